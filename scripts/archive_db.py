@@ -0,0 +1,190 @@
+"""
+Archive DB - Перенос старых заявок и назначений в архив
+
+Горячие таблицы tasks/assignments держат только рабочий набор текущего
+дня, история уходит в tasks_archive/assignments_archive (см.
+migrate_add_archive.py). Отчеты за весь период читают представления
+tasks_all/assignments_all (schema.load_tasks(..., include_archive=True)).
+
+В архив переносятся распределенные заявки, созданные и назначенные до
+горизонта, вместе с назначениями, а также назначения без заявки.
+Нераспределенные заявки остаются в горячей таблице.
+
+Перенос идет небольшими транзакциями (SQLITE_ARCHIVE_CHUNK заявок),
+между ними запись доступна другим процессам.
+
+Использование (в т.ч. по расписанию: cron, Планировщик заданий Windows):
+    python scripts/archive_db.py                  # все до начала сегодняшнего дня
+    python scripts/archive_db.py --keep-days 7    # оставить последние 7 дней
+    python scripts/archive_db.py --dry-run        # только посчитать
+"""
+
+import argparse
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, checkpoint, close_connection, get_connection, transaction
+from schema import ASSIGNMENT_COLUMNS, get_schema
+
+ARCHIVE_CHUNK_SIZE = int(os.environ.get('SQLITE_ARCHIVE_CHUNK', 500))
+
+SELECT_ARCHIVABLE_TASKS_SQL = """
+    SELECT t.id FROM tasks t JOIN assignments a ON a.task_id = t.id
+    WHERE t.created_at < ? AND a.assigned_at < ?
+    LIMIT ?
+"""
+
+SELECT_ORPHAN_ASSIGNMENTS_SQL = """
+    SELECT a.id FROM assignments a
+    WHERE a.assigned_at < ? AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.id = a.task_id)
+    LIMIT ?
+"""
+
+
+def archive_cutoff(keep_days: int = 0, now: datetime = None) -> str:
+    """
+    Горизонт архивации: начало дня keep_days дней назад (ISO-строка)
+
+    Сравнивается с created_at/assigned_at как строка, что для ISO-формата
+    совпадает с хронологическим порядком.
+    """
+    now = now or datetime.now()
+    start = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=keep_days)
+    return start.isoformat()
+
+
+def _placeholders(values: List) -> str:
+    return ','.join('?' * len(values))
+
+
+def _archive_tasks_chunk(conn, task_columns: str, task_ids: List[str]) -> Dict[str, int]:
+    ph = _placeholders(task_ids)
+    assignment_columns = ','.join(ASSIGNMENT_COLUMNS)
+    conn.execute(
+        f"INSERT OR REPLACE INTO tasks_archive ({task_columns}) SELECT {task_columns} FROM tasks WHERE id IN ({ph})",
+        task_ids
+    )
+    conn.execute(
+        f"INSERT OR REPLACE INTO assignments_archive ({assignment_columns}) "
+        f"SELECT {assignment_columns} FROM assignments WHERE task_id IN ({ph})",
+        task_ids
+    )
+    assignments = conn.execute(f"DELETE FROM assignments WHERE task_id IN ({ph})", task_ids).rowcount
+    tasks = conn.execute(f"DELETE FROM tasks WHERE id IN ({ph})", task_ids).rowcount
+    return {'tasks': tasks, 'assignments': assignments}
+
+
+def _archive_orphans_chunk(conn, assignment_ids: List[str]) -> int:
+    ph = _placeholders(assignment_ids)
+    assignment_columns = ','.join(ASSIGNMENT_COLUMNS)
+    conn.execute(
+        f"INSERT OR REPLACE INTO assignments_archive ({assignment_columns}) "
+        f"SELECT {assignment_columns} FROM assignments WHERE id IN ({ph})",
+        assignment_ids
+    )
+    return conn.execute(f"DELETE FROM assignments WHERE id IN ({ph})", assignment_ids).rowcount
+
+
+def count_archivable(cutoff: str, db_path: str = None) -> Dict[str, int]:
+    """Сколько заявок и назначений будет перенесено при данном горизонте"""
+    conn = get_connection(db_path)
+    tasks = conn.execute(
+        "SELECT COUNT(*) FROM tasks t JOIN assignments a ON a.task_id = t.id "
+        "WHERE t.created_at < ? AND a.assigned_at < ?", (cutoff, cutoff)
+    ).fetchone()[0]
+    orphans = conn.execute(
+        "SELECT COUNT(*) FROM assignments a WHERE a.assigned_at < ? "
+        "AND NOT EXISTS (SELECT 1 FROM tasks t WHERE t.id = a.task_id)", (cutoff,)
+    ).fetchone()[0]
+    return {'tasks': tasks, 'assignments': tasks + orphans}
+
+
+def archive(db_path: str = None, keep_days: int = 0, chunk_size: int = None,
+            pause_ms: float = 0, cutoff: str = None) -> Dict[str, int]:
+    """
+    Перенести старые данные в архивные таблицы
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        keep_days: Сколько прошлых дней оставить в горячих таблицах (0 - только сегодня)
+        chunk_size: Заявок в одной транзакции (по умолчанию SQLITE_ARCHIVE_CHUNK)
+        pause_ms: Пауза между транзакциями (мс), чтобы пропустить писателей
+        cutoff: Явный горизонт (ISO-строка) вместо keep_days
+
+    Returns:
+        Количество перенесенных заявок, назначений и транзакций
+    """
+    schema = get_schema(db_path)
+    if not schema.has_archive:
+        raise RuntimeError("Архивные таблицы не созданы (нужна миграция add_archive_v1)")
+
+    cutoff = cutoff or archive_cutoff(keep_days)
+    chunk_size = max(1, chunk_size or ARCHIVE_CHUNK_SIZE)
+    task_columns = ','.join(schema.task_columns)
+    stats = {'tasks': 0, 'assignments': 0, 'chunks': 0}
+
+    while True:
+        with transaction(db_path) as conn:
+            task_ids = [r[0] for r in conn.execute(
+                SELECT_ARCHIVABLE_TASKS_SQL, (cutoff, cutoff, chunk_size)
+            ).fetchall()]
+            if task_ids:
+                moved = _archive_tasks_chunk(conn, task_columns, task_ids)
+            else:
+                orphan_ids = [r[0] for r in conn.execute(
+                    SELECT_ORPHAN_ASSIGNMENTS_SQL, (cutoff, chunk_size)
+                ).fetchall()]
+                if not orphan_ids:
+                    break
+                moved = {'tasks': 0, 'assignments': _archive_orphans_chunk(conn, orphan_ids)}
+
+        stats['tasks'] += moved['tasks']
+        stats['assignments'] += moved['assignments']
+        stats['chunks'] += 1
+        if pause_ms > 0:
+            time.sleep(pause_ms / 1000.0)
+
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Перенести старые заявки и назначения в архивные таблицы')
+    parser.add_argument('--keep-days', type=int, default=0,
+                        help='Сколько прошлых дней оставить в горячих таблицах (0 - только сегодня)')
+    parser.add_argument('--chunk-size', type=int, default=None, help='Заявок в одной транзакции')
+    parser.add_argument('--pause-ms', type=float, default=0, help='Пауза между транзакциями (миллисекунды)')
+    parser.add_argument('--dry-run', action='store_true', help='Только посчитать, ничего не переносить')
+    args = parser.parse_args()
+
+    if not os.path.exists(DB_PATH):
+        print(f"[ERROR] База данных не найдена: {DB_PATH}")
+        return 1
+
+    cutoff = archive_cutoff(args.keep_days)
+    print(f"[INFO] Горизонт архивации: {cutoff}")
+
+    try:
+        if args.dry_run:
+            counts = count_archivable(cutoff, DB_PATH)
+            print(f"[INFO] Будет перенесено: заявок {counts['tasks']}, назначений {counts['assignments']}")
+            return 0
+
+        start = time.time()
+        stats = archive(DB_PATH, chunk_size=args.chunk_size, pause_ms=args.pause_ms, cutoff=cutoff)
+        checkpoint(DB_PATH, 'TRUNCATE')
+        print(f"[OK] Перенесено: заявок {stats['tasks']}, назначений {stats['assignments']} "
+              f"({stats['chunks']} транзакций, {time.time() - start:.2f} сек)")
+        return 0
+    except Exception as e:
+        print(f"[ERROR] Ошибка архивации: {e}")
+        return 1
+    finally:
+        close_connection(DB_PATH)
+
+
+if __name__ == "__main__":
+    exit(main())
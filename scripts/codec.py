@@ -0,0 +1,198 @@
+"""
+Codec - Кодирование JSON-колонок data и params
+
+Поддерживает:
+- orjson, если установлен (иначе стандартный json)
+- Бинарный формат msgpack для колонки data (SQLITE_DATA_FORMAT=msgpack),
+  старые текстовые строки читаются прозрачно: TEXT - JSON, BLOB - msgpack
+- Ленивое декодирование params (LazyJSON): JSON разбирается при первом
+  обращении, а неизмененные params записываются обратно без перекодирования
+- Быстрый путь для пустых документов ('{}') без вызова декодера
+
+params всегда хранится JSON-текстом: по нему строятся генерируемые
+колонки и фильтры json_extract (см. migrate_add_param_columns.py).
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+DATA_FORMATS = ('json', 'msgpack')
+
+EMPTY_DOCUMENTS = (None, '', '{}', 'null', b'')
+
+_PENDING = object()
+# Разбор LazyJSON: объекты общих данных (shared_data.py) читают несколько сессий
+_decode_lock = threading.Lock()
+
+
+def _data_format(name: str) -> str:
+    if name not in DATA_FORMATS:
+        print(f"[WARN] Неизвестный формат data: {name}, используется json")
+        return 'json'
+    if name == 'msgpack' and not MSGPACK_AVAILABLE:
+        print("[WARN] msgpack не установлен, data записывается в JSON")
+        return 'json'
+    return name
+
+
+DATA_FORMAT = _data_format(os.environ.get('SQLITE_DATA_FORMAT', 'json'))
+
+
+def _default(obj):
+    # Подклассы встроенных типов (orjson с OPT_PASSTHROUGH_SUBCLASS, msgpack)
+    if isinstance(obj, dict):
+        return dict(obj.items())
+    for base in (str, int, float, list):
+        if isinstance(obj, base):
+            return base(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(obj: Any) -> str:
+    """
+    Объект -> JSON-текст (не-ASCII символы не экранируются)
+
+    Нераскодированный LazyJSON возвращается исходным текстом.
+    """
+    if isinstance(obj, LazyJSON) and obj._raw is not None:
+        return obj._raw
+    if ORJSON_AVAILABLE:
+        return orjson.dumps(
+            obj, default=_default,
+            option=orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_SUBCLASS
+        ).decode('utf-8')
+    if isinstance(obj, LazyJSON):
+        obj = dict(obj.items())
+    return json.dumps(obj, ensure_ascii=False)
+
+
+def loads(raw: Union[str, bytes]) -> Any:
+    """JSON-текст -> объект"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def encode_data(obj: Dict) -> Union[str, bytes]:
+    """Значение колонки data в формате DATA_FORMAT"""
+    if DATA_FORMAT == 'msgpack':
+        return msgpack.packb(obj, use_bin_type=True, default=_default)
+    return dumps(obj)
+
+
+def decode_data(raw: Union[str, bytes, None]) -> Dict:
+    """
+    Значение колонки data -> словарь (TEXT - JSON, BLOB - msgpack)
+
+    Returns:
+        Словарь ({} для пустых и нечитаемых значений)
+    """
+    if raw in EMPTY_DOCUMENTS:
+        return {}
+    try:
+        if isinstance(raw, bytes):
+            if not MSGPACK_AVAILABLE:
+                print("[WARN] Колонка data в формате msgpack, но msgpack не установлен")
+                return {}
+            value = msgpack.unpackb(raw, raw=False)
+        else:
+            value = loads(raw)
+    except Exception:
+        return {}
+    return value if isinstance(value, dict) else {}
+
+
+class LazyJSON(dict):
+    """
+    Словарь, который разбирает JSON-текст при первом обращении
+
+    Подкласс dict: isinstance(x, dict) и обычные операции работают как
+    с обычным словарем. Нечитаемый JSON дает пустой словарь.
+    """
+
+    __slots__ = ('_raw',)
+
+    def __init__(self, raw: str):
+        # Метка в хранилище: C-код, проверяющий размер словаря напрямую
+        # (например, быстрый путь json.dumps для {}), не примет его за пустой
+        super().__init__({_PENDING: None})
+        self._raw = raw
+
+    def _decode(self) -> None:
+        # _raw сбрасывается последним: поток, увидевший _raw = None, видит
+        # уже заполненный словарь, остальные ждут блокировку
+        with _decode_lock:
+            raw = self._raw
+            if raw is None:
+                return
+            try:
+                value = loads(raw)
+            except Exception:
+                value = {}
+            dict.clear(self)
+            if isinstance(value, dict):
+                dict.update(self, value)
+            self._raw = None
+
+    @property
+    def decoded(self) -> bool:
+        return self._raw is None
+
+    def __bool__(self) -> bool:
+        if self._raw is not None:
+            return self._raw not in EMPTY_DOCUMENTS
+        return dict.__len__(self) > 0
+
+    def __repr__(self) -> str:
+        if self._raw is not None:
+            return f"LazyJSON({self._raw!r})"
+        return dict.__repr__(self)
+
+    def __reduce__(self):
+        # Копирование и pickle дают обычный словарь
+        return dict, (dict(self.items()),)
+
+
+def _decoding(name: str):
+    method = getattr(dict, name)
+
+    def wrapper(self, *args, **kwargs):
+        if self._raw is not None:
+            self._decode()
+        return method(self, *args, **kwargs)
+
+    wrapper.__name__ = name
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+
+# Все операции чтения и записи сначала разбирают JSON
+for _name in ('__getitem__', '__setitem__', '__delitem__', '__contains__', '__iter__', '__len__',
+              '__reversed__', '__eq__', '__ne__', '__or__', '__ior__', 'get', 'keys', 'values',
+              'items', 'copy', 'pop', 'popitem', 'setdefault', 'update', 'clear'):
+    setattr(LazyJSON, _name, _decoding(_name))
+
+
+def lazy_loads(raw: Union[str, None]) -> Dict:
+    """
+    JSON-текст params -> LazyJSON (пустые документы - обычный пустой словарь)
+    """
+    if raw in EMPTY_DOCUMENTS:
+        return {}
+    return LazyJSON(raw)
@@ -0,0 +1,196 @@
+"""
+Dashboard Queries - Агрегаты дашборда на стороне SQL
+
+Итоги, количество нераспределенных заявок, нагрузка по отделам и по
+исполнителям считались циклами Python по полностью загруженным спискам
+заявок, назначений и исполнителей. DashboardQueries считает их
+запросами к снимку БД (snapshot.py):
+- COUNT(*) по таблицам - по самому узкому индексу
+- Нераспределенные заявки - анти-join NOT EXISTS по idx_assignments_task_id
+- Назначения по исполнителям - GROUP BY по idx_assignments_executor_assigned
+- Нагрузка исполнителей - счетчики текущей эпохи (executor_counters)
+- Гистограмма утилизации, крайние по утилизации исполнители и нагрузка
+  одного отдела - для пула, где столбец на каждого исполнителя не
+  помещается в график (больше CHART_EXECUTOR_LIMIT)
+
+Результаты кэшируются до смены поколения снимка: обновление дашборда без
+изменений в БД не выполняет ни одного запроса. Таблицы возвращаются как
+pandas.DataFrame (без pandas - список словарей).
+"""
+
+import os
+import threading
+from typing import Callable, Dict, List, Sequence, Tuple
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    pd = None
+    PANDAS_AVAILABLE = False
+
+# Утилизация исполнителя в процентах (лимит 0 - утилизация 0, как на дашборде)
+UTILIZATION_EXPR = "(CASE WHEN daily_limit > 0 THEN 100.0 * assigned_today / daily_limit ELSE 0 END)"
+
+# Больше активных исполнителей - дашборд рисует агрегаты вместо столбца на каждого
+CHART_EXECUTOR_LIMIT = int(os.environ.get('DASHBOARD_CHART_EXECUTORS', 50))
+# Ширина корзины гистограммы утилизации (%); последняя корзина - от 100% и выше
+HISTOGRAM_BIN_WIDTH = 10
+
+
+def _with_load(schema, sql: str) -> str:
+    """Запрос поверх нагрузки исполнителей (CTE load)"""
+    return f"WITH load AS ({schema.executor_load_sql}) {sql}"
+
+
+def kpis_sql(schema) -> str:
+    return _with_load(schema, """
+        SELECT
+            (SELECT COUNT(*) FROM tasks),
+            (SELECT COUNT(*) FROM assignments),
+            (SELECT COUNT(*) FROM tasks t
+             WHERE NOT EXISTS (SELECT 1 FROM assignments a WHERE a.task_id = t.id)),
+            (SELECT COUNT(*) FROM load WHERE active = 1),
+            (SELECT COALESCE(SUM(assigned_today), 0) FROM load WHERE active = 1)
+    """)
+
+
+def department_load_sql(schema) -> str:
+    return _with_load(schema, f"""
+        SELECT COALESCE(department, 'N/A') AS dept, COUNT(*), SUM(assigned_today), SUM(daily_limit),
+               ROUND(AVG({UTILIZATION_EXPR}), 1)
+        FROM load WHERE active = 1
+        GROUP BY dept ORDER BY SUM(assigned_today) DESC, dept
+    """)
+
+
+def executor_load_sql(schema, limit: int = None, by_department: bool = False) -> str:
+    # by_department - только отдел из параметра запроса
+    return _with_load(schema, f"""
+        SELECT id, name, COALESCE(department, 'N/A'), assigned_today, daily_limit, {UTILIZATION_EXPR}
+        FROM load WHERE active = 1{" AND COALESCE(department, 'N/A') = ?" if by_department else ''}
+        ORDER BY name{f' LIMIT {int(limit)}' if limit else ''}
+    """)
+
+
+def executor_outliers_sql(schema, limit: int, highest: bool = True) -> str:
+    return _with_load(schema, f"""
+        SELECT id, name, COALESCE(department, 'N/A'), assigned_today, daily_limit, {UTILIZATION_EXPR} AS util
+        FROM load WHERE active = 1
+        ORDER BY util {'DESC' if highest else 'ASC'}, name LIMIT {int(limit)}
+    """)
+
+
+def utilization_histogram_sql(schema, width: int = HISTOGRAM_BIN_WIDTH) -> str:
+    return _with_load(schema, f"""
+        SELECT MIN(CAST({UTILIZATION_EXPR} / {int(width)} AS INTEGER), {100 // int(width)}) AS bin, COUNT(*)
+        FROM load WHERE active = 1
+        GROUP BY bin ORDER BY bin
+    """)
+
+
+def assignments_by_department_sql(schema) -> str:
+    return """
+        SELECT COALESCE(e.department, 'N/A') AS dept, SUM(a.cnt) AS total
+        FROM (SELECT executor_id, COUNT(*) AS cnt FROM assignments GROUP BY executor_id) a
+        LEFT JOIN executors e ON e.id = a.executor_id
+        GROUP BY dept ORDER BY total DESC, dept
+    """
+
+
+KPI_KEYS = ('tasks', 'assignments', 'unassigned', 'active_executors', 'assigned_today')
+DEPARTMENT_COLUMNS = ['Отдел', 'Исполнителей', 'Назначено', 'Лимит', 'Утилизация']
+EXECUTOR_COLUMNS = ['ID', 'Исполнитель', 'Отдел', 'Назначено', 'Лимит', 'Утилизация']
+ASSIGNMENT_DEPARTMENT_COLUMNS = ['Отдел', 'Назначений']
+HISTOGRAM_COLUMNS = ['Утилизация', 'От', 'Исполнителей']
+
+
+def frame(columns: Sequence[str], rows: List[Tuple]):
+    """Таблица результата: DataFrame (или список словарей без pandas)"""
+    if PANDAS_AVAILABLE:
+        return pd.DataFrame(rows, columns=list(columns))
+    return [dict(zip(columns, row)) for row in rows]
+
+
+class DashboardQueries:
+    """Агрегаты дашборда по снимку БД с кэшем на поколение снимка"""
+
+    def __init__(self, snapshot):
+        """
+        Args:
+            snapshot: SnapshotService, по которому выполняются запросы
+        """
+        self.snapshot = snapshot
+        self.queries = 0
+        self._generation = None
+        self._cache: Dict[Tuple, List[Tuple]] = {}
+        self._lock = threading.Lock()
+
+    def _rows(self, key: Tuple, build_sql: Callable, *args, params: Tuple = ()) -> List[Tuple]:
+        """Строки запроса для текущего поколения снимка (из кэша, если уже выполнялся)"""
+        conn, generation = self.snapshot.reader()
+        with self._lock:
+            if generation.number != self._generation:
+                self._cache.clear()
+                self._generation = generation.number
+            rows = self._cache.get(key)
+        if rows is None:
+            rows = [tuple(r) for r in conn.execute(build_sql(generation.schema, *args), params).fetchall()]
+            with self._lock:
+                if generation.number == self._generation:
+                    self._cache[key] = rows
+                self.queries += 1
+        return rows
+
+    def kpis(self) -> Dict[str, int]:
+        """
+        Итоги дашборда
+
+        Returns:
+            {'tasks', 'assignments', 'unassigned', 'active_executors', 'assigned_today'}
+        """
+        return dict(zip(KPI_KEYS, self._rows(('kpis',), kpis_sql)[0]))
+
+    def department_load(self):
+        """Нагрузка активных исполнителей по отделам (Утилизация - средняя, %)"""
+        return frame(DEPARTMENT_COLUMNS, self._rows(('departments',), department_load_sql))
+
+    def executor_load(self, limit: int = None, department: str = None):
+        """
+        Нагрузка активных исполнителей (Утилизация в %), по имени
+
+        Args:
+            limit: Не больше limit исполнителей
+            department: Только исполнители отдела ('N/A' - без отдела)
+        """
+        if department is None:
+            return frame(EXECUTOR_COLUMNS, self._rows(('executors', limit), executor_load_sql, limit))
+        return frame(EXECUTOR_COLUMNS, self._rows(('executors', limit, department), executor_load_sql,
+                                                  limit, True, params=(department,)))
+
+    def executor_outliers(self, limit: int = 10, highest: bool = True):
+        """Исполнители с самой высокой (highest) или самой низкой утилизацией"""
+        return frame(EXECUTOR_COLUMNS, self._rows(('outliers', limit, highest), executor_outliers_sql,
+                                                  limit, highest))
+
+    def utilization_histogram(self, width: int = HISTOGRAM_BIN_WIDTH):
+        """
+        Гистограмма утилизации активных исполнителей (корзины считаются в SQL)
+
+        Args:
+            width: Ширина корзины (%)
+
+        Returns:
+            Таблица (Утилизация - подпись корзины, От - ее начало, Исполнителей)
+            из 100 / width + 1 строк независимо от числа исполнителей
+        """
+        counts = dict(self._rows(('histogram', width), utilization_histogram_sql, width))
+        last = 100 // width
+        rows = [(f"{b * width}–{(b + 1) * width}%" if b < last else f"≥{b * width}%", b * width, counts.get(b, 0))
+                for b in range(last + 1)]
+        return frame(HISTOGRAM_COLUMNS, rows)
+
+    def assignments_by_department(self):
+        """Все назначения горячей таблицы по отделам исполнителей"""
+        return frame(ASSIGNMENT_DEPARTMENT_COLUMNS,
+                     self._rows(('assignments_by_department',), assignments_by_department_sql))
@@ -0,0 +1,314 @@
+"""
+DB - Менеджер соединений SQLite
+
+Единая точка получения соединений для приложения и скриптов:
+- Одно долгоживущее соединение на поток (и на файл БД)
+- Профиль производительности (WAL, synchronous, кэш, mmap) применяется
+  один раз при создании соединения
+- Транзакции через контекстный менеджер transaction()
+- Периодический checkpoint WAL, чтобы журнал не рос во время нагрузочных тестов
+  (RESTART/TRUNCATE - в фоновом потоке, коммит не ждет читателей)
+
+Настройка через переменные окружения:
+    SQLITE_PATH           - путь к файлу БД
+    SQLITE_PROFILE        - пресет: safe | fast (по умолчанию fast)
+    SQLITE_<PRAGMA>       - переопределение отдельной PRAGMA профиля,
+                            например SQLITE_SYNCHRONOUS=FULL, SQLITE_MMAP_SIZE=0
+    SQLITE_CHECKPOINT_S   - период checkpoint WAL в секундах (0 - только автоматический)
+    SQLITE_CHECKPOINT_MODE - режим периодического checkpoint (PASSIVE/FULL/RESTART/TRUNCATE)
+    SQLITE_BULK_CHUNK     - строк в одном executemany при пакетной записи
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+from itertools import islice
+from typing import Dict, Iterable, Mapping, Optional, Sequence, Tuple
+
+DB_PATH = os.environ.get(
+    'SQLITE_PATH',
+    os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'streamlit_app', 'ais.db'))
+)
+
+# Пресеты PRAGMA. busy_timeout идет первым: смена journal_mode ждет блокировку.
+# safe - WAL с fsync на каждый коммит; fast - fsync только при checkpoint
+# (при сбое питания теряются последние коммиты, но БД не повреждается).
+PROFILES = {
+    'safe': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'FULL',
+        'cache_size': -16000,           # КиБ (отрицательное значение), ~16 МБ
+        'mmap_size': 0,
+        'temp_store': 'DEFAULT',
+        'wal_autocheckpoint': 1000,     # страниц
+        'journal_size_limit': 67108864,  # WAL обрезается до 64 МБ после checkpoint
+    },
+    'fast': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'cache_size': -65536,           # ~64 МБ
+        'mmap_size': 268435456,         # 256 МБ
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 1000,
+        'journal_size_limit': 67108864,
+    },
+}
+DEFAULT_PROFILE = 'fast'
+
+CHECKPOINT_MODES = ('PASSIVE', 'FULL', 'RESTART', 'TRUNCATE')
+
+
+def load_profile(name: Optional[str] = None, env: Mapping[str, str] = os.environ) -> Dict:
+    """
+    Собрать PRAGMA профиля с учетом переопределений из окружения
+
+    Args:
+        name: Имя пресета (по умолчанию SQLITE_PROFILE или DEFAULT_PROFILE)
+        env: Переменные окружения
+
+    Returns:
+        Словарь PRAGMA -> значение
+    """
+    name = (name or env.get('SQLITE_PROFILE') or DEFAULT_PROFILE).lower()
+    if name not in PROFILES:
+        print(f"[WARN] Неизвестный профиль SQLite '{name}', используется '{DEFAULT_PROFILE}'")
+        name = DEFAULT_PROFILE
+
+    pragmas = dict(PROFILES[name])
+    for pragma in pragmas:
+        value = env.get(f'SQLITE_{pragma.upper()}')
+        if value is not None and value.strip():
+            value = value.strip()
+            pragmas[pragma] = int(value) if value.lstrip('-').isdigit() else value.upper()
+    return pragmas
+
+
+# PRAGMA, применяемые к каждому новому соединению
+CONNECTION_PRAGMAS = load_profile()
+
+CHECKPOINT_INTERVAL_S = float(os.environ.get('SQLITE_CHECKPOINT_S', 30))
+CHECKPOINT_MODE = os.environ.get('SQLITE_CHECKPOINT_MODE', 'RESTART').upper()
+
+BULK_CHUNK_SIZE = int(os.environ.get('SQLITE_BULK_CHUNK', 500))
+
+_local = threading.local()
+_registry_lock = threading.Lock()
+_all_connections = weakref.WeakSet()
+# Увеличивается в close_all(): соединения потоков прошлых поколений пересоздаются
+_generation = 0
+# Время последнего периодического checkpoint по файлам БД
+_last_checkpoint: Dict[str, float] = {}
+# Файлы БД, для которых сейчас выполняется фоновый checkpoint
+_checkpoint_running = set()
+
+
+class PooledConnection(sqlite3.Connection):
+    """sqlite3.Connection с поддержкой weakref (для реестра открытых соединений)"""
+
+
+def apply_profile(conn: sqlite3.Connection, pragmas: Optional[Dict] = None) -> None:
+    """
+    Применить профиль PRAGMA к соединению
+
+    Ошибка отдельной PRAGMA не мешает открыть соединение: например, WAL
+    нельзя включить, пока другой процесс держит БД в режиме rollback journal.
+
+    Args:
+        conn: Соединение SQLite
+        pragmas: PRAGMA -> значение (по умолчанию CONNECTION_PRAGMAS)
+    """
+    for name, value in (pragmas or CONNECTION_PRAGMAS).items():
+        try:
+            conn.execute(f"PRAGMA {name}={value}")
+        except sqlite3.OperationalError as e:
+            print(f"[WARN] PRAGMA {name}={value} не применена: {e}")
+
+
+def connect(db_path: str = None) -> sqlite3.Connection:
+    """
+    Открыть новое соединение с примененными PRAGMA
+
+    Обычно нужен get_connection(); connect() - для случаев, когда
+    соединение должно жить отдельно от потока (например, бэкап).
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+
+    Returns:
+        Соединение с row_factory = sqlite3.Row
+    """
+    conn = sqlite3.connect(db_path or DB_PATH, check_same_thread=False, factory=PooledConnection)
+    conn.row_factory = sqlite3.Row
+    apply_profile(conn)
+    with _registry_lock:
+        _all_connections.add(conn)
+    return conn
+
+
+def get_connection(db_path: str = None) -> sqlite3.Connection:
+    """
+    Получить долгоживущее соединение текущего потока
+
+    Соединение создается при первом обращении и переиспользуется всеми
+    последующими вызовами из этого потока. Закрывается вместе с потоком
+    или явно через close_connection().
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+
+    Returns:
+        Соединение SQLite
+    """
+    path = os.path.abspath(db_path or DB_PATH)
+    connections = getattr(_local, 'connections', None)
+    if connections is None or _local.generation != _generation:
+        connections = _local.connections = {}
+        _local.generation = _generation
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = connections[path] = connect(path)
+    return conn
+
+
+@contextmanager
+def transaction(db_path: str = None, immediate: bool = True):
+    """
+    Транзакция на соединении текущего потока
+
+    Вложенный вызов присоединяется к внешней транзакции.
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        immediate: BEGIN IMMEDIATE - сразу захватить блокировку записи
+
+    Yields:
+        Соединение SQLite
+    """
+    conn = get_connection(db_path)
+    if conn.in_transaction:
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+    maybe_checkpoint(db_path)
+
+
+def executemany_chunked(conn: sqlite3.Connection, sql: str, rows: Iterable[Sequence],
+                        chunk_size: int = None) -> int:
+    """
+    executemany частями по chunk_size строк
+
+    Не делает commit - вызывается внутри transaction(), поэтому вся пачка
+    фиксируется одним коммитом, а в памяти одновременно лежит только один чанк.
+
+    Args:
+        conn: Соединение SQLite
+        sql: Параметризованный запрос
+        rows: Параметры строк (список или генератор)
+        chunk_size: Строк в одном executemany (по умолчанию BULK_CHUNK_SIZE)
+
+    Returns:
+        Количество переданных строк
+    """
+    size = max(1, chunk_size or BULK_CHUNK_SIZE)
+    it = iter(rows)
+    total = 0
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return total
+        conn.executemany(sql, chunk)
+        total += len(chunk)
+
+
+def checkpoint(db_path: str = None, mode: str = None) -> Optional[Tuple[int, int, int]]:
+    """
+    Перенести WAL в основной файл БД
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        mode: PASSIVE, FULL, RESTART или TRUNCATE (по умолчанию CHECKPOINT_MODE)
+
+    Returns:
+        (busy, страниц в WAL, перенесено страниц) или None при ошибке
+    """
+    mode = (mode or CHECKPOINT_MODE).upper()
+    if mode not in CHECKPOINT_MODES:
+        raise ValueError(f"Неизвестный режим checkpoint: {mode}")
+    try:
+        row = get_connection(db_path).execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    except sqlite3.OperationalError as e:
+        print(f"[WARN] Checkpoint WAL не выполнен: {e}")
+        return None
+    return tuple(row)
+
+
+def maybe_checkpoint(db_path: str = None) -> None:
+    """
+    Периодический checkpoint: не чаще раза в CHECKPOINT_INTERVAL_S на файл БД
+
+    Автоматический checkpoint SQLite (wal_autocheckpoint) не может сбросить
+    WAL, пока его читают дашборды, и журнал растет. RESTART/TRUNCATE
+    дожидаются читателей (в пределах busy_timeout) и начинают WAL сначала,
+    поэтому выполняются в фоновом потоке со своим соединением, а не в
+    потоке, который только что закоммитил. PASSIVE не ждет и идет сразу.
+    """
+    if CHECKPOINT_INTERVAL_S <= 0:
+        return
+    path = os.path.abspath(db_path or DB_PATH)
+    now = time.monotonic()
+    with _registry_lock:
+        last = _last_checkpoint.setdefault(path, now)
+        if now - last < CHECKPOINT_INTERVAL_S or path in _checkpoint_running:
+            return
+        _last_checkpoint[path] = now
+        if CHECKPOINT_MODE != 'PASSIVE':
+            _checkpoint_running.add(path)
+    if CHECKPOINT_MODE == 'PASSIVE':
+        checkpoint(path)
+        return
+    threading.Thread(target=_background_checkpoint, args=(path,), name='sqlite-checkpoint', daemon=True).start()
+
+
+def _background_checkpoint(path: str) -> None:
+    try:
+        checkpoint(path)
+    finally:
+        close_connection(path)
+        with _registry_lock:
+            _checkpoint_running.discard(path)
+
+
+def close_connection(db_path: str = None) -> None:
+    """Закрыть соединение текущего потока (например, в конце фонового потока)"""
+    connections = getattr(_local, 'connections', None) or {}
+    path = os.path.abspath(db_path or DB_PATH)
+    conn = connections.pop(path, None)
+    if conn is not None:
+        conn.close()
+
+
+def close_all() -> None:
+    """Закрыть все открытые соединения процесса (перед удалением файла БД)"""
+    global _generation
+    with _registry_lock:
+        _generation += 1
+        connections = list(_all_connections)
+    for conn in connections:
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
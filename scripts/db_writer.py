@@ -0,0 +1,250 @@
+"""
+DB Writer - Единственный поток записи с групповым коммитом
+
+Запись по одной строке упирается в fsync на каждый коммит. DBWriter
+принимает операции через очередь и фиксирует их пачками: одна транзакция
+на WRITER_MAX_BATCH операций или WRITER_MAX_DELAY_MS миллисекунд.
+
+Поддерживает:
+- Произвольные execute / executemany (подряд идущие одинаковые запросы
+  склеиваются в один executemany)
+- Атомарное резервирование слотов (dispatcher.try_reserve) - лимиты
+  исполнителей соблюдаются и при групповом коммите
+- Склейку инкрементов счетчиков исполнителей внутри пачки
+- Future на каждую операцию: результат выставляется после коммита
+- flush() и остановку с дозаписью очереди (также при выходе из процесса)
+
+Настройка через переменные окружения:
+    SQLITE_WRITER_BATCH     - максимум операций в одной транзакции
+    SQLITE_WRITER_DELAY_MS  - сколько ждать пополнения пачки после первой операции
+"""
+
+import atexit
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+from typing import Dict, List, Mapping, Optional, Sequence
+
+from db import DB_PATH, close_connection, transaction
+from dispatcher import try_reserve
+from schema import get_schema
+
+WRITER_MAX_BATCH = int(os.environ.get('SQLITE_WRITER_BATCH', 1000))
+WRITER_MAX_DELAY_MS = float(os.environ.get('SQLITE_WRITER_DELAY_MS', 5))
+# Сколько flush() ждет фиксации по умолчанию (сек)
+FLUSH_TIMEOUT_S = 60
+
+# Виды операций в очереди
+_EXECUTE = 'execute'
+_RESERVE = 'reserve'
+_INCREMENT = 'increment'
+_FLUSH = 'flush'
+_STOP = 'stop'
+
+_writers: Dict[str, 'DBWriter'] = {}
+_writers_lock = threading.Lock()
+
+
+class DBWriter:
+    """Поток записи в SQLite с групповым коммитом"""
+
+    def __init__(self, db_path: str = None, max_batch: int = None, max_delay_ms: float = None):
+        """
+        Args:
+            db_path: Путь к файлу БД (по умолчанию db.DB_PATH)
+            max_batch: Максимум операций в одной транзакции
+            max_delay_ms: Сколько ждать пополнения пачки после первой операции
+        """
+        self.db_path = os.path.abspath(db_path or DB_PATH)
+        self.max_batch = max(1, max_batch or WRITER_MAX_BATCH)
+        self.max_delay_s = (WRITER_MAX_DELAY_MS if max_delay_ms is None else max_delay_ms) / 1000.0
+        self.queue: queue.Queue = queue.Queue()
+        self.thread: Optional[threading.Thread] = None
+        self.stopped = False
+        # Поток записи завершился (штатно или с ошибкой) - новые операции не принимаются
+        self.dead = False
+        self._submit_lock = threading.Lock()
+        self.commits = 0
+        self.operations = 0
+
+    def start(self) -> 'DBWriter':
+        """Запустить поток записи"""
+        self.thread = threading.Thread(target=self._run, name='db-writer', daemon=True)
+        self.thread.start()
+        atexit.register(self.stop)
+        return self
+
+    @property
+    def alive(self) -> bool:
+        """Поток записи запущен и принимает операции"""
+        return not self.stopped and not self.dead and self.thread is not None and self.thread.is_alive()
+
+    def _submit(self, kind: str, payload) -> Future:
+        future = Future()
+        with self._submit_lock:
+            if self.stopped or self.dead:
+                raise RuntimeError("DBWriter остановлен")
+            self.queue.put((kind, payload, future))
+        return future
+
+    def execute(self, sql: str, params: Sequence = ()) -> Future:
+        """Поставить запрос в очередь. Future -> 1 после коммита"""
+        return self._submit(_EXECUTE, (sql, [tuple(params)]))
+
+    def executemany(self, sql: str, rows: Sequence[Sequence]) -> Future:
+        """Поставить пачку строк в очередь. Future -> количество строк после коммита"""
+        return self._submit(_EXECUTE, (sql, [tuple(r) for r in rows]))
+
+    def reserve(self, assignment: Dict) -> Future:
+        """
+        Зарезервировать слот исполнителя и записать назначение (см. dispatcher.try_reserve)
+
+        Returns:
+            Future -> True после коммита, False если у исполнителя не осталось слотов
+        """
+        return self._submit(_RESERVE, assignment)
+
+    def increment_counts(self, counts: Mapping[str, int]) -> Future:
+        """Увеличить счетчики assigned_today (инкременты пачки суммируются)"""
+        return self._submit(_INCREMENT, dict(counts))
+
+    def flush(self, timeout: float = FLUSH_TIMEOUT_S) -> None:
+        """
+        Дождаться фиксации всех операций, поставленных до вызова
+
+        Raises:
+            TimeoutError: операции не зафиксированы за timeout секунд
+            RuntimeError: поток записи завершился
+        """
+        self._submit(_FLUSH, None).result(timeout)
+
+    def stop(self, timeout: float = 30) -> None:
+        """Дописать очередь и остановить поток"""
+        if self.stopped or self.thread is None:
+            return
+        self.stopped = True
+        self.queue.put((_STOP, None, Future()))
+        self.thread.join(timeout)
+
+    def _collect(self, first) -> List:
+        """Добрать операции в пачку: до max_batch штук или max_delay после первой"""
+        batch = [first]
+        deadline = time.monotonic() + self.max_delay_s
+        while len(batch) < self.max_batch and batch[-1][0] not in (_FLUSH, _STOP):
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(item)
+        return batch
+
+    def _run(self) -> None:
+        batch = []
+        error: Exception = RuntimeError("DBWriter остановлен")
+        try:
+            while True:
+                batch = self._collect(self.queue.get())
+                ops = [item for item in batch if item[0] not in (_FLUSH, _STOP)]
+                if ops:
+                    self._commit(ops)
+                for kind, _, future in batch:
+                    if kind == _FLUSH:
+                        future.set_result(None)
+                if batch[-1][0] == _STOP:
+                    break
+                batch = []
+        except Exception as e:
+            print(f"[ERROR] Поток записи {self.db_path} завершился с ошибкой: {e}")
+            error = RuntimeError(f"DBWriter завершился с ошибкой: {e}")
+        finally:
+            # Ожидающие операции не будут выполнены - их Future завершаются ошибкой
+            with self._submit_lock:
+                self.dead = True
+            pending = list(batch)
+            while True:
+                try:
+                    pending.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+            close_connection(self.db_path)
+
+    def _commit(self, ops: List) -> None:
+        """Выполнить пачку одной транзакцией; при ошибке - по одной операции"""
+        try:
+            with transaction(self.db_path) as conn:
+                results = self._apply(conn, ops)
+        except Exception as e:
+            print(f"[WARN] Групповой коммит не удался ({e}), повтор по одной операции")
+            for op in ops:
+                try:
+                    with transaction(self.db_path) as conn:
+                        result = self._apply(conn, [op])[0]
+                except Exception as op_error:
+                    op[2].set_exception(op_error)
+                else:
+                    self.commits += 1
+                    op[2].set_result(result)
+            return
+
+        self.commits += 1
+        self.operations += len(ops)
+        for (_, _, future), result in zip(ops, results):
+            future.set_result(result)
+
+    def _apply(self, conn, ops: List) -> List:
+        """Выполнить операции на соединении (без коммита), вернуть результаты по порядку"""
+        results = [None] * len(ops)
+        increments = Counter()
+        schema = get_schema(self.db_path)
+        i = 0
+        while i < len(ops):
+            kind, payload, _ = ops[i]
+            if kind == _RESERVE:
+                results[i] = try_reserve(conn, payload, schema)
+                i += 1
+            elif kind == _INCREMENT:
+                increments.update(payload)
+                i += 1
+            else:
+                # Подряд идущие одинаковые запросы - одним executemany
+                sql, rows = payload
+                j = i + 1
+                if j < len(ops) and ops[j][0] == _EXECUTE and ops[j][1][0] == sql:
+                    rows = list(rows)
+                while j < len(ops) and ops[j][0] == _EXECUTE and ops[j][1][0] == sql:
+                    rows.extend(ops[j][1][1])
+                    j += 1
+                conn.executemany(sql, rows)
+                for k in range(i, j):
+                    results[k] = len(ops[k][1][1])
+                i = j
+
+        if increments:
+            conn.executemany(schema.increment_count_sql, [(n, executor_id) for executor_id, n in increments.items() if n])
+        return results
+
+
+def get_writer(db_path: str = None) -> DBWriter:
+    """Общий для процесса DBWriter файла БД (запускается при первом обращении)"""
+    path = os.path.abspath(db_path or DB_PATH)
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None or not writer.alive:
+            writer = _writers[path] = DBWriter(path).start()
+        return writer
+
+
+def stop_writers() -> None:
+    """Дописать очереди и остановить все DBWriter процесса"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.stop()
@@ -0,0 +1,144 @@
+"""
+Delta Sync - Инкрементальная синхронизация данных дашборда с SQLite
+
+Вместо перечитывания всех таблиц на каждом обновлении:
+- Отпечаток БД (PRAGMA data_version + total_changes соединения): если
+  никто ничего не записал, синхронизация не читает ни одной строки
+- Заявки и назначения в памяти не хранятся (KPI, разбивки и экспорт -
+  SQL-запросы к снимку): по rowid-водяному знаку (WHERE rowid > ?)
+  читаются только время новых строк и исполнитель новых назначений
+  (appended) - для рядов time_series.py и метрик fairness.py
+- Удаления обнаруживаются сверкой COUNT(*) - при расхождении водяной знак
+  переставляется без чтения строк (appended = None, ряды перестраиваются
+  запросом)
+- Исполнители (небольшая таблица с постоянно меняющимися счетчиками)
+  перечитываются целиком, но только если БД изменилась
+- changed_executors - исполнители из новых назначений: только их счетчики
+  изменились, если состав, лимиты, активность и эпоха счетчиков те же
+  (schema.executors_fingerprint_sql); иначе None - нужен полный проход
+
+Стоимость обновления пропорциональна числу изменений, а не размеру истории.
+С snapshot (snapshot.py) данные читаются из снимка БД в памяти, отпечаток -
+номер поколения снимка; живая БД не читается совсем.
+Правки уже существующих заявок/назначений сюда не попадают: после таких
+операций вызывайте reload().
+"""
+
+from contextlib import nullcontext
+from typing import Dict, List, Optional, Set, Tuple
+
+from db import get_connection, transaction
+from schema import get_schema
+
+
+class DeltaSync:
+    """Исполнители и водяные знаки заявок и назначений, синхронизируемые по изменениям"""
+
+    def __init__(self, db_path: str = None, snapshot=None):
+        """
+        Args:
+            db_path: Путь к файлу БД (по умолчанию db.DB_PATH)
+            snapshot: SnapshotService - читать из снимка вместо живой БД
+        """
+        self.db_path = db_path
+        self.snapshot = snapshot
+        self.executors: List[Dict] = []
+        # Таблица -> (максимальный rowid, количество строк) на момент синхронизации
+        self.watermarks: Dict[str, Tuple[int, int]] = {}
+        self._fingerprint: Optional[Tuple] = None
+        # Поколение снимка, из которого прочитаны коллекции (только со snapshot)
+        self.generation: Optional[int] = None
+        # Таблица -> новые строки последней синхронизации (schema.select_*_since_sql:
+        # (created_at,) для tasks, (assigned_at, executor_id) для assignments),
+        # None - водяной знак переставлен (первая синхронизация или удаления)
+        self.appended: Dict[str, Optional[List[Tuple]]] = {}
+        # ID исполнителей, чьи счетчики изменились последней синхронизацией;
+        # None - неизвестно (первая загрузка, перезагрузка, правка исполнителей)
+        self.changed_executors: Optional[Set[str]] = None
+        self._executors_fingerprint: Optional[Tuple] = None
+        self.full_reloads = 0
+        self.rows_fetched = 0
+
+    def _current_fingerprint(self, conn) -> Tuple[int, int, int]:
+        # data_version меняется при коммитах других соединений,
+        # total_changes - при записях через это же соединение
+        data_version = conn.execute("PRAGMA data_version").fetchone()[0]
+        return id(conn), data_version, conn.total_changes
+
+    def reload(self) -> None:
+        """Перечитать все таблицы целиком"""
+        self._fingerprint = None
+        self._executors_fingerprint = None
+        self.watermarks.clear()
+        self.sync()
+
+    def sync(self) -> bool:
+        """
+        Подтянуть изменения с прошлой синхронизации
+
+        Returns:
+            False если БД не менялась с прошлой синхронизации (ничего не читалось)
+        """
+        if self.snapshot is not None:
+            # Поколение снимка неизменно - транзакция не нужна
+            conn, generation = self.snapshot.reader()
+            fingerprint = ('snapshot', id(self.snapshot), generation.number)
+            schema = generation.schema
+            read = nullcontext()
+        else:
+            conn = get_connection(self.db_path)
+            fingerprint = self._current_fingerprint(conn)
+            schema = None
+            # Одна read-транзакция: все таблицы из одного снимка (WAL)
+            read = transaction(self.db_path, immediate=False)
+        if fingerprint == self._fingerprint:
+            return False
+
+        schema = schema or get_schema(self.db_path)
+        with read:
+            self._sync_append_only(conn, 'tasks', schema.select_tasks_since_sql)
+            self._sync_append_only(conn, 'assignments', schema.select_assignments_since_sql)
+            rows = conn.execute(schema.select_executors_sql).fetchall()
+            self.rows_fetched += len(rows)
+            self.executors = [schema.executor_from_row(r) for r in rows]
+            executors_fingerprint = (conn.execute(schema.executors_fingerprint_sql).fetchone()
+                                     if schema.executors_fingerprint_sql else None)
+
+        appended = self.appended['assignments']
+        if appended is None or executors_fingerprint is None or executors_fingerprint != self._executors_fingerprint:
+            self.changed_executors = None
+        else:
+            self.changed_executors = {row[1] for row in appended}
+        self._executors_fingerprint = executors_fingerprint
+
+        if self.snapshot is not None:
+            self.generation = generation.number
+        # Отпечаток снят до чтения: коммит, попавший между ним и снимком,
+        # даст лишнюю (пустую) синхронизацию, но не потеряется
+        self._fingerprint = fingerprint
+        return True
+
+    def _sync_append_only(self, conn, table: str, since_sql: str) -> None:
+        """Передвинуть водяной знак таблицы, новые строки - в self.appended[table]"""
+        max_rowid, count = conn.execute(f"SELECT MAX(rowid), COUNT(*) FROM {table}").fetchone()
+        max_rowid = max_rowid or 0
+        watermark = self.watermarks.get(table)
+
+        if watermark is not None:
+            last_rowid, last_count = watermark
+            if (max_rowid, count) == (last_rowid, last_count):
+                self.appended[table] = []
+                return
+
+            if max_rowid >= last_rowid and count >= last_count:
+                rows = conn.execute(since_sql, (last_rowid,)).fetchall()
+                if last_count + len(rows) == count:
+                    self.rows_fetched += len(rows)
+                    self.watermarks[table] = (max_rowid, count)
+                    self.appended[table] = rows
+                    return
+
+        # Первая синхронизация или удаления - строки не читаются, только водяной знак
+        self.full_reloads += 1
+        self.watermarks[table] = (max_rowid, count)
+        self.appended[table] = None
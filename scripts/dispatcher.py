@@ -0,0 +1,563 @@
+"""
+Dispatcher - Ядро распределения заявок без привязки к UI
+
+Используется и Streamlit-приложением, и HTTP сервисом приема заявок:
+- Загрузка Rule Engine из config/matching_rules.json
+- Выбор лучшего исполнителя (Rule Engine или простой fairness-алгоритм)
+- Распределение пачки заявок по состоянию исполнителей в памяти
+- Атомарное резервирование слотов в SQLite для параллельных распределителей
+- Приближенный режим power-of-d-choices для очень больших пулов исполнителей
+- Пакетное распределение с одной транзакцией на пачку заявок
+"""
+
+import json
+import os
+import random
+import uuid
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from db import transaction
+from schema import get_schema, increment_executor_counts_bulk, save_assignments_bulk, schema_for_connection
+
+try:
+    from rule_engine import RuleEngine
+    RULE_ENGINE_AVAILABLE = True
+except ImportError:
+    RULE_ENGINE_AVAILABLE = False
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'matching_rules.json')
+
+PRIORITY_BONUS = {'Критический': 0.5, 'Высокий': 0.3, 'Средний': 0.1, 'Низкий': 0.0}
+
+
+def load_rule_engine(config_path: str = DEFAULT_RULES_PATH):
+    """
+    Загрузить Rule Engine из конфигурации
+
+    Args:
+        config_path: Путь к JSON файлу с правилами
+
+    Returns:
+        RuleEngine или None если движок недоступен
+    """
+    if not RULE_ENGINE_AVAILABLE:
+        return None
+
+    if not os.path.exists(config_path):
+        print(f"[WARN] Конфигурация правил не найдена: {config_path}")
+        return None
+
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+
+        engine = RuleEngine(config)
+        print(f"[OK] Rule Engine загружен, правил: {len(config.get('rules', []))}")
+        return engine
+    except Exception as e:
+        print(f"[ERROR] Ошибка загрузки Rule Engine: {e}")
+        return None
+
+
+def prepare_for_rules(task: Dict, executors: List[Dict]) -> None:
+    """
+    Обогатить заявку и исполнителей полями, которые используются в правилах
+
+    Args:
+        task: Данные заявки (изменяется на месте)
+        executors: Список исполнителей (изменяются на месте)
+    """
+    for executor in executors:
+        executor['assigned_count'] = executor.get('assigned_today', 0)
+        executor['max_assignments'] = executor.get('daily_limit', 10)
+        # Добавляем params из data если есть
+        if 'params' not in executor and 'data' in executor:
+            executor['params'] = executor.get('data', {})
+
+    # Добавляем params к заявке
+    if 'params' not in task and 'data' in task:
+        task['params'] = task.get('data', {})
+
+    # Добавляем is_active для правила active_executor
+    task['is_active'] = 1
+
+
+def simple_score(task: Dict, executor: Dict) -> float:
+    """
+    Score простого алгоритма: fairness (главный вес) + бонусы отдела и приоритета
+
+    Args:
+        task: Данные заявки
+        executor: Данные исполнителя
+
+    Returns:
+        Итоговый score
+    """
+    utilization = executor['assigned_today'] / executor['daily_limit'] if executor['daily_limit'] > 0 else 0
+
+    # Fairness score - ОСНОВНОЙ вес (умножаем на 10 для усиления)
+    fairness_score = (1.0 - utilization) * 10.0
+
+    # Бонус за совпадение отдела (небольшой аддитивный бонус)
+    department_bonus = 1.0 if executor.get('department') == task.get('category') else 0.0
+
+    # Бонус за приоритет (небольшой аддитивный бонус)
+    priority_bonus = PRIORITY_BONUS.get(task.get('priority', 'Средний'), 0.1)
+
+    return fairness_score + department_bonus + priority_bonus
+
+
+def find_best_executor(task: Dict, executors: List[Dict], engine=None) -> Optional[Tuple[Dict, float]]:
+    """
+    Найти лучшего исполнителя для заявки
+
+    Режим (exact/sampled) берется из секции sampling конфигурации правил.
+
+    Args:
+        task: Данные заявки
+        executors: Список исполнителей
+        engine: RuleEngine (если None - используется простой алгоритм)
+
+    Returns:
+        (executor, score) или None если свободных исполнителей нет
+    """
+    sampling = (getattr(engine, 'sampling', None) or {}) if engine is not None else {}
+    if sampling.get('mode') == 'sampled':
+        sample = sample_available(executors, int(sampling.get('d', 8)))
+        return find_best_sampled(task, sample, executors, engine, sampling.get('fallback', True))
+    return find_best_exact(task, executors, engine)
+
+
+def find_best_exact(task: Dict, executors: List[Dict], engine=None) -> Optional[Tuple[Dict, float]]:
+    """Точный поиск: правила для всех свободных исполнителей, иначе простой алгоритм"""
+    # Фильтруем только активных исполнителей с доступными слотами
+    active_executors = [e for e in executors if e.get('active', True) and e['assigned_today'] < e['daily_limit']]
+    if not active_executors:
+        return None
+
+    if engine is not None:
+        try:
+            prepare_for_rules(task, active_executors)
+            result = engine.find_best_match(task, active_executors)
+            if result:
+                executor, score, matched_rules = result
+                return executor, score
+        except Exception as e:
+            print(f"[WARN] Rule Engine error: {e}, fallback to simple algorithm")
+
+    # Fallback: простой алгоритм
+    best_executor = None
+    best_score = -1.0
+
+    for executor in active_executors:
+        final_score = simple_score(task, executor)
+        if final_score > best_score:
+            best_score = final_score
+            best_executor = executor
+
+    return (best_executor, best_score) if best_executor else None
+
+
+def find_best_sampled(task: Dict, sample: List[Dict], executors: List[Dict], engine,
+                      fallback: bool = True) -> Optional[Tuple[Dict, float]]:
+    """
+    Power-of-d-choices: правила и подготовка только для выборки кандидатов
+
+    Args:
+        task: Данные заявки
+        sample: Выборка свободных кандидатов (sample_available / AvailablePool.sample)
+        executors: Полный список - для точного перебора
+        engine: RuleEngine
+        fallback: Если выборка пуста или в ней нет подходящих по правилам -
+                  точный перебор executors (False - вернуть None)
+
+    Returns:
+        (executor, score) или None
+    """
+    ranked = rank_candidates(task, sample, engine, top_n=1, rules_only=True) if sample else []
+    if ranked:
+        return ranked[0]
+    return find_best_exact(task, executors, engine) if fallback else None
+
+
+def rank_candidates(task: Dict, executors: List[Dict], engine=None, top_n: int = None,
+                    rules_only: bool = False) -> List[Tuple[Dict, float]]:
+    """
+    Ранжировать свободных исполнителей для заявки (лучший первый)
+
+    Args:
+        task: Данные заявки
+        executors: Список исполнителей
+        engine: RuleEngine (если None - используется простой алгоритм)
+        top_n: Вернуть только топ N (или всех если None)
+        rules_only: Только подходящие по правилам, без простого алгоритма
+                    (для выборки в режиме sampled - пустой результат
+                    значит, что нужен точный перебор)
+
+    Returns:
+        Список (executor, score) отсортированный по score
+    """
+    active_executors = [e for e in executors if e.get('active', True) and e['assigned_today'] < e['daily_limit']]
+    if not active_executors:
+        return []
+
+    if engine is not None:
+        try:
+            prepare_for_rules(task, active_executors)
+            ranked = engine.rank_executors(task, active_executors, top_n=top_n)
+            if ranked or rules_only:
+                return [(executor, score) for executor, score, _ in ranked]
+        except Exception as e:
+            print(f"[WARN] Rule Engine error: {e}, fallback to simple algorithm")
+            if rules_only:
+                return []
+
+    ranked = sorted(((e, simple_score(task, e)) for e in active_executors), key=lambda x: x[1], reverse=True)
+    return ranked[:top_n] if top_n else ranked
+
+
+INSERT_ASSIGNMENT_SQL = """
+    INSERT INTO assignments(id,task_id,executor_id,assigned_at,score)
+    VALUES(?,?,?,?,?)
+"""
+
+
+def make_assignment(task: Dict, executor: Dict, score: float) -> Dict:
+    """Создать запись назначения заявки исполнителю"""
+    return {
+        'id': str(uuid.uuid4()),
+        'task_id': task['id'],
+        'executor_id': executor['id'],
+        'assigned_at': datetime.now().isoformat(),
+        'score': score
+    }
+
+
+def try_reserve(conn, assignment: Dict, schema) -> bool:
+    """
+    Зарезервировать слот исполнителя и записать назначение
+
+    Не делает commit - вызывается внутри транзакции вызывающего кода,
+    поэтому инкремент счетчика и вставка назначения фиксируются вместе.
+    Счетчик растет только если лимит не исчерпан (schema.reserve_slot_sql).
+
+    Args:
+        conn: Соединение SQLite
+        assignment: Назначение (см. make_assignment)
+        schema: Схема БД (кэшированная get_schema - без PRAGMA на каждую заявку)
+
+    Returns:
+        False если у исполнителя не осталось слотов (конфликт)
+    """
+    cur = conn.execute(schema.reserve_slot_sql, (assignment['executor_id'],))
+    if cur.rowcount != 1:
+        return False
+    conn.execute(INSERT_ASSIGNMENT_SQL, (
+        assignment['id'], assignment['task_id'], assignment['executor_id'],
+        assignment['assigned_at'], assignment['score']
+    ))
+    return True
+
+
+def refresh_executor_counter(conn, executor: Dict, schema) -> None:
+    """Перечитать счетчик, лимит и активность исполнителя из БД"""
+    row = conn.execute(schema.select_counter_sql, (executor['id'],)).fetchone()
+    if row is None:
+        executor['active'] = False
+        return
+    executor['assigned_today'] = row[1]
+    executor['daily_limit'] = row[2]
+    executor['active'] = bool(row[3])
+
+
+def sync_executor_counters(conn, executors: List[Dict], schema) -> None:
+    """Перечитать счетчики, лимиты и активность всех исполнителей одним запросом"""
+    rows = {r[0]: r for r in conn.execute(schema.select_counters_sql)}
+    for executor in executors:
+        row = rows.get(executor['id'])
+        if row is None:
+            executor['active'] = False
+            continue
+        executor['assigned_today'] = row[1]
+        executor['daily_limit'] = row[2]
+        executor['active'] = bool(row[3])
+
+
+def assigned_task_ids(conn, task_ids: List[str], chunk_size: int = 500) -> set:
+    """ID заявок из списка, у которых уже есть назначение (индекс assignments.task_id)"""
+    ids = list(task_ids)
+    found = set()
+    for i in range(0, len(ids), chunk_size):
+        chunk = ids[i:i + chunk_size]
+        rows = conn.execute(
+            f"SELECT task_id FROM assignments WHERE task_id IN ({','.join('?' * len(chunk))})", chunk
+        ).fetchall()
+        found.update(r[0] for r in rows)
+    return found
+
+
+def assign_with_reservation(conn, task: Dict, executors: List[Dict], schema, engine=None,
+                            max_attempts: int = 5, rules_only: bool = False) -> Optional[Dict]:
+    """
+    Назначить заявку с атомарным резервированием слота
+
+    Если слот лучшего исполнителя уже занят другим распределителем,
+    его счетчик перечитывается из БД и пробуется следующий по score.
+    Не делает commit - оберните вызов в `with conn:`.
+
+    Args:
+        conn: Соединение SQLite
+        task: Данные заявки
+        executors: Список исполнителей (счетчики обновляются на месте)
+        schema: Схема БД (кэшированная get_schema)
+        engine: RuleEngine или None
+        max_attempts: Сколько раз перевыбирать исполнителя при конфликтах
+        rules_only: Только подходящие по правилам (см. rank_candidates)
+
+    Returns:
+        Назначение или None если свободных исполнителей нет
+    """
+    for _ in range(max_attempts):
+        candidates = rank_candidates(task, executors, engine, top_n=max_attempts, rules_only=rules_only)
+        if not candidates:
+            return None
+
+        for executor, score in candidates:
+            assignment = make_assignment(task, executor, score)
+            if try_reserve(conn, assignment, schema):
+                executor['assigned_today'] += 1
+                return assignment
+            # Конфликт: слот занят другим распределителем
+            refresh_executor_counter(conn, executor, schema)
+            if executor.get('active', True) and executor['assigned_today'] < executor['daily_limit']:
+                # Счетчик изменился, но место есть - пересчитываем ранжирование
+                break
+
+    return None
+
+
+def is_available(executor: Dict) -> bool:
+    """Исполнитель активен и у него есть свободные слоты"""
+    return executor.get('active', True) and executor['assigned_today'] < executor['daily_limit']
+
+
+def sample_available(executors: List[Dict], d: int, rng=random, attempts: int = 4) -> List[Dict]:
+    """
+    До d свободных исполнителей случайной выборкой из списка, без его фильтрации
+
+    Занятые исполнители отбрасываются из выборки, как в AvailablePool.sample;
+    пустой результат после attempts попыток значит, что свободных мало и
+    нужен точный перебор.
+    """
+    if len(executors) <= d:
+        return [e for e in executors if is_available(e)]
+    for _ in range(attempts):
+        sample = [e for e in rng.sample(executors, d) if is_available(e)]
+        if sample:
+            return sample
+    return []
+
+
+class AvailablePool:
+    """Множество свободных исполнителей с O(1) удалением и случайной выборкой"""
+
+    def __init__(self, executors: List[Dict] = ()):
+        self.items: List[Dict] = []
+        self.positions: Dict[str, int] = {}
+        for executor in executors:
+            self.add(executor)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def add(self, executor: Dict) -> None:
+        if executor['id'] not in self.positions:
+            self.positions[executor['id']] = len(self.items)
+            self.items.append(executor)
+
+    def remove(self, executor: Dict) -> None:
+        index = self.positions.pop(executor['id'], None)
+        if index is None:
+            return
+        last = self.items.pop()
+        if index < len(self.items):
+            self.items[index] = last
+            self.positions[last['id']] = index
+
+    def sample(self, d: int, rng: random.Random) -> List[Dict]:
+        """
+        Выбрать до d свободных исполнителей
+
+        Заполненные исполнители удаляются из пула лениво - при попадании в выборку,
+        поэтому пул не нужно синхронизировать с каждым инкрементом счетчика.
+        """
+        sample = []
+        while not sample and self.items:
+            picked = list(self.items) if len(self.items) <= d else rng.sample(self.items, d)
+            for executor in picked:
+                if is_available(executor):
+                    sample.append(executor)
+                else:
+                    self.remove(executor)
+        return sample
+
+
+class Dispatcher:
+    """Распределяет заявки по состоянию исполнителей, которое держит в памяти"""
+
+    def __init__(self, executors: List[Dict], engine=None, sampling: Dict = None, seed: int = None):
+        """
+        Args:
+            executors: Список исполнителей (dict в формате load_executors_from_db)
+            engine: RuleEngine или None для простого алгоритма
+            sampling: Режим выбора {'mode': 'exact'|'sampled', 'd': 8,
+                      'pool': 'uniform'|'category', 'fallback': True}.
+                      По умолчанию берется из секции sampling конфигурации правил
+            seed: Seed генератора выборок (для воспроизводимых замеров)
+        """
+        self.engine = engine
+        self.sampling = sampling or (getattr(engine, 'sampling', None) or {'mode': 'exact'})
+        self.rng = random.Random(seed)
+        self.executors: List[Dict] = []
+        self.available = AvailablePool()
+        self.available_by_category: Dict[str, AvailablePool] = {}
+        self.load(executors)
+
+    @property
+    def sampled(self) -> bool:
+        return self.engine is not None and self.sampling.get('mode') == 'sampled'
+
+    def load(self, executors: List[Dict]) -> None:
+        """Заменить состояние исполнителей (например, после перечитывания из БД)"""
+        self.executors = list(executors)
+        if self.sampled:
+            available = [e for e in self.executors if is_available(e)]
+            self.available = AvailablePool(available)
+            self.available_by_category = {}
+            for executor in available:
+                department = executor.get('department')
+                self.available_by_category.setdefault(department, AvailablePool()).add(executor)
+
+    def sample_candidates(self, task: Dict) -> List[Dict]:
+        """
+        Выборка d свободных кандидатов для заявки
+
+        pool='category' - из свободных исполнителей отдела, совпадающего с
+        категорией заявки (если таких нет - из всех свободных).
+        """
+        d = int(self.sampling.get('d', 8))
+        if self.sampling.get('pool', 'uniform') == 'category':
+            pool = self.available_by_category.get(task.get('category'))
+            if pool:
+                sample = pool.sample(d, self.rng)
+                if sample:
+                    return sample
+        return self.available.sample(d, self.rng)
+
+    def _assign_sampled(self, task: Dict, conn=None, schema=None) -> Optional[Dict]:
+        """Power-of-d-choices: полный набор правил только для d кандидатов"""
+        sample = self.sample_candidates(task)
+        fallback = self.sampling.get('fallback', True)
+
+        if conn is not None:
+            # Выборка пуста или все в ней неподходящие по правилам - точный перебор
+            assignment = None
+            if sample:
+                assignment = assign_with_reservation(conn, task, sample, schema, self.engine, rules_only=True)
+            if assignment is None and fallback:
+                assignment = assign_with_reservation(conn, task, self.executors, schema, self.engine)
+            return assignment
+
+        result = find_best_sampled(task, sample, self.executors, self.engine, fallback)
+        if result is None:
+            return None
+
+        executor, score = result
+        executor['assigned_today'] += 1
+        return make_assignment(task, executor, score)
+
+    def assign(self, task: Dict, conn=None, schema=None) -> Optional[Dict]:
+        """
+        Назначить заявку лучшему исполнителю и учесть это в его счетчике
+
+        Args:
+            task: Данные заявки
+            conn: Соединение SQLite - если передано, слот резервируется
+                  атомарно в БД (см. assign_with_reservation)
+            schema: Схема БД (get_schema); если не передана - определяется
+                    по соединению
+
+        Returns:
+            Назначение (dict) или None если свободных исполнителей нет
+        """
+        if conn is not None and schema is None:
+            schema = schema_for_connection(conn)
+
+        if self.sampled:
+            return self._assign_sampled(task, conn, schema)
+
+        if conn is not None:
+            return assign_with_reservation(conn, task, self.executors, schema, self.engine)
+
+        result = find_best_exact(task, self.executors, self.engine)
+        if not result:
+            return None
+
+        executor, score = result
+        executor['assigned_today'] += 1
+        return make_assignment(task, executor, score)
+
+    def assign_batch(self, tasks: List[Dict], conn=None, schema=None) -> List[Optional[Dict]]:
+        """
+        Распределить пачку заявок
+
+        Args:
+            tasks: Список заявок
+            conn: Соединение SQLite для атомарного резервирования (опционально)
+            schema: Схема БД (get_schema); если не передана - определяется
+                    по соединению один раз на пачку
+
+        Returns:
+            Список назначений в порядке заявок (None для нераспределенных)
+        """
+        if conn is not None and schema is None:
+            schema = schema_for_connection(conn)
+        return [self.assign(task, conn, schema) for task in tasks]
+
+
+def assign_tasks_bulk(tasks: List[Dict], executors: List[Dict], engine=None,
+                      db_path: str = None, chunk_size: int = None) -> List[Optional[Dict]]:
+    """
+    Распределить пачку заявок одной транзакцией
+
+    BEGIN IMMEDIATE берет блокировку записи до чтения счетчиков, поэтому
+    распределение в памяти и пакетный инкремент счетчиков не превышают
+    daily_limit при параллельных распределителях - без отдельного
+    резервирования и коммита на каждую заявку.
+
+    Args:
+        tasks: Заявки (уже сохраненные или сохраняемые в той же транзакции);
+               заявки, у которых уже есть назначение, пропускаются
+        executors: Список исполнителей (счетчики обновляются на месте)
+        engine: RuleEngine или None
+        db_path: Путь к файлу БД (по умолчанию db.DB_PATH)
+        chunk_size: Строк в одном executemany
+
+    Returns:
+        Список назначений в порядке заявок (None для нераспределенных)
+    """
+    with transaction(db_path) as conn:
+        sync_executor_counters(conn, executors, get_schema(db_path))
+        # Заявки, уже распределенные другим распределителем, пропускаются
+        # (иначе нарушится UNIQUE индекс assignments.task_id)
+        already = assigned_task_ids(conn, [t['id'] for t in tasks])
+        pending = [t for t in tasks if t['id'] not in already]
+
+        made = [a for a in Dispatcher(executors, engine).assign_batch(pending) if a]
+        save_assignments_bulk(made, db_path, chunk_size)
+        increment_executor_counts_bulk(Counter(a['executor_id'] for a in made), db_path, chunk_size)
+
+    by_task = {a['task_id']: a for a in made}
+    return [by_task.get(t['id']) for t in tasks]
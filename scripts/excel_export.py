@@ -0,0 +1,278 @@
+"""
+Excel Export - Потоковая выгрузка дашборда в Excel
+
+Прежний экспорт искал исполнителя и заявку каждого назначения перебором
+списков (O(A×(E+T))) и собирал всю книгу в памяти через pandas и BytesIO.
+Здесь:
+- Лист «Все назначения» - один запрос с LEFT JOIN по первичным ключам
+  tasks/executors (и архивных таблиц), строки читаются пачками fetchmany
+- Книга openpyxl в режиме write_only: строки листа сразу уходят во
+  временный файл openpyxl, в памяти остается одна пачка
+- Диаграммы добавляются после строк, по известному числу строк
+- Готовая книга пишется в SpooledTemporaryFile: небольшая остается в
+  памяти, крупная (больше EXCEL_EXPORT_SPOOL_MB) - во временном файле
+
+Данные читаются из снимка БД (snapshot.py): вся книга соответствует
+одному состоянию БД.
+
+Настройка через переменные окружения:
+    EXCEL_EXPORT_BATCH_ROWS - строк за одну выборку (по умолчанию 5000)
+    EXCEL_EXPORT_SPOOL_MB   - размер книги в памяти до сброса на диск (по умолчанию 32)
+"""
+
+import os
+import tempfile
+from typing import IO, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from dashboard_queries import department_load_sql, kpis_sql
+
+EXPORT_BATCH_ROWS = int(os.environ.get('EXCEL_EXPORT_BATCH_ROWS', 5000))
+EXPORT_SPOOL_BYTES = int(float(os.environ.get('EXCEL_EXPORT_SPOOL_MB', 32)) * 1024 * 1024)
+
+XLSX_MIME = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+EXECUTOR_EXPORT_COLUMNS = [
+    'ID', 'Исполнитель', 'Email', 'Отдел', 'Назначено заявок', 'Дневной лимит',
+    'Утилизация (%)', 'Отклонение от среднего (%)', 'Навыки', 'Активен',
+]
+ASSIGNMENT_EXPORT_COLUMNS = [
+    'ID назначения', 'ID заявки', 'Категория заявки', 'Приоритет', 'ID исполнителя',
+    'Имя исполнителя', 'Отдел', 'Дата назначения', 'Оценка (score)',
+]
+
+
+def assignment_export_sql(schema, archive: bool = False) -> str:
+    """
+    Назначения с категорией и приоритетом заявки и именем и отделом исполнителя
+
+    Args:
+        schema: Schema соединения
+        archive: Читать assignments_archive вместо горячей таблицы
+    """
+    source = 'assignments_archive' if archive else 'assignments'
+    if schema.has_archive:
+        # Заявка назначения может быть уже в архиве: два поиска по первичному ключу
+        task_join = ("LEFT JOIN tasks t ON t.id = a.task_id "
+                     "LEFT JOIN tasks_archive ta ON ta.id = a.task_id")
+        category, priority = "COALESCE(t.category, ta.category)", "COALESCE(t.priority, ta.priority)"
+    else:
+        task_join = "LEFT JOIN tasks t ON t.id = a.task_id"
+        category, priority = "t.category", "t.priority"
+    # Горячая таблица - в обратном порядке вставки (без сортировки),
+    # архив - по индексу assigned_at
+    order = "a.assigned_at DESC" if archive else "a.rowid DESC"
+    return f"""
+        SELECT a.id, a.task_id, COALESCE({category}, 'N/A'), COALESCE({priority}, 'N/A'),
+               a.executor_id, COALESCE(e.name, 'N/A'), COALESCE(e.department, 'N/A'),
+               a.assigned_at, ROUND(COALESCE(a.score, 0), 2)
+        FROM {source} a
+        {task_join}
+        LEFT JOIN executors e ON e.id = a.executor_id
+        ORDER BY {order}
+    """
+
+
+def iter_assignment_rows(conn, schema, include_archive: bool = False,
+                         batch_rows: int = None) -> Iterator[List[Tuple]]:
+    """
+    Строки листа «Все назначения» пачками (память - одна пачка)
+
+    Args:
+        conn: Соединение с БД или снимком
+        schema: Schema соединения
+        include_archive: Добавить назначения из архива (после горячих)
+        batch_rows: Строк в пачке (по умолчанию EXCEL_EXPORT_BATCH_ROWS)
+    """
+    batch_rows = batch_rows or EXPORT_BATCH_ROWS
+    sources = [False] + ([True] if include_archive and schema.has_archive else [])
+    for archive in sources:
+        cursor = conn.execute(assignment_export_sql(schema, archive))
+        while True:
+            rows = cursor.fetchmany(batch_rows)
+            if not rows:
+                break
+            yield [tuple(r) for r in rows]
+
+
+def _header(ws, columns: Sequence[str]) -> None:
+    from openpyxl.cell import WriteOnlyCell
+    from openpyxl.styles import Font
+
+    bold = Font(bold=True)
+    cells = []
+    for column in columns:
+        cell = WriteOnlyCell(ws, value=column)
+        cell.font = bold
+        cells.append(cell)
+    ws.append(cells)
+
+
+def _line_chart(ws, title: str, y_title: str, rows: int, style: int) -> None:
+    from openpyxl.chart import LineChart, Reference
+
+    chart = LineChart()
+    chart.title = title
+    chart.y_axis.title = y_title
+    chart.x_axis.title = "Время"
+    chart.add_data(Reference(ws, min_col=2, min_row=1, max_row=rows + 1), titles_from_data=True)
+    chart.set_categories(Reference(ws, min_col=1, min_row=2, max_row=rows + 1))
+    chart.height = 12
+    chart.width = 20
+    chart.style = style
+    ws.add_chart(chart, "E2")
+
+
+def write_dashboard_workbook(target, conn, schema, metrics: Dict, rates: Dict[str, List[Tuple[str, int]]],
+                             recent_tasks: int = 0, include_archive: bool = False, batch_rows: int = None,
+                             progress: Optional[Callable[[int], None]] = None) -> Dict[str, int]:
+    """
+    Записать книгу дашборда
+
+    Args:
+        target: Путь или файловый объект для книги
+        conn: Соединение с БД или снимком (все листы - из него)
+        schema: Schema соединения
+        metrics: Метрики справедливости (FairnessMetrics.summary)
+        rates: 'tasks'/'assignments' -> [(время, количество)] за последние минуты
+        recent_tasks: Новых заявок за последнюю минуту
+        include_archive: Назначения вместе с архивом
+        batch_rows: Строк в пачке выборки назначений
+        progress: Вызывается после каждой пачки с числом записанных назначений
+
+    Returns:
+        Лист -> число строк данных
+    """
+    from openpyxl import Workbook
+    from openpyxl.chart import BarChart, PieChart, Reference
+    from openpyxl.chart.label import DataLabelList
+
+    workbook = Workbook(write_only=True)
+    written: Dict[str, int] = {}
+    tasks_total, _, _, _, _ = conn.execute(kpis_sql(schema)).fetchone()
+
+    # === Лист 1: Общие метрики ===
+    ws = workbook.create_sheet('Общие метрики')
+    _header(ws, ['Метрика', 'Значение'])
+    metric_rows = [
+        ('Всего заявок в системе', tasks_total),
+        ('Новых заявок за последнюю минуту', recent_tasks),
+        ('Активных исполнителей', metrics['active']),
+        ('Обработано заявок', metrics['total_assigned']),
+        ('Справедливость (MAE)', f"{metrics['mae']:.3f}"),
+        ('Средняя нагрузка (заявок/исполнитель)', f"{metrics['avg_load']:.1f}"),
+        ('---', ''),
+        ('СТАТИСТИКА РАСПРЕДЕЛЕНИЯ:', ''),
+        ('Средняя утилизация (%)', f"{metrics['avg_utilization']:.1f}"),
+        ('Стандартное отклонение (σ, %)', f"{metrics['std_utilization']:.2f}"),
+        ('Минимальная утилизация (%)', f"{metrics['min_utilization']:.1f}"),
+        ('Максимальная утилизация (%)', f"{metrics['max_utilization']:.1f}"),
+        ('Разброс утилизации (%)', f"{metrics['range_utilization']:.1f}"),
+        ('Медиана утилизации (%)', f"{metrics['p50_utilization']:.1f}"),
+        ('90-й перцентиль утилизации (%)', f"{metrics['p90_utilization']:.1f}"),
+    ]
+    for row in metric_rows:
+        ws.append(row)
+    written['Общие метрики'] = len(metric_rows)
+
+    # === Лист 2: Исполнители (активные) с диаграммами утилизации и отклонения ===
+    avg_utilization = metrics['avg_utilization']
+    ws = workbook.create_sheet('Исполнители')
+    _header(ws, EXECUTOR_EXPORT_COLUMNS)
+    executors = 0
+    for r in conn.execute(schema.select_executors_sql):
+        e = schema.executor_from_row(r)
+        if not e['active']:
+            continue
+        utilization = e['assigned_today'] / e['daily_limit'] * 100 if e['daily_limit'] > 0 else 0
+        ws.append([
+            e['id'], e['name'], e['email'], e.get('department') or 'N/A', e['assigned_today'],
+            e['daily_limit'], round(utilization, 1), round(utilization - avg_utilization, 1),
+            ', '.join(e.get('skills', [])), 'Да',
+        ])
+        executors += 1
+    written['Исполнители'] = executors
+    if executors:
+        for column, title, y_title, anchor in ((7, "Утилизация исполнителей (%)", "Утилизация (%)", "L2"),
+                                               (8, "Отклонение от среднего (%)", "Отклонение (%)", "L22")):
+            chart = BarChart()
+            chart.title = title
+            chart.y_axis.title = y_title
+            chart.x_axis.title = "Исполнитель"
+            chart.add_data(Reference(ws, min_col=column, min_row=1, max_row=executors + 1), titles_from_data=True)
+            chart.set_categories(Reference(ws, min_col=2, min_row=2, max_row=executors + 1))
+            chart.height = 12
+            chart.width = 20
+            ws.add_chart(chart, anchor)
+
+    # === Лист 3: Отделы (GROUP BY в SQL) с круговой диаграммой ===
+    departments = conn.execute(department_load_sql(schema)).fetchall()
+    if departments:
+        ws = workbook.create_sheet('Отделы')
+        _header(ws, ['Отдел', 'Заявок'])
+        for dept, _, assigned, _, _ in departments:
+            ws.append([dept, assigned])
+        written['Отделы'] = len(departments)
+        chart = PieChart()
+        chart.title = "Распределение заявок по отделам"
+        chart.add_data(Reference(ws, min_col=2, min_row=1, max_row=len(departments) + 1), titles_from_data=True)
+        chart.set_categories(Reference(ws, min_col=1, min_row=2, max_row=len(departments) + 1))
+        chart.height = 12
+        chart.width = 15
+        chart.dataLabels = DataLabelList()
+        chart.dataLabels.showPercent = True
+        ws.add_chart(chart, "D2")
+
+    # === Листы 4-5: Поступление заявок и назначения за последние минуты ===
+    for name, sheet, title, y_title, style in (
+            ('tasks', 'Поступление заявок', "Поступление заявок (последние 5 минут)", "Количество заявок", 10),
+            ('assignments', 'Назначения', "Назначения (последние 5 минут)", "Количество назначений", 12)):
+        ws = workbook.create_sheet(sheet)
+        _header(ws, ['Время', 'Количество'])
+        points = rates.get(name, [])
+        for point in points:
+            ws.append(list(point))
+        written[sheet] = len(points)
+        _line_chart(ws, title, y_title, len(points), style)
+
+    # === Лист 6: Все назначения - пачками из одного JOIN ===
+    ws = None
+    assignments = 0
+    for batch in iter_assignment_rows(conn, schema, include_archive, batch_rows):
+        if ws is None:
+            ws = workbook.create_sheet('Все назначения')
+            _header(ws, ASSIGNMENT_EXPORT_COLUMNS)
+        for row in batch:
+            ws.append(row)
+        assignments += len(batch)
+        if progress is not None:
+            progress(assignments)
+    written['Все назначения'] = assignments
+
+    workbook.save(target)
+    return written
+
+
+def export_dashboard(snapshot, metrics: Dict, rates: Dict[str, List[Tuple[str, int]]], recent_tasks: int = 0,
+                     include_archive: bool = False, spool_bytes: int = None, **kwargs) -> IO[bytes]:
+    """
+    Книга дашборда по текущему поколению снимка
+
+    Args:
+        snapshot: SnapshotService
+        metrics, rates, recent_tasks, include_archive: см. write_dashboard_workbook
+        spool_bytes: Размер книги в памяти до сброса во временный файл
+        **kwargs: batch_rows, progress (см. write_dashboard_workbook)
+
+    Returns:
+        Файловый объект с книгой, позиция - в начале (закройте после отдачи)
+    """
+    conn, generation = snapshot.reader()
+    output = tempfile.SpooledTemporaryFile(max_size=spool_bytes or EXPORT_SPOOL_BYTES, suffix='.xlsx')
+    try:
+        write_dashboard_workbook(output, conn, generation.schema, metrics, rates, recent_tasks,
+                                 include_archive, **kwargs)
+    except BaseException:
+        output.close()
+        raise
+    output.seek(0)
+    return output
@@ -0,0 +1,297 @@
+"""
+Export Jobs - Фоновые задания экспорта с кэшем по версии данных
+
+Экспорт выполнялся синхронно в обработчике кнопки и блокировал скрипт
+Streamlit, а повторное нажатие повторяло всю работу. ExportJobRunner:
+- выполняет экспорт в фоновом потоке, прогресс (строк назначений из
+  общего числа) читается из ExportJob без блокировок скрипта
+- форматы: xlsx (книга дашборда, excel_export.py), csv (потоковая запись
+  назначений) и parquet (колоночный, сжатие zstd; нужен pyarrow)
+- результат кэшируется по (формат, архив, версия данных): версия - номер
+  поколения снимка БД, пока БД не менялась, повторная выгрузка отдается
+  готовым файлом; файлы прошлых версий удаляются
+
+Все задания читают снимок БД (snapshot.py). Исполнитель общий для
+процесса (get_export_runner): одинаковые задания из разных сессий
+выполняются один раз.
+"""
+
+import csv
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from excel_export import ASSIGNMENT_EXPORT_COLUMNS, XLSX_MIME, iter_assignment_rows, write_dashboard_workbook
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    pa = None
+    pq = None
+    PYARROW_AVAILABLE = False
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+ERROR = 'error'
+
+# Формат -> (расширение файла, MIME)
+FORMATS = {
+    'xlsx': ('xlsx', XLSX_MIME),
+    'csv': ('csv', 'text/csv'),
+    'parquet': ('parquet', 'application/vnd.apache.parquet'),
+}
+
+_runners: Dict[str, 'ExportJobRunner'] = {}
+_runners_lock = threading.Lock()
+
+
+def available_formats() -> Tuple[str, ...]:
+    """Форматы, доступные в текущем окружении (parquet - при установленном pyarrow)"""
+    return tuple(fmt for fmt in FORMATS if fmt != 'parquet' or PYARROW_AVAILABLE)
+
+
+class ExportJob:
+    """Одно задание экспорта: параметры, прогресс и результат"""
+
+    def __init__(self, job_id: int, fmt: str, include_archive: bool, version: int):
+        self.id = job_id
+        self.format = fmt
+        self.include_archive = include_archive
+        self.version = version
+        self.status = QUEUED
+        self.rows = 0
+        self.total = 0
+        self.path: Optional[str] = None
+        self.error = ''
+        self.created_at = time.time()
+        self.seconds = 0.0
+
+    @property
+    def key(self) -> Tuple[str, bool, int]:
+        return self.format, self.include_archive, self.version
+
+    @property
+    def progress(self) -> float:
+        """Доля выгруженных назначений (0..1)"""
+        if self.status == DONE:
+            return 1.0
+        return min(self.rows / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def mime(self) -> str:
+        return FORMATS[self.format][1]
+
+    @property
+    def file_name(self) -> str:
+        """Имя файла для скачивания"""
+        stamp = time.strftime('%Y%m%d_%H%M%S', time.localtime(self.created_at))
+        return f"распределение_заявок_{stamp}.{FORMATS[self.format][0]}"
+
+    def read(self) -> bytes:
+        """Содержимое готового файла"""
+        with open(self.path, 'rb') as f:
+            return f.read()
+
+
+class ExportJobRunner:
+    """Фоновые задания экспорта по снимку БД с кэшем готовых файлов"""
+
+    def __init__(self, snapshot, export_dir: str = None):
+        """
+        Args:
+            snapshot: SnapshotService, из которого читаются данные
+            export_dir: Каталог файлов экспорта (по умолчанию временный)
+        """
+        self.snapshot = snapshot
+        self.export_dir = export_dir or tempfile.mkdtemp(prefix='ais_exports_')
+        self._own_dir = export_dir is None
+        self._jobs: Dict[int, ExportJob] = {}
+        self._by_key: Dict[Tuple[str, bool, int], ExportJob] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self.exports = 0
+        # close() вызван: результаты выполняемых заданий отбрасываются без ошибок
+        self.closed = False
+
+    def submit(self, fmt: str, include_archive: bool = False, **workbook_inputs) -> ExportJob:
+        """
+        Поставить экспорт в очередь или вернуть готовый/выполняемый для той же версии данных
+
+        Args:
+            fmt: 'xlsx', 'csv' или 'parquet'
+            include_archive: Назначения вместе с архивом
+            **workbook_inputs: Для xlsx - metrics, rates, recent_tasks (см. write_dashboard_workbook)
+
+        Returns:
+            Задание (status DONE - файл уже готов)
+        """
+        if fmt not in FORMATS:
+            raise ValueError(f"Неизвестный формат экспорта: {fmt}")
+        if fmt == 'parquet' and not PYARROW_AVAILABLE:
+            raise RuntimeError("Для экспорта в Parquet установите pyarrow")
+        if self.snapshot.generation is None:
+            self.snapshot.refresh()
+        version = self.snapshot.generation.number
+
+        with self._lock:
+            job = self._by_key.get((fmt, include_archive, version))
+            if job is not None and job.status in (QUEUED, RUNNING, DONE):
+                return job
+            job = ExportJob(next(self._ids), fmt, include_archive, version)
+            self._jobs[job.id] = job
+            self._by_key[job.key] = job
+        threading.Thread(target=self._run, args=(job, workbook_inputs),
+                         name=f'export-{job.id}', daemon=True).start()
+        return job
+
+    def get(self, job_id: int) -> Optional[ExportJob]:
+        """Задание по ID (None - неизвестно или удалено)"""
+        return self._jobs.get(job_id)
+
+    def _run(self, job: ExportJob, workbook_inputs: Dict) -> None:
+        start = time.perf_counter()
+        path = os.path.join(self.export_dir, f"export_{job.id}.{FORMATS[job.format][0]}")
+        if self.closed:
+            self._discard(job, path)
+            return
+        job.status = RUNNING
+        try:
+            conn, generation = self.snapshot.reader()
+            schema = generation.schema
+            job.total = conn.execute("SELECT COUNT(*) FROM assignments").fetchone()[0]
+            if job.include_archive and schema.has_archive:
+                job.total += conn.execute("SELECT COUNT(*) FROM assignments_archive").fetchone()[0]
+
+            def progress(rows):
+                job.rows = rows
+
+            if job.format == 'xlsx':
+                write_dashboard_workbook(path, conn, schema, include_archive=job.include_archive,
+                                         progress=progress, **workbook_inputs)
+            elif job.format == 'csv':
+                write_assignments_csv(path, conn, schema, job.include_archive, progress)
+            else:
+                write_assignments_parquet(path, conn, schema, job.include_archive, progress)
+
+            if self.closed:
+                self._discard(job, path)
+                return
+            job.path = path
+            job.seconds = time.perf_counter() - start
+            job.status = DONE
+            self.exports += 1
+            print(f"[OK] Экспорт {job.format}: {job.rows} назначений за {job.seconds:.1f} сек")
+            self._evict(job)
+        except Exception as e:
+            if self.closed:
+                # Каталог экспорта или снимок уже удалены - ошибка ожидаемая
+                self._discard(job, path)
+                return
+            job.error = str(e)
+            job.status = ERROR
+            print(f"[ERROR] Экспорт {job.format} не выполнен: {e}")
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _discard(self, job: ExportJob, path: str) -> None:
+        """Отбросить результат задания, завершившегося после close()"""
+        job.error = "Экспорт отменен: данные пересозданы"
+        job.status = ERROR
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _evict(self, latest: ExportJob) -> None:
+        """Удалить файлы прошлых версий того же формата"""
+        with self._lock:
+            stale = [job for job in self._jobs.values()
+                     if job.format == latest.format and job.include_archive == latest.include_archive
+                     and job.version < latest.version and job.status in (DONE, ERROR)]
+            for job in stale:
+                del self._jobs[job.id]
+                if self._by_key.get(job.key) is job:
+                    del self._by_key[job.key]
+        for job in stale:
+            if job.path and os.path.exists(job.path):
+                os.remove(job.path)
+
+    def close(self) -> None:
+        """Удалить файлы экспорта; результаты выполняемых заданий будут отброшены"""
+        with self._lock:
+            self.closed = True
+            self._jobs.clear()
+            self._by_key.clear()
+        if self._own_dir:
+            shutil.rmtree(self.export_dir, ignore_errors=True)
+
+
+def write_assignments_csv(path: str, conn, schema, include_archive: bool = False, progress=None) -> int:
+    """
+    Назначения в CSV (UTF-8 с BOM для Excel), пачками
+
+    Returns:
+        Записано строк
+    """
+    rows = 0
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(ASSIGNMENT_EXPORT_COLUMNS)
+        for batch in iter_assignment_rows(conn, schema, include_archive):
+            writer.writerows(batch)
+            rows += len(batch)
+            if progress is not None:
+                progress(rows)
+    return rows
+
+
+def write_assignments_parquet(path: str, conn, schema, include_archive: bool = False, progress=None) -> int:
+    """
+    Назначения в Parquet (сжатие zstd), группа строк на пачку выборки
+
+    Returns:
+        Записано строк
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("Для экспорта в Parquet установите pyarrow")
+    arrow_schema = pa.schema([(name, pa.float64() if name == 'Оценка (score)' else pa.string())
+                              for name in ASSIGNMENT_EXPORT_COLUMNS])
+    rows = 0
+    with pq.ParquetWriter(path, arrow_schema, compression='zstd') as writer:
+        for batch in iter_assignment_rows(conn, schema, include_archive):
+            columns = list(zip(*batch))
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(columns, arrow_schema)],
+                schema=arrow_schema,
+            ))
+            rows += len(batch)
+            if progress is not None:
+                progress(rows)
+    return rows
+
+
+def get_export_runner(snapshot) -> ExportJobRunner:
+    """Общий для процесса исполнитель экспорта по снимку БД"""
+    with _runners_lock:
+        runner = _runners.get(snapshot.db_path)
+        if runner is not None and runner.snapshot is not snapshot:
+            # Снимок пересоздан (stop_snapshots) - прежние файлы не соответствуют данным
+            runner.close()
+            runner = None
+        if runner is None:
+            runner = _runners[snapshot.db_path] = ExportJobRunner(snapshot)
+        return runner
+
+
+def stop_export_runners() -> None:
+    """Удалить файлы экспорта всех исполнителей процесса"""
+    with _runners_lock:
+        runners = list(_runners.values())
+        _runners.clear()
+    for runner in runners:
+        runner.close()
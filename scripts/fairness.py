@@ -0,0 +1,318 @@
+"""
+Fairness - Инкрементальные метрики справедливости распределения
+
+Дашборд и экспорт показывали MAE, σ, среднюю, минимальную и максимальную
+утилизацию, пересчитывая их по всем активным исполнителям на каждом
+обновлении. FairnessMetrics хранит накопленные суммы и обновляет их
+только для изменившихся исполнителей:
+- Σu, Σu², количество и Σassigned_today - среднее и σ за O(1)
+- Дерево Фенвика по корзинам утилизации (количество и сумма u) -
+  MAE, минимум, максимум и квантили за O(log B)
+- Значения внутри корзины хранятся точно (значение -> количество
+  исполнителей), поэтому результаты совпадают с полным пересчетом;
+  утилизаций немного различных, и корзина с тысячами исполнителей
+  перебирается за число различных значений, а не исполнителей
+
+Изменение одного исполнителя (назначение, сброс счетчика, активация,
+смена лимита) - O(log B), где B - число корзин. Обновления приходят по
+исполнителям из новых назначений (shared_data.py), полный проход apply -
+только после перезагрузки. Утилизация исполнителя с daily_limit <= 0
+считается 0, как на дашборде.
+"""
+
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+# Корзин на единицу утилизации (шаг 0.1%) и верхняя граница шкалы;
+# утилизация выше границы попадает в последнюю корзину без потери точности
+BUCKETS_PER_UNIT = 1000
+MAX_UTILIZATION = 10.0
+
+
+class FenwickTree:
+    """Дерево Фенвика: прибавление и префиксная сумма за O(log n)"""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._tree = [0] * (size + 1)
+
+    @classmethod
+    def from_values(cls, values: List) -> 'FenwickTree':
+        """Дерево по готовым значениям элементов за O(n)"""
+        tree = cls(len(values))
+        data = tree._tree
+        for i, value in enumerate(values, 1):
+            data[i] += value
+            parent = i + (i & -i)
+            if parent <= tree.size:
+                data[parent] += data[i]
+        return tree
+
+    def add(self, index: int, delta) -> None:
+        """Прибавить delta к элементу index (с 0)"""
+        i = index + 1
+        while i <= self.size:
+            self._tree[i] += delta
+            i += i & -i
+
+    def prefix(self, index: int):
+        """Сумма элементов 0..index включительно"""
+        total = 0
+        i = index + 1
+        while i > 0:
+            total += self._tree[i]
+            i -= i & -i
+        return total
+
+    def find(self, k: int) -> int:
+        """
+        Наименьший индекс с префиксной суммой >= k (для неотрицательных элементов)
+
+        Returns:
+            Индекс с 0 (size, если сумма всех элементов меньше k)
+        """
+        pos = 0
+        step = 1 << self.size.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.size and self._tree[nxt] < k:
+                pos = nxt
+                k -= self._tree[nxt]
+            step >>= 1
+        return pos
+
+
+class FairnessMetrics:
+    """Метрики утилизации активных исполнителей с обновлением по одному исполнителю"""
+
+    def __init__(self, buckets_per_unit: int = BUCKETS_PER_UNIT, max_utilization: float = MAX_UTILIZATION):
+        self.buckets_per_unit = buckets_per_unit
+        self.max_bucket = int(max_utilization * buckets_per_unit)
+        self._counts = FenwickTree(self.max_bucket + 1)
+        self._sums = FenwickTree(self.max_bucket + 1)
+        # Точные значения по корзинам: корзина -> {u: количество исполнителей}
+        self._buckets: Dict[int, Dict[float, int]] = {}
+        # executor_id -> (assigned_today, daily_limit, u, корзина)
+        self._entries: Dict[str, Tuple[int, int, float, int]] = {}
+        self._sum = 0.0
+        self._sum_sq = 0.0
+        self._assigned = 0
+        self._summary: Optional[Dict] = None
+        self.updates = 0
+
+    @classmethod
+    def from_executors(cls, executors: Iterable[Dict]) -> 'FairnessMetrics':
+        """Метрики по списку исполнителей"""
+        metrics = cls()
+        metrics.apply(executors)
+        return metrics
+
+    # === Обновление ===
+
+    def _bucket(self, u: float) -> int:
+        return min(max(int(u * self.buckets_per_unit), 0), self.max_bucket)
+
+    def _remove(self, executor_id: str) -> None:
+        assigned, _, u, bucket = self._entries.pop(executor_id)
+        self._counts.add(bucket, -1)
+        self._sums.add(bucket, -u)
+        values = self._buckets[bucket]
+        values[u] -= 1
+        if not values[u]:
+            del values[u]
+            if not values:
+                del self._buckets[bucket]
+        self._assigned -= assigned
+        if self._entries:
+            self._sum -= u
+            self._sum_sq -= u * u
+        else:
+            # Без исполнителей суммы точно нулевые (не копим ошибку округления)
+            self._sum = self._sum_sq = 0.0
+
+    def update(self, executor_id: str, assigned_today: int, daily_limit: int, active: bool = True) -> bool:
+        """
+        Учесть новое состояние исполнителя (O(log B))
+
+        Args:
+            executor_id: ID исполнителя
+            assigned_today: Назначено сегодня
+            daily_limit: Дневной лимит
+            active: Неактивные исполнители в метрики не входят
+
+        Returns:
+            True если метрики изменились
+        """
+        entry = self._entries.get(executor_id)
+        if not active:
+            if entry is None:
+                return False
+            self._remove(executor_id)
+        else:
+            if entry is not None and entry[:2] == (assigned_today, daily_limit):
+                return False
+            if entry is not None:
+                self._remove(executor_id)
+            u = assigned_today / daily_limit if daily_limit > 0 else 0.0
+            bucket = self._bucket(u)
+            self._counts.add(bucket, 1)
+            self._sums.add(bucket, u)
+            values = self._buckets.setdefault(bucket, {})
+            values[u] = values.get(u, 0) + 1
+            self._entries[executor_id] = (assigned_today, daily_limit, u, bucket)
+            self._sum += u
+            self._sum_sq += u * u
+            self._assigned += assigned_today
+
+        self._summary = None
+        self.updates += 1
+        return True
+
+    def remove(self, executor_id: str) -> bool:
+        """Исключить исполнителя (удален или деактивирован)"""
+        return self.update(executor_id, 0, 0, active=False)
+
+    def apply(self, executors: Iterable[Dict]) -> int:
+        """
+        Привести метрики к списку исполнителей: обновляются только изменившиеся,
+        отсутствующие в списке исключаются
+
+        Если изменилась заметная доля исполнителей (в т.ч. первая загрузка),
+        структуры строятся заново за O(E + B) вместо O(log B) на каждого.
+
+        Returns:
+            Количество обновленных исполнителей
+        """
+        state = {e['id']: (e.get('assigned_today', 0), e.get('daily_limit') or 0)
+                 for e in executors if e.get('active', True)}
+        changed = [i for i, value in state.items()
+                   if i not in self._entries or self._entries[i][:2] != value]
+        removed = [i for i in self._entries if i not in state]
+        if len(changed) + len(removed) > len(state) // 8:
+            self._rebuild(state)
+        else:
+            for executor_id in removed:
+                self.remove(executor_id)
+            for executor_id in changed:
+                self.update(executor_id, *state[executor_id])
+        return len(changed) + len(removed)
+
+    def _rebuild(self, state: Dict[str, Tuple[int, int]]) -> None:
+        """Построить метрики заново: executor_id -> (assigned_today, daily_limit)"""
+        counts = [0] * (self.max_bucket + 1)
+        sums = [0.0] * (self.max_bucket + 1)
+        self._buckets = {}
+        self._entries = {}
+        self._sum = self._sum_sq = 0.0
+        self._assigned = 0
+        for executor_id, (assigned_today, daily_limit) in state.items():
+            u = assigned_today / daily_limit if daily_limit > 0 else 0.0
+            bucket = self._bucket(u)
+            counts[bucket] += 1
+            sums[bucket] += u
+            values = self._buckets.setdefault(bucket, {})
+            values[u] = values.get(u, 0) + 1
+            self._entries[executor_id] = (assigned_today, daily_limit, u, bucket)
+            self._sum += u
+            self._sum_sq += u * u
+            self._assigned += assigned_today
+        self._counts = FenwickTree.from_values(counts)
+        self._sums = FenwickTree.from_values(sums)
+        self._summary = None
+        self.updates += 1
+
+    # === Чтение ===
+
+    @property
+    def count(self) -> int:
+        """Количество активных исполнителей"""
+        return len(self._entries)
+
+    def mean(self) -> float:
+        """Средняя утилизация (доля)"""
+        return self._sum / self.count if self.count else 0.0
+
+    def std(self) -> float:
+        """Выборочное стандартное отклонение утилизации (как pandas Series.std)"""
+        n = self.count
+        if n < 2:
+            return 0.0
+        variance = (self._sum_sq - self._sum * self._sum / n) / (n - 1)
+        return math.sqrt(max(variance, 0.0))
+
+    def mae(self) -> float:
+        """Среднее абсолютное отклонение утилизации от средней"""
+        n = self.count
+        if not n:
+            return 0.0
+        mean = self._sum / n
+        bucket = self._bucket(mean)
+        # Корзины ниже корзины среднего целиком не больше среднего, выше - больше;
+        # корзина среднего считается по точным значениям
+        below_count = self._counts.prefix(bucket - 1) if bucket > 0 else 0
+        below_sum = self._sums.prefix(bucket - 1) if bucket > 0 else 0.0
+        values = self._buckets.get(bucket, {})
+        above_count = n - below_count - sum(values.values())
+        above_sum = self._sum - below_sum - sum(u * c for u, c in values.items())
+        total = (mean * below_count - below_sum) + (above_sum - mean * above_count)
+        total += sum(abs(u - mean) * c for u, c in values.items())
+        return max(total, 0.0) / n
+
+    def kth(self, k: int) -> float:
+        """k-я по возрастанию утилизация (k с 0)"""
+        if not 0 <= k < self.count:
+            raise IndexError(k)
+        bucket = self._counts.find(k + 1)
+        k -= self._counts.prefix(bucket - 1) if bucket > 0 else 0
+        values = self._buckets[bucket]
+        for u in sorted(values):
+            if k < values[u]:
+                return u
+            k -= values[u]
+        raise IndexError(k)
+
+    def min(self) -> float:
+        """Минимальная утилизация"""
+        return self.kth(0) if self.count else 0.0
+
+    def max(self) -> float:
+        """Максимальная утилизация"""
+        return self.kth(self.count - 1) if self.count else 0.0
+
+    def quantile(self, q: float) -> float:
+        """Квантиль утилизации с линейной интерполяцией (как pandas Series.quantile)"""
+        if not self.count:
+            return 0.0
+        position = (self.count - 1) * min(max(q, 0.0), 1.0)
+        lower = int(position)
+        low = self.kth(lower)
+        if lower == position:
+            return low
+        return low + (self.kth(lower + 1) - low) * (position - lower)
+
+    def summary(self) -> Dict:
+        """
+        Метрики для дашборда и экспорта (кэшируются до следующего изменения)
+
+        Returns:
+            {'active', 'total_assigned', 'avg_load', 'mae', и утилизация в %:
+             'avg_utilization', 'std_utilization', 'min_utilization',
+             'max_utilization', 'range_utilization', 'p50_utilization', 'p90_utilization'}
+        """
+        if self._summary is None:
+            n = self.count
+            low, high = self.min() * 100, self.max() * 100
+            self._summary = {
+                'active': n,
+                'total_assigned': self._assigned,
+                'avg_load': self._assigned / n if n else 0.0,
+                'mae': self.mae(),
+                'avg_utilization': self.mean() * 100,
+                'std_utilization': self.std() * 100,
+                'min_utilization': low,
+                'max_utilization': high,
+                'range_utilization': high - low,
+                'p50_utilization': self.quantile(0.5) * 100,
+                'p90_utilization': self.quantile(0.9) * 100,
+            }
+        return self._summary
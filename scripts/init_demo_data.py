@@ -6,77 +6,29 @@ import sys
 import os
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-import sqlite3
 import uuid
 from datetime import datetime
 import json
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'streamlit_app', 'ais.db')
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, close_all
+from repository import SQLiteRepository
+
+repo = SQLiteRepository(DB_PATH)
 
 def init_db():
     """Инициализация базы данных"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    # Создание таблиц
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS tasks (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        category TEXT,
-        priority TEXT,
-        created_at TEXT,
-        data TEXT
-    )
-    """)
-    
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS executors (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL,
-        department TEXT,
-        skills TEXT,
-        active INTEGER DEFAULT 1,
-        daily_limit INTEGER DEFAULT 10,
-        assigned_today INTEGER DEFAULT 0,
-        created_at TEXT,
-        data TEXT
-    )
-    """)
-    
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS assignments (
-        id TEXT PRIMARY KEY,
-        task_id TEXT,
-        executor_id TEXT,
-        assigned_at TEXT,
-        score REAL
-    )
-    """)
-    
-    conn.commit()
-    conn.close()
+    repo.init_storage()
     print("[OK] База данных инициализирована")
 
 def clear_all_data():
     """Очистка всех данных"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
-    cur.execute("DELETE FROM assignments")
-    cur.execute("DELETE FROM tasks")
-    cur.execute("DELETE FROM executors")
-    
-    conn.commit()
-    conn.close()
+    repo.clear_tasks_and_assignments()
+    repo.clear_executors()
     print("[OK] Все данные очищены")
 
 def create_demo_executors():
     """Создание демо-исполнителей"""
-    conn = sqlite3.connect(DB_PATH)
-    cur = conn.cursor()
-    
     executors = [
         {
             'name': 'Иванов Иван',
@@ -150,25 +102,22 @@ def create_demo_executors():
         }
     ]
     
-    count = 0
-    for exec_data in executors:
-        executor_id = str(uuid.uuid4())
-        cur.execute("""
-            INSERT INTO executors(id, name, email, department, skills, active, daily_limit, assigned_today, created_at, data)
-            VALUES(?, ?, ?, ?, ?, 1, ?, 0, ?, '{}')
-        """, (
-            executor_id,
-            exec_data['name'],
-            exec_data['email'],
-            exec_data['department'],
-            exec_data['skills'],
-            exec_data['daily_limit'],
-            datetime.now().isoformat()
-        ))
-        count += 1
+    now = datetime.now().isoformat()
+    count = repo.save_executors([
+        {
+            'id': str(uuid.uuid4()),
+            'name': exec_data['name'],
+            'email': exec_data['email'],
+            'department': exec_data['department'],
+            'skills': exec_data['skills'],
+            'active': True,
+            'daily_limit': exec_data['daily_limit'],
+            'assigned_today': 0,
+            'created_at': now
+        }
+        for exec_data in executors
+    ])
     
-    conn.commit()
-    conn.close()
     print(f"[OK] Создано {count} исполнителей")
 
 def main():
@@ -182,7 +131,12 @@ def main():
     if db_exists:
         response = input("\n[!] БД уже существует. Пересоздать с нуля? (y/n): ")
         if response.lower() == 'y':
+            close_all()
             os.remove(DB_PATH)
+            # Файлы WAL-журнала, иначе SQLite применит старый WAL к новой БД
+            for suffix in ('-wal', '-shm'):
+                if os.path.exists(DB_PATH + suffix):
+                    os.remove(DB_PATH + suffix)
             print("[OK] Старая БД удалена")
             init_db()
         else:
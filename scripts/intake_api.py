@@ -0,0 +1,317 @@
+"""
+Intake API - Асинхронный HTTP сервис приема заявок
+
+Поддерживает:
+- Прием одиночных (POST /tasks) и пакетных (POST /tasks/bulk) заявок
+- Ограниченную очередь с backpressure (429 + Retry-After при переполнении,
+  413 для пакета больше всей очереди)
+- Отклонение повторных ID заявок без влияния на остальные заявки батча:
+  409 для POST /tasks, в POST /tasks/bulk - {'task_id', 'error': 'duplicate'}
+  на месте повторной заявки (остальные сохранены и распределены)
+- Микро-батчевое распределение через Rule Engine каждые несколько мс
+- Сохранение пачки заявок и назначений в SQLite одной транзакцией
+- Статистику очереди и задержек (GET /stats)
+- Параллельные шарды по категориям (INTAKE_SHARDED=1, см. sharded_dispatcher.py)
+
+Запуск:
+    python scripts/intake_api.py
+"""
+
+import asyncio
+import os
+import sys
+import time
+import uuid
+from collections import Counter, deque
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set
+
+from fastapi import FastAPI, HTTPException
+from pydantic import BaseModel, Field
+
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, close_all, transaction
+from dispatcher import Dispatcher, load_rule_engine
+from schema import get_schema, load_executors
+from sharded_dispatcher import ShardedDispatcher
+
+# Настройки очереди и микро-батчей
+QUEUE_SIZE = int(os.environ.get('INTAKE_QUEUE_SIZE', 10000))
+BATCH_MS = float(os.environ.get('INTAKE_BATCH_MS', 5))
+MAX_BATCH = int(os.environ.get('INTAKE_MAX_BATCH', 500))
+RETRY_AFTER_S = int(os.environ.get('INTAKE_RETRY_AFTER', 1))
+REFRESH_S = float(os.environ.get('INTAKE_REFRESH_S', 5))
+SHARDED = os.environ.get('INTAKE_SHARDED', '0') == '1'
+LATENCY_WINDOW = 10000
+
+
+class TaskIn(BaseModel):
+    id: Optional[str] = None
+    name: Optional[str] = None
+    category: str
+    priority: str = 'Средний'
+    params: Dict[str, Any] = Field(default_factory=dict)
+
+
+class BulkTasksIn(BaseModel):
+    tasks: List[TaskIn]
+
+
+class IntakeService:
+    """Очередь приема заявок и воркер микро-батчевого распределения"""
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.schema = get_schema(DB_PATH)
+        if SHARDED:
+            self.dispatcher = ShardedDispatcher().start()
+        else:
+            self.dispatcher = Dispatcher([], load_rule_engine())
+        self.executors: Dict[str, Dict] = {}
+        # ID заявок в очереди и в обработке - повторный ID отклоняется сразу
+        self.pending_ids: Set[str] = set()
+        self.last_refresh = 0.0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)
+        self.received = 0
+        self.processed = 0
+        self.assigned = 0
+        self.rejected = 0
+        self.batches = 0
+        self.worker: Optional[asyncio.Task] = None
+
+    def refresh_executors(self, force=False):
+        """Перечитать исполнителей из БД (новые исполнители, лимиты, счетчики)"""
+        now = time.monotonic()
+        stale = getattr(self.dispatcher, 'stale', False)
+        if force or stale or now - self.last_refresh >= REFRESH_S:
+            executors = load_executors(DB_PATH)
+            self.executors = {e['id']: e for e in executors}
+            self.dispatcher.load(executors)
+            self.last_refresh = now
+
+    def process_batch(self, tasks):
+        """
+        Распределить пачку заявок и сохранить ее одной транзакцией
+
+        Выполняется в отдельном потоке, воркер всегда один - состояние
+        исполнителей не требует блокировок.
+
+        Returns:
+            Результат на каждую заявку; заявка с ID, уже существующим в БД
+            (в том числе в архиве), не сохраняется и получает
+            {'task_id', 'error': 'duplicate'}
+        """
+        self.refresh_executors()
+        executors = self.executors
+
+        with transaction(DB_PATH) as conn:
+            # Проверка под блокировкой записи (BEGIN IMMEDIATE) - между ней и
+            # вставкой ID не может появиться
+            ids = [t['id'] for t in tasks]
+            placeholders = ','.join('?' * len(ids))
+            existing = {row[0] for row in conn.execute(
+                f"SELECT id FROM tasks WHERE id IN ({placeholders})", ids
+            )}
+            if self.schema.has_archive:
+                # Архивная заявка с тем же ID столкнулась бы с новой при следующей архивации
+                existing.update(row[0] for row in conn.execute(
+                    f"SELECT id FROM tasks_archive WHERE id IN ({placeholders})", ids
+                ))
+            new_tasks = [t for t in tasks if t['id'] not in existing]
+            conn.executemany(self.schema.insert_task_sql, [self.schema.task_row(t) for t in new_tasks])
+            # Слоты резервируются атомарно в той же транзакции - параллельные
+            # распределители (Streamlit, нагрузочный тест) не превысят лимит
+            assignments = iter(self.dispatcher.assign_batch(new_tasks, conn, self.schema) if new_tasks else [])
+
+        results = []
+        for task in tasks:
+            if task['id'] in existing:
+                results.append({'task_id': task['id'], 'error': 'duplicate'})
+                continue
+            assignment = next(assignments)
+            executor = executors.get(assignment['executor_id']) if assignment else None
+            results.append({
+                'task_id': task['id'],
+                'assigned': assignment is not None,
+                'executor_id': assignment['executor_id'] if assignment else None,
+                'executor_name': executor['name'] if executor else None,
+                'score': assignment['score'] if assignment else None,
+                'assigned_at': assignment['assigned_at'] if assignment else None,
+            })
+        return results
+
+    async def run_worker(self):
+        """Собирает заявки из очереди в микро-батчи и распределяет их"""
+        while True:
+            batch = [await self.queue.get()]
+            await asyncio.sleep(BATCH_MS / 1000.0)
+            while len(batch) < MAX_BATCH and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+
+            tasks = [task for task, _, _ in batch]
+            try:
+                results = await asyncio.to_thread(self.process_batch, tasks)
+            except Exception as e:
+                print(f"[ERROR] Ошибка обработки батча: {e}")
+                # Транзакция откатилась - счетчики в памяти перечитаем из БД
+                self.last_refresh = 0.0
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self.pending_ids.difference_update(task['id'] for task in tasks)
+
+            now = time.perf_counter()
+            self.batches += 1
+            self.processed += len(batch)
+            for (_, future, enqueued_at), result in zip(batch, results):
+                if result.get('error') == 'duplicate':
+                    # Результат, а не исключение: остальные заявки пакета уже сохранены
+                    self.rejected += 1
+                    if not future.done():
+                        future.set_result(result)
+                    continue
+                latency_ms = (now - enqueued_at) * 1000.0
+                self.latencies.append(latency_ms)
+                if result['assigned']:
+                    self.assigned += 1
+                result['latency_ms'] = round(latency_ms, 3)
+                if not future.done():
+                    future.set_result(result)
+
+    def enqueue(self, tasks_in: List[TaskIn]):
+        """
+        Поставить заявки в очередь (все или ни одной)
+
+        Returns:
+            Список future с результатами назначения
+
+        Raises:
+            HTTPException(413): пакет больше всей очереди - повтор не поможет
+            HTTPException(409): ID заявки повторяется в пакете или уже в очереди
+            HTTPException(429): очередь переполнена
+        """
+        if len(tasks_in) > QUEUE_SIZE:
+            self.rejected += len(tasks_in)
+            raise HTTPException(
+                status_code=413,
+                detail=f"Пакет из {len(tasks_in)} заявок больше очереди ({QUEUE_SIZE}), разделите его"
+            )
+
+        counts = Counter(t.id for t in tasks_in if t.id)
+        duplicates = sorted(i for i, n in counts.items() if n > 1 or i in self.pending_ids)
+        if duplicates:
+            self.rejected += len(tasks_in)
+            raise HTTPException(status_code=409, detail=f"Повторные ID заявок: {', '.join(duplicates[:10])}")
+
+        if QUEUE_SIZE - self.queue.qsize() < len(tasks_in):
+            self.rejected += len(tasks_in)
+            raise HTTPException(
+                status_code=429,
+                detail="Очередь заявок переполнена, повторите позже",
+                headers={'Retry-After': str(RETRY_AFTER_S)}
+            )
+
+        loop = asyncio.get_running_loop()
+        futures = []
+        for t in tasks_in:
+            task_id = t.id or str(uuid.uuid4())
+            task = {
+                'id': task_id,
+                'name': t.name or f"Заявка {task_id[:8]}",
+                'category': t.category,
+                'priority': t.priority,
+                'params': t.params,
+                'created_at': datetime.now().isoformat()
+            }
+            future = loop.create_future()
+            self.pending_ids.add(task_id)
+            self.queue.put_nowait((task, future, time.perf_counter()))
+            futures.append(future)
+        self.received += len(futures)
+        return futures
+
+    def stats(self):
+        latencies = sorted(self.latencies)
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 3)
+
+        return {
+            'queue_depth': self.queue.qsize(),
+            'queue_size': QUEUE_SIZE,
+            'received': self.received,
+            'processed': self.processed,
+            'assigned': self.assigned,
+            'rejected': self.rejected,
+            'batches': self.batches,
+            'latency_ms': {'p50': percentile(0.50), 'p99': percentile(0.99), 'max': percentile(1.0)},
+        }
+
+
+service: Optional[IntakeService] = None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global service
+    service = IntakeService()
+    service.refresh_executors(force=True)
+    service.worker = asyncio.create_task(service.run_worker())
+    print(f"[OK] Intake API запущен: очередь {QUEUE_SIZE}, батч {BATCH_MS} мс / {MAX_BATCH} заявок")
+    yield
+    service.worker.cancel()
+    if SHARDED:
+        service.dispatcher.stop()
+    close_all()
+
+
+app = FastAPI(title="СРЗ - Прием заявок", lifespan=lifespan)
+
+
+async def _await_results(futures):
+    try:
+        return await asyncio.gather(*futures)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Ошибка распределения: {e}")
+
+
+@app.post("/tasks")
+async def submit_task(task: TaskIn):
+    futures = service.enqueue([task])
+    result = (await _await_results(futures))[0]
+    if result.get('error') == 'duplicate':
+        raise HTTPException(status_code=409, detail=f"Заявка {result['task_id']} уже существует")
+    return result
+
+
+@app.post("/tasks/bulk")
+async def submit_tasks_bulk(payload: BulkTasksIn):
+    if not payload.tasks:
+        return {'results': []}
+    # Повторные ID - элементы {'task_id', 'error': 'duplicate'}, без 409 на весь пакет
+    futures = service.enqueue(payload.tasks)
+    results = await _await_results(futures)
+    return {'results': results}
+
+
+@app.get("/stats")
+async def get_stats():
+    return service.stats()
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(
+        app,
+        host=os.environ.get('INTAKE_HOST', '0.0.0.0'),
+        port=int(os.environ.get('INTAKE_PORT', 8000)),
+        log_level='warning'
+    )
@@ -0,0 +1,156 @@
+"""
+Load Test Control - Управление нагрузочным тестом внутри процесса
+
+Раньше фоновый поток теста и каждая отрисовка дашборда читали и писали
+таблицу load_test_status перед/после каждой пачки. LoadTestController
+хранит прогресс в памяти процесса:
+- счетчики (обработано/назначено) под блокировкой
+- threading.Event остановки: паузы между пачками прерываются сразу,
+  генерация пачки проверяет флаг на каждой заявке
+- живую производительность (заявок/сек с начала теста)
+
+В хранилище (Repository.set_load_test_status) статус пишется только при
+старте и завершении - как история последнего запуска.
+
+Контроллер общий для процесса (get_controller): Streamlit обслуживает все
+сессии в одном процессе, поэтому кнопка «Остановить» в любой вкладке
+останавливает тот же тест.
+"""
+
+import threading
+import time
+from typing import Dict, Optional
+
+from repository import Repository, make_load_test_status
+
+IDLE = 'idle'
+RUNNING = 'running'
+COMPLETED = 'completed'
+ERROR = 'error'
+
+_controllers: Dict[str, 'LoadTestController'] = {}
+_controllers_lock = threading.Lock()
+
+
+class LoadTestController:
+    """Прогресс, остановка и производительность нагрузочного теста"""
+
+    def __init__(self, repository: Optional[Repository] = None):
+        """
+        Args:
+            repository: Хранилище для истории (статус при старте и завершении)
+        """
+        self.repository = repository
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._status = IDLE
+        self._total = 0
+        self._current = 0
+        self._assigned = 0
+        self._message = ''
+        self._started_at = 0.0
+        self._elapsed = 0.0
+
+    # === Поток теста ===
+
+    def start(self, total: int) -> bool:
+        """
+        Начать тест
+
+        Returns:
+            False, если тест уже выполняется
+        """
+        with self._lock:
+            if self._status == RUNNING:
+                return False
+            self._stop.clear()
+            self._status = RUNNING
+            self._total = total
+            self._current = 0
+            self._assigned = 0
+            self._message = ''
+            self._started_at = time.perf_counter()
+            self._elapsed = 0.0
+        self._save_history()
+        return True
+
+    def advance(self, generated: int = 0, assigned: int = 0) -> None:
+        """Учесть сгенерированные заявки и зафиксированные назначения"""
+        with self._lock:
+            self._current += generated
+            self._assigned += assigned
+
+    def should_stop(self) -> bool:
+        """Запрошена остановка (проверка без блокировки)"""
+        return self._stop.is_set()
+
+    def wait(self, delay_s: float) -> bool:
+        """
+        Пауза между пачками, прерываемая остановкой
+
+        Returns:
+            True, если за время паузы запрошена остановка
+        """
+        return self._stop.wait(delay_s) if delay_s > 0 else self._stop.is_set()
+
+    def finish(self, status: str = COMPLETED, message: str = '') -> Dict:
+        """Завершить тест, записать итог в историю и вернуть его"""
+        with self._lock:
+            self._elapsed = time.perf_counter() - self._started_at
+            self._status = status
+            if not message and status == COMPLETED and self._stop.is_set():
+                message = 'Остановлено пользователем'
+            self._message = message
+        self._save_history()
+        return self.snapshot()
+
+    # === Интерфейс ===
+
+    def request_stop(self) -> None:
+        """Остановить тест (поток увидит флаг в течение миллисекунд)"""
+        self._stop.set()
+
+    def reset(self) -> None:
+        """Сбросить итог завершенного теста"""
+        with self._lock:
+            if self._status != RUNNING:
+                self._status = IDLE
+                self._message = ''
+
+    @property
+    def running(self) -> bool:
+        return self._status == RUNNING
+
+    def snapshot(self) -> Dict:
+        """Текущий статус в формате make_load_test_status"""
+        with self._lock:
+            elapsed = time.perf_counter() - self._started_at if self._status == RUNNING else self._elapsed
+            return make_load_test_status(
+                self._status,
+                progress=self._current / self._total if self._total else 0,
+                current=self._current,
+                total=self._total,
+                assigned=self._assigned,
+                elapsed=elapsed,
+                performance=self._current / elapsed if elapsed > 0 else 0,
+                message=self._message,
+            )
+
+    def _save_history(self) -> None:
+        if self.repository is None:
+            return
+        try:
+            self.repository.set_load_test_status(self.snapshot())
+        except Exception as e:
+            print(f"[WARN] Не удалось сохранить статус нагрузочного теста: {e}")
+
+
+def get_controller(key: str = 'default', repository: Optional[Repository] = None) -> LoadTestController:
+    """Общий для процесса контроллер (repository задает хранилище истории)"""
+    with _controllers_lock:
+        controller = _controllers.get(key)
+        if controller is None:
+            controller = _controllers[key] = LoadTestController(repository)
+        elif repository is not None:
+            controller.repository = repository
+        return controller
@@ -0,0 +1,184 @@
+"""
+Миграция: Архивные таблицы и представления для старых данных
+Версия: 1.0
+Дата: 2026-10-19
+
+Создает:
+- tasks_archive, assignments_archive - та же структура, что у tasks/assignments
+  (без генерируемых колонок), заполняются скриптом archive_db.py
+- tasks_all, assignments_all - представления UNION ALL горячих и архивных
+  таблиц для отчетов за весь период
+
+Требует колонку tasks.params (миграция add_json_params_v1).
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, checkpoint, close_connection, get_connection
+
+MIGRATION_NAME = 'add_archive_v1'
+
+TASK_COLUMNS = 'id, name, category, priority, created_at, data, params'
+ASSIGNMENT_COLUMNS = 'id, task_id, executor_id, assigned_at, score'
+
+TABLES = {
+    'tasks_archive': """
+        CREATE TABLE IF NOT EXISTS tasks_archive (
+            id TEXT PRIMARY KEY,
+            name TEXT NOT NULL,
+            category TEXT,
+            priority TEXT,
+            created_at TEXT,
+            data TEXT,
+            params TEXT
+        )
+    """,
+    'assignments_archive': """
+        CREATE TABLE IF NOT EXISTS assignments_archive (
+            id TEXT PRIMARY KEY,
+            task_id TEXT,
+            executor_id TEXT,
+            assigned_at TEXT,
+            score REAL
+        )
+    """,
+}
+
+INDEXES = {
+    'idx_tasks_archive_created_at': (
+        "CREATE INDEX IF NOT EXISTS idx_tasks_archive_created_at ON tasks_archive(created_at)"
+    ),
+    'idx_assignments_archive_task_id': (
+        "CREATE INDEX IF NOT EXISTS idx_assignments_archive_task_id ON assignments_archive(task_id)"
+    ),
+    'idx_assignments_archive_assigned_at': (
+        "CREATE INDEX IF NOT EXISTS idx_assignments_archive_assigned_at ON assignments_archive(assigned_at)"
+    ),
+}
+
+VIEWS = {
+    'tasks_all': f"""
+        CREATE VIEW IF NOT EXISTS tasks_all AS
+        SELECT {TASK_COLUMNS} FROM tasks
+        UNION ALL
+        SELECT {TASK_COLUMNS} FROM tasks_archive
+    """,
+    'assignments_all': f"""
+        CREATE VIEW IF NOT EXISTS assignments_all AS
+        SELECT {ASSIGNMENT_COLUMNS} FROM assignments
+        UNION ALL
+        SELECT {ASSIGNMENT_COLUMNS} FROM assignments_archive
+    """,
+}
+
+
+def backup_database():
+    """Создать резервную копию БД перед миграцией"""
+    if os.path.exists(DB_PATH):
+        backup_path = f"{DB_PATH}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        import shutil
+        shutil.copy2(DB_PATH, backup_path)
+        print(f"[OK] Создана резервная копия: {backup_path}")
+        return backup_path
+    return None
+
+
+def _existing(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,)).fetchall()}
+
+
+def is_needed(conn):
+    """Горячие таблицы (с params) созданы, но архивных объектов нет"""
+    if not {'tasks', 'assignments'} <= _existing(conn, 'table'):
+        return False
+    if 'params' not in {row[1] for row in conn.execute("PRAGMA table_info(tasks)").fetchall()}:
+        return False
+    return not (set(TABLES) <= _existing(conn, 'table')
+                and set(INDEXES) <= _existing(conn, 'index')
+                and set(VIEWS) <= _existing(conn, 'view'))
+
+
+def create_archive_objects(conn):
+    """Создать архивные таблицы, индексы и представления"""
+    for statements in (TABLES, INDEXES, VIEWS):
+        for name, sql in statements.items():
+            conn.execute(sql)
+    print(f"[OK] Архив: {', '.join(list(TABLES) + list(VIEWS))}")
+
+
+def log_migration(conn):
+    """Записать миграцию в schema_migrations"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            migration_name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            success INTEGER DEFAULT 1,
+            notes TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO schema_migrations (migration_name, notes)
+        VALUES (?, ?)
+    """, (MIGRATION_NAME, 'Таблицы tasks_archive, assignments_archive, представления tasks_all, assignments_all'))
+
+
+def apply_schema_changes(conn):
+    """
+    Изменения схемы (автозапуск из schema.py)
+
+    Args:
+        conn: Соединение SQLite (коммит - на вызывающей стороне)
+    """
+    create_archive_objects(conn)
+    log_migration(conn)
+
+
+def main():
+    print("=" * 60)
+    print("МИГРАЦИЯ БД: Архивные таблицы")
+    print("=" * 60)
+
+    if not os.path.exists(DB_PATH):
+        print(f"[ERROR] База данных не найдена: {DB_PATH}")
+        return
+
+    backup_path = backup_database()
+    conn = get_connection(DB_PATH)
+
+    try:
+        if not is_needed(conn):
+            print("[INFO] Архивные таблицы уже созданы (или не применена миграция add_json_params_v1)")
+            return
+
+        print("\n[1/2] Создание таблиц и представлений...")
+        create_archive_objects(conn)
+
+        print("\n[2/2] Сохранение изменений...")
+        log_migration(conn)
+        conn.commit()
+        checkpoint(DB_PATH, 'TRUNCATE')
+
+        print("\n" + "=" * 60)
+        print("MIGRATION COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+
+        if backup_path:
+            print(f"\n[BACKUP] Created: {backup_path}")
+
+    except Exception as e:
+        print(f"\n[ERROR] Ошибка при миграции: {e}")
+        conn.rollback()
+
+        if backup_path:
+            print(f"\n💾 Восстановите из резервной копии: {backup_path}")
+
+    finally:
+        close_connection(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+Миграция: Узкая таблица счетчиков исполнителей
+Версия: 1.0
+Дата: 2026-10-19
+
+Создает:
+- executor_counters - изменяемые счетчики исполнителя (assigned_today,
+  last_assigned_at) в узких строках WITHOUT ROWID по executor_id:
+  назначение обновляет одну короткую строку, а не профиль из 11 колонок
+- counter_epoch - номер текущего дня счетчиков: сброс дня увеличивает
+  его на 1 (одна строка) вместо UPDATE по всем исполнителям; счетчик
+  из прошлой эпохи читается как 0 (см. counter_expr)
+- Триггеры на executors: новая строка получает счетчик, удаленная -
+  теряет его (для любой вставки, включая seed_data и ручной SQL)
+
+Колонка executors.assigned_today остается (начальное значение счетчика
+при вставке), но после миграции не обновляется.
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, checkpoint, close_connection, get_connection
+
+MIGRATION_NAME = 'add_executor_counters_v1'
+
+CURRENT_EPOCH_SQL = "(SELECT epoch FROM counter_epoch WHERE id = 1)"
+
+TABLES = {
+    'counter_epoch': """
+        CREATE TABLE IF NOT EXISTS counter_epoch (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            epoch INTEGER NOT NULL DEFAULT 0,
+            reset_at TEXT
+        )
+    """,
+    'executor_counters': """
+        CREATE TABLE IF NOT EXISTS executor_counters (
+            executor_id TEXT PRIMARY KEY,
+            epoch INTEGER NOT NULL DEFAULT 0,
+            assigned_today INTEGER NOT NULL DEFAULT 0,
+            last_assigned_at TEXT
+        ) WITHOUT ROWID
+    """,
+}
+
+TRIGGERS = {
+    'trg_executors_counter_insert': f"""
+        CREATE TRIGGER IF NOT EXISTS trg_executors_counter_insert AFTER INSERT ON executors
+        BEGIN
+            INSERT OR IGNORE INTO executor_counters (executor_id, epoch, assigned_today)
+            VALUES (NEW.id, {CURRENT_EPOCH_SQL}, COALESCE(NEW.assigned_today, 0));
+        END
+    """,
+    'trg_executors_counter_delete': """
+        CREATE TRIGGER IF NOT EXISTS trg_executors_counter_delete AFTER DELETE ON executors
+        BEGIN
+            DELETE FROM executor_counters WHERE executor_id = OLD.id;
+        END
+    """,
+}
+
+
+def counter_expr(alias: str = '') -> str:
+    """
+    SQL-выражение счетчика текущей эпохи: строки прошлых эпох (до сброса
+    дня) считаются нулем
+
+    Args:
+        alias: Псевдоним таблицы executor_counters в запросе
+    """
+    prefix = f"{alias}." if alias else ''
+    return f"(CASE WHEN {prefix}epoch = {CURRENT_EPOCH_SQL} THEN {prefix}assigned_today ELSE 0 END)"
+
+
+def backup_database():
+    """Создать резервную копию БД перед миграцией"""
+    if os.path.exists(DB_PATH):
+        backup_path = f"{DB_PATH}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        import shutil
+        shutil.copy2(DB_PATH, backup_path)
+        print(f"[OK] Создана резервная копия: {backup_path}")
+        return backup_path
+    return None
+
+
+def _existing(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,)).fetchall()}
+
+
+def is_needed(conn):
+    """Таблица executors есть, а счетчиков (или триггеров) нет"""
+    if 'executors' not in _existing(conn, 'table'):
+        return False
+    return not (set(TABLES) <= _existing(conn, 'table') and set(TRIGGERS) <= _existing(conn, 'trigger'))
+
+
+def create_counter_objects(conn):
+    """Создать таблицы и триггеры, перенести текущие счетчики"""
+    for statements in (TABLES, TRIGGERS):
+        for name, sql in statements.items():
+            conn.execute(sql)
+    conn.execute("INSERT OR IGNORE INTO counter_epoch (id, epoch) VALUES (1, 0)")
+    moved = conn.execute(f"""
+        INSERT OR IGNORE INTO executor_counters (executor_id, epoch, assigned_today)
+        SELECT id, {CURRENT_EPOCH_SQL}, COALESCE(assigned_today, 0) FROM executors
+    """).rowcount
+    print(f"[OK] Счетчики: {', '.join(TABLES)} (перенесено {moved} исполнителей)")
+
+
+def log_migration(conn):
+    """Записать миграцию в schema_migrations"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            migration_name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            success INTEGER DEFAULT 1,
+            notes TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO schema_migrations (migration_name, notes)
+        VALUES (?, ?)
+    """, (MIGRATION_NAME, 'Таблицы executor_counters, counter_epoch, триггеры на executors'))
+
+
+def apply_schema_changes(conn):
+    """
+    Изменения схемы (автозапуск из schema.py)
+
+    Args:
+        conn: Соединение SQLite (коммит - на вызывающей стороне)
+    """
+    create_counter_objects(conn)
+    log_migration(conn)
+
+
+def main():
+    print("=" * 60)
+    print("МИГРАЦИЯ БД: Счетчики исполнителей")
+    print("=" * 60)
+
+    if not os.path.exists(DB_PATH):
+        print(f"[ERROR] База данных не найдена: {DB_PATH}")
+        return
+
+    backup_path = backup_database()
+    conn = get_connection(DB_PATH)
+
+    try:
+        if not is_needed(conn):
+            print("[INFO] Счетчики уже вынесены в executor_counters")
+            return
+
+        print("\n[1/2] Создание таблиц и триггеров...")
+        create_counter_objects(conn)
+
+        print("\n[2/2] Сохранение изменений...")
+        log_migration(conn)
+        conn.commit()
+        checkpoint(DB_PATH, 'TRUNCATE')
+
+        print("\n" + "=" * 60)
+        print("MIGRATION COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+
+        if backup_path:
+            print(f"\n[BACKUP] Created: {backup_path}")
+
+    except Exception as e:
+        print(f"\n[ERROR] Ошибка при миграции: {e}")
+        conn.rollback()
+
+        if backup_path:
+            print(f"\n💾 Восстановите из резервной копии: {backup_path}")
+
+    finally:
+        close_connection(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
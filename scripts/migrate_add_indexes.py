@@ -0,0 +1,227 @@
+"""
+Миграция: Вторичные индексы для назначений и заявок
+Версия: 1.0
+Дата: 2026-10-19
+
+Создает индексы:
+- assignments(task_id) UNIQUE - поиск назначения заявки, одна заявка - одно назначение
+- assignments(executor_id, assigned_at) - назначения исполнителя, удаление исполнителя
+- tasks(created_at) - сортировка списка заявок
+- executors(active, department) - выборка активных исполнителей отдела
+
+UNIQUE индекс нельзя создать, пока у заявки несколько назначений. Автозапуск
+из schema.py такие данные не трогает: создает остальные индексы, пишет
+предупреждение и не отмечает миграцию примененной. Повторные назначения
+удаляет только ручной запуск (python scripts/migrate_add_indexes.py) -
+с резервной копией БД и уменьшением счетчиков исполнителей в той же
+транзакции (остается самое раннее назначение заявки).
+"""
+
+import os
+import sys
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, checkpoint, close_connection, get_connection
+
+MIGRATION_NAME = 'add_indexes_v1'
+
+INDEXES = {
+    'idx_assignments_task_id': "CREATE UNIQUE INDEX IF NOT EXISTS idx_assignments_task_id ON assignments(task_id)",
+    'idx_assignments_executor_assigned': (
+        "CREATE INDEX IF NOT EXISTS idx_assignments_executor_assigned ON assignments(executor_id, assigned_at)"
+    ),
+    'idx_tasks_created_at': "CREATE INDEX IF NOT EXISTS idx_tasks_created_at ON tasks(created_at)",
+    'idx_executors_active_department': (
+        "CREATE INDEX IF NOT EXISTS idx_executors_active_department ON executors(active, department)"
+    ),
+}
+
+TABLES = ('tasks', 'executors', 'assignments')
+
+
+def backup_database():
+    """Создать резервную копию БД перед миграцией"""
+    if os.path.exists(DB_PATH):
+        backup_path = f"{DB_PATH}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        import shutil
+        shutil.copy2(DB_PATH, backup_path)
+        print(f"[OK] Создана резервная копия: {backup_path}")
+        return backup_path
+    return None
+
+
+def _existing(conn, kind):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = ?", (kind,)).fetchall()}
+
+
+def is_needed(conn):
+    """Таблицы созданы, но хотя бы одного индекса нет"""
+    if not set(TABLES) <= _existing(conn, 'table'):
+        return False
+    return not set(INDEXES) <= _existing(conn, 'index')
+
+
+def count_duplicate_assignments(conn):
+    """Количество повторных назначений (сверх первого у каждой заявки)"""
+    return conn.execute("SELECT COUNT(*) - COUNT(DISTINCT task_id) FROM assignments").fetchone()[0]
+
+
+def _counter_day_start(conn):
+    """Начало текущего дня счетчиков: последний сброс эпохи или начало календарного дня"""
+    if 'counter_epoch' in _existing(conn, 'table'):
+        row = conn.execute("SELECT reset_at FROM counter_epoch WHERE id = 1").fetchone()
+        if row and row[0]:
+            return row[0]
+    return datetime.now().strftime('%Y-%m-%dT00:00:00')
+
+
+def remove_duplicate_assignments(conn):
+    """
+    Удалить повторные назначения одной заявки (остается самое раннее)
+
+    Каждое повторное назначение текущего дня увеличило счетчик исполнителя -
+    счетчики уменьшаются в той же транзакции (не ниже нуля).
+
+    Returns:
+        Количество удаленных назначений
+    """
+    duplicates = conn.execute("""
+        SELECT rowid, executor_id, assigned_at FROM (
+            SELECT rowid, executor_id, assigned_at, ROW_NUMBER() OVER (
+                PARTITION BY task_id ORDER BY assigned_at, rowid
+            ) AS rn
+            FROM assignments
+        )
+        WHERE rn > 1
+    """).fetchall()
+    if not duplicates:
+        return 0
+
+    day_start = _counter_day_start(conn)
+    overcounted = {}
+    for _, executor_id, assigned_at in duplicates:
+        if assigned_at and assigned_at >= day_start:
+            overcounted[executor_id] = overcounted.get(executor_id, 0) + 1
+
+    conn.executemany("DELETE FROM assignments WHERE rowid = ?", [(row[0],) for row in duplicates])
+    if 'executor_counters' in _existing(conn, 'table'):
+        # Строки прошлых эпох и так читаются как 0
+        sql = ("UPDATE executor_counters SET assigned_today = MAX(0, assigned_today - ?) "
+               "WHERE executor_id = ? AND epoch = (SELECT epoch FROM counter_epoch WHERE id = 1)")
+    else:
+        sql = "UPDATE executors SET assigned_today = MAX(0, assigned_today - ?) WHERE id = ?"
+    conn.executemany(sql, [(n, executor_id) for executor_id, n in overcounted.items()])
+
+    print(f"[WARN] Удалено повторных назначений: {len(duplicates)}, "
+          f"исправлены счетчики {len(overcounted)} исполнителей")
+    return len(duplicates)
+
+
+def create_indexes(conn, skip=()):
+    """Создать недостающие индексы (кроме skip)"""
+    existing = _existing(conn, 'index')
+    created = 0
+    for name, sql in INDEXES.items():
+        if name in existing or name in skip:
+            continue
+        conn.execute(sql)
+        print(f"[OK] Создан индекс {name}")
+        created += 1
+    if created:
+        # Статистика для планировщика запросов
+        conn.execute("ANALYZE")
+    return created
+
+
+def log_migration(conn):
+    """Записать миграцию в schema_migrations"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            migration_name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            success INTEGER DEFAULT 1,
+            notes TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO schema_migrations (migration_name, notes)
+        VALUES (?, ?)
+    """, (MIGRATION_NAME, 'Индексы assignments(task_id), assignments(executor_id, assigned_at), '
+                          'tasks(created_at), executors(active, department)'))
+
+
+def apply_schema_changes(conn):
+    """
+    Изменения схемы (автозапуск из schema.py)
+
+    Назначения не удаляются: при повторных назначениях UNIQUE индекс
+    не создается, а миграция остается непримененной до ручного запуска.
+
+    Args:
+        conn: Соединение SQLite (коммит - на вызывающей стороне)
+
+    Returns:
+        Количество созданных индексов
+    """
+    duplicates = count_duplicate_assignments(conn)
+    if duplicates:
+        print(f"[WARN] Повторных назначений заявок: {duplicates}. Индекс idx_assignments_task_id "
+              f"не создан - выполните python scripts/migrate_add_indexes.py")
+        return create_indexes(conn, skip=('idx_assignments_task_id',))
+    created = create_indexes(conn)
+    log_migration(conn)
+    return created
+
+
+def main():
+    print("=" * 60)
+    print("МИГРАЦИЯ БД: Вторичные индексы")
+    print("=" * 60)
+
+    if not os.path.exists(DB_PATH):
+        print(f"[ERROR] База данных не найдена: {DB_PATH}")
+        return
+
+    backup_path = backup_database()
+    conn = get_connection(DB_PATH)
+
+    try:
+        if not is_needed(conn):
+            print("[INFO] Индексы уже созданы")
+            return
+
+        print("\n[1/3] Удаление повторных назначений и исправление счетчиков...")
+        removed = remove_duplicate_assignments(conn)
+
+        print("\n[2/3] Создание индексов...")
+        created = create_indexes(conn)
+
+        print("\n[3/3] Сохранение изменений...")
+        log_migration(conn)
+        conn.commit()
+        checkpoint(DB_PATH, 'TRUNCATE')
+
+        print("\n" + "=" * 60)
+        print("MIGRATION COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+        print(f"[OK] Duplicates removed: {removed}")
+        print(f"[OK] Indexes created: {created}")
+
+        if backup_path:
+            print(f"\n[BACKUP] Created: {backup_path}")
+
+    except Exception as e:
+        print(f"\n[ERROR] Ошибка при миграции: {e}")
+        conn.rollback()
+
+        if backup_path:
+            print(f"\n💾 Восстановите из резервной копии: {backup_path}")
+
+    finally:
+        close_connection(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,13 @@
 import sqlite3
 import json
 import os
+import sys
 from datetime import datetime
 
-DB_PATH = 'streamlit_app/ais.db'
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, checkpoint, close_connection, get_connection
+
+MIGRATION_NAME = 'add_json_params_v1'
 
 def backup_database():
     """Создать резервную копию БД перед миграцией"""
@@ -201,12 +205,35 @@ def create_migration_log(conn):
         INSERT INTO schema_migrations (migration_name, notes)
         VALUES (?, ?)
     """, (
-        'add_json_params_v1',
+        MIGRATION_NAME,
         'Добавлены JSON колонки params в tasks и executors'
     ))
     
     print("[OK] Создана таблица миграций")
 
+def is_needed(conn):
+    """Таблицы tasks/executors созданы, но без колонок params"""
+    for table in ('tasks', 'executors'):
+        columns = [col[1] for col in conn.execute(f"PRAGMA table_info({table})").fetchall()]
+        if columns and 'params' not in columns:
+            return True
+    return False
+
+def apply_schema_changes(conn):
+    """
+    Изменения схемы без демо-параметров (автозапуск из schema.py)
+    
+    Args:
+        conn: Соединение SQLite (коммит - на вызывающей стороне)
+    
+    Returns:
+        Количество добавленных колонок и мигрированных записей
+    """
+    columns_added = int(add_params_column_to_tasks(conn)) + int(add_params_column_to_executors(conn))
+    migrated = migrate_existing_data(conn) if columns_added else 0
+    create_migration_log(conn)
+    return columns_added, migrated
+
 def main():
     print("=" * 60)
     print("МИГРАЦИЯ БД: Добавление JSON параметров")
@@ -222,8 +249,7 @@ def main():
     
     try:
         # Подключиться к БД
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row
+        conn = get_connection(DB_PATH)
         
         print("\n[1/6] Добавление колонки params в tasks...")
         tasks_added = add_params_column_to_tasks(conn)
@@ -242,6 +268,8 @@ def main():
         
         print("\n[6/6] Сохранение изменений...")
         conn.commit()
+        # Соединение открыто с профилем db.py (WAL) - переносим журнал в файл БД
+        checkpoint(DB_PATH, 'TRUNCATE')
         
         print("\n" + "=" * 60)
         print("MIGRATION COMPLETED SUCCESSFULLY!")
@@ -266,7 +294,7 @@ def main():
             print(f"\n💾 Восстановите из резервной копии: {backup_path}")
     
     finally:
-        conn.close()
+        close_connection(DB_PATH)
 
 if __name__ == "__main__":
     main()
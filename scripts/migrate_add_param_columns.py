@@ -0,0 +1,249 @@
+"""
+Миграция: Генерируемые колонки для часто используемых параметров
+Версия: 1.0
+Дата: 2026-10-19
+
+params хранится JSON-текстом, поэтому фильтровать и группировать по нему
+в SQL можно только через json_extract по каждой строке. Миграция
+материализует "горячие" пути параметров, объявленные в секции
+indexed_params конфигурации правил (config/matching_rules.json):
+
+    "indexed_params": {"tasks": ["location"], "executors": ["location", "experience_years"]}
+
+Для каждого пути создаются:
+- колонка p_<ключ> GENERATED ALWAYS AS (json_extract(params, '$.<ключ>')) VIRTUAL
+  (некорректный JSON в params дает NULL, а не ошибку записи)
+- индекс idx_<таблица>_p_<ключ>
+
+Миграция аддитивная: новые пути в конфиге добавляются при следующем запуске,
+убранные из конфига колонки остаются. Требует SQLite >= 3.31.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(__file__))
+from db import DB_PATH, checkpoint, close_connection, get_connection
+
+MIGRATION_NAME = 'add_param_columns_v1'
+
+DEFAULT_CONFIG_PATH = os.path.join(os.path.dirname(__file__), '..', 'config', 'matching_rules.json')
+
+# Префикс генерируемых колонок: params.location -> p_location
+PARAM_COLUMN_PREFIX = 'p_'
+
+TABLES = ('tasks', 'executors')
+
+MIN_SQLITE_VERSION = (3, 31, 0)
+
+_KEY_RE = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+
+
+def backup_database():
+    """Создать резервную копию БД перед миграцией"""
+    if os.path.exists(DB_PATH):
+        backup_path = f"{DB_PATH}.backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        import shutil
+        shutil.copy2(DB_PATH, backup_path)
+        print(f"[OK] Создана резервная копия: {backup_path}")
+        return backup_path
+    return None
+
+
+def load_indexed_params(config_path: str = None) -> Dict[str, List[str]]:
+    """
+    Прочитать горячие пути параметров из конфигурации правил
+
+    Пути можно указывать как 'location' или 'params.location'. Ключи, не
+    являющиеся идентификаторами, пропускаются с предупреждением.
+
+    Returns:
+        Таблица -> список ключей params
+    """
+    path = config_path or os.environ.get('INDEXED_PARAMS_CONFIG', DEFAULT_CONFIG_PATH)
+    try:
+        with open(path, encoding='utf-8') as f:
+            section = json.load(f).get('indexed_params', {})
+    except (OSError, ValueError) as e:
+        print(f"[WARN] Не удалось прочитать indexed_params из {path}: {e}")
+        return {table: [] for table in TABLES}
+
+    result = {}
+    for table in TABLES:
+        keys = []
+        for raw in section.get(table, []):
+            key = raw[len('params.'):] if raw.startswith('params.') else raw
+            if not is_valid_key(key):
+                print(f"[WARN] Пропущен путь параметра {table}.{raw}: допустимы только вложенные на 1 уровень ключи")
+                continue
+            if key not in keys:
+                keys.append(key)
+        result[table] = keys
+    return result
+
+
+def is_valid_key(key: str) -> bool:
+    """Ключ можно подставить в SQL (имя колонки и путь json_extract)"""
+    return bool(_KEY_RE.match(key))
+
+
+def extract_expr(key: str) -> str:
+    """Выражение значения параметра из JSON-текста params"""
+    return f"CASE WHEN json_valid(params) THEN json_extract(params, '$.{key}') END"
+
+
+def column_name(key: str) -> str:
+    return f"{PARAM_COLUMN_PREFIX}{key}"
+
+
+def index_name(table: str, key: str) -> str:
+    return f"idx_{table}_{column_name(key)}"
+
+
+def _columns(conn, table):
+    # table_xinfo (в отличие от table_info) показывает генерируемые колонки
+    return {row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall()}
+
+
+def _indexes(conn):
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'").fetchall()}
+
+
+def is_needed(conn, indexed_params: Dict[str, List[str]] = None):
+    """Есть объявленные пути без колонки или индекса (и SQLite их поддерживает)"""
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        return False
+    indexed_params = load_indexed_params() if indexed_params is None else indexed_params
+    indexes = _indexes(conn)
+    for table in TABLES:
+        keys = indexed_params.get(table, [])
+        if not keys:
+            continue
+        columns = _columns(conn, table)
+        # Колонки params нет - сначала должна пройти миграция add_json_params_v1
+        if 'params' not in columns:
+            continue
+        for key in keys:
+            if column_name(key) not in columns or index_name(table, key) not in indexes:
+                return True
+    return False
+
+
+def add_param_columns(conn, indexed_params: Dict[str, List[str]]):
+    """Добавить недостающие генерируемые колонки и индексы"""
+    indexes = _indexes(conn)
+    created = []
+    for table in TABLES:
+        columns = _columns(conn, table)
+        if 'params' not in columns:
+            continue
+        for key in indexed_params.get(table, []):
+            column = column_name(key)
+            if column not in columns:
+                # ALTER TABLE поддерживает только VIRTUAL: значение хранится в индексе
+                conn.execute(
+                    f"ALTER TABLE {table} ADD COLUMN {column} "
+                    f"GENERATED ALWAYS AS ({extract_expr(key)}) VIRTUAL"
+                )
+                print(f"[OK] {table}: добавлена колонка {column}")
+            index = index_name(table, key)
+            if index not in indexes:
+                conn.execute(f"CREATE INDEX IF NOT EXISTS {index} ON {table}({column})")
+                print(f"[OK] {table}: создан индекс {index}")
+            created.append(f"{table}.{column}")
+    conn.execute("ANALYZE")
+    return created
+
+
+def log_migration(conn, created):
+    """Записать миграцию в schema_migrations"""
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            migration_name TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            success INTEGER DEFAULT 1,
+            notes TEXT
+        )
+    """)
+    conn.execute("""
+        INSERT INTO schema_migrations (migration_name, notes)
+        VALUES (?, ?)
+    """, (MIGRATION_NAME, 'Генерируемые колонки: ' + ', '.join(created)))
+
+
+def apply_schema_changes(conn, indexed_params: Dict[str, List[str]] = None):
+    """
+    Изменения схемы (автозапуск из schema.py)
+
+    Args:
+        conn: Соединение SQLite (коммит - на вызывающей стороне)
+        indexed_params: Таблица -> ключи params (по умолчанию из конфигурации правил)
+
+    Returns:
+        Список материализованных колонок вида 'таблица.колонка'
+    """
+    indexed_params = load_indexed_params() if indexed_params is None else indexed_params
+    created = add_param_columns(conn, indexed_params)
+    log_migration(conn, created)
+    return created
+
+
+def main():
+    print("=" * 60)
+    print("МИГРАЦИЯ БД: Генерируемые колонки параметров")
+    print("=" * 60)
+
+    if not os.path.exists(DB_PATH):
+        print(f"[ERROR] База данных не найдена: {DB_PATH}")
+        return
+
+    if sqlite3.sqlite_version_info < MIN_SQLITE_VERSION:
+        print(f"[ERROR] Нужен SQLite >= 3.31, установлен {sqlite3.sqlite_version}")
+        return
+
+    indexed_params = load_indexed_params()
+    print(f"[INFO] Пути параметров: {indexed_params}")
+
+    backup_path = backup_database()
+    conn = get_connection(DB_PATH)
+
+    try:
+        if not is_needed(conn, indexed_params):
+            print("[INFO] Все колонки уже созданы")
+            return
+
+        print("\n[1/2] Создание колонок и индексов...")
+        created = add_param_columns(conn, indexed_params)
+
+        print("\n[2/2] Сохранение изменений...")
+        log_migration(conn, created)
+        conn.commit()
+        checkpoint(DB_PATH, 'TRUNCATE')
+
+        print("\n" + "=" * 60)
+        print("MIGRATION COMPLETED SUCCESSFULLY!")
+        print("=" * 60)
+        print(f"[OK] Columns: {', '.join(created)}")
+
+        if backup_path:
+            print(f"\n[BACKUP] Created: {backup_path}")
+
+    except Exception as e:
+        print(f"\n[ERROR] Ошибка при миграции: {e}")
+        conn.rollback()
+
+        if backup_path:
+            print(f"\n💾 Восстановите из резервной копии: {backup_path}")
+
+    finally:
+        close_connection(DB_PATH)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+"""
+Repository - Интерфейс хранилища заявок, исполнителей и назначений
+
+Вся работа с хранилищем (заявки, исполнители, назначения, счетчики,
+статус нагрузочного теста) идет через Repository:
+- SQLiteRepository - рабочее хранилище (db.py, schema.py)
+- InMemoryRepository - словари в памяти: тесты и замеры распределителя
+  и Rule Engine без дискового ввода-вывода
+
+Новые бэкенды (например, async SQLAlchemy) регистрируются через
+register_backend и создаются create_repository по имени.
+"""
+
+import os
+import threading
+from abc import ABC, abstractmethod
+from collections import Counter
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Mapping, Optional
+
+from db import DB_PATH, close_connection, get_connection, transaction
+from dispatcher import Dispatcher, assign_tasks_bulk
+from schema import (get_schema, increment_executor_counts_bulk, invalidate_schema, load_assignments,
+                    load_executors, load_tasks, load_unassigned_tasks, reset_executor_counts,
+                    save_assignments_bulk, save_executors_bulk, save_tasks_bulk)
+
+LOAD_TEST_FIELDS = ('status', 'progress', 'current', 'total', 'assigned', 'elapsed', 'performance', 'message')
+
+
+def make_load_test_status(status: str, progress: float = 0, current: int = 0, total: int = 0, assigned: int = 0,
+                          elapsed: float = 0, performance: float = 0, message: str = '') -> Dict:
+    """Запись статуса нагрузочного теста"""
+    return {'status': status, 'progress': progress, 'current': current, 'total': total, 'assigned': assigned,
+            'elapsed': elapsed, 'performance': performance, 'message': message}
+
+
+class Repository(ABC):
+    """Хранилище заявок, исполнителей, назначений, счетчиков и статуса нагрузочного теста"""
+
+    @abstractmethod
+    def init_storage(self) -> None:
+        """Создать таблицы/структуры хранилища, если их нет"""
+
+    # === Заявки ===
+
+    @abstractmethod
+    def load_tasks(self, include_archive: bool = False) -> List[Dict]:
+        """Заявки, от новых к старым"""
+
+    @abstractmethod
+    def load_unassigned_tasks(self) -> List[Dict]:
+        """Заявки без назначения, от новых к старым"""
+
+    @abstractmethod
+    def save_tasks(self, tasks: Iterable[Dict]) -> int:
+        """Сохранить (upsert) заявки, вернуть количество"""
+
+    # === Исполнители ===
+
+    @abstractmethod
+    def load_executors(self) -> List[Dict]:
+        """Исполнители, по имени"""
+
+    @abstractmethod
+    def save_executors(self, executors: Iterable[Dict]) -> int:
+        """Сохранить (upsert) исполнителей, вернуть количество"""
+
+    @abstractmethod
+    def delete_executor(self, executor_id: str) -> None:
+        """Удалить исполнителя вместе с его назначениями"""
+
+    # === Назначения ===
+
+    @abstractmethod
+    def load_assignments(self, include_archive: bool = False) -> List[Dict]:
+        """Назначения, от новых к старым"""
+
+    @abstractmethod
+    def save_assignments(self, assignments: Iterable[Dict]) -> int:
+        """Сохранить (upsert) назначения без изменения счетчиков"""
+
+    @abstractmethod
+    def assign_tasks(self, tasks: List[Dict], executors: List[Dict], engine=None) -> List[Optional[Dict]]:
+        """
+        Распределить заявки атомарно: назначения и счетчики фиксируются вместе,
+        daily_limit не превышается, уже распределенные заявки пропускаются
+
+        Args:
+            tasks: Сохраненные заявки
+            executors: Исполнители (счетчики обновляются на месте)
+            engine: RuleEngine или None
+
+        Returns:
+            Назначения в порядке заявок (None для нераспределенных)
+        """
+
+    # === Счетчики ===
+
+    @abstractmethod
+    def increment_counts(self, counts: Mapping[str, int]) -> int:
+        """Увеличить assigned_today исполнителей, вернуть количество обновленных"""
+
+    @abstractmethod
+    def reset_daily_counts(self) -> None:
+        """Обнулить assigned_today всех исполнителей"""
+
+    # === Статус нагрузочного теста ===
+
+    @abstractmethod
+    def get_load_test_status(self) -> Optional[Dict]:
+        """Последний статус (см. make_load_test_status) или None"""
+
+    @abstractmethod
+    def set_load_test_status(self, status: Dict) -> None:
+        """Сохранить статус нагрузочного теста"""
+
+    # === Очистка ===
+
+    @abstractmethod
+    def clear_tasks_and_assignments(self) -> None:
+        """Удалить заявки и назначения (включая архив), обнулить счетчики"""
+
+    @abstractmethod
+    def clear_executors(self) -> None:
+        """Удалить всех исполнителей и их назначения"""
+
+    def save_task(self, task: Dict) -> None:
+        self.save_tasks([task])
+
+    def save_executor(self, executor: Dict) -> None:
+        self.save_executors([executor])
+
+    def save_assignment(self, assignment: Dict) -> None:
+        self.save_assignments([assignment])
+
+    def close(self) -> None:
+        """Освободить ресурсы текущего потока"""
+
+
+class SQLiteRepository(Repository):
+    """Хранилище в SQLite (соединение на поток, схема и миграции из schema.py)"""
+
+    def __init__(self, db_path: str = None):
+        """
+        Args:
+            db_path: Путь к файлу БД (по умолчанию db.DB_PATH)
+        """
+        self.db_path = db_path or DB_PATH
+
+    def init_storage(self) -> None:
+        with transaction(self.db_path) as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                category TEXT,
+                priority TEXT,
+                created_at TEXT,
+                data TEXT
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS executors (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                email TEXT NOT NULL,
+                department TEXT,
+                skills TEXT,
+                active INTEGER DEFAULT 1,
+                daily_limit INTEGER DEFAULT 10,
+                assigned_today INTEGER DEFAULT 0,
+                created_at TEXT,
+                data TEXT
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS assignments (
+                id TEXT PRIMARY KEY,
+                task_id TEXT,
+                executor_id TEXT,
+                assigned_at TEXT,
+                score REAL
+            )
+            """)
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS load_test_status (
+                id INTEGER PRIMARY KEY,
+                status TEXT,
+                progress REAL,
+                current INTEGER,
+                total INTEGER,
+                assigned INTEGER,
+                elapsed REAL,
+                performance REAL,
+                message TEXT,
+                updated_at TEXT
+            )
+            """)
+        # Проверка схемы (и недостающие миграции) один раз после создания таблиц
+        invalidate_schema(self.db_path)
+        get_schema(self.db_path)
+
+    def load_tasks(self, include_archive: bool = False) -> List[Dict]:
+        return load_tasks(self.db_path, include_archive)
+
+    def load_unassigned_tasks(self) -> List[Dict]:
+        return load_unassigned_tasks(self.db_path)
+
+    def save_tasks(self, tasks: Iterable[Dict]) -> int:
+        return save_tasks_bulk(tasks, self.db_path)
+
+    def load_executors(self) -> List[Dict]:
+        return load_executors(self.db_path)
+
+    def save_executors(self, executors: Iterable[Dict]) -> int:
+        return save_executors_bulk(executors, self.db_path)
+
+    def delete_executor(self, executor_id: str) -> None:
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM assignments WHERE executor_id=?", (executor_id,))
+            conn.execute("DELETE FROM executors WHERE id=?", (executor_id,))
+
+    def load_assignments(self, include_archive: bool = False) -> List[Dict]:
+        return load_assignments(self.db_path, include_archive)
+
+    def save_assignments(self, assignments: Iterable[Dict]) -> int:
+        return save_assignments_bulk(assignments, self.db_path)
+
+    def assign_tasks(self, tasks: List[Dict], executors: List[Dict], engine=None) -> List[Optional[Dict]]:
+        return assign_tasks_bulk(tasks, executors, engine, self.db_path)
+
+    def increment_counts(self, counts: Mapping[str, int]) -> int:
+        return increment_executor_counts_bulk(counts, self.db_path)
+
+    def reset_daily_counts(self) -> None:
+        reset_executor_counts(self.db_path)
+
+    def get_load_test_status(self) -> Optional[Dict]:
+        row = get_connection(self.db_path).execute("SELECT * FROM load_test_status WHERE id = 1").fetchone()
+        if row is None:
+            return None
+        status = make_load_test_status(row['status'])
+        for field in LOAD_TEST_FIELDS[1:]:
+            status[field] = row[field] or status[field]
+        return status
+
+    def set_load_test_status(self, status: Dict) -> None:
+        values = make_load_test_status(**status)
+        with transaction(self.db_path) as conn:
+            conn.execute("""
+                INSERT INTO load_test_status (id, status, progress, current, total, assigned, elapsed, performance, message, updated_at)
+                VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    status=excluded.status,
+                    progress=excluded.progress,
+                    current=excluded.current,
+                    total=excluded.total,
+                    assigned=excluded.assigned,
+                    elapsed=excluded.elapsed,
+                    performance=excluded.performance,
+                    message=excluded.message,
+                    updated_at=excluded.updated_at
+            """, tuple(values[f] for f in LOAD_TEST_FIELDS) + (datetime.now().isoformat(),))
+
+    def clear_tasks_and_assignments(self) -> None:
+        schema = get_schema(self.db_path)
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM assignments")
+            conn.execute("DELETE FROM tasks")
+            if schema.has_archive:
+                conn.execute("DELETE FROM assignments_archive")
+                conn.execute("DELETE FROM tasks_archive")
+            conn.execute(schema.reset_counts_sql)
+
+    def clear_executors(self) -> None:
+        with transaction(self.db_path) as conn:
+            conn.execute("DELETE FROM assignments")
+            conn.execute("DELETE FROM executors")
+
+    def close(self) -> None:
+        close_connection(self.db_path)
+
+
+class InMemoryRepository(Repository):
+    """
+    Хранилище в памяти процесса
+
+    Загрузки возвращают копии записей (как SQLite), поэтому изменения
+    на стороне вызывающего кода не попадают в хранилище без save_*.
+    Архива нет: include_archive игнорируется.
+    """
+
+    def __init__(self):
+        self.tasks: Dict[str, Dict] = {}
+        self.executors: Dict[str, Dict] = {}
+        self.assignments: Dict[str, Dict] = {}
+        self.load_test_status: Optional[Dict] = None
+        self.lock = threading.RLock()
+
+    def init_storage(self) -> None:
+        pass
+
+    def _assigned_task_ids(self) -> set:
+        return {a['task_id'] for a in self.assignments.values()}
+
+    def load_tasks(self, include_archive: bool = False) -> List[Dict]:
+        with self.lock:
+            return sorted((dict(t) for t in self.tasks.values()), key=lambda t: t['created_at'], reverse=True)
+
+    def load_unassigned_tasks(self) -> List[Dict]:
+        with self.lock:
+            assigned = self._assigned_task_ids()
+            return [t for t in self.load_tasks() if t['id'] not in assigned]
+
+    def save_tasks(self, tasks: Iterable[Dict]) -> int:
+        with self.lock:
+            count = 0
+            for task in tasks:
+                self.tasks[task['id']] = dict(task)
+                count += 1
+            return count
+
+    def load_executors(self) -> List[Dict]:
+        with self.lock:
+            return sorted((dict(e) for e in self.executors.values()), key=lambda e: e['name'])
+
+    def save_executors(self, executors: Iterable[Dict]) -> int:
+        with self.lock:
+            count = 0
+            for executor in executors:
+                self.executors[executor['id']] = dict(executor)
+                count += 1
+            return count
+
+    def delete_executor(self, executor_id: str) -> None:
+        with self.lock:
+            self.assignments = {k: a for k, a in self.assignments.items() if a['executor_id'] != executor_id}
+            self.executors.pop(executor_id, None)
+
+    def load_assignments(self, include_archive: bool = False) -> List[Dict]:
+        with self.lock:
+            return sorted((dict(a) for a in self.assignments.values()), key=lambda a: a['assigned_at'], reverse=True)
+
+    def save_assignments(self, assignments: Iterable[Dict]) -> int:
+        with self.lock:
+            count = 0
+            for assignment in assignments:
+                self.assignments[assignment['id']] = dict(assignment)
+                count += 1
+            return count
+
+    def assign_tasks(self, tasks: List[Dict], executors: List[Dict], engine=None) -> List[Optional[Dict]]:
+        with self.lock:
+            # Счетчики из хранилища - как sync_executor_counters под BEGIN IMMEDIATE
+            for executor in executors:
+                stored = self.executors.get(executor['id'])
+                if stored is None:
+                    executor['active'] = False
+                else:
+                    for field in ('assigned_today', 'daily_limit', 'active'):
+                        executor[field] = stored[field]
+
+            assigned = self._assigned_task_ids()
+            pending = [t for t in tasks if t['id'] not in assigned]
+            made = [a for a in Dispatcher(executors, engine).assign_batch(pending) if a]
+            self.save_assignments(made)
+            self.increment_counts(Counter(a['executor_id'] for a in made))
+
+        by_task = {a['task_id']: a for a in made}
+        return [by_task.get(t['id']) for t in tasks]
+
+    def increment_counts(self, counts: Mapping[str, int]) -> int:
+        with self.lock:
+            updated = 0
+            for executor_id, n in counts.items():
+                executor = self.executors.get(executor_id)
+                if executor is not None and n:
+                    executor['assigned_today'] += n
+                    updated += 1
+            return updated
+
+    def reset_daily_counts(self) -> None:
+        with self.lock:
+            for executor in self.executors.values():
+                executor['assigned_today'] = 0
+
+    def get_load_test_status(self) -> Optional[Dict]:
+        with self.lock:
+            return dict(self.load_test_status) if self.load_test_status else None
+
+    def set_load_test_status(self, status: Dict) -> None:
+        with self.lock:
+            self.load_test_status = make_load_test_status(**status)
+
+    def clear_tasks_and_assignments(self) -> None:
+        with self.lock:
+            self.tasks.clear()
+            self.assignments.clear()
+            self.reset_daily_counts()
+
+    def clear_executors(self) -> None:
+        with self.lock:
+            self.assignments.clear()
+            self.executors.clear()
+
+
+BACKENDS: Dict[str, Callable[..., Repository]] = {
+    'sqlite': SQLiteRepository,
+    'memory': InMemoryRepository,
+}
+
+
+def register_backend(name: str, factory: Callable[..., Repository]) -> None:
+    """Зарегистрировать бэкенд хранилища (фабрика принимает параметры create_repository)"""
+    BACKENDS[name] = factory
+
+
+def create_repository(backend: str = None, **kwargs) -> Repository:
+    """
+    Создать хранилище по имени бэкенда
+
+    Args:
+        backend: Имя из BACKENDS (по умолчанию переменная окружения STORAGE_BACKEND или 'sqlite')
+        **kwargs: Параметры бэкенда (например, db_path для sqlite)
+
+    Returns:
+        Repository с созданными таблицами
+    """
+    name = backend or os.environ.get('STORAGE_BACKEND', 'sqlite')
+    if name not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд хранилища: {name} (доступны: {', '.join(BACKENDS)})")
+    repository = BACKENDS[name](**kwargs)
+    repository.init_storage()
+    return repository
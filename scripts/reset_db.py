@@ -4,6 +4,10 @@ DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'streamlit_app', 'ais.db
 
 if os.path.exists(DB_PATH):
     os.remove(DB_PATH)
+    # Файлы WAL-журнала (см. SQLITE_PROFILE в scripts/db.py)
+    for suffix in ('-wal', '-shm'):
+        if os.path.exists(DB_PATH + suffix):
+            os.remove(DB_PATH + suffix)
     print(f"[OK] БД удалена: {DB_PATH}")
 else:
     print("[INFO] БД не существует")
@@ -7,6 +7,7 @@ Rule Engine - Движок правил для динамического мат
 - Различные типы условий (equals, greater, contains, array_match)
 - Настраиваемые веса правил
 - Формулы для вычисления score
+- Настройки режима выбора исполнителя (sampling) для dispatcher.py
 """
 
 import json
@@ -26,6 +27,8 @@ class RuleEngine:
         """
         self.rules = rules_config.get('rules', [])
         self.default_weight = rules_config.get('default_weight', 1.0)
+        # Режим выбора исполнителя: exact (полный перебор) или sampled (d кандидатов)
+        self.sampling = rules_config.get('sampling', {'mode': 'exact'})
         
     def get_nested_value(self, obj: Dict, path: str) -> Any:
         """
@@ -0,0 +1,186 @@
+"""
+Замер точного и приближенного (power-of-d-choices) режимов распределения
+
+Для синтетического пула исполнителей прогоняет одну и ту же последовательность
+заявок через Dispatcher в режиме exact и в режиме sampled для разных d
+и возвращает пропускную способность и справедливость (MAE утилизации).
+
+Режим --storage прогоняет полный цикл (сохранение заявок, распределение,
+запись назначений и счетчиков) через хранилища Repository: in-memory
+показывает стоимость распределения без ввода-вывода, sqlite - вместе с ним.
+
+Запуск:
+    python scripts/sampling_benchmark.py --executors 2000 --tasks 5000
+    python scripts/sampling_benchmark.py --storage --executors 200 --tasks 5000
+"""
+
+import argparse
+import copy
+import os
+import random
+import shutil
+import tempfile
+import time
+from typing import Dict, List, Sequence
+
+from db import close_connection
+from dispatcher import Dispatcher, load_rule_engine
+from repository import create_repository
+from task_generator import generate_executors, generate_tasks
+
+DEFAULT_D_VALUES = (2, 4, 8, 16, 32)
+
+
+def utilization_mae(executors: List[Dict]) -> float:
+    """MAE утилизации активных исполнителей (как на дашборде)"""
+    active = [e for e in executors if e.get('active', True)]
+    if not active:
+        return 0.0
+    utilizations = [e['assigned_today'] / e['daily_limit'] if e['daily_limit'] > 0 else 0 for e in active]
+    avg_util = sum(utilizations) / len(utilizations)
+    return sum(abs(u - avg_util) for u in utilizations) / len(utilizations)
+
+
+def run_mode(executors: List[Dict], tasks: List[Dict], engine, sampling: Dict, seed: int = 0) -> Dict:
+    """
+    Прогнать заявки через Dispatcher в заданном режиме
+
+    Args:
+        executors: Шаблон исполнителей (копируется, не изменяется)
+        tasks: Заявки
+        engine: RuleEngine
+        sampling: Режим выбора (см. Dispatcher)
+        seed: Seed выборок
+
+    Returns:
+        Результаты замера
+    """
+    pool = copy.deepcopy(executors)
+    dispatcher = Dispatcher(pool, engine, sampling=sampling, seed=seed)
+    work = copy.deepcopy(tasks)
+
+    start = time.perf_counter()
+    assigned = sum(1 for a in dispatcher.assign_batch(work) if a)
+    elapsed = time.perf_counter() - start
+
+    return {
+        'Режим': 'exact' if sampling.get('mode') != 'sampled' else f"sampled d={sampling['d']}",
+        'd': sampling.get('d') if sampling.get('mode') == 'sampled' else len(executors),
+        'Назначено': assigned,
+        'Заявок/сек': round(len(tasks) / elapsed, 1) if elapsed > 0 else 0.0,
+        'MAE': round(utilization_mae(pool), 4),
+    }
+
+
+def benchmark_sampling(n_executors: int = 500, n_tasks: int = 1000,
+                       d_values: Sequence[int] = DEFAULT_D_VALUES, pool: str = 'category',
+                       include_exact: bool = True, seed: int = 42) -> List[Dict]:
+    """
+    Сравнить точный режим и выборку из d кандидатов на одном наборе данных
+
+    Args:
+        n_executors: Размер синтетического пула исполнителей
+        n_tasks: Количество заявок
+        d_values: Проверяемые значения d
+        pool: Откуда брать кандидатов: 'uniform' или 'category'
+        include_exact: Замерить также полный перебор (медленно на больших пулах)
+        seed: Seed генерации данных и выборок
+
+    Returns:
+        Список строк результатов (для pandas.DataFrame)
+    """
+    engine = load_rule_engine()
+    rng = random.Random(seed)
+    executors = generate_executors(n_executors, rng)
+    tasks = generate_tasks(n_tasks, rng)
+
+    results = []
+    if include_exact:
+        results.append(run_mode(executors, tasks, engine, {'mode': 'exact'}, seed))
+    for d in d_values:
+        sampling = {'mode': 'sampled', 'd': int(d), 'pool': pool, 'fallback': True}
+        results.append(run_mode(executors, tasks, engine, sampling, seed))
+    return results
+
+
+def run_storage(backend: str, executors: List[Dict], tasks: List[Dict], engine, batch_size: int) -> Dict:
+    """
+    Прогнать заявки пачками через хранилище: save_tasks + assign_tasks
+
+    Args:
+        backend: Имя бэкенда Repository ('memory', 'sqlite')
+        executors: Шаблон исполнителей (копируется)
+        tasks: Заявки
+        engine: RuleEngine
+        batch_size: Заявок в пачке
+
+    Returns:
+        Результаты замера
+    """
+    tmp_dir = tempfile.mkdtemp() if backend == 'sqlite' else None
+    kwargs = {'db_path': os.path.join(tmp_dir, 'benchmark.db')} if tmp_dir else {}
+    repo = create_repository(backend, **kwargs)
+    try:
+        repo.save_executors(copy.deepcopy(executors))
+        pool = repo.load_executors()
+        work = copy.deepcopy(tasks)
+
+        start = time.perf_counter()
+        assigned = 0
+        for i in range(0, len(work), batch_size):
+            batch = work[i:i + batch_size]
+            repo.save_tasks(batch)
+            assigned += sum(1 for a in repo.assign_tasks(batch, pool, engine) if a)
+        elapsed = time.perf_counter() - start
+
+        return {
+            'Хранилище': backend,
+            'Назначено': assigned,
+            'Заявок/сек': round(len(tasks) / elapsed, 1) if elapsed > 0 else 0.0,
+            'MAE': round(utilization_mae(repo.load_executors()), 4),
+        }
+    finally:
+        repo.close()
+        if tmp_dir:
+            close_connection(kwargs['db_path'])
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+
+def benchmark_storage(n_executors: int = 200, n_tasks: int = 1000, batch_size: int = 100,
+                      backends: Sequence[str] = ('memory', 'sqlite'), seed: int = 42) -> List[Dict]:
+    """Сравнить полный цикл распределения на разных хранилищах (одинаковые данные)"""
+    engine = load_rule_engine()
+    rng = random.Random(seed)
+    executors = generate_executors(n_executors, rng)
+    tasks = generate_tasks(n_tasks, rng)
+    return [run_storage(backend, executors, tasks, engine, batch_size) for backend in backends]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Замер режимов exact / power-of-d-choices')
+    parser.add_argument('--executors', type=int, default=500, help='Размер пула исполнителей')
+    parser.add_argument('--tasks', type=int, default=1000, help='Количество заявок')
+    parser.add_argument('--d', type=str, default=','.join(map(str, DEFAULT_D_VALUES)), help='Значения d через запятую')
+    parser.add_argument('--pool', choices=['uniform', 'category'], default='category', help='Откуда брать кандидатов')
+    parser.add_argument('--no-exact', action='store_true', help='Не замерять полный перебор')
+    parser.add_argument('--storage', action='store_true', help='Сравнить хранилища memory / sqlite вместо режимов')
+    parser.add_argument('--batch-size', type=int, default=100, help='Заявок в пачке (режим --storage)')
+    args = parser.parse_args()
+
+    if args.storage:
+        results = benchmark_storage(args.executors, args.tasks, args.batch_size)
+        print(f"{'Хранилище':<12}{'Назначено':>10}{'Заявок/сек':>14}{'MAE':>10}")
+        for r in results:
+            print(f"{r['Хранилище']:<12}{r['Назначено']:>10}{r['Заявок/сек']:>14}{r['MAE']:>10}")
+        return
+
+    d_values = [int(x) for x in args.d.split(',') if x.strip()]
+    results = benchmark_sampling(args.executors, args.tasks, d_values, args.pool, not args.no_exact)
+
+    print(f"{'Режим':<16}{'Назначено':>10}{'Заявок/сек':>14}{'MAE':>10}")
+    for r in results:
+        print(f"{r['Режим']:<16}{r['Назначено']:>10}{r['Заявок/сек']:>14}{r['MAE']:>10}")
+
+
+if __name__ == '__main__':
+    main()
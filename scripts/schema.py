@@ -0,0 +1,520 @@
+"""
+Schema - Реестр схемы БД
+
+Поддерживает:
+- Однократную проверку схемы на файл БД с автозапуском недостающих
+  миграций (MIGRATIONS: JSON параметры, вторичные индексы, генерируемые
+  колонки горячих параметров, архивные таблицы, счетчики исполнителей)
+- Кэш наборов колонок таблиц
+- Одно SQL-выражение на операцию вместо PRAGMA table_info и веток под
+  старую/новую схему в каждом вызове (sqlite3 кэширует подготовленные
+  выражения соединения по тексту запроса)
+- Преобразование строк БД в словари приложения и обратно (codec.py:
+  orjson/msgpack, ленивое декодирование params)
+- Пакетную запись (executemany в одной транзакции)
+- Фильтрацию и группировку по параметрам в SQL (генерируемые колонки p_<ключ>)
+- Счетчики назначений в узкой таблице executor_counters: инкремент -
+  UPDATE одной короткой строки, сброс дня - смена эпохи (O(1))
+"""
+
+import os
+import threading
+from datetime import datetime
+from typing import Dict, FrozenSet, List, Mapping, Sequence, Tuple
+
+import codec
+import migrate_add_archive as archive_migration
+import migrate_add_executor_counters as counters_migration
+import migrate_add_indexes as indexes_migration
+import migrate_add_json_params as json_params_migration
+import migrate_add_param_columns as param_columns_migration
+from db import DB_PATH, executemany_chunked, get_connection, transaction
+
+TABLES = ('tasks', 'executors', 'assignments')
+ARCHIVE_TABLES = ('tasks_archive', 'assignments_archive')
+COUNTER_TABLES = ('executor_counters', 'counter_epoch')
+
+TASK_COLUMNS = ('id', 'name', 'category', 'priority', 'created_at', 'data', 'params')
+EXECUTOR_COLUMNS = ('id', 'name', 'email', 'department', 'skills', 'active', 'daily_limit',
+                    'assigned_today', 'created_at', 'data', 'params')
+ASSIGNMENT_COLUMNS = ('id', 'task_id', 'executor_id', 'assigned_at', 'score')
+
+# Миграции в порядке применения: модуль с MIGRATION_NAME, is_needed(conn), apply_schema_changes(conn)
+MIGRATIONS = (json_params_migration, indexes_migration, param_columns_migration, archive_migration,
+              counters_migration)
+
+PARAM_TABLES = param_columns_migration.TABLES
+PARAM_COLUMN_PREFIX = param_columns_migration.PARAM_COLUMN_PREFIX
+
+# Операторы фильтров load_executors_by_params
+PARAM_OPERATORS = ('=', '!=', '<', '<=', '>', '>=')
+
+# Колонки профиля, которые upsert не перезаписывает при вынесенных счетчиках
+COUNTER_COLUMNS = frozenset({'assigned_today'})
+
+# Ключи, хранящиеся в отдельных колонках; остальное уходит в data (JSON)
+TASK_BASE_KEYS = frozenset(TASK_COLUMNS) - {'data'}
+EXECUTOR_BASE_KEYS = frozenset(EXECUTOR_COLUMNS) - {'data'}
+
+_schemas: Dict[str, 'Schema'] = {}
+_lock = threading.Lock()
+
+
+def _json_dumps(obj) -> str:
+    try:
+        return codec.dumps(obj)
+    except Exception:
+        return '{}'
+
+
+def _encode_data(obj: Dict):
+    try:
+        return codec.encode_data(obj)
+    except Exception:
+        return '{}'
+
+
+def _upsert_sql(table: str, columns: Tuple[str, ...], skip_update: FrozenSet[str] = frozenset(),
+                only_changed: bool = False) -> str:
+    """
+    INSERT ... ON CONFLICT(id) DO UPDATE
+
+    Args:
+        skip_update: Колонки, которые пишутся только при вставке
+        only_changed: Не перезаписывать строку, если значения не изменились
+    """
+    updated = [c for c in columns if c != 'id' and c not in skip_update]
+    sql = (
+        f"INSERT INTO {table}({','.join(columns)}) VALUES({','.join('?' * len(columns))}) "
+        f"ON CONFLICT(id) DO UPDATE SET {','.join(f'{c}=excluded.{c}' for c in updated)}"
+    )
+    if only_changed:
+        sql += f" WHERE {' OR '.join(f'{c} IS NOT excluded.{c}' for c in updated)}"
+    return sql
+
+
+def _insert_sql(table: str, columns: Tuple[str, ...]) -> str:
+    return f"INSERT INTO {table}({','.join(columns)}) VALUES({','.join('?' * len(columns))})"
+
+
+class Schema:
+    """Колонки таблиц и готовые SQL-выражения для одной версии схемы"""
+
+    def __init__(self, columns: Dict[str, FrozenSet[str]]):
+        """
+        Args:
+            columns: Таблица -> набор колонок (из PRAGMA table_info)
+        """
+        self.columns = columns
+        self.tasks_has_params = 'params' in columns.get('tasks', ())
+        self.executors_has_params = 'params' in columns.get('executors', ())
+        # Архив (archive_db.py) и представления tasks_all / assignments_all
+        self.has_archive = all(columns.get(table) for table in ARCHIVE_TABLES)
+        # Счетчики в executor_counters (migrate_add_executor_counters.py)
+        self.has_counters = all(columns.get(table) for table in COUNTER_TABLES)
+
+        self.task_columns = TASK_COLUMNS if self.tasks_has_params else TASK_COLUMNS[:-1]
+        self.executor_columns = EXECUTOR_COLUMNS if self.executors_has_params else EXECUTOR_COLUMNS[:-1]
+        # Таблица -> ключ params -> генерируемая колонка с индексом
+        self.param_columns = {
+            table: {c[len(PARAM_COLUMN_PREFIX):]: c for c in sorted(columns.get(table, ()))
+                    if c.startswith(PARAM_COLUMN_PREFIX)}
+            for table in PARAM_TABLES
+        }
+
+        # Сортировка по исходной ISO-строке (а не datetime(...)) использует индексы
+        self.select_tasks_sql = f"SELECT {','.join(self.task_columns)} FROM tasks ORDER BY created_at DESC"
+        self.select_unassigned_tasks_sql = (
+            f"SELECT {','.join(self.task_columns)} FROM tasks "
+            "WHERE NOT EXISTS (SELECT 1 FROM assignments a WHERE a.task_id = tasks.id) "
+            "ORDER BY created_at DESC"
+        )
+        if self.has_counters:
+            profile_columns = ','.join(f"e.{c}" for c in self.executor_columns if c not in COUNTER_COLUMNS)
+            counter = counters_migration.counter_expr('c')
+            executors_from = "FROM executors e LEFT JOIN executor_counters c ON c.executor_id = e.id"
+            self.select_executors_sql = (
+                f"SELECT {profile_columns},{counter} AS assigned_today {executors_from} ORDER BY e.name"
+            )
+            # Счетчик, лимит и активность: (id, assigned_today, daily_limit, active)
+            self.select_counters_sql = f"SELECT e.id,{counter},e.daily_limit,e.active {executors_from}"
+            # Нагрузка исполнителей для агрегатов дашборда (dashboard_queries.py)
+            self.executor_load_sql = (
+                f"SELECT e.id,e.name,e.department,{counter} AS assigned_today,e.daily_limit,e.active "
+                f"{executors_from}"
+            )
+            self.select_counter_sql = self.select_counters_sql + " WHERE e.id = ?"
+            # Отпечаток состава, лимитов, активности исполнителей и эпохи счетчиков
+            # (delta_sync.py): назначения меняют только executor_counters
+            self.executors_fingerprint_sql = (
+                "SELECT COUNT(*), MAX(rowid), TOTAL(daily_limit * rowid), TOTAL(active * rowid), "
+                f"{counters_migration.CURRENT_EPOCH_SQL} FROM executors"
+            )
+            # Инкремент и резервирование обновляют только строку счетчика;
+            # строка прошлой эпохи при первом обновлении начинается с нуля
+            counter_update = (
+                f"UPDATE executor_counters SET assigned_today = {counters_migration.counter_expr()} + {{n}}, "
+                f"epoch = {counters_migration.CURRENT_EPOCH_SQL}, "
+                "last_assigned_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime') "
+                "WHERE executor_id = ?"
+            )
+            self.increment_count_sql = counter_update.format(n='?')
+            self.reserve_slot_sql = counter_update.format(n='1') + (
+                f" AND {counters_migration.counter_expr()} < "
+                "(SELECT daily_limit FROM executors WHERE id = executor_counters.executor_id AND active = 1)"
+            )
+            self.reset_counts_sql = (
+                "UPDATE counter_epoch SET epoch = epoch + 1, "
+                "reset_at = strftime('%Y-%m-%dT%H:%M:%f', 'now', 'localtime') WHERE id = 1"
+            )
+        else:
+            self.select_executors_sql = f"SELECT {','.join(self.executor_columns)} FROM executors ORDER BY name"
+            self.select_counters_sql = "SELECT id, assigned_today, daily_limit, active FROM executors"
+            self.executor_load_sql = (
+                "SELECT id, name, department, assigned_today, daily_limit, active FROM executors"
+            )
+            self.select_counter_sql = self.select_counters_sql + " WHERE id = ?"
+            # Счетчики в самой таблице executors - отпечаток менялся бы с каждым назначением
+            self.executors_fingerprint_sql = None
+            self.increment_count_sql = "UPDATE executors SET assigned_today = assigned_today + ? WHERE id = ?"
+            self.reserve_slot_sql = (
+                "UPDATE executors SET assigned_today = assigned_today + 1 "
+                "WHERE id = ? AND active = 1 AND assigned_today < daily_limit"
+            )
+            self.reset_counts_sql = "UPDATE executors SET assigned_today = 0"
+        self.select_assignments_sql = (
+            f"SELECT {','.join(ASSIGNMENT_COLUMNS)} FROM assignments ORDER BY assigned_at DESC"
+        )
+        # Отчеты за весь период: горячие таблицы + архив
+        self.select_tasks_all_sql = (
+            f"SELECT {','.join(self.task_columns)} FROM tasks_all ORDER BY created_at DESC"
+        )
+        self.select_assignments_all_sql = (
+            f"SELECT {','.join(ASSIGNMENT_COLUMNS)} FROM assignments_all ORDER BY assigned_at DESC"
+        )
+        # Дельта-синхронизация: время (и исполнитель) строк после rowid-водяного знака
+        self.select_tasks_since_sql = "SELECT created_at FROM tasks WHERE rowid > ? ORDER BY rowid"
+        self.select_assignments_since_sql = (
+            "SELECT assigned_at, executor_id FROM assignments WHERE rowid > ? ORDER BY rowid"
+        )
+        self.insert_task_sql = _insert_sql('tasks', self.task_columns)
+        self.upsert_task_sql = _upsert_sql('tasks', self.task_columns)
+        # Профиль перезаписывается только при изменении; счетчик задается лишь при вставке
+        self.upsert_executor_sql = _upsert_sql(
+            'executors', self.executor_columns,
+            skip_update=COUNTER_COLUMNS if self.has_counters else frozenset(), only_changed=True
+        )
+        self.upsert_assignment_sql = _upsert_sql('assignments', ASSIGNMENT_COLUMNS)
+
+    def param_expr(self, table: str, key: str) -> str:
+        """
+        SQL-выражение значения параметра: генерируемая колонка (по индексу),
+        если путь материализован, иначе json_extract по каждой строке
+        """
+        column = self.param_columns.get(table, {}).get(key)
+        if column:
+            return column
+        if not param_columns_migration.is_valid_key(key):
+            raise ValueError(f"Недопустимый ключ параметра: {key}")
+        return param_columns_migration.extract_expr(key)
+
+    def count_by_param_sql(self, table: str, key: str) -> str:
+        """Запрос (значение, количество) по параметру - см. count_by_param"""
+        if table not in PARAM_TABLES:
+            raise ValueError(f"Неизвестная таблица: {table}")
+        expr = self.param_expr(table, key)
+        return (f"SELECT {expr} AS value, COUNT(*) AS cnt FROM {table} "
+                f"WHERE {expr} IS NOT NULL GROUP BY {expr} ORDER BY cnt DESC, value")
+
+    @property
+    def complete(self) -> bool:
+        """Все таблицы созданы (только такую схему можно кэшировать)"""
+        return all(self.columns.get(table) for table in TABLES)
+
+    def task_row(self, task: Dict) -> Tuple:
+        """Параметры для insert_task_sql / upsert_task_sql"""
+        base_keys = TASK_BASE_KEYS if self.tasks_has_params else TASK_BASE_KEYS - {'params'}
+        data = {k: v for k, v in task.items() if k not in base_keys}
+        row = (task['id'], task['name'], task.get('category', ''), task.get('priority', ''),
+               task['created_at'], _encode_data(data))
+        if self.tasks_has_params:
+            params = task.get('params')
+            row += (_json_dumps(params) if params else '{}',)
+        return row
+
+    def executor_row(self, executor: Dict) -> Tuple:
+        """Параметры для upsert_executor_sql"""
+        base_keys = EXECUTOR_BASE_KEYS if self.executors_has_params else EXECUTOR_BASE_KEYS - {'params'}
+        data = {k: v for k, v in executor.items() if k not in base_keys}
+        skills = executor.get('skills', '')
+        skills_str = ','.join(skills) if isinstance(skills, list) else skills
+        row = (executor['id'], executor['name'], executor['email'], executor.get('department', ''), skills_str,
+               1 if executor.get('active', True) else 0, executor.get('daily_limit', 10),
+               executor.get('assigned_today', 0), executor['created_at'], _encode_data(data))
+        if self.executors_has_params:
+            params = executor.get('params')
+            row += (_json_dumps(params) if params else '{}',)
+        return row
+
+    @staticmethod
+    def assignment_row(assignment: Dict) -> Tuple:
+        """Параметры для upsert_assignment_sql"""
+        return (assignment['id'], assignment['task_id'], assignment['executor_id'],
+                assignment['assigned_at'], assignment.get('score', 0.0))
+
+    def task_from_row(self, r) -> Dict:
+        """Строка tasks -> словарь заявки"""
+        t = {
+            'id': r['id'],
+            'name': r['name'],
+            'category': r['category'],
+            'priority': r['priority'],
+            'created_at': r['created_at'] or datetime.now().isoformat()
+        }
+        # Дополнительные данные из data (для обратной совместимости)
+        t.update(codec.decode_data(r['data']))
+        if self.tasks_has_params:
+            # params разбирается при первом обращении
+            params = codec.lazy_loads(r['params'])
+            if params:
+                t['params'] = params
+        return t
+
+    def executor_from_row(self, r) -> Dict:
+        """Строка executors -> словарь исполнителя"""
+        e = {
+            'id': r['id'],
+            'name': r['name'],
+            'email': r['email'],
+            'department': r['department'],
+            'skills': r['skills'].split(',') if r['skills'] else [],
+            'active': bool(r['active']),
+            'daily_limit': r['daily_limit'],
+            'assigned_today': r['assigned_today'],
+            'created_at': r['created_at'] or datetime.now().isoformat()
+        }
+        e.update(codec.decode_data(r['data']))
+        if self.executors_has_params:
+            # params разбирается при первом обращении
+            params = codec.lazy_loads(r['params'])
+            if params:
+                e['params'] = params
+        return e
+
+    @staticmethod
+    def assignment_from_row(r) -> Dict:
+        """Строка assignments -> словарь назначения"""
+        return {
+            'id': r['id'],
+            'task_id': r['task_id'],
+            'executor_id': r['executor_id'],
+            'assigned_at': r['assigned_at'] or datetime.now().isoformat(),
+            'score': r['score'] if r['score'] is not None else 0.0
+        }
+
+
+def read_columns(conn) -> Dict[str, FrozenSet[str]]:
+    """Прочитать наборы колонок таблиц, включая генерируемые (пустой набор - таблицы нет)"""
+    return {
+        table: frozenset(row[1] for row in conn.execute(f"PRAGMA table_xinfo({table})").fetchall())
+        for table in TABLES + ARCHIVE_TABLES + COUNTER_TABLES
+    }
+
+
+def get_schema(db_path: str = None, migrate: bool = True) -> Schema:
+    """
+    Получить схему БД (проверяется один раз на файл)
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        migrate: Применить недостающие миграции из MIGRATIONS
+
+    Returns:
+        Schema с готовыми SQL-выражениями
+    """
+    path = os.path.abspath(db_path or DB_PATH)
+    schema = _schemas.get(path)
+    if schema is not None:
+        return schema
+
+    with _lock:
+        schema = _schemas.get(path)
+        if schema is not None:
+            return schema
+
+        conn = get_connection(path)
+        for migration in MIGRATIONS if migrate else ():
+            if migration.is_needed(conn):
+                print(f"[INFO] Применяем миграцию {migration.MIGRATION_NAME}")
+                with transaction(path):
+                    migration.apply_schema_changes(conn)
+
+        columns = read_columns(conn)
+
+        schema = Schema(columns)
+        if schema.complete:
+            _schemas[path] = schema
+        return schema
+
+
+def invalidate_schema(db_path: str = None) -> None:
+    """Сбросить кэш схемы (после пересоздания таблиц)"""
+    with _lock:
+        _schemas.pop(os.path.abspath(db_path or DB_PATH), None)
+
+
+def schema_for_connection(conn) -> Schema:
+    """
+    Схема БД, к которой открыто соединение (для функций, получающих только conn)
+
+    Файловая БД берется из кэша get_schema по пути из PRAGMA database_list,
+    для БД в памяти колонки читаются через само соединение.
+    """
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    return get_schema(path) if path else Schema(read_columns(conn))
+
+
+def load_tasks(db_path: str = None, include_archive: bool = False) -> List[Dict]:
+    """
+    Заявки (по умолчанию только горячая таблица)
+
+    Args:
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        include_archive: Добавить заявки из архива (представление tasks_all)
+    """
+    schema = get_schema(db_path)
+    sql = schema.select_tasks_all_sql if include_archive and schema.has_archive else schema.select_tasks_sql
+    rows = get_connection(db_path).execute(sql).fetchall()
+    return [schema.task_from_row(r) for r in rows]
+
+
+def load_unassigned_tasks(db_path: str = None) -> List[Dict]:
+    """Заявки без назначения (поиск по индексу assignments.task_id)"""
+    schema = get_schema(db_path)
+    rows = get_connection(db_path).execute(schema.select_unassigned_tasks_sql).fetchall()
+    return [schema.task_from_row(r) for r in rows]
+
+
+def load_executors(db_path: str = None) -> List[Dict]:
+    schema = get_schema(db_path)
+    rows = get_connection(db_path).execute(schema.select_executors_sql).fetchall()
+    return [schema.executor_from_row(r) for r in rows]
+
+
+def load_assignments(db_path: str = None, include_archive: bool = False) -> List[Dict]:
+    """Назначения (include_archive - вместе с архивом, представление assignments_all)"""
+    schema = get_schema(db_path)
+    sql = (schema.select_assignments_all_sql if include_archive and schema.has_archive
+           else schema.select_assignments_sql)
+    rows = get_connection(db_path).execute(sql).fetchall()
+    return [schema.assignment_from_row(r) for r in rows]
+
+
+def count_by_param(table: str, key: str, db_path: str = None) -> List[Tuple]:
+    """
+    Количество строк по значениям параметра (группировка в SQL)
+
+    Args:
+        table: 'tasks' или 'executors'
+        key: Ключ params (например 'location')
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+
+    Returns:
+        Список (значение, количество) по убыванию количества; строки без параметра не считаются
+    """
+    sql = get_schema(db_path).count_by_param_sql(table, key)
+    return [tuple(r) for r in get_connection(db_path).execute(sql).fetchall()]
+
+
+def load_executors_by_params(filters: Mapping[str, object], db_path: str = None,
+                             active_only: bool = True) -> List[Dict]:
+    """
+    Предварительный отбор кандидатов по параметрам в SQL
+
+    Args:
+        filters: Ключ params -> значение (равенство) или (оператор, значение),
+                 например {'location': 'Москва', 'experience_years': ('>=', 3)}
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        active_only: Только активные исполнители
+
+    Returns:
+        Исполнители, удовлетворяющие всем условиям (отсортированы по имени)
+    """
+    schema = get_schema(db_path)
+    conditions, args = ['active = 1'] if active_only else [], []
+    for key, value in filters.items():
+        op, value = value if isinstance(value, tuple) else ('=', value)
+        if op not in PARAM_OPERATORS:
+            raise ValueError(f"Неизвестный оператор: {op}")
+        conditions.append(f"{schema.param_expr('executors', key)} {op} ?")
+        args.append(value)
+
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+    sql = schema.select_executors_sql.replace(' ORDER BY ', f"{where} ORDER BY ", 1)
+    rows = get_connection(db_path).execute(sql, args).fetchall()
+    return [schema.executor_from_row(r) for r in rows]
+
+
+def save_tasks_bulk(tasks: Sequence[Dict], db_path: str = None, chunk_size: int = None) -> int:
+    """
+    Сохранить (upsert) пачку заявок одной транзакцией
+
+    Args:
+        tasks: Заявки
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        chunk_size: Строк в одном executemany (по умолчанию db.BULK_CHUNK_SIZE)
+
+    Returns:
+        Количество сохраненных заявок
+    """
+    schema = get_schema(db_path)
+    with transaction(db_path) as conn:
+        return executemany_chunked(conn, schema.upsert_task_sql, (schema.task_row(t) for t in tasks), chunk_size)
+
+
+def save_executors_bulk(executors: Sequence[Dict], db_path: str = None, chunk_size: int = None) -> int:
+    """Сохранить (upsert) пачку исполнителей одной транзакцией"""
+    schema = get_schema(db_path)
+    with transaction(db_path) as conn:
+        return executemany_chunked(
+            conn, schema.upsert_executor_sql, (schema.executor_row(e) for e in executors), chunk_size
+        )
+
+
+def save_assignments_bulk(assignments: Sequence[Dict], db_path: str = None, chunk_size: int = None) -> int:
+    """Сохранить (upsert) пачку назначений одной транзакцией"""
+    schema = get_schema(db_path)
+    with transaction(db_path) as conn:
+        return executemany_chunked(
+            conn, schema.upsert_assignment_sql, (schema.assignment_row(a) for a in assignments), chunk_size
+        )
+
+
+def increment_executor_counts_bulk(counts: Mapping[str, int], db_path: str = None, chunk_size: int = None) -> int:
+    """
+    Увеличить счетчики assigned_today пачкой
+
+    Лимиты не проверяются: вызывайте в той же транзакции, в которой
+    счетчики были перечитаны и распределены (см. assign_tasks_bulk в dispatcher.py).
+
+    Args:
+        counts: ID исполнителя -> на сколько увеличить счетчик
+        db_path: Путь к файлу БД (по умолчанию DB_PATH)
+        chunk_size: Строк в одном executemany
+
+    Returns:
+        Количество обновленных исполнителей
+    """
+    schema = get_schema(db_path)
+    with transaction(db_path) as conn:
+        return executemany_chunked(
+            conn, schema.increment_count_sql, ((n, executor_id) for executor_id, n in counts.items() if n),
+            chunk_size
+        )
+
+
+def reset_executor_counts(db_path: str = None) -> None:
+    """Обнулить счетчики assigned_today (со счетчиками в executor_counters - смена эпохи, O(1))"""
+    schema = get_schema(db_path)
+    with transaction(db_path) as conn:
+        conn.execute(schema.reset_counts_sql)
@@ -1,26 +1,13 @@
 import argparse
-import json
 import os
 import random
-import sqlite3
 import sys
-import uuid
-from datetime import datetime
 from pathlib import Path
 import time
 
-
-TASK_PARAMS = {
-    'Приоритет': ['Низкий', 'Средний', 'Высокий', 'Критический'],
-    'Категория': ['IT', 'Строительство', 'Страхование', 'Консалтинг'],
-    'Сложность': ['Простая', 'Средняя', 'Сложная', 'Экспертная'],
-}
-
-EXECUTOR_PARAMS = {
-    'Отдел': ['IT', 'Строительство', 'Страхование', 'Консалтинг'],
-    'Опыт работы': ['До 1 года', '1-3 года', '3-5 лет', '5-10 лет', 'Более 10 лет'],
-    'Навыки': ['Python', 'JavaScript', 'Строительство', 'Проектирование', 'Анализ рисков', 'Продажи'],
-}
+sys.path.insert(0, os.path.dirname(__file__))
+from repository import create_repository
+from task_generator import CATEGORIES, generate_executor, generate_task, generate_task_params
 
 
 def detect_db_path() -> Path:
@@ -33,153 +20,20 @@ def detect_db_path() -> Path:
     return p
 
 
-def get_conn(db_path: Path):
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(str(db_path), check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-
-def init_schema(conn: sqlite3.Connection):
-    cur = conn.cursor()
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS tasks (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            description TEXT,
-            status TEXT DEFAULT 'Новая',
-            created_at TEXT,
-            data TEXT
-        )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS executors (
-            id TEXT PRIMARY KEY,
-            name TEXT NOT NULL,
-            email TEXT NOT NULL,
-            phone TEXT,
-            status TEXT DEFAULT 'Активен',
-            active INTEGER DEFAULT 1,
-            created_at TEXT,
-            data TEXT
-        )
-        """
-    )
-    cur.execute(
-        """
-        CREATE TABLE IF NOT EXISTS assignments (
-            id TEXT PRIMARY KEY,
-            task_id TEXT,
-            executor_id TEXT,
-            assigned_at TEXT,
-            status TEXT DEFAULT 'Назначена',
-            score REAL
-        )
-        """
-    )
-    conn.commit()
-
-
-def insert_task(cur: sqlite3.Cursor, t: dict):
-    data = {k: v for k, v in t.items() if k not in ['id', 'name', 'description', 'status', 'created_at']}
-    cur.execute(
-        """
-        INSERT INTO tasks(id,name,description,status,created_at,data)
-        VALUES(?,?,?,?,?,?)
-        ON CONFLICT(id) DO UPDATE SET
-          name=excluded.name,
-          description=excluded.description,
-          status=excluded.status,
-          created_at=excluded.created_at,
-          data=excluded.data
-        """,
-        (
-            t['id'],
-            t['name'],
-            t.get('description', ''),
-            t.get('status', 'Новая'),
-            t['created_at'],
-            json.dumps(data, ensure_ascii=False),
-        ),
-    )
-
-
-def insert_executor(cur: sqlite3.Cursor, e: dict):
-    data = {
-        k: v
-        for k, v in e.items()
-        if k not in ['id', 'name', 'email', 'phone', 'status', 'active', 'created_at']
-    }
-    cur.execute(
-        """
-        INSERT INTO executors(id,name,email,phone,status,active,created_at,data)
-        VALUES(?,?,?,?,?,?,?,?)
-        ON CONFLICT(id) DO UPDATE SET
-          name=excluded.name,
-          email=excluded.email,
-          phone=excluded.phone,
-          status=excluded.status,
-          active=excluded.active,
-          created_at=excluded.created_at,
-          data=excluded.data
-        """,
-        (
-            e['id'],
-            e['name'],
-            e['email'],
-            e.get('phone', ''),
-            e.get('status', 'Активен'),
-            1 if e.get('active', True) else 0,
-            e['created_at'],
-            json.dumps(data, ensure_ascii=False),
-        ),
-    )
-
-
 def generate_tasks(n: int, categories: list[str]) -> list[dict]:
     tasks = []
     for i in range(n):
-        cat = random.choice(categories) if categories else random.choice(TASK_PARAMS['Категория'])
-        t = {
-            'id': str(uuid.uuid4()),
-            'name': f'Заявка #{i+1}',
-            'description': f'Автогенерация описания для заявки #{i+1}',
-            'status': random.choice(['Новая', 'Назначена', 'В работе', 'Завершена']),
-            'created_at': datetime.now().isoformat(),
-            'Приоритет': random.choice(TASK_PARAMS['Приоритет']),
-            'Категория': cat,
-            'Сложность': random.choice(TASK_PARAMS['Сложность']),
-            'Бюджет': random.choice([50000, 100000, 250000, 500000]),
-            'Срок выполнения': datetime.now().date().isoformat(),
-        }
+        t = generate_task(i + 1)
+        cat = random.choice(categories) if categories else t['category']
+        if cat != t['category']:
+            t['category'] = cat
+            t['params'] = generate_task_params(cat)
         tasks.append(t)
     return tasks
 
 
 def generate_executors(n: int) -> list[dict]:
-    executors = []
-    for i in range(n):
-        dep = random.choice(EXECUTOR_PARAMS['Отдел'])
-        skills = random.sample(EXECUTOR_PARAMS['Навыки'], k=random.randint(1, 3))
-        e = {
-            'id': str(uuid.uuid4()),
-            'name': f'Исполнитель {i+1}',
-            'email': f'user{i+1}@example.com',
-            'phone': f'+7 (900) {random.randint(100,999)}-{random.randint(10,99)}-{random.randint(10,99)}',
-            'status': 'Активен',
-            'active': True,
-            'created_at': datetime.now().isoformat(),
-            'Отдел': dep,
-            'Опыт работы': random.choice(EXECUTOR_PARAMS['Опыт работы']),
-            'Рейтинг': random.randint(1, 5),
-            'Навыки': skills,
-            'Максимум заявок в день': random.choice([5, 10, 15, 20]),
-        }
-        executors.append(e)
-    return executors
+    return [generate_executor(i + 1) for i in range(n)]
 
 
 def _prompt_categories(default_list: list[str]) -> list[str]:
@@ -201,49 +55,52 @@ def main():
     args = parser.parse_args()
 
     db_path = detect_db_path()
-    conn = get_conn(db_path)
-    init_schema(conn)
-    cur = conn.cursor()
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Таблицы, миграции и SQL записи - общие с приложением (repository.py, schema.py).
+    # Пакет строк в одном executemany задает SQLITE_BULK_CHUNK
+    repo = create_repository('sqlite', db_path=str(db_path))
 
     # Определяем категории: из аргумента или интерактивно
     if args.categories:
         categories = [x.strip() for x in args.categories.split(',') if x.strip()]
         if not categories:
-            categories = TASK_PARAMS['Категория']
+            categories = CATEGORIES
     else:
         # Запрос вручную (интерактив)
         try:
-            categories = _prompt_categories(TASK_PARAMS['Категория'])
+            categories = _prompt_categories(CATEGORIES)
         except EOFError:
             # если запускается неинтерактивно (CI/compose run) — используем дефолт
-            categories = TASK_PARAMS['Категория']
+            categories = CATEGORIES
 
     gen_tasks = generate_tasks(args.tasks, categories)
     gen_execs = generate_executors(args.executors)
 
-    # Постепенная вставка с паузой и коммитом
     delay = max(0, args.sleep_ms) / 1000.0
+    if not delay:
+        # Без паузы - пакетная вставка одной транзакцией на таблицу
+        repo.save_tasks(gen_tasks)
+        repo.save_executors(gen_execs)
+        repo.close()
+        print(f'OK: добавлено заявок: {len(gen_tasks)}, исполнителей: {len(gen_execs)} в {db_path}')
+        return
+
+    # Постепенная вставка с паузой: транзакция на строку
     for i, t in enumerate(gen_tasks, 1):
-        insert_task(cur, t)
-        conn.commit()
-        if delay:
-            time.sleep(delay)
+        repo.save_task(t)
+        time.sleep(delay)
         if i % 10 == 0:
             print(f"Добавлено заявок: {i}/{len(gen_tasks)}", flush=True)
 
     for j, e in enumerate(gen_execs, 1):
-        insert_executor(cur, e)
-        conn.commit()
-        if delay:
-            time.sleep(delay)
+        repo.save_executor(e)
+        time.sleep(delay)
         if j % 10 == 0:
             print(f"Добавлено исполнителей: {j}/{len(gen_execs)}", flush=True)
 
-    conn.close()
+    repo.close()
     print(f'OK: добавлено заявок: {len(gen_tasks)}, исполнителей: {len(gen_execs)} в {db_path}')
 
 
 if __name__ == '__main__':
     sys.exit(main())
-
-
@@ -0,0 +1,296 @@
+"""
+Sharded Dispatcher - Параллельное распределение заявок по категориям
+
+Поддерживает:
+- Отдельный процесс-воркер на каждый шард (категорию / отдел)
+- Собственные очередь и состояние загрузки исполнителей в каждом шарде
+- Маршрутизацию заявок по категории
+- Кросс-шардовый fallback, если в домашнем шарде закончились слоты
+- Локальное распределение в процессе маршрутизатора вместо шарда, который
+  упал, не ответил за SHARD_TIMEOUT_S или вернул ошибку
+
+Пропускная способность растет с числом ядер: скоринг Rule Engine в разных
+шардах идет параллельно, а не в одном потоке Python.
+"""
+
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from dispatcher import DEFAULT_RULES_PATH, Dispatcher, load_rule_engine, try_reserve
+from schema import schema_for_connection
+
+SHARDS = ["IT", "Строительство", "Страхование", "Консалтинг"]
+
+# Шард для исполнителей и заявок вне основных категорий
+DEFAULT_SHARD = "Другое"
+
+# Сколько ждать ответа шарда, прежде чем распределять его заявки локально
+SHARD_TIMEOUT_S = float(os.environ.get('INTAKE_SHARD_TIMEOUT_S', 5))
+# Период проверки, что процессы-шарды живы, пока ответ не пришел
+_POLL_S = 0.1
+
+
+def shard_of(category: Optional[str]) -> str:
+    """Определить шард по категории заявки / отделу исполнителя"""
+    return category if category in SHARDS else DEFAULT_SHARD
+
+
+def _free_slots(executors: List[Dict]) -> int:
+    return sum(
+        max(0, e.get('daily_limit', 0) - e.get('assigned_today', 0))
+        for e in executors if e.get('active', True)
+    )
+
+
+def _shard_main(shard: str, rules_path: Optional[str], inbox, outbox) -> None:
+    """
+    Цикл процесса-шарда: владеет исполнителями своего отдела и их счетчиками
+
+    Сообщения во входящей очереди:
+        ('load', request_id, executors) - заменить состояние исполнителей
+        ('assign', request_id, tasks)   - распределить пачку заявок
+        ('stop',)                       - завершить процесс
+
+    Ответ: (shard, request_id, assignments, free_slots, error); при ошибке
+    процесс не завершается, а возвращает ее текст в error.
+    """
+    engine = load_rule_engine(rules_path) if rules_path else None
+    dispatcher = Dispatcher([], engine)
+
+    while True:
+        msg = inbox.get()
+        kind = msg[0]
+
+        if kind == 'stop':
+            break
+
+        request_id = msg[1]
+        try:
+            if kind == 'load':
+                dispatcher.load(msg[2])
+                assignments = None
+            elif kind == 'assign':
+                assignments = dispatcher.assign_batch(msg[2])
+            else:
+                raise ValueError(f"неизвестная команда {kind!r}")
+            outbox.put((shard, request_id, assignments, _free_slots(dispatcher.executors), None))
+        except Exception as e:
+            print(f"[ERROR] Шард {shard}: ошибка команды {kind}: {e}")
+            outbox.put((shard, request_id, None, 0, str(e)))
+
+
+class ShardedDispatcher:
+    """Маршрутизатор заявок между процессами-шардами"""
+
+    def __init__(self, shards: List[str] = None, rules_path: Optional[str] = DEFAULT_RULES_PATH):
+        """
+        Args:
+            shards: Список шардов (по умолчанию SHARDS + DEFAULT_SHARD)
+            rules_path: Путь к правилам Rule Engine (None - простой алгоритм)
+        """
+        self.shards = list(shards or SHARDS + [DEFAULT_SHARD])
+        self.rules_path = rules_path
+        self.free_slots: Dict[str, int] = {shard: 0 for shard in self.shards}
+        self.inboxes = {}
+        self.processes = {}
+        self.outbox = None
+        self.request_seq = 0
+        self.stale = False
+        # Шарды, заявки которых распределяются в этом процессе
+        self.down: Set[str] = set()
+        self.local: Dict[str, Dispatcher] = {}
+        self.shard_executors: Dict[str, List[Dict]] = {shard: [] for shard in self.shards}
+        self._engine = None
+        self._engine_loaded = False
+        self._lock = threading.Lock()
+
+    def start(self) -> 'ShardedDispatcher':
+        """Запустить процессы-шарды"""
+        # spawn: безопасно запускать из процессов с потоками (Streamlit, uvicorn)
+        ctx = mp.get_context('spawn')
+        self.outbox = ctx.Queue()
+        for shard in self.shards:
+            inbox = ctx.Queue()
+            process = ctx.Process(
+                target=_shard_main,
+                args=(shard, self.rules_path, inbox, self.outbox),
+                name=f"shard-{shard}",
+                daemon=True
+            )
+            process.start()
+            self.inboxes[shard] = inbox
+            self.processes[shard] = process
+        print(f"[OK] Запущено шардов: {len(self.shards)}")
+        return self
+
+    def stop(self) -> None:
+        """Остановить процессы-шарды"""
+        for shard, inbox in self.inboxes.items():
+            if shard not in self.down:
+                inbox.put(('stop',))
+        for shard, process in self.processes.items():
+            if shard in self.down and process.is_alive():
+                # Зависший шард: общая очередь ответов больше не используется
+                process.terminate()
+            process.join(timeout=5)
+        self.inboxes.clear()
+        self.processes.clear()
+
+    def load(self, executors: List[Dict]) -> None:
+        """
+        Разложить исполнителей по шардам (по отделу)
+
+        Args:
+            executors: Полный список исполнителей
+        """
+        with self._lock:
+            by_shard = {shard: [] for shard in self.shards}
+            for e in executors:
+                shard = shard_of(e.get('department'))
+                by_shard.get(shard, by_shard[self.shards[-1]]).append(e)
+
+            self.shard_executors = by_shard
+            self.request_seq += 1
+            request_id = self.request_seq
+            sent = []
+            for shard, shard_executors in by_shard.items():
+                if shard in self.down:
+                    self.local[shard].load(shard_executors)
+                    self.free_slots[shard] = _free_slots(shard_executors)
+                else:
+                    self.inboxes[shard].put(('load', request_id, shard_executors))
+                    sent.append(shard)
+            for shard, (_, free) in self._collect(request_id, sent).items():
+                self.free_slots[shard] = free
+            self.stale = False
+
+    def _collect(self, request_id: int, shards: List[str]) -> Dict[str, tuple]:
+        """
+        Ответы шардов на запрос request_id
+
+        Шард, который упал, не ответил за SHARD_TIMEOUT_S или вернул ошибку,
+        переводится на локальное распределение (_mark_down) и в результат
+        не попадает.
+
+        Returns:
+            {шард: (assignments, free_slots)}
+        """
+        waiting = set(shards)
+        replies = {}
+        deadline = time.monotonic() + SHARD_TIMEOUT_S
+        while waiting:
+            try:
+                shard, reply_id, assignments, free, error = self.outbox.get(timeout=_POLL_S)
+            except queue.Empty:
+                expired = time.monotonic() >= deadline
+                for shard in list(waiting):
+                    if expired or not self.processes[shard].is_alive():
+                        waiting.discard(shard)
+                        self._mark_down(shard, "нет ответа" if expired else "процесс завершился")
+                continue
+            if reply_id != request_id or shard not in waiting:
+                continue  # опоздавший ответ на прошлый запрос
+            waiting.discard(shard)
+            if error is not None:
+                self._mark_down(shard, error)
+            else:
+                replies[shard] = (assignments, free)
+        return replies
+
+    def _mark_down(self, shard: str, reason: str) -> None:
+        """Распределять заявки шарда в этом процессе (до перезапуска диспетчера)"""
+        print(f"[WARN] Шард {shard} недоступен ({reason}), заявки распределяются локально")
+        if not self._engine_loaded:
+            self._engine = load_rule_engine(self.rules_path) if self.rules_path else None
+            self._engine_loaded = True
+        self.down.add(shard)
+        self.local[shard] = Dispatcher(self.shard_executors.get(shard, []), self._engine)
+        self.free_slots[shard] = _free_slots(self.local[shard].executors)
+        # Счетчики шарда могли уйти вперед - исполнителей стоит перечитать из БД
+        self.stale = True
+
+    def _route(self, tasks_by_shard: Dict[str, List[int]], tasks: List[Dict], results: List) -> None:
+        """Отправить заявки в шарды и собрать ответы (шарды работают параллельно)"""
+        self.request_seq += 1
+        request_id = self.request_seq
+        sent = []
+        for shard, indexes in tasks_by_shard.items():
+            if indexes and shard not in self.down:
+                self.inboxes[shard].put(('assign', request_id, [tasks[i] for i in indexes]))
+                sent.append(shard)
+
+        for shard, (assignments, free) in self._collect(request_id, sent).items():
+            self.free_slots[shard] = free
+            for i, assignment in zip(tasks_by_shard[shard], assignments):
+                results[i] = assignment
+
+        # Недоступные шарды (в том числе отказавшие в этом запросе) - локально
+        for shard, indexes in tasks_by_shard.items():
+            if indexes and shard in self.down:
+                local = self.local[shard]
+                for i, assignment in zip(indexes, local.assign_batch([tasks[i] for i in indexes])):
+                    results[i] = assignment
+                self.free_slots[shard] = _free_slots(local.executors)
+
+    def assign_batch(self, tasks: List[Dict], conn=None, schema=None) -> List[Optional[Dict]]:
+        """
+        Распределить пачку заявок по шардам
+
+        Args:
+            tasks: Список заявок
+            conn: Соединение SQLite - если передано, решения шардов
+                  подтверждаются атомарным резервированием (try_reserve).
+                  Неподтвержденные назначения возвращаются как None, а
+                  состояние шардов помечается устаревшим (self.stale).
+            schema: Схема БД (get_schema); если не передана - определяется
+                    по соединению
+
+        Returns:
+            Список назначений в порядке заявок (None для нераспределенных)
+        """
+        with self._lock:
+            results: List[Optional[Dict]] = [None] * len(tasks)
+
+            # 1. Домашний шард по категории заявки
+            tasks_by_shard = {shard: [] for shard in self.shards}
+            for i, task in enumerate(tasks):
+                shard = shard_of(task.get('category'))
+                tasks_by_shard.get(shard, tasks_by_shard[self.shards[-1]]).append(i)
+            self._route(tasks_by_shard, tasks, results)
+
+            # 2. Кросс-шардовый fallback: остаток - в шарды со свободными слотами
+            pending = [i for i, a in enumerate(results) if a is None]
+            while pending:
+                donors = sorted(
+                    (shard for shard in self.shards if self.free_slots[shard] > 0),
+                    key=lambda s: self.free_slots[s], reverse=True
+                )
+                if not donors:
+                    break
+
+                tasks_by_shard = {shard: [] for shard in self.shards}
+                rest = pending
+                for shard in donors:
+                    take = min(self.free_slots[shard], len(rest))
+                    tasks_by_shard[shard], rest = rest[:take], rest[take:]
+                    if not rest:
+                        break
+                self._route(tasks_by_shard, tasks, results)
+
+                still_pending = [i for i, a in enumerate(results) if a is None]
+                if len(still_pending) == len(pending):
+                    break  # раунд ничего не распределил
+                pending = still_pending
+
+        if conn is not None:
+            schema = schema or schema_for_connection(conn)
+            for i, assignment in enumerate(results):
+                if assignment and not try_reserve(conn, assignment, schema):
+                    results[i] = None
+                    self.stale = True
+
+        return results
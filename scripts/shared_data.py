@@ -0,0 +1,126 @@
+"""
+Shared Data - Общие для всех сессий данные дашборда
+
+Раньше каждая сессия браузера держала свои копии заявок, исполнителей и
+назначений и обновляла их сама: десять открытых дашбордов - десять
+чтений БД и десять копий в памяти. SharedData хранит одну копию на
+процесс (в Streamlit - через st.cache_resource), причем только
+исполнителей: KPI, разбивки и экспорт считаются SQL-запросами к снимку
+(dashboard_queries.py, excel_export.py), история заявок и назначений в
+память не загружается:
+- DataView - неизменяемое представление данных одной версии
+- Версия - номер поколения снимка БД (snapshot.py), он растет, только
+  когда кто-то записал в БД
+- Новое представление строится инкрементально (DeltaSync по снимку)
+  и только при смене версии; сессии получают один и тот же объект
+- Метрики справедливости (fairness.py) обновляются только по
+  исполнителям из новых назначений (DeltaSync.changed_executors, счетчики
+  читаются из снимка точечно) и читаются из DataView.metrics готовыми
+- Скорость поступления заявок и назначений (time_series.py) - в
+  SharedData.series: время новых строк дописывается в кольцевые буферы,
+  после удалений или перезагрузки буферы восстанавливаются запросом к снимку
+
+Коллекции DataView общие для всех сессий: не изменяйте их и их записи
+на месте (копируйте запись перед правкой).
+"""
+
+import threading
+import time
+from typing import Dict, List, Optional
+
+from delta_sync import DeltaSync
+from fairness import FairnessMetrics
+from snapshot import SnapshotService, get_snapshot
+from time_series import SERIES, TimeSeriesStore
+
+
+class DataView:
+    """Исполнители и метрики одной версии данных (только чтение)"""
+
+    __slots__ = ('version', 'executors', 'metrics', 'built_at')
+
+    def __init__(self, version: int, executors: List[Dict], metrics: Dict):
+        self.version = version
+        self.executors = executors
+        # Метрики справедливости активных исполнителей (FairnessMetrics.summary)
+        self.metrics = metrics
+        self.built_at = time.time()
+
+
+class SharedData:
+    """Одна на процесс копия данных дашборда, перестраиваемая при смене версии"""
+
+    def __init__(self, db_path: str = None, snapshot: Optional[SnapshotService] = None):
+        """
+        Args:
+            db_path: Путь к файлу БД (по умолчанию db.DB_PATH)
+            snapshot: Снимок БД (по умолчанию общий снимок процесса get_snapshot)
+        """
+        self.snapshot = snapshot or get_snapshot(db_path)
+        self.builds = 0
+        self._sync = DeltaSync(db_path, snapshot=self.snapshot)
+        self._fairness = FairnessMetrics()
+        # Ряды событий для графиков: общие, пополняются при каждом построении
+        self.series = TimeSeriesStore()
+        self._view: Optional[DataView] = None
+        self._lock = threading.Lock()
+
+    def current(self) -> DataView:
+        """
+        Представление последнего опубликованного поколения снимка
+
+        Снимок здесь не обновляется: его копирует фоновый поток
+        (snapshot.request_refresh - раньше периода, после своих записей).
+        """
+        view = self._view
+        generation = self.snapshot.generation
+        if view is not None and generation is not None and view.version == generation.number:
+            return view
+
+        with self._lock:
+            # Другая сессия могла перестроить представление, пока мы ждали
+            if self._sync.sync() or self._view is None:
+                self._build()
+            return self._view
+
+    def reload(self) -> DataView:
+        """Перечитать снимок целиком (после правки уже существующих строк)"""
+        self.snapshot.refresh()
+        with self._lock:
+            self._sync.reload()
+            self._build()
+            return self._view
+
+    def _build(self) -> None:
+        sync = self._sync
+        self._update_fairness()
+        self._update_series()
+        self._view = DataView(sync.generation, sync.executors, self._fairness.summary())
+        self.builds += 1
+
+    def _update_fairness(self) -> None:
+        sync = self._sync
+        if sync.changed_executors is None:
+            # Первая загрузка, перезагрузка или правка исполнителей - полный проход
+            self._fairness.apply(sync.executors)
+            return
+        # Только исполнители из новых назначений: счетчики точечно из снимка
+        conn, generation = self.snapshot.reader()
+        sql = generation.schema.select_counter_sql
+        for executor_id in sync.changed_executors:
+            row = conn.execute(sql, (executor_id,)).fetchone()
+            if row is None:
+                self._fairness.remove(executor_id)
+            else:
+                self._fairness.update(executor_id, row[1], row[2] or 0, bool(row[3]))
+
+    def _update_series(self) -> None:
+        sync = self._sync
+        if any(sync.appended.get(name) is None for name in SERIES):
+            # Первая загрузка, удаления или перезагрузка: GROUP BY по снимку до водяных знаков синхронизации
+            conn, generation = self.snapshot.reader()
+            max_rowids = {name: sync.watermarks[name][0] for name in SERIES if name in sync.watermarks}
+            self.series.rebuild(conn, generation.schema, max_rowids)
+            return
+        self.series.record_iso('tasks', (row[0] for row in sync.appended['tasks']))
+        self.series.record_iso('assignments', (row[0] for row in sync.appended['assignments']))
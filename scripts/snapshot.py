@@ -0,0 +1,395 @@
+"""
+Snapshot - Снимок БД для читателей (дашборд, экспорт, страница исполнителей)
+
+Читатели аналитики не должны работать с живой БД, в которую пишет
+распределитель: долгие чтения задерживают checkpoint WAL, а отчет из
+нескольких запросов видит разные состояния. SnapshotService копирует БД
+в разделяемую БД в памяти (file:...?mode=memory&cache=shared):
+- Копия снимается, только если БД изменилась (PRAGMA data_version)
+- Каждый снимок - новое поколение: читатели текущего поколения не мешают
+  построению следующего, переключение - замена ссылки
+- Все запросы к одному поколению видят одно состояние БД
+- Фоновый поток обновляет снимок раз в SNAPSHOT_INTERVAL_S; читатель после
+  собственных изменений просит обновить его раньше (request_refresh)
+
+В каждое поколение копируются только горячие таблицы (INSERT ... SELECT
+из присоединенного файла, с исходными rowid). Архив
+(tasks_archive/assignments_archive) растет со всей историей, поэтому
+копируется в отдельную БД в памяти только когда изменился (последняя
+строка архивных таблиц), и присоединяется к соединениям читателей как schema archive. Представления
+tasks_all/assignments_all создаются у читателей временными (TEMP VIEW):
+представление основной БД не видит присоединенных таблиц.
+
+Копия поколения и проверка архива - одна read-транзакция, в режиме WAL
+она не блокирует запись.
+
+Настройка через переменные окружения:
+    SQLITE_SNAPSHOT_INTERVAL_S - период фонового обновления (сек), 0 - только по запросу
+"""
+
+import itertools
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from db import DB_PATH, connect
+from schema import ARCHIVE_TABLES, Schema, read_columns
+
+SNAPSHOT_INTERVAL_S = float(os.environ.get('SQLITE_SNAPSHOT_INTERVAL_S', 2))
+
+SELECT_OBJECTS_SQL = "SELECT type, name, tbl_name, sql FROM src.sqlite_master WHERE sql IS NOT NULL"
+
+_services: Dict[str, 'SnapshotService'] = {}
+_services_lock = threading.Lock()
+_service_ids = itertools.count(1)
+
+
+class ArchiveCopy:
+    """Копия архивных таблиц, общая для поколений, пока архив не изменился"""
+
+    def __init__(self, uri: str, anchor: sqlite3.Connection, fingerprint: Tuple):
+        self.uri = uri
+        self.anchor = anchor
+        # Последняя строка (rowid, id) каждой архивной таблицы
+        self.fingerprint = fingerprint
+
+
+class Generation:
+    """Одно поколение снимка: разделяемая БД в памяти и ее схема"""
+
+    def __init__(self, number: int, uri: str, anchor: sqlite3.Connection, schema: Schema, seconds: float,
+                 archive: Optional[ArchiveCopy] = None, views: Tuple[str, ...] = (), archive_copied: bool = False):
+        self.number = number
+        self.uri = uri
+        # Разделяемая БД в памяти живет, пока открыто хотя бы одно соединение
+        self.anchor = anchor
+        self.schema = schema
+        self.created_at = time.time()
+        self.seconds = seconds
+        self.archive = archive
+        # CREATE TEMP VIEW для соединений читателей (tasks_all, assignments_all)
+        self.views = views
+        # Архив скопирован этим поколением (иначе взят у предыдущего)
+        self.archive_copied = archive_copied
+
+
+def _temp_view_sql(sql: str) -> str:
+    return re.sub(r'^\s*CREATE\s+VIEW', 'CREATE TEMP VIEW', sql, count=1, flags=re.IGNORECASE)
+
+
+def _copy_columns(conn, table: str, sql: str) -> str:
+    """
+    Колонки таблицы src без генерируемых (их значения вычисляет копия)
+
+    rowid копируется явно: delta_sync и TimeSeriesStore читают новые строки
+    по rowid, перенумерация в каждом поколении теряла бы строки после удалений.
+    """
+    columns = [f'"{row[1]}"' for row in conn.execute(f"PRAGMA src.table_xinfo({table})") if row[6] == 0]
+    if not re.search(r'WITHOUT\s+ROWID', sql, flags=re.IGNORECASE):
+        columns.insert(0, 'rowid')
+    return ','.join(columns)
+
+
+def _archive_fingerprint(conn, tables: List[str]) -> Tuple:
+    """
+    Отпечаток архива: последняя строка каждой архивной таблицы
+
+    Архив только пополняется (archive_db.py, INSERT OR REPLACE дает новый
+    rowid) или очищается целиком, поэтому изменение видно по последней
+    строке - за O(log n), без подсчета всей истории.
+    """
+    return tuple(
+        tuple(row) if row else None
+        for row in (conn.execute(f"SELECT rowid, id FROM src.{table} ORDER BY rowid DESC LIMIT 1").fetchone()
+                    for table in tables)
+    )
+
+
+class SnapshotService:
+    """Периодически обновляемый снимок файла БД в памяти"""
+
+    def __init__(self, db_path: str = None, interval_s: float = None):
+        """
+        Args:
+            db_path: Путь к файлу БД (по умолчанию db.DB_PATH)
+            interval_s: Период фонового обновления (по умолчанию SQLITE_SNAPSHOT_INTERVAL_S)
+        """
+        self.db_path = os.path.abspath(db_path or DB_PATH)
+        self.interval_s = SNAPSHOT_INTERVAL_S if interval_s is None else interval_s
+        self.refreshes = 0
+        self._id = next(_service_ids)
+        self._numbers = itertools.count(1)
+        self._source: Optional[sqlite3.Connection] = None
+        self._current: Optional[Generation] = None
+        self._data_version: Optional[int] = None
+        self._refresh_lock = threading.Lock()
+        # Публикация поколения и подключение читателя: поколение не закрывается
+        # между выбором текущего и открытием соединения с ним
+        self._publish_lock = threading.Lock()
+        self._local = threading.local()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # === Обновление ===
+
+    def start(self) -> 'SnapshotService':
+        """Снять первый снимок и запустить фоновое обновление"""
+        self.refresh()
+        if self.interval_s > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='sqlite-snapshot', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Остановить фоновое обновление и освободить снимок"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._refresh_lock, self._publish_lock:
+            if self._current is not None:
+                if self._current.archive is not None:
+                    self._current.archive.anchor.close()
+                self._current.anchor.close()
+                self._current = None
+            if self._source is not None:
+                self._source.close()
+                self._source = None
+
+    def _run(self) -> None:
+        while True:
+            self._wake.wait(self.interval_s)
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"[WARN] Снимок БД не обновлен: {e}")
+
+    def request_refresh(self) -> None:
+        """
+        Попросить обновить снимок, не дожидаясь периода (после своих записей)
+
+        С фоновым потоком не ждет копирования: новое поколение появится
+        через время копии. Без потока (interval_s=0) снимок обновляется сразу.
+        """
+        if self._thread is not None:
+            self._wake.set()
+        else:
+            self.refresh()
+
+    def refresh(self, force: bool = False) -> bool:
+        """
+        Снять новый снимок, если БД изменилась
+
+        Args:
+            force: Снять снимок без проверки изменений
+
+        Returns:
+            True если опубликовано новое поколение
+        """
+        with self._refresh_lock:
+            if self._source is None:
+                self._source = connect(self.db_path)
+            # data_version меняется при коммитах других соединений; снимается
+            # до копирования - коммит во время копии даст лишнее обновление, но не потеряется
+            data_version = self._source.execute("PRAGMA data_version").fetchone()[0]
+            if not force and self._current is not None and data_version == self._data_version:
+                return False
+
+            start = time.perf_counter()
+            number = next(self._numbers)
+            uri = self._uri('snapshot', number)
+            anchor = sqlite3.connect(uri, uri=True, check_same_thread=False, isolation_level=None)
+            archive = previous_archive = self._current.archive if self._current is not None else None
+            try:
+                archive, views = self._copy(anchor, number, archive)
+                if archive is not None:
+                    anchor.execute("ATTACH DATABASE ? AS archive", (archive.uri,))
+                schema = Schema(read_columns(anchor))
+                if archive is not None:
+                    anchor.execute("DETACH DATABASE archive")
+            except BaseException:
+                if archive is not None and archive is not previous_archive:
+                    archive.anchor.close()
+                anchor.close()
+                raise
+
+            generation = Generation(number, uri, anchor, schema, time.perf_counter() - start,
+                                    archive, views, archive is not None and archive is not previous_archive)
+            with self._publish_lock:
+                previous, self._current = self._current, generation
+                if previous is not None:
+                    # Читатели прошлого поколения держат свои соединения до следующего обращения
+                    previous.anchor.close()
+                    if previous.archive is not None and previous.archive is not archive:
+                        previous.archive.anchor.close()
+            self._data_version = data_version
+            self.refreshes += 1
+        return True
+
+    def _uri(self, kind: str, number: int) -> str:
+        return f"file:ais_{kind}_{os.getpid()}_{self._id}_{number}?mode=memory&cache=shared"
+
+    def _copy(self, anchor: sqlite3.Connection, number: int,
+              archive: Optional[ArchiveCopy]) -> Tuple[Optional[ArchiveCopy], Tuple[str, ...]]:
+        """
+        Скопировать горячие таблицы в anchor, архив - если он изменился
+
+        Args:
+            anchor: Соединение с новой БД поколения (isolation_level=None)
+            number: Номер поколения
+            archive: Копия архива предыдущего поколения
+
+        Returns:
+            (копия архива для поколения или None, SQL временных представлений)
+        """
+        anchor.execute("ATTACH DATABASE ? AS src", (self.db_path,))
+        new_archive, attached = None, False
+        try:
+            objects = [o for o in anchor.execute(SELECT_OBJECTS_SQL).fetchall() if not o[1].startswith('sqlite_')]
+            tables = [name for kind, name, _, _ in objects if kind == 'table' and name not in ARCHIVE_TABLES]
+            archive_tables = [name for kind, name, _, _ in objects if kind == 'table' and name in ARCHIVE_TABLES]
+            table_sql = {name: sql for kind, name, _, sql in objects if kind == 'table'}
+            for table in tables:
+                anchor.execute(table_sql[table])
+
+            anchor.execute("BEGIN")
+            fingerprint = _archive_fingerprint(anchor, archive_tables)
+            if not archive_tables:
+                archive = None
+            elif archive is None or archive.fingerprint != fingerprint:
+                # ATTACH невозможен внутри транзакции: создаем пустую копию архива,
+                # отпечаток перечитывается в одной транзакции с копированием
+                anchor.execute("ROLLBACK")
+                uri = self._uri('archive', number)
+                archive = new_archive = ArchiveCopy(uri, sqlite3.connect(uri, uri=True, check_same_thread=False), ())
+                for kind, name, _, sql in objects:
+                    if kind == 'table' and name in archive_tables:
+                        new_archive.anchor.execute(sql)
+                new_archive.anchor.commit()
+                anchor.execute("ATTACH DATABASE ? AS archive", (uri,))
+                attached = True
+                anchor.execute("BEGIN")
+                new_archive.fingerprint = _archive_fingerprint(anchor, archive_tables)
+
+            for table in tables:
+                columns = _copy_columns(anchor, table, table_sql[table])
+                anchor.execute(f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM src.{table}")
+            if new_archive is not None:
+                for table in archive_tables:
+                    columns = _copy_columns(anchor, table, table_sql[table])
+                    anchor.execute(f"INSERT INTO archive.{table} ({columns}) SELECT {columns} FROM src.{table}")
+            anchor.execute("COMMIT")
+
+            # Индексы - после заполнения таблиц
+            for kind, name, table, sql in objects:
+                if kind == 'index' and table in tables:
+                    anchor.execute(sql)
+                elif kind == 'index' and new_archive is not None and table in archive_tables:
+                    new_archive.anchor.execute(sql)
+            if new_archive is not None:
+                new_archive.anchor.commit()
+        except BaseException:
+            if new_archive is not None:
+                new_archive.anchor.close()
+            raise
+        finally:
+            if anchor.in_transaction:
+                anchor.execute("ROLLBACK")
+            if attached:
+                anchor.execute("DETACH DATABASE archive")
+            anchor.execute("DETACH DATABASE src")
+
+        views = tuple(_temp_view_sql(sql) for kind, _, _, sql in objects if kind == 'view')
+        return archive, views
+    # === Чтение ===
+
+    @property
+    def generation(self) -> Optional[Generation]:
+        """Текущее поколение снимка (None до первого refresh)"""
+        return self._current
+
+    def reader(self) -> Tuple[sqlite3.Connection, Generation]:
+        """
+        Соединение текущего потока с текущим поколением снимка
+
+        Returns:
+            (соединение только для чтения, поколение), схема - generation.schema
+        """
+        if self._current is None:
+            self.refresh()
+
+        conn = getattr(self._local, 'conn', None)
+        with self._publish_lock:
+            current = self._current
+            if current is None:
+                raise RuntimeError("Снимок БД остановлен")
+            if conn is not None and self._local.number == current.number:
+                return conn, current
+            new_conn = sqlite3.connect(current.uri, uri=True)
+            if current.archive is not None:
+                new_conn.execute("ATTACH DATABASE ? AS archive", (current.archive.uri,))
+
+        if conn is not None:
+            conn.close()
+        new_conn.row_factory = sqlite3.Row
+        for sql in current.views:
+            new_conn.execute(sql)
+        new_conn.execute("PRAGMA query_only = ON")
+        self._local.conn, self._local.number = new_conn, current.number
+        return new_conn, current
+
+    def connection(self) -> sqlite3.Connection:
+        """Соединение текущего потока со снимком (только чтение)"""
+        return self.reader()[0]
+
+    def load_tasks(self, include_archive: bool = False) -> List[Dict]:
+        """Заявки из снимка (см. schema.load_tasks)"""
+        conn, current = self.reader()
+        schema = current.schema
+        sql = schema.select_tasks_all_sql if include_archive and schema.has_archive else schema.select_tasks_sql
+        return [schema.task_from_row(r) for r in conn.execute(sql).fetchall()]
+
+    def load_executors(self) -> List[Dict]:
+        """Исполнители из снимка"""
+        conn, current = self.reader()
+        return [current.schema.executor_from_row(r) for r in conn.execute(current.schema.select_executors_sql)]
+
+    def load_assignments(self, include_archive: bool = False) -> List[Dict]:
+        """Назначения из снимка (include_archive - вместе с архивом)"""
+        conn, current = self.reader()
+        schema = current.schema
+        sql = (schema.select_assignments_all_sql if include_archive and schema.has_archive
+               else schema.select_assignments_sql)
+        return [schema.assignment_from_row(r) for r in conn.execute(sql).fetchall()]
+
+    def count_by_param(self, table: str, key: str) -> List[Tuple]:
+        """Количество строк по значениям параметра (см. schema.count_by_param)"""
+        conn, current = self.reader()
+        return [tuple(r) for r in conn.execute(current.schema.count_by_param_sql(table, key)).fetchall()]
+
+
+def get_snapshot(db_path: str = None) -> SnapshotService:
+    """Общий для процесса снимок файла БД (запускается при первом обращении)"""
+    path = os.path.abspath(db_path or DB_PATH)
+    with _services_lock:
+        service = _services.get(path)
+        if service is None:
+            service = _services[path] = SnapshotService(path).start()
+        return service
+
+
+def stop_snapshots() -> None:
+    """Остановить все снимки процесса (перед удалением файла БД)"""
+    with _services_lock:
+        services = list(_services.values())
+        _services.clear()
+    for service in services:
+        service.stop()
@@ -0,0 +1,122 @@
+"""
+Генератор тестовых заявок и исполнителей для нагрузочного тестирования
+"""
+
+import random
+import uuid
+from datetime import datetime
+from typing import Dict, List
+
+CATEGORIES = ["IT", "Строительство", "Страхование", "Консалтинг"]
+PRIORITIES = ["Низкий", "Средний", "Высокий", "Критический"]
+
+
+def generate_task_params(category: str, rng=random) -> Dict:
+    """Сгенерировать параметры заявки в зависимости от категории"""
+    if category == "IT":
+        all_skills = ["Python", "JavaScript", "React", "FastAPI", "Docker", "PostgreSQL", "AWS"]
+        return {
+            'required_skills': rng.sample(all_skills, rng.randint(1, 3)),
+            'min_experience_years': rng.choice([1, 2, 3, 5, 7]),
+            'complexity': rng.randint(1, 10),
+            'remote_work': rng.choice([True, False]),
+            'max_hourly_rate': rng.choice([3000, 4000, 5000, 6000])
+        }
+
+    if category == "Строительство":
+        return {
+            'location': rng.choice(["Москва", "Санкт-Петербург", "Казань", "Екатеринбург"]),
+            'equipment_needed': rng.sample(["Кран", "Экскаватор", "Бетономешалка"], rng.randint(1, 2)),
+            'square_meters': rng.choice([500, 1000, 1500, 2000, 3000]),
+            'floor_count': rng.randint(1, 10)
+        }
+
+    if category == "Страхование":
+        return {
+            'insurance_types': rng.sample(["ОСАГО", "КАСКО", "Жизнь", "Имущество"], rng.randint(1, 2)),
+            'vehicle_year': rng.choice([2018, 2019, 2020, 2021, 2022, 2023]),
+            'driver_age': rng.randint(25, 65),
+            'accident_history': rng.choice([True, False])
+        }
+
+    if category == "Консалтинг":
+        return {
+            'required_certifications': rng.sample(["PMP", "Agile", "PRINCE2", "Scrum Master"], rng.randint(1, 2)),
+            'project_duration_months': rng.choice([1, 3, 6, 12, 24]),
+            'team_size': rng.randint(5, 50),
+            'industry': rng.choice(["Финансы", "Производство", "Ритейл", "IT"])
+        }
+
+    return {}
+
+
+def generate_task(number: int, rng=random) -> Dict:
+    """Сгенерировать случайную заявку с параметрами"""
+    category = rng.choice(CATEGORIES)
+    return {
+        'id': str(uuid.uuid4()),
+        'name': f"Заявка #{number}",
+        'category': category,
+        'priority': rng.choice(PRIORITIES),
+        'params': generate_task_params(category, rng),
+        'created_at': datetime.now().isoformat()
+    }
+
+
+def generate_executor_params(department: str, rng=random) -> Dict:
+    """Сгенерировать параметры исполнителя в зависимости от отдела"""
+    if department == "IT":
+        return {
+            'skills': rng.sample(["Python", "JavaScript", "React", "FastAPI", "Docker", "PostgreSQL", "AWS"], rng.randint(2, 5)),
+            'experience_years': rng.randint(1, 12),
+            'max_complexity': rng.randint(3, 10),
+            'remote_available': rng.choice([True, False]),
+            'hourly_rate': rng.choice([2500, 3500, 4500, 5500])
+        }
+
+    if department == "Строительство":
+        return {
+            'location': rng.choice(["Москва", "Санкт-Петербург", "Казань", "Екатеринбург"]),
+            'equipment_available': rng.sample(["Кран", "Экскаватор", "Бетономешалка"], rng.randint(1, 3)),
+            'experience_years': rng.randint(1, 20)
+        }
+
+    if department == "Страхование":
+        return {
+            'insurance_types': rng.sample(["ОСАГО", "КАСКО", "Жизнь", "Имущество"], rng.randint(1, 3)),
+            'experience_years': rng.randint(1, 10)
+        }
+
+    if department == "Консалтинг":
+        return {
+            'certifications': rng.sample(["PMP", "Agile", "PRINCE2", "Scrum Master"], rng.randint(1, 3)),
+            'experience_years': rng.randint(1, 15)
+        }
+
+    return {}
+
+
+def generate_executor(number: int, rng=random) -> Dict:
+    """Сгенерировать случайного исполнителя с параметрами"""
+    department = rng.choice(CATEGORIES)
+    return {
+        'id': str(uuid.uuid4()),
+        'name': f"Исполнитель {number}",
+        'email': f"user{number}@example.com",
+        'department': department,
+        'skills': [],
+        'active': True,
+        'daily_limit': rng.choice([5, 10, 15, 20]),
+        'assigned_today': 0,
+        'rating': round(rng.uniform(3.0, 5.0), 1),
+        'params': generate_executor_params(department, rng),
+        'created_at': datetime.now().isoformat()
+    }
+
+
+def generate_tasks(n: int, rng=random) -> List[Dict]:
+    return [generate_task(i + 1, rng) for i in range(n)]
+
+
+def generate_executors(n: int, rng=random) -> List[Dict]:
+    return [generate_executor(i + 1, rng) for i in range(n)]
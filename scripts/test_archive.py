@@ -0,0 +1,105 @@
+"""
+Тесты архивации старых данных (archive_db.py)
+"""
+
+import os
+import sys
+import tempfile
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from archive_db import archive, archive_cutoff, count_archivable
+
+CUTOFF = '2025-01-02T00:00:00'
+
+
+def make_db():
+    """Вчерашние распределенные и нераспределенные заявки, сегодняшние распределенные"""
+    path = os.path.join(tempfile.mkdtemp(), 'archive.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+
+    old = [{'id': f'old{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+            'created_at': f'2025-01-01T10:00:{i:02d}', 'params': {'complexity': i}} for i in range(7)]
+    new = [{'id': f'new{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+            'created_at': f'2025-01-02T10:00:{i:02d}'} for i in range(3)]
+    schema.save_tasks_bulk(old + new, path)
+    # old5, old6 остаются нераспределенными; orphan - назначение удаленной заявки
+    assignments = [{'id': f'a_{t["id"]}', 'task_id': t['id'], 'executor_id': 'e1',
+                    'assigned_at': t['created_at'], 'score': 0.5} for t in old[:5] + new]
+    assignments.append({'id': 'orphan', 'task_id': 'gone', 'executor_id': 'e1',
+                        'assigned_at': '2025-01-01T09:00:00', 'score': 0.1})
+    schema.save_assignments_bulk(assignments, path)
+    return path
+
+
+def test_archive_moves_finished_history():
+    """В архив уходят распределенные вчерашние заявки с назначениями, отчеты видят все"""
+    print("=" * 60)
+    print("TEST 1: Archive History")
+    print("=" * 60)
+
+    path = make_db()
+    assert count_archivable(CUTOFF, path) == {'tasks': 5, 'assignments': 6}
+
+    stats = archive(path, chunk_size=2, cutoff=CUTOFF)
+    print(f"[RESULT] {stats}")
+    assert stats['tasks'] == 5 and stats['assignments'] == 6
+    assert stats['chunks'] == 4
+
+    hot_ids = {t['id'] for t in schema.load_tasks(path)}
+    assert hot_ids == {'old5', 'old6', 'new0', 'new1', 'new2'}
+    assert {a['task_id'] for a in schema.load_assignments(path)} == {'new0', 'new1', 'new2'}
+
+    all_tasks = schema.load_tasks(path, include_archive=True)
+    assert len(all_tasks) == 10
+    assert next(t for t in all_tasks if t['id'] == 'old3')['params'] == {'complexity': 3}
+    assert len(schema.load_assignments(path, include_archive=True)) == 9
+
+    # Повторный запуск ничего не переносит
+    assert archive(path, cutoff=CUTOFF)['chunks'] == 0
+    db.close_connection(path)
+
+
+def test_cutoff():
+    """Горизонт - начало дня keep_days дней назад"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Cutoff")
+    print("=" * 60)
+
+    from datetime import datetime
+    now = datetime(2025, 1, 10, 15, 30)
+    assert archive_cutoff(0, now) == '2025-01-10T00:00:00'
+    assert archive_cutoff(7, now) == '2025-01-03T00:00:00'
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Archive History", test_archive_moves_finished_history),
+        ("Cutoff", test_cutoff),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
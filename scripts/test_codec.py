@@ -0,0 +1,123 @@
+"""
+Тесты кодека JSON-колонок (codec.py)
+"""
+
+import copy
+import json
+import os
+import pickle
+import sys
+import tempfile
+import threading
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import codec
+import db
+import schema
+from codec import LazyJSON
+
+
+def test_lazy_json():
+    """LazyJSON разбирает текст только при обращении и ведет себя как dict"""
+    print("=" * 60)
+    print("TEST 1: Lazy JSON")
+    print("=" * 60)
+
+    raw = '{"location": "Москва", "skills": ["Python"]}'
+    params = LazyJSON(raw)
+    assert isinstance(params, dict) and params and not params.decoded
+    # Неизмененные params записываются исходным текстом
+    assert codec.dumps(params) == raw and not params.decoded
+
+    assert params.get('location') == 'Москва' and params.decoded
+    assert params == {'location': 'Москва', 'skills': ['Python']}
+    assert dict(LazyJSON(raw)) == params and {**LazyJSON(raw)} == params
+    assert json.loads(json.dumps(LazyJSON(raw), ensure_ascii=False)) == params
+    assert type(copy.deepcopy(LazyJSON(raw))) is dict
+    assert pickle.loads(pickle.dumps(LazyJSON(raw))) == params
+
+    params['experience_years'] = 5
+    assert json.loads(codec.dumps(params))['experience_years'] == 5
+    assert LazyJSON('не json') == {}
+    assert codec.lazy_loads('{}') == {} and type(codec.lazy_loads('{}')) is dict
+
+    # Первое обращение из нескольких потоков сразу: никто не видит пустой
+    # словарь или служебную метку
+    big = json.dumps({f'k{i}': i for i in range(2000)})
+    for _ in range(20):
+        shared = LazyJSON(big)
+        barrier = threading.Barrier(8)
+        seen = []
+
+        def read():
+            barrier.wait()
+            seen.append(len(list(shared.items())))
+
+        threads = [threading.Thread(target=read) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert seen == [2000] * 8
+
+
+def test_rows_decode_lazily():
+    """Загрузка заявок не разбирает params, пока их не читают"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Lazy Rows")
+    print("=" * 60)
+
+    path = os.path.join(tempfile.mkdtemp(), 'codec.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+        # Строка в старом текстовом формате, записанная стандартным json
+        conn.execute("INSERT INTO tasks VALUES ('old', 'Старая', 'IT', 'Низкий', '2025-01-01T00:00:00', ?, ?)",
+                     (json.dumps({'source': 'api'}), json.dumps({'complexity': 3})))
+
+    tasks = [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+              'created_at': f'2025-01-02T10:00:{i:02d}', 'params': {'complexity': i}} for i in range(50)]
+    schema.save_tasks_bulk(tasks, path)
+
+    loaded = schema.load_tasks(path)
+    lazy = [t['params'] for t in loaded]
+    print(f"[RESULT] Заявок: {len(loaded)}, разобрано params: {sum(p.decoded for p in lazy)}")
+    assert all(isinstance(p, LazyJSON) and not p.decoded for p in lazy)
+
+    old = next(t for t in loaded if t['id'] == 'old')
+    assert old['source'] == 'api' and old['params']['complexity'] == 3
+
+    # Повторное сохранение без чтения params сохраняет их как есть
+    schema.save_tasks_bulk(loaded, path)
+    assert {t['id']: t['params'] for t in schema.load_tasks(path)}['t7'] == {'complexity': 7}
+    db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Lazy JSON", test_lazy_json),
+        ("Lazy Rows", test_rows_decode_lazily),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
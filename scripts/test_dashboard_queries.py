@@ -0,0 +1,164 @@
+"""
+Тесты агрегатов дашборда в SQL (dashboard_queries.py)
+"""
+
+import os
+import sys
+import tempfile
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from dashboard_queries import DashboardQueries, PANDAS_AVAILABLE, kpis_sql
+from snapshot import SnapshotService
+
+
+def make_db():
+    path = os.path.join(tempfile.mkdtemp(), 'queries.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+    executors = [
+        {'id': 'e1', 'name': 'Анна', 'email': 'a@x.ru', 'department': 'IT', 'daily_limit': 10},
+        {'id': 'e2', 'name': 'Борис', 'email': 'b@x.ru', 'department': 'IT', 'daily_limit': 5},
+        {'id': 'e3', 'name': 'Вера', 'email': 'v@x.ru', 'department': 'Страхование', 'daily_limit': 0},
+        {'id': 'e4', 'name': 'Глеб', 'email': 'g@x.ru', 'department': 'IT', 'active': False},
+    ]
+    schema.save_executors_bulk([dict(e, created_at='2025-01-01') for e in executors], path)
+    schema.save_tasks_bulk([{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+                             'created_at': f'2025-01-02T10:00:{i:02d}'} for i in range(6)], path)
+    schema.save_assignments_bulk([{'id': f'a{i}', 'task_id': f't{i}', 'executor_id': executor,
+                                   'assigned_at': f'2025-01-02T10:01:{i:02d}', 'score': 1.0}
+                                  for i, executor in enumerate(['e1', 'e1', 'e2', 'e3'])], path)
+    schema.increment_executor_counts_bulk({'e1': 2, 'e2': 1, 'e3': 1}, path)
+    return path
+
+
+def rows(result):
+    """Строки результата независимо от наличия pandas"""
+    return result.to_dict('records') if PANDAS_AVAILABLE else result
+
+
+def test_aggregates():
+    """Итоги, нагрузка по отделам и исполнителям совпадают с данными"""
+    print("=" * 60)
+    print("TEST 1: Aggregates")
+    print("=" * 60)
+
+    path = make_db()
+    service = SnapshotService(path, interval_s=0).start()
+    queries = DashboardQueries(service)
+    try:
+        kpis = queries.kpis()
+        print(f"[RESULT] {kpis}")
+        assert kpis == {'tasks': 6, 'assignments': 4, 'unassigned': 2, 'active_executors': 3, 'assigned_today': 4}
+
+        departments = rows(queries.department_load())
+        assert [(d['Отдел'], d['Исполнителей'], d['Назначено'], d['Лимит']) for d in departments] == [
+            ('IT', 2, 3, 15), ('Страхование', 1, 1, 0)]
+        assert departments[0]['Утилизация'] == 20.0  # среднее (20% + 20%)
+
+        executors = rows(queries.executor_load())
+        assert [e['Исполнитель'] for e in executors] == ['Анна', 'Борис', 'Вера']
+        assert [e['Утилизация'] for e in executors] == [20.0, 20.0, 0]
+        assert len(rows(queries.executor_load(limit=2))) == 2
+
+        by_department = rows(queries.assignments_by_department())
+        assert [(d['Отдел'], d['Назначений']) for d in by_department] == [('IT', 3), ('Страхование', 1)]
+
+        # Анти-join нераспределенных идет по уникальному индексу назначений
+        plan = ' '.join(str(tuple(r)) for r in
+                        service.connection().execute("EXPLAIN QUERY PLAN " + kpis_sql(service.generation.schema)))
+        assert 'idx_assignments_task_id' in plan
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_cache_per_generation():
+    """Без изменений БД запросы не выполняются повторно"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Cache Per Generation")
+    print("=" * 60)
+
+    path = make_db()
+    service = SnapshotService(path, interval_s=0).start()
+    queries = DashboardQueries(service)
+    try:
+        queries.kpis()
+        queries.department_load()
+        assert queries.queries == 2
+        for _ in range(10):
+            service.refresh()
+            queries.kpis()
+            queries.department_load()
+        assert queries.queries == 2
+
+        schema.save_assignments_bulk([{'id': 'a9', 'task_id': 't5', 'executor_id': 'e2',
+                                       'assigned_at': '2025-01-02T10:02:00', 'score': 1.0}], path)
+        service.refresh()
+        kpis = queries.kpis()
+        print(f"[RESULT] Запросов: {queries.queries}, нераспределено: {kpis['unassigned']}")
+        assert kpis['unassigned'] == 1 and queries.queries == 3
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_large_pool_rollups():
+    """Гистограмма, крайние исполнители и нагрузка отдела для агрегированных графиков"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Large Pool Rollups")
+    print("=" * 60)
+
+    path = make_db()
+    schema.increment_executor_counts_bulk({'e2': 5}, path)  # Борис: 6 из 5 - 120%
+    service = SnapshotService(path, interval_s=0).start()
+    queries = DashboardQueries(service)
+    try:
+        histogram = rows(queries.utilization_histogram())
+        print(f"[RESULT] {[(b['Утилизация'], b['Исполнителей']) for b in histogram if b['Исполнителей']]}")
+        assert len(histogram) == 11
+        assert histogram[0]['Утилизация'] == '0–10%' and histogram[-1]['Утилизация'] == '≥100%'
+        assert [b['Исполнителей'] for b in histogram] == [1, 0, 1, 0, 0, 0, 0, 0, 0, 0, 1]
+
+        assert [e['Исполнитель'] for e in rows(queries.executor_outliers(2))] == ['Борис', 'Анна']
+        assert [e['Исполнитель'] for e in rows(queries.executor_outliers(1, highest=False))] == ['Вера']
+
+        it = rows(queries.executor_load(department='IT'))
+        assert [e['Исполнитель'] for e in it] == ['Анна', 'Борис']
+        assert rows(queries.executor_load(department="IT' OR 1=1 --")) == []
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Aggregates", test_aggregates),
+        ("Cache Per Generation", test_cache_per_generation),
+        ("Large Pool Rollups", test_large_pool_rollups),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,162 @@
+"""
+Тесты менеджера соединений SQLite (db.py)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+
+
+def make_db():
+    path = os.path.join(tempfile.mkdtemp(), 'pool.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    return path
+
+
+def test_connection_per_thread():
+    """Поток переиспользует свое соединение, другой поток получает свое"""
+    print("=" * 60)
+    print("TEST 1: Connection Per Thread")
+    print("=" * 60)
+
+    path = make_db()
+    conn = db.get_connection(path)
+    assert db.get_connection(path) is conn
+
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection(path)))
+    thread.start()
+    thread.join()
+
+    assert other[0] is not conn
+    db.close_connection(path)
+    assert db.get_connection(path) is not conn
+    db.close_connection(path)
+
+
+def test_transaction_rollback():
+    """Ошибка внутри transaction() откатывает изменения, вложенная - присоединяется"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Transaction Rollback")
+    print("=" * 60)
+
+    path = make_db()
+    try:
+        with db.transaction(path) as conn:
+            conn.execute("INSERT INTO items(name) VALUES('a')")
+            with db.transaction(path) as inner:
+                inner.execute("INSERT INTO items(name) VALUES('b')")
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+
+    conn = db.get_connection(path)
+    assert not conn.in_transaction
+    assert conn.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+
+    with db.transaction(path) as conn:
+        conn.execute("INSERT INTO items(name) VALUES('c')")
+    assert conn.execute("SELECT name FROM items").fetchone()['name'] == 'c'
+    db.close_connection(path)
+
+
+def test_close_all():
+    """close_all() закрывает соединения всех потоков, следующий вызов открывает новое"""
+    path = make_db()
+    conn = db.get_connection(path)
+    db.close_all()
+
+    fresh = db.get_connection(path)
+    assert fresh is not conn
+    assert fresh.execute("SELECT COUNT(*) FROM items").fetchone()[0] == 0
+    db.close_connection(path)
+
+
+def test_storage_profile():
+    """Профиль включает WAL, переменные окружения переопределяют пресет"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Storage Profile")
+    print("=" * 60)
+
+    pragmas = db.load_profile('safe', env={'SQLITE_SYNCHRONOUS': 'normal', 'SQLITE_MMAP_SIZE': '1048576'})
+    assert pragmas['synchronous'] == 'NORMAL'
+    assert pragmas['mmap_size'] == 1048576
+    assert pragmas['cache_size'] == db.PROFILES['safe']['cache_size']
+
+    path = make_db()
+    conn = db.get_connection(path)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == 'wal'
+
+    with db.transaction(path) as conn:
+        conn.executemany("INSERT INTO items(name) VALUES(?)", [(str(i),) for i in range(100)])
+    busy, wal_pages, moved = db.checkpoint(path, 'TRUNCATE')
+    print(f"[RESULT] busy={busy}, WAL={wal_pages}, перенесено={moved}")
+    assert busy == 0 and wal_pages == 0
+    db.close_connection(path)
+
+
+def test_checkpoint_off_commit_path():
+    """Периодический RESTART checkpoint не задерживает коммит, пока WAL читают"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Background Checkpoint")
+    print("=" * 60)
+
+    path = make_db()
+    reader = db.connect(path)
+    reader.execute("PRAGMA busy_timeout=2000")
+    interval, mode = db.CHECKPOINT_INTERVAL_S, db.CHECKPOINT_MODE
+    db.CHECKPOINT_INTERVAL_S, db.CHECKPOINT_MODE = 0.01, 'RESTART'
+    try:
+        with db.transaction(path) as conn:
+            conn.execute("INSERT INTO items(name) VALUES('a')")
+        # Открытая транзакция чтения: RESTART будет ждать ее до busy_timeout
+        reader.execute("BEGIN")
+        reader.execute("SELECT COUNT(*) FROM items").fetchone()
+        time.sleep(0.02)
+
+        start = time.perf_counter()
+        with db.transaction(path) as conn:
+            conn.execute("INSERT INTO items(name) VALUES('b')")
+        elapsed = time.perf_counter() - start
+        print(f"[RESULT] Коммит с checkpoint: {elapsed * 1000:.1f} мс")
+        assert elapsed < 0.5
+        assert db._checkpoint_running
+    finally:
+        db.CHECKPOINT_INTERVAL_S, db.CHECKPOINT_MODE = interval, mode
+        reader.rollback()
+        reader.close()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Connection Per Thread", test_connection_per_thread),
+        ("Transaction Rollback", test_transaction_rollback),
+        ("Close All", test_close_all),
+        ("Storage Profile", test_storage_profile),
+        ("Background Checkpoint", test_checkpoint_off_commit_path),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
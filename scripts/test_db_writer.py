@@ -0,0 +1,168 @@
+"""
+Тесты потока записи с групповым коммитом (db_writer.py)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+import db_writer
+from db_writer import DBWriter
+from dispatcher import make_assignment
+
+
+def make_db(daily_limit=10):
+    path = os.path.join(tempfile.mkdtemp(), 'writer.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+        conn.execute("INSERT INTO executors (id, name, email, daily_limit) VALUES ('e1', 'Иван', 'i@x.ru', ?)",
+                     (daily_limit,))
+    db.close_connection(path)
+    return path
+
+
+def make_tasks(n):
+    return [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+             'created_at': f'2025-01-02T10:00:{i % 60:02d}'} for i in range(n)]
+
+
+def test_group_commit():
+    """Одиночные записи склеиваются в несколько транзакций, Future готовы после коммита"""
+    print("=" * 60)
+    print("TEST 1: Group Commit")
+    print("=" * 60)
+
+    path = make_db()
+    s = schema.get_schema(path)
+    writer = DBWriter(path, max_batch=1000, max_delay_ms=50).start()
+    futures = [writer.execute(s.upsert_task_sql, s.task_row(t)) for t in make_tasks(500)]
+    futures.append(writer.increment_counts({'e1': 2}))
+    futures.append(writer.increment_counts({'e1': 3}))
+    writer.flush()
+
+    print(f"[RESULT] Операций: {writer.operations}, коммитов: {writer.commits}")
+    assert all(f.done() for f in futures)
+    assert writer.commits < 10
+    assert len(schema.load_tasks(path)) == 500
+    assert schema.load_executors(path)[0]['assigned_today'] == 5
+    writer.stop()
+    db.close_connection(path)
+
+
+def test_reserve_respects_limit():
+    """Резервирование через поток записи не превышает daily_limit"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Reserve Limit")
+    print("=" * 60)
+
+    path = make_db(daily_limit=3)
+    s = schema.get_schema(path)
+    executor = {'id': 'e1'}
+    tasks = make_tasks(5)
+
+    writer = DBWriter(path).start()
+    writer.executemany(s.upsert_task_sql, [s.task_row(t) for t in tasks])
+    futures = [writer.reserve(make_assignment(t, executor, 0.5)) for t in tasks]
+    results = [f.result(timeout=10) for f in futures]
+    writer.stop()
+
+    print(f"[RESULT] Резервирования: {results}")
+    assert results == [True, True, True, False, False]
+    assert len(schema.load_assignments(path)) == 3
+    assert schema.load_executors(path)[0]['assigned_today'] == 3
+    db.close_connection(path)
+
+
+def test_failure_isolated_and_stop_drains():
+    """Ошибочная операция не откатывает соседей, stop() дописывает очередь"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Failure Isolation")
+    print("=" * 60)
+
+    path = make_db()
+    s = schema.get_schema(path)
+    writer = DBWriter(path, max_delay_ms=50).start()
+    ok = writer.execute(s.upsert_task_sql, s.task_row(make_tasks(1)[0]))
+    bad = writer.execute("INSERT INTO tasks (id, name) VALUES (?, NULL)", ('broken',))
+    tail = writer.executemany(s.upsert_task_sql, [s.task_row(t) for t in make_tasks(20)[1:]])
+    writer.stop()
+
+    assert ok.result() == 1 and tail.result() == 19
+    assert isinstance(bad.exception(), sqlite3.IntegrityError)
+    assert len(schema.load_tasks(path)) == 20
+    try:
+        writer.execute(s.upsert_task_sql, s.task_row(make_tasks(1)[0]))
+        assert False, "запись после stop() должна быть отклонена"
+    except RuntimeError:
+        pass
+    db.close_connection(path)
+
+
+def test_dead_writer_fails_pending():
+    """Упавший поток записи завершает ожидающие Future ошибкой и заменяется get_writer"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Dead Writer")
+    print("=" * 60)
+
+    path = make_db()
+    s = schema.get_schema(path)
+    writer = DBWriter(path, max_delay_ms=50)
+
+    def broken_commit(ops):
+        raise MemoryError("нет памяти")
+
+    writer._commit = broken_commit
+    db_writer._writers[os.path.abspath(path)] = writer.start()
+    pending = writer.executemany(s.upsert_task_sql, [s.task_row(t) for t in make_tasks(5)])
+    writer.thread.join(5)
+
+    assert not writer.thread.is_alive()
+    assert isinstance(pending.exception(5), RuntimeError)
+    try:
+        writer.flush(timeout=1)
+        assert False, "flush() упавшего потока должен завершиться ошибкой"
+    except RuntimeError:
+        pass
+
+    fresh = db_writer.get_writer(path)
+    assert fresh is not writer and fresh.alive
+    assert fresh.executemany(s.upsert_task_sql, [s.task_row(t) for t in make_tasks(5)]).result(5) == 5
+    db_writer.stop_writers()
+    db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Group Commit", test_group_commit),
+        ("Reserve Limit", test_reserve_respects_limit),
+        ("Failure Isolation", test_failure_isolated_and_stop_drains),
+        ("Dead Writer", test_dead_writer_fails_pending),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
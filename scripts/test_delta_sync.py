@@ -0,0 +1,110 @@
+"""
+Тесты инкрементальной синхронизации (delta_sync.py)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from delta_sync import DeltaSync
+
+
+def make_db():
+    path = os.path.join(tempfile.mkdtemp(), 'sync.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+    return path
+
+
+def make_tasks(start, n):
+    return [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+             'created_at': f'2025-01-02T10:{i // 60:02d}:{i % 60:02d}'} for i in range(start, start + n)]
+
+
+def test_incremental_sync():
+    """Без изменений ничего не читается, новые строки читаются по rowid"""
+    print("=" * 60)
+    print("TEST 1: Incremental Sync")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 100), path)
+    sync = DeltaSync(path)
+    assert sync.sync()
+    # Первая синхронизация - только водяной знак, история не читается
+    assert sync.appended['tasks'] is None and sync.watermarks['tasks'] == (100, 100)
+    assert sync.rows_fetched == 0
+
+    assert not sync.sync()
+    assert sync.rows_fetched == 0
+
+    # Запись из другого потока (другое соединение) - data_version
+    writer = threading.Thread(target=lambda: (schema.save_tasks_bulk(make_tasks(100, 5), path),
+                                              db.close_connection(path)))
+    writer.start()
+    writer.join()
+    assert sync.sync()
+    print(f"[RESULT] Водяной знак: {sync.watermarks['tasks']}, прочитано строк: {sync.rows_fetched}")
+    assert sync.rows_fetched == 5 and sync.full_reloads == 2
+    assert [row[0] for row in sync.appended['tasks']] == [t['created_at'] for t in make_tasks(100, 5)]
+
+    # Запись через то же соединение - total_changes
+    schema.save_tasks_bulk(make_tasks(105, 1), path)
+    assert sync.sync()
+    assert [row[0] for row in sync.appended['tasks']] == [make_tasks(105, 1)[0]['created_at']]
+    assert sync.watermarks['tasks'] == (106, 106)
+    db.close_connection(path)
+
+
+def test_delete_triggers_reload():
+    """Удаления обнаруживаются по количеству строк"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Delete Detection")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 10), path)
+    sync = DeltaSync(path)
+    sync.sync()
+
+    with db.transaction(path) as conn:
+        conn.execute("DELETE FROM tasks WHERE id IN ('t2', 't3')")
+    sync.sync()
+    assert sync.appended['tasks'] is None and sync.watermarks['tasks'] == (10, 8)
+    assert sync.full_reloads == 3 and sync.rows_fetched == 0
+    db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Incremental Sync", test_incremental_sync),
+        ("Delete Detection", test_delete_triggers_reload),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,298 @@
+"""
+Тесты ядра распределения заявок (Dispatcher)
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from dispatcher import Dispatcher, assign_tasks_bulk, assign_with_reservation, find_best_executor, load_rule_engine
+from rule_engine import RuleEngine
+from sharded_dispatcher import ShardedDispatcher
+
+
+def make_executors():
+    return [
+        {'id': '1', 'name': 'Иван', 'department': 'IT', 'active': True, 'assigned_today': 0, 'daily_limit': 3},
+        {'id': '2', 'name': 'Петр', 'department': 'Строительство', 'active': True, 'assigned_today': 0, 'daily_limit': 3},
+        {'id': '3', 'name': 'Мария', 'department': 'IT', 'active': False, 'assigned_today': 0, 'daily_limit': 3},
+    ]
+
+
+def make_tasks(n, category='IT'):
+    return [{'id': f't{i}', 'category': category, 'priority': 'Средний'} for i in range(n)]
+
+
+def test_simple_algorithm_respects_limits():
+    """Простой алгоритм не превышает дневной лимит и пропускает неактивных"""
+    print("=" * 60)
+    print("TEST 1: Simple Algorithm Limits")
+    print("=" * 60)
+
+    dispatcher = Dispatcher(make_executors())
+    assignments = dispatcher.assign_batch(make_tasks(8))
+
+    made = [a for a in assignments if a]
+    print(f"[RESULT] Назначено {len(made)} из 8")
+    assert len(made) == 6
+    assert assignments[-1] is None and assignments[-2] is None
+    assert all(a['executor_id'] != '3' for a in made)
+    assert all(e['assigned_today'] <= e['daily_limit'] for e in dispatcher.executors)
+
+
+def test_rule_engine_balances_load():
+    """Rule Engine из конфигурации распределяет нагрузку равномерно"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Rule Engine Balancing")
+    print("=" * 60)
+
+    engine = load_rule_engine()
+    assert engine is not None
+
+    executors = [
+        {'id': str(i), 'name': f'E{i}', 'department': 'IT', 'active': True, 'assigned_today': 0, 'daily_limit': 10}
+        for i in range(4)
+    ]
+    dispatcher = Dispatcher(executors, engine)
+    dispatcher.assign_batch(make_tasks(20))
+
+    loads = [e['assigned_today'] for e in dispatcher.executors]
+    print(f"[RESULT] Нагрузка: {loads}")
+    assert sum(loads) == 20
+    assert max(loads) - min(loads) <= 1
+
+
+def test_no_capacity():
+    """Без свободных слотов исполнитель не выбирается"""
+    executors = make_executors()
+    for e in executors:
+        e['assigned_today'] = e['daily_limit']
+    assert find_best_executor(make_tasks(1)[0], executors) is None
+
+
+def test_concurrent_reservation():
+    """Параллельные распределители с отдельными соединениями не превышают лимит"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Concurrent Reservation")
+    print("=" * 60)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'reserve.db')
+    conn = sqlite3.connect(db_path)
+    conn.execute("""CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT, email TEXT, department TEXT,
+                    skills TEXT, active INTEGER, daily_limit INTEGER, assigned_today INTEGER,
+                    created_at TEXT, data TEXT, params TEXT)""")
+    conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT, category TEXT, priority TEXT, "
+                 "created_at TEXT, data TEXT, params TEXT)")
+    conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, assigned_at TEXT, score REAL)")
+    conn.executemany("INSERT INTO executors(id,name,department,active,daily_limit,assigned_today) VALUES(?,?,?,1,5,0)",
+                     [(str(i), f'E{i}', 'IT') for i in range(4)])
+    conn.commit()
+    conn.close()
+    # Миграции (счетчики в executor_counters) - до запуска распределителей
+    db_schema = schema.get_schema(db_path)
+    counters_sql = db_schema.select_counters_sql
+    db.close_connection(db_path)
+
+    def worker(prefix):
+        # У каждого распределителя своя (устаревающая) копия исполнителей
+        wconn = sqlite3.connect(db_path, timeout=30)
+        executors = [
+            {'id': str(i), 'name': f'E{i}', 'department': 'IT', 'active': True, 'assigned_today': 0, 'daily_limit': 5}
+            for i in range(4)
+        ]
+        for task in make_tasks(15):
+            task['id'] = f'{prefix}-{task["id"]}'
+            with wconn:
+                assign_with_reservation(wconn, task, executors, db_schema)
+        wconn.close()
+
+    threads = [threading.Thread(target=worker, args=(p,)) for p in ('a', 'b', 'c')]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    conn = sqlite3.connect(db_path)
+    counters = {r[0]: r[1] for r in conn.execute(counters_sql)}
+    per_executor = dict(conn.execute("SELECT executor_id, COUNT(*) FROM assignments GROUP BY executor_id").fetchall())
+    conn.close()
+
+    print(f"[RESULT] Счетчики: {counters}, назначения: {per_executor}")
+    assert all(v == 5 for v in counters.values())
+    assert per_executor == counters
+
+
+def test_sharded_fallback():
+    """Шарды распределяют по категории, остаток уходит в другие шарды"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Sharded Dispatch")
+    print("=" * 60)
+
+    sharded = ShardedDispatcher(rules_path=None).start()
+    try:
+        sharded.load(make_executors())
+        tasks = make_tasks(4, 'IT') + make_tasks(2, 'Строительство')
+        for i, task in enumerate(tasks):
+            task['id'] = f't{i}'
+        assignments = sharded.assign_batch(tasks)
+    finally:
+        sharded.stop()
+
+    owners = [a['executor_id'] if a else None for a in assignments]
+    print(f"[RESULT] Исполнители: {owners}")
+    # 3 слота IT, 4-я IT заявка уходит в шард "Строительство"
+    assert owners[:3] == ['1', '1', '1']
+    assert owners.count('2') == 3
+    assert owners.count(None) == 0
+
+
+def test_sampled_mode():
+    """Режим power-of-d-choices соблюдает лимиты и распределяет все заявки"""
+    print("\n" + "=" * 60)
+    print("TEST 6: Sampled Mode")
+    print("=" * 60)
+
+    engine = load_rule_engine()
+    executors = [
+        {'id': str(i), 'name': f'E{i}', 'department': 'IT' if i % 2 else 'Консалтинг',
+         'active': True, 'assigned_today': 0, 'daily_limit': 4}
+        for i in range(10)
+    ]
+    sampling = {'mode': 'sampled', 'd': 2, 'pool': 'category', 'fallback': True}
+    dispatcher = Dispatcher(executors, engine, sampling=sampling, seed=1)
+    assignments = dispatcher.assign_batch(make_tasks(40))
+
+    loads = [e['assigned_today'] for e in dispatcher.executors]
+    print(f"[RESULT] Нагрузка: {loads}")
+    # Пул IT исчерпывается - остаток берется из общего пула
+    assert all(assignments)
+    assert loads == [4] * 10
+
+    # find_best_executor в режиме sampled готовит к правилам только выборку
+    default_sampling, engine.sampling = engine.sampling, sampling
+    try:
+        executors = [{k: v for k, v in e.items() if k not in ('assigned_count', 'max_assignments')}
+                     for e in executors]
+        for e in executors:
+            e['assigned_today'] = 0
+        executor, _ = find_best_executor(make_tasks(1)[0], executors, engine)
+        prepared = [e for e in executors if 'max_assignments' in e]
+        assert executor in prepared and len(prepared) <= 2
+    finally:
+        engine.sampling = default_sampling
+
+
+def test_sampled_reservation_fallback():
+    """С резервированием в БД неподходящая выборка ведет к точному перебору по правилам"""
+    print("\n" + "=" * 60)
+    print("TEST 7: Sampled Reservation Fallback")
+    print("=" * 60)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'sampled.db')
+    with db.transaction(db_path) as conn:
+        conn.execute("""CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT, email TEXT, department TEXT,
+                        skills TEXT, active INTEGER, daily_limit INTEGER, assigned_today INTEGER,
+                        created_at TEXT, data TEXT, params TEXT)""")
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT, category TEXT, priority TEXT, "
+                     "created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+        conn.executemany("INSERT INTO executors(id,name,department,active,daily_limit,assigned_today) "
+                         "VALUES(?,?,?,1,50,0)",
+                         [(str(i), f'E{i}', 'IT' if i == 0 else 'Консалтинг') for i in range(10)])
+
+    # Подходит по правилам только исполнитель из отдела заявки
+    engine = RuleEngine({'rules': [{
+        'id': 'department_match',
+        'condition': {'type': 'equals', 'executor_field': 'department', 'task_field': 'category'},
+        'weight': 1
+    }]})
+    executors = [
+        {'id': str(i), 'name': f'E{i}', 'department': 'IT' if i == 0 else 'Консалтинг',
+         'active': True, 'assigned_today': 0, 'daily_limit': 50}
+        for i in range(10)
+    ]
+    dispatcher = Dispatcher(executors, engine, sampling={'mode': 'sampled', 'd': 2, 'fallback': True}, seed=1)
+    conn = db.get_connection(db_path)
+    db_schema = schema.get_schema(db_path)
+    assignments = []
+    for task in make_tasks(20):
+        with conn:
+            assignments.append(dispatcher.assign(task, conn, db_schema))
+    db.close_connection(db_path)
+
+    owners = {a['executor_id'] for a in assignments if a}
+    print(f"[RESULT] Исполнители: {owners}")
+    assert all(assignments)
+    assert owners == {'0'}
+
+
+def test_bulk_assignment():
+    """Пакетное распределение перечитывает счетчики в транзакции и не превышает лимит"""
+    print("\n" + "=" * 60)
+    print("TEST 8: Bulk Assignment")
+    print("=" * 60)
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'bulk.db')
+    with db.transaction(db_path) as conn:
+        conn.execute("""CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT, email TEXT, department TEXT,
+                        skills TEXT, active INTEGER, daily_limit INTEGER, assigned_today INTEGER,
+                        created_at TEXT, data TEXT, params TEXT)""")
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT, category TEXT, priority TEXT, "
+                     "created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+        conn.executemany("INSERT INTO executors(id,name,department,active,daily_limit,assigned_today) "
+                         "VALUES(?,?,'IT',1,5,?)", [('1', 'E1', 3), ('2', 'E2', 0)])
+
+    # Копия в памяти устарела: в БД у исполнителя 1 уже 3 назначения
+    executors = [
+        {'id': str(i), 'name': f'E{i}', 'department': 'IT', 'active': True, 'assigned_today': 0, 'daily_limit': 5}
+        for i in (1, 2)
+    ]
+    assignments = assign_tasks_bulk(make_tasks(9), executors, db_path=db_path)
+
+    conn = db.get_connection(db_path)
+    counters = {r[0]: r[1] for r in conn.execute(schema.get_schema(db_path).select_counters_sql)}
+    stored = conn.execute("SELECT COUNT(*) FROM assignments").fetchone()[0]
+    db.close_connection(db_path)
+
+    print(f"[RESULT] Счетчики: {counters}, назначений: {stored}")
+    assert sum(1 for a in assignments if a) == 7 == stored
+    assert counters == {'1': 5, '2': 5}
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Simple Algorithm Limits", test_simple_algorithm_respects_limits),
+        ("Rule Engine Balancing", test_rule_engine_balances_load),
+        ("No Capacity", test_no_capacity),
+        ("Concurrent Reservation", test_concurrent_reservation),
+        ("Sharded Dispatch", test_sharded_fallback),
+        ("Sampled Mode", test_sampled_mode),
+        ("Sampled Reservation Fallback", test_sampled_reservation_fallback),
+        ("Bulk Assignment", test_bulk_assignment),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,150 @@
+"""
+Тесты потоковой выгрузки дашборда в Excel (excel_export.py)
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from excel_export import export_dashboard, iter_assignment_rows
+from fairness import FairnessMetrics
+from snapshot import SnapshotService
+
+
+def make_db(n_assignments=25):
+    path = os.path.join(tempfile.mkdtemp(), 'export.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+    schema.save_executors_bulk([
+        {'id': 'e1', 'name': 'Анна', 'email': 'a@x.ru', 'department': 'IT', 'skills': ['python'],
+         'created_at': '2025-01-01'},
+        {'id': 'e2', 'name': 'Борис', 'email': 'b@x.ru', 'department': 'Консалтинг', 'created_at': '2025-01-01'},
+    ], path)
+    schema.save_tasks_bulk([{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT' if i % 2 else 'Консалтинг',
+                             'priority': 'Высокий', 'created_at': f'2025-01-02T10:{i // 60:02d}:{i % 60:02d}'}
+                            for i in range(n_assignments)], path)
+    # Последнее назначение - у удаленного исполнителя
+    schema.save_assignments_bulk([{'id': f'a{i}', 'task_id': f't{i}',
+                                   'executor_id': 'gone' if i == n_assignments - 1 else ('e1', 'e2')[i % 2],
+                                   'assigned_at': f'2025-01-02T11:{i // 60:02d}:{i % 60:02d}', 'score': i / 3}
+                                  for i in range(n_assignments)], path)
+    return path
+
+
+TASK_COLUMNS = "id, name, category, priority, created_at, data, params"
+ASSIGNMENT_COLUMNS = "id, task_id, executor_id, assigned_at, score"
+
+
+def archive_first(path, n):
+    """Перенести первые n заявок и их назначения в архив"""
+    with db.transaction(path) as conn:
+        ids = [f't{i}' for i in range(n)]
+        marks = ','.join('?' * n)
+        conn.execute(f"INSERT INTO tasks_archive SELECT {TASK_COLUMNS} FROM tasks WHERE id IN ({marks})", ids)
+        conn.execute(f"INSERT INTO assignments_archive SELECT {ASSIGNMENT_COLUMNS} FROM assignments "
+                     f"WHERE task_id IN ({marks})", ids)
+        conn.execute(f"DELETE FROM assignments WHERE task_id IN ({marks})", ids)
+        conn.execute(f"DELETE FROM tasks WHERE id IN ({marks})", ids)
+
+
+def test_assignment_rows():
+    """JOIN назначений с заявками (в т.ч. архивными) и исполнителями, пачками"""
+    print("=" * 60)
+    print("TEST 1: Assignment Rows")
+    print("=" * 60)
+
+    path = make_db()
+    service = SnapshotService(path, interval_s=0).start()
+    try:
+        conn, generation = service.reader()
+        batches = list(iter_assignment_rows(conn, generation.schema, batch_rows=10))
+        assert [len(b) for b in batches] == [10, 10, 5]
+        rows = [row for batch in batches for row in batch]
+        assert rows[0] == ('a24', 't24', 'Консалтинг', 'Высокий', 'gone', 'N/A', 'N/A',
+                           '2025-01-02T11:00:24', 8.0)
+        assert rows[-1][:7] == ('a0', 't0', 'Консалтинг', 'Высокий', 'e1', 'Анна', 'IT')
+
+        # Заявка уже в архиве, назначение еще в горячей таблице - категория из архива
+        with db.transaction(path) as write:
+            write.execute(f"INSERT INTO tasks_archive SELECT {TASK_COLUMNS} FROM tasks WHERE id = 't23'")
+            write.execute("DELETE FROM tasks WHERE id = 't23'")
+        archive_first(path, 5)
+        service.refresh()
+        conn, generation = service.reader()
+        hot = [row for batch in iter_assignment_rows(conn, generation.schema) for row in batch]
+        assert len(hot) == 20 and hot[1][:3] == ('a23', 't23', 'IT')
+        everything = [row for batch in iter_assignment_rows(conn, generation.schema, include_archive=True)
+                      for row in batch]
+        print(f"[RESULT] Горячих: {len(hot)}, с архивом: {len(everything)}")
+        assert len(everything) == 25 and everything[-1][0] == 'a0' and everything[-1][2] == 'Консалтинг'
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_workbook():
+    """Книга write_only: листы, строки, диаграммы"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Workbook")
+    print("=" * 60)
+
+    load_workbook = pytest.importorskip("openpyxl").load_workbook
+
+    path = make_db(n_assignments=120)
+    service = SnapshotService(path, interval_s=0).start()
+    try:
+        metrics = FairnessMetrics.from_executors(service.load_executors()).summary()
+        progress = []
+        with export_dashboard(service, metrics, {'tasks': [('10:00', 3)], 'assignments': [('10:00', 2)]},
+                              recent_tasks=3, batch_rows=50, progress=progress.append, spool_bytes=1024) as output:
+            assert output._rolled  # книга больше spool_bytes - во временном файле
+            workbook = load_workbook(output)
+        assert workbook.sheetnames == ['Общие метрики', 'Исполнители', 'Отделы', 'Поступление заявок',
+                                       'Назначения', 'Все назначения']
+        assert progress == [50, 100, 120]
+        sheet = workbook['Все назначения']
+        assert sheet.max_row == 121 and sheet['A2'].value == 'a119'
+        assert workbook['Общие метрики']['B2'].value == 120
+        assert len(workbook['Исполнители']._charts) == 2
+        print(f"[RESULT] Листов: {len(workbook.sheetnames)}, назначений: {sheet.max_row - 1}")
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Assignment Rows", test_assignment_rows),
+        ("Workbook", test_workbook),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except pytest.skip.Exception as e:
+            print(f"[SKIP] {name}: {e}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,173 @@
+"""
+Тесты фоновых заданий экспорта (export_jobs.py)
+"""
+
+import csv
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import export_jobs
+import schema
+from export_jobs import DONE, PYARROW_AVAILABLE, ExportJobRunner, available_formats
+from snapshot import SnapshotService
+from test_excel_export import make_db
+
+
+def wait(job, timeout=10.0):
+    deadline = time.time() + timeout
+    while job.status not in (DONE, 'error') and time.time() < deadline:
+        time.sleep(0.01)
+    return job
+
+
+def test_cached_by_version():
+    """Повторный экспорт той же версии данных не выполняется заново"""
+    print("=" * 60)
+    print("TEST 1: Cached By Version")
+    print("=" * 60)
+
+    path = make_db(n_assignments=40)
+    service = SnapshotService(path, interval_s=0).start()
+    runner = ExportJobRunner(service)
+    try:
+        job = wait(runner.submit('csv'))
+        assert job.status == DONE, job.error
+        assert job.rows == job.total == 40 and job.progress == 1.0
+        with open(job.path, encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.reader(f))
+        assert len(rows) == 41 and rows[0][0] == 'ID назначения' and rows[1][0] == 'a39'
+
+        # Та же версия - то же задание и тот же файл
+        assert runner.submit('csv') is job and runner.exports == 1
+
+        schema.save_tasks_bulk([{'id': 'new', 'name': 'Заявка', 'category': 'IT', 'priority': 'Средний',
+                                 'created_at': '2025-01-03T10:00:00'}], path)
+        schema.save_assignments_bulk([{'id': 'a-new', 'task_id': 'new', 'executor_id': 'e1',
+                                       'assigned_at': '2025-01-03T10:00:01', 'score': 1.0}], path)
+        service.refresh()
+        second = wait(runner.submit('csv'))
+        print(f"[RESULT] Версии {job.version} -> {second.version}, экспортов: {runner.exports}")
+        assert second is not job
+        assert second.status == DONE and second.rows == 41 and runner.exports == 2
+        # Файл прошлой версии удален
+        assert not os.path.exists(job.path) and runner.get(job.id) is None
+    finally:
+        runner.close()
+        service.stop()
+        db.close_connection(path)
+
+
+def test_formats():
+    """Неизвестный формат и Parquet без pyarrow отклоняются сразу"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Formats")
+    print("=" * 60)
+
+    path = make_db(n_assignments=5)
+    service = SnapshotService(path, interval_s=0).start()
+    runner = ExportJobRunner(service)
+    try:
+        try:
+            runner.submit('pdf')
+            assert False, "неизвестный формат должен отклоняться"
+        except ValueError:
+            pass
+
+        assert ('parquet' in available_formats()) == PYARROW_AVAILABLE
+        if not PYARROW_AVAILABLE:
+            try:
+                runner.submit('parquet')
+                assert False, "parquet без pyarrow должен отклоняться"
+            except RuntimeError:
+                pass
+    finally:
+        runner.close()
+        service.stop()
+        db.close_connection(path)
+
+
+def test_parquet():
+    """Parquet с архивом (нужен pyarrow)"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Parquet")
+    print("=" * 60)
+
+    pq = pytest.importorskip("pyarrow.parquet")
+    path = make_db(n_assignments=5)
+    service = SnapshotService(path, interval_s=0).start()
+    runner = ExportJobRunner(service)
+    try:
+        job = wait(runner.submit('parquet', include_archive=True))
+        assert job.status == DONE, job.error
+        assert pq.read_table(job.path).num_rows == 5
+    finally:
+        runner.close()
+        service.stop()
+        db.close_connection(path)
+
+
+def test_close_discards_running():
+    """Задание, выполнявшееся во время close(), отбрасывается без ошибки экспорта"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Close Discards Running")
+    print("=" * 60)
+
+    path = make_db(n_assignments=5)
+    service = SnapshotService(path, interval_s=0).start()
+    runner = ExportJobRunner(service)
+    release = threading.Event()
+    original = export_jobs.write_assignments_csv
+
+    def blocked_csv(*args):
+        release.wait(5.0)
+        return original(*args)
+
+    export_jobs.write_assignments_csv = blocked_csv
+    try:
+        job = runner.submit('csv')
+        runner.close()
+        release.set()
+        wait(job)
+        print(f"[RESULT] {job.status}: {job.error}")
+        assert job.status == 'error' and job.error == "Экспорт отменен: данные пересозданы"
+        assert job.path is None and not os.path.exists(runner.export_dir)
+    finally:
+        export_jobs.write_assignments_csv = original
+        release.set()
+        service.stop()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Cached By Version", test_cached_by_version),
+        ("Formats", test_formats),
+        ("Parquet", test_parquet),
+        ("Close Discards Running", test_close_discards_running),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except pytest.skip.Exception as e:
+            print(f"[SKIP] {name}: {e}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
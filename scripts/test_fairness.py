@@ -0,0 +1,117 @@
+"""
+Тесты инкрементальных метрик справедливости (fairness.py)
+"""
+
+import os
+import random
+import statistics
+import sys
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+from fairness import FairnessMetrics, FenwickTree
+from sampling_benchmark import utilization_mae
+
+
+def brute_force(executors):
+    """Полный пересчет, как раньше на дашборде"""
+    active = [e for e in executors.values() if e['active']]
+    utils = sorted(e['assigned_today'] / e['daily_limit'] if e['daily_limit'] > 0 else 0 for e in active)
+    return utils, utilization_mae(active)
+
+
+def quantile(values, q):
+    position = (len(values) - 1) * q
+    lower = int(position)
+    if lower == position:
+        return values[lower]
+    return values[lower] + (values[lower + 1] - values[lower]) * (position - lower)
+
+
+def test_fenwick_tree():
+    """Префиксные суммы и поиск k-го элемента"""
+    print("=" * 60)
+    print("TEST 1: Fenwick Tree")
+    print("=" * 60)
+
+    tree = FenwickTree(10)
+    for index, value in [(0, 2), (3, 1), (9, 4)]:
+        tree.add(index, value)
+    assert [tree.prefix(i) for i in (0, 2, 3, 8, 9)] == [2, 2, 3, 3, 7]
+    assert [tree.find(k) for k in (1, 2, 3, 4, 7)] == [0, 0, 3, 9, 9]
+    assert tree.find(8) == 10
+    print("[RESULT] prefix/find совпадают с ожидаемыми")
+
+
+def test_matches_full_recompute():
+    """Метрики после случайных изменений совпадают с полным пересчетом"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Matches Full Recompute")
+    print("=" * 60)
+
+    rng = random.Random(7)
+    executors = {f'e{i}': {'id': f'e{i}', 'assigned_today': rng.randint(0, 10),
+                           'daily_limit': rng.choice([0, 5, 10, 20]), 'active': True} for i in range(200)}
+    metrics = FairnessMetrics.from_executors(executors.values())
+
+    for step in range(2000):
+        e = executors[f'e{rng.randrange(200)}']
+        action = rng.random()
+        if action < 0.8:
+            e['assigned_today'] += 1  # назначение (в т.ч. сверх лимита)
+        elif action < 0.9:
+            e['active'] = not e['active']
+        elif action < 0.95:
+            e['daily_limit'] = rng.choice([0, 1, 10, 30])
+        else:
+            e['assigned_today'] = 0  # сброс счетчика
+        metrics.update(e['id'], e['assigned_today'], e['daily_limit'], e['active'])
+
+        if step % 100 == 0:
+            utils, mae = brute_force(executors)
+            assert metrics.count == len(utils)
+            assert abs(metrics.mae() - mae) < 1e-9
+            assert abs(metrics.mean() - sum(utils) / len(utils)) < 1e-9
+            assert abs(metrics.std() - statistics.stdev(utils)) < 1e-9
+            assert metrics.min() == utils[0] and metrics.max() == utils[-1]
+            for q in (0.1, 0.5, 0.9):
+                assert abs(metrics.quantile(q) - quantile(utils, q)) < 1e-12
+
+    summary = metrics.summary()
+    assert summary is metrics.summary()  # кэш до следующего изменения
+    assert summary['total_assigned'] == sum(e['assigned_today'] for e in executors.values() if e['active'])
+    print(f"[RESULT] MAE {summary['mae']:.4f}, σ {summary['std_utilization']:.2f}%, "
+          f"обновлений: {metrics.updates}")
+
+    # apply обновляет только изменившихся и исключает удаленных
+    assert metrics.apply(executors.values()) == 0
+    removed = executors.pop('e0')
+    assert metrics.apply(executors.values()) == (1 if removed['active'] else 0)
+    assert metrics.count == sum(1 for e in executors.values() if e['active'])
+    for e in executors.values():
+        metrics.remove(e['id'])
+    assert metrics.count == 0 and metrics.summary()['mae'] == 0.0 and metrics.mean() == 0.0
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Fenwick Tree", test_fenwick_tree),
+        ("Matches Full Recompute", test_matches_full_recompute),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,109 @@
+"""
+Тесты управления нагрузочным тестом (load_test_control.py)
+"""
+
+import os
+import sys
+import threading
+import time
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+from load_test_control import COMPLETED, IDLE, RUNNING, LoadTestController
+from repository import InMemoryRepository
+
+
+class RecordingRepository(InMemoryRepository):
+    """In-memory хранилище, запоминающее записи статуса"""
+
+    def __init__(self):
+        super().__init__()
+        self.writes = []
+
+    def set_load_test_status(self, status):
+        self.writes.append(status['status'])
+        super().set_load_test_status(status)
+
+
+def test_stop_interrupts_wait():
+    """Остановка прерывает паузу между пачками за миллисекунды"""
+    print("=" * 60)
+    print("TEST 1: Stop Latency")
+    print("=" * 60)
+
+    repo = RecordingRepository()
+    controller = LoadTestController(repo)
+    assert controller.start(100)
+    assert not controller.start(100)
+
+    def worker():
+        for _ in range(10):
+            controller.advance(generated=10, assigned=9)
+            if controller.wait(5.0):
+                break
+        controller.finish()
+
+    thread = threading.Thread(target=worker)
+    thread.start()
+    time.sleep(0.05)
+    stop_at = time.perf_counter()
+    controller.request_stop()
+    thread.join(1.0)
+    latency_ms = (time.perf_counter() - stop_at) * 1000
+    print(f"[RESULT] Остановка за {latency_ms:.1f} мс")
+
+    assert not thread.is_alive()
+    assert latency_ms < 500
+    status = controller.snapshot()
+    assert status['status'] == COMPLETED and status['current'] == 10 and status['assigned'] == 9
+    assert status['message'] == 'Остановлено пользователем'
+
+
+def test_history_written_at_start_and_finish():
+    """В хранилище пишутся только старт и итог, прогресс - в памяти"""
+    print("\n" + "=" * 60)
+    print("TEST 2: History Writes")
+    print("=" * 60)
+
+    repo = RecordingRepository()
+    controller = LoadTestController(repo)
+    controller.start(1000)
+    for _ in range(100):
+        controller.advance(generated=10, assigned=10)
+        assert not controller.wait(0)
+    live = controller.snapshot()
+    assert live['status'] == RUNNING and live['progress'] == 1.0 and live['performance'] > 0
+    controller.finish()
+
+    print(f"[RESULT] Записей статуса: {repo.writes}")
+    assert repo.writes == [RUNNING, COMPLETED]
+    assert repo.get_load_test_status()['current'] == 1000
+    assert repo.get_load_test_status()['message'] == ''
+
+    controller.reset()
+    assert controller.snapshot()['status'] == IDLE
+    assert controller.start(10) and controller.snapshot()['current'] == 0
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Stop Latency", test_stop_interrupts_wait),
+        ("History Writes", test_history_written_at_start_and_finish),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
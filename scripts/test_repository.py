@@ -0,0 +1,113 @@
+"""
+Тесты хранилищ Repository (repository.py): одинаковое поведение SQLite и in-memory
+"""
+
+import os
+import sys
+import tempfile
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+from repository import BACKENDS, InMemoryRepository, create_repository, make_load_test_status, register_backend
+
+
+def make_repositories():
+    path = os.path.join(tempfile.mkdtemp(), 'repo.db')
+    return [create_repository('sqlite', db_path=path), create_repository('memory')]
+
+
+def make_executors():
+    return [{'id': f'e{i}', 'name': f'Исполнитель {i}', 'email': f'e{i}@x.ru', 'department': 'IT',
+             'skills': [], 'active': True, 'daily_limit': 2, 'assigned_today': 0,
+             'created_at': '2025-01-01T00:00:00'} for i in range(2)]
+
+
+def make_tasks(n):
+    return [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+             'created_at': f'2025-01-02T10:00:{i:02d}', 'params': {'complexity': i}} for i in range(n)]
+
+
+def test_assign_contract():
+    """Оба хранилища одинаково сохраняют данные и соблюдают daily_limit"""
+    print("=" * 60)
+    print("TEST 1: Assign Contract")
+    print("=" * 60)
+
+    for repo in make_repositories():
+        repo.save_executors(make_executors())
+        repo.save_tasks(make_tasks(5))
+        executors = repo.load_executors()
+
+        first = repo.assign_tasks(repo.load_unassigned_tasks(), executors)
+        again = repo.assign_tasks(repo.load_tasks(), repo.load_executors())
+        loaded = repo.load_executors()
+
+        name = type(repo).__name__
+        print(f"[RESULT] {name}: назначено {sum(1 for a in first if a)}, счетчики "
+              f"{[e['assigned_today'] for e in loaded]}")
+        assert sum(1 for a in first if a) == 4
+        assert not any(again)
+        assert [e['assigned_today'] for e in loaded] == [2, 2]
+        assert len(repo.load_assignments()) == 4
+        assert [t['id'] for t in repo.load_unassigned_tasks()] == ['t0']
+        assert repo.load_tasks()[0]['params'] == {'complexity': 4}
+
+        repo.delete_executor('e0')
+        assert [e['id'] for e in repo.load_executors()] == ['e1']
+        assert len(repo.load_assignments()) == 2
+
+        repo.clear_tasks_and_assignments()
+        assert not repo.load_tasks() and not repo.load_assignments()
+        assert repo.load_executors()[0]['assigned_today'] == 0
+        repo.close()
+
+
+def test_load_test_status_and_backends():
+    """Статус нагрузочного теста и регистрация бэкендов"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Status And Backends")
+    print("=" * 60)
+
+    for repo in make_repositories():
+        assert repo.get_load_test_status() is None
+        repo.set_load_test_status(make_load_test_status('running', 0.5, 50, 100, 40))
+        status = repo.get_load_test_status()
+        assert status['status'] == 'running' and status['current'] == 50 and status['message'] == ''
+        repo.close()
+
+    register_backend('test_memory', InMemoryRepository)
+    try:
+        assert isinstance(create_repository('test_memory'), InMemoryRepository)
+    finally:
+        BACKENDS.pop('test_memory')
+    try:
+        create_repository('unknown')
+        assert False, "неизвестный бэкенд должен быть отклонен"
+    except ValueError:
+        pass
+    db.close_all()
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Assign Contract", test_assign_contract),
+        ("Status And Backends", test_load_test_status_and_backends),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
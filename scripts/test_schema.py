@@ -0,0 +1,245 @@
+"""
+Тесты реестра схемы БД (schema.py)
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import migrate_add_indexes
+import schema
+
+
+def make_legacy_db():
+    """БД в схеме до миграции add_json_params_v1 (без колонок params)"""
+    path = os.path.join(tempfile.mkdtemp(), 'legacy.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+        conn.execute("INSERT INTO executors VALUES('e1','Иван','i@x.ru','IT','Python,SQL',1,10,0,'2025-01-01','{}')")
+    return path
+
+
+def test_auto_migration():
+    """Схема без params мигрируется при первой проверке, навыки переносятся в params"""
+    print("=" * 60)
+    print("TEST 1: Auto Migration")
+    print("=" * 60)
+
+    path = make_legacy_db()
+    s = schema.get_schema(path)
+
+    assert s.tasks_has_params and s.executors_has_params
+    assert schema.get_schema(path) is s
+
+    executors = schema.load_executors(path)
+    print(f"[RESULT] Исполнитель: {executors[0]}")
+    assert executors[0]['params'] == {'skills': ['Python', 'SQL']}
+    db.close_connection(path)
+
+
+def test_roundtrip_without_introspection():
+    """Чтение и запись не выполняют PRAGMA table_info после первой проверки"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Cached Statements")
+    print("=" * 60)
+
+    path = make_legacy_db()
+    s = schema.get_schema(path)
+    conn = db.get_connection(path)
+
+    statements = []
+    conn.set_trace_callback(statements.append)
+    task = {'id': 't1', 'name': 'Заявка', 'category': 'IT', 'priority': 'Высокий',
+            'created_at': '2025-01-02T10:00:00', 'params': {'complexity': 5}, 'source': 'api'}
+    with db.transaction(path) as conn:
+        conn.execute(s.upsert_task_sql, s.task_row(task))
+    tasks = schema.load_tasks(path)
+    conn.set_trace_callback(None)
+
+    assert tasks == [task]
+    assert not any('table_info' in sql for sql in statements)
+    db.close_connection(path)
+
+
+def test_bulk_save():
+    """Пакетная запись: чанки executemany, один коммит, инкременты счетчиков"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Bulk Save")
+    print("=" * 60)
+
+    path = make_legacy_db()
+    tasks = [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+              'created_at': f'2025-01-02T10:00:{i:02d}'} for i in range(10)]
+    assignments = [{'id': f'a{i}', 'task_id': f't{i}', 'executor_id': 'e1',
+                    'assigned_at': '2025-01-02T11:00:00', 'score': 0.5} for i in range(4)]
+
+    conn = db.get_connection(path)
+    commits = []
+    conn.set_trace_callback(lambda sql: commits.append(sql) if sql == 'COMMIT' else None)
+    with db.transaction(path):
+        assert schema.save_tasks_bulk(tasks, path, chunk_size=3) == 10
+        assert schema.save_assignments_bulk(assignments, path, chunk_size=3) == 4
+        assert schema.increment_executor_counts_bulk({'e1': 4}, path) == 1
+    conn.set_trace_callback(None)
+
+    print(f"[RESULT] Коммитов: {len(commits)}")
+    assert len(commits) == 1
+    assert len(schema.load_tasks(path)) == 10
+    assert len(schema.load_assignments(path)) == 4
+    assert schema.load_executors(path)[0]['assigned_today'] == 4
+    db.close_connection(path)
+
+
+def test_index_migration():
+    """Автозапуск не удаляет повторные назначения, ручной - удаляет и исправляет счетчики"""
+    print("\n" + "=" * 60)
+    print("TEST 4: Index Migration")
+    print("=" * 60)
+
+    path = make_legacy_db()
+    today = datetime.now().strftime('%Y-%m-%dT%H:%M:%S')
+    with db.transaction(path) as conn:
+        conn.executemany("INSERT INTO assignments VALUES(?,?,?,?,?)", [
+            ('a1', 't1', 'e1', '2025-01-02T10:00:00', 0.5),
+            ('a2', 't1', 'e1', today, 0.4),
+            ('a3', 't2', 'e1', '2025-01-02T12:00:00', 0.3),
+        ])
+        conn.execute("UPDATE executors SET assigned_today = 3")
+
+    s = schema.get_schema(path)
+    conn = db.get_connection(path)
+    assert len(schema.load_assignments(path)) == 3
+    assert migrate_add_indexes.is_needed(conn)
+
+    # Ручной запуск: дубликат текущего дня уменьшает счетчик
+    with db.transaction(path):
+        assert migrate_add_indexes.remove_duplicate_assignments(conn) == 1
+        migrate_add_indexes.create_indexes(conn)
+    ids = [a['id'] for a in schema.load_assignments(path)]
+    plan = ' '.join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + s.select_tasks_sql).fetchall())
+
+    print(f"[RESULT] Назначения: {ids}, план: {plan}")
+    assert ids == ['a3', 'a1']
+    assert schema.load_executors(path)[0]['assigned_today'] == 2
+    assert 'idx_tasks_created_at' in plan and 'TEMP B-TREE' not in plan
+    assert not migrate_add_indexes.is_needed(conn)
+    db.close_connection(path)
+
+
+def test_param_columns():
+    """Горячие параметры материализуются в колонки: отбор и группировка идут в SQL по индексу"""
+    print("\n" + "=" * 60)
+    print("TEST 5: Param Columns")
+    print("=" * 60)
+
+    path = make_legacy_db()
+    s = schema.get_schema(path)
+    assert s.param_columns['executors']['location'] == 'p_location'
+
+    executors = [{'id': f'e{i}', 'name': f'Исполнитель {i}', 'email': f'e{i}@x.ru', 'department': 'IT',
+                  'created_at': '2025-01-01', 'params': {'location': city, 'experience_years': i}}
+                 for i, city in enumerate(['Москва', 'Казань', 'Москва', 'Москва'], start=2)]
+    schema.save_executors_bulk(executors, path)
+
+    found = schema.load_executors_by_params({'location': 'Москва', 'experience_years': ('>=', 4)}, path)
+    breakdown = schema.count_by_param('executors', 'location', path)
+    conn = db.get_connection(path)
+    # Статистика миграции снята на таблице из одной строки - обновляем
+    with db.transaction(path):
+        conn.execute("ANALYZE")
+    plan = ' '.join(row[3] for row in conn.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM executors WHERE p_location = ?", ('Москва',)).fetchall())
+
+    print(f"[RESULT] Отобрано: {[e['id'] for e in found]}, разбивка: {breakdown}, план: {plan}")
+    assert [e['id'] for e in found] == ['e4', 'e5']
+    assert breakdown == [('Москва', 3), ('Казань', 1)]
+    assert 'idx_executors_p_location' in plan
+    # Ключ без колонки - json_extract, недопустимый ключ - ошибка
+    assert schema.count_by_param('executors', 'rating', path) == []
+    try:
+        schema.count_by_param('executors', "x') --", path)
+        assert False, "недопустимый ключ должен быть отклонен"
+    except ValueError:
+        pass
+    db.close_connection(path)
+
+
+def test_executor_counters():
+    """Счетчики в executor_counters: инкремент и сброс не трогают профили исполнителей"""
+    print("\n" + "=" * 60)
+    print("TEST 6: Executor Counters")
+    print("=" * 60)
+
+    path = make_legacy_db()
+    with db.transaction(path) as conn:
+        conn.execute("UPDATE executors SET assigned_today = 4 WHERE id = 'e1'")
+    s = schema.get_schema(path)
+    assert s.has_counters
+    conn = db.get_connection(path)
+
+    # Текущее значение перенесено миграцией; новый исполнитель получает счетчик триггером
+    executor = schema.load_executors(path)[0]
+    assert executor['assigned_today'] == 4
+    schema.save_executors_bulk([dict(executor, id='e2', name='Петр', email='p@x.ru', assigned_today=1)], path)
+    schema.increment_executor_counts_bulk({'e1': 2, 'e2': 1}, path)
+    assert {e['id']: e['assigned_today'] for e in schema.load_executors(path)} == {'e1': 6, 'e2': 2}
+
+    # Сохранение профиля не сбрасывает счетчик, неизмененный профиль не перезаписывается
+    changes = conn.total_changes
+    schema.save_executors_bulk([schema.load_executors(path)[0]], path)
+    assert conn.total_changes == changes
+    schema.save_executors_bulk([dict(executor, daily_limit=7, assigned_today=0)], path)
+    assert conn.total_changes == changes + 1
+    assert schema.load_executors(path)[0]['assigned_today'] == 6
+
+    # Сброс дня - одна строка counter_epoch
+    changes = conn.total_changes
+    schema.reset_executor_counts(path)
+    assert conn.total_changes == changes + 1
+    assert [e['assigned_today'] for e in schema.load_executors(path)] == [0, 0]
+    schema.increment_executor_counts_bulk({'e1': 1}, path)
+    print(f"[RESULT] Счетчики: {[(e['id'], e['assigned_today']) for e in schema.load_executors(path)]}")
+    assert [e['assigned_today'] for e in schema.load_executors(path)] == [1, 0]
+
+    with db.transaction(path):
+        conn.execute("DELETE FROM executors WHERE id = 'e2'")
+    assert conn.execute("SELECT COUNT(*) FROM executor_counters").fetchone()[0] == 1
+    db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Auto Migration", test_auto_migration),
+        ("Cached Statements", test_roundtrip_without_introspection),
+        ("Bulk Save", test_bulk_save),
+        ("Index Migration", test_index_migration),
+        ("Param Columns", test_param_columns),
+        ("Executor Counters", test_executor_counters),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
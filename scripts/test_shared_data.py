@@ -0,0 +1,171 @@
+"""
+Тесты общих для сессий данных дашборда (shared_data.py)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from fairness import FairnessMetrics
+from shared_data import SharedData
+from snapshot import SnapshotService
+
+
+def make_db():
+    path = os.path.join(tempfile.mkdtemp(), 'shared.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+    schema.save_executors_bulk([{'id': 'e1', 'name': 'Иван', 'email': 'i@x.ru', 'department': 'IT',
+                                 'created_at': '2025-01-01'}], path)
+    return path
+
+
+def same_metrics(a, b):
+    return a.keys() == b.keys() and all(abs(a[k] - b[k]) < 1e-9 for k in a)
+
+
+def make_tasks(start, n):
+    return [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+             'created_at': f'2025-01-02T10:00:{i:02d}'} for i in range(start, start + n)]
+
+
+def test_version_invalidation():
+    """Представление общее и перестраивается только после записи в БД"""
+    print("=" * 60)
+    print("TEST 1: Version Invalidation")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 3), path)
+    service = SnapshotService(path, interval_s=0).start()
+    shared = SharedData(path, snapshot=service)
+    try:
+        first = shared.current()
+        assert first.version == service.generation.number
+        assert len(first.executors) == 1 and shared._sync.watermarks['tasks'] == (3, 3)
+
+        # Без записей - тот же объект, без чтения БД
+        service.request_refresh()
+        assert shared.current() is first
+        assert shared.builds == 1
+
+        schema.save_tasks_bulk(make_tasks(3, 2), path)
+        assert shared.current() is first  # снимок сам не обновляется
+        service.request_refresh()
+        second = shared.current()
+        print(f"[RESULT] Версии {first.version} -> {second.version}, построений: {shared.builds}")
+        assert second is not first and second.version == first.version + 1
+        assert shared._sync.watermarks['tasks'] == (5, 5)
+        assert shared.builds == 2
+
+        third = shared.reload()
+        assert third.version == second.version and shared._sync.watermarks['tasks'] == (5, 5)
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_sessions_share_one_copy():
+    """Параллельные сессии получают одно представление, построенное один раз"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Sessions Share One Copy")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 20), path)
+    service = SnapshotService(path, interval_s=0).start()
+    shared = SharedData(path, snapshot=service)
+    views = []
+    barrier = threading.Barrier(8)
+
+    def session():
+        barrier.wait()
+        views.append(shared.current())
+
+    try:
+        threads = [threading.Thread(target=session) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        print(f"[RESULT] Сессий: {len(views)}, построений: {shared.builds}")
+        assert len(views) == 8 and all(v is views[0] for v in views)
+        assert shared.builds == 1
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_fairness_from_counter_changes():
+    """Метрики обновляются по исполнителям из новых назначений, правка профиля - полный проход"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Fairness From Counter Changes")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_executors_bulk([{'id': f'e{i}', 'name': f'E{i}', 'email': f'e{i}@x.ru', 'department': 'IT',
+                                 'daily_limit': 10, 'created_at': '2025-01-01'} for i in range(2, 6)], path)
+    service = SnapshotService(path, interval_s=0).start()
+    shared = SharedData(path, snapshot=service)
+    sync = shared._sync
+    try:
+        shared.current()
+        assert sync.changed_executors is None  # первая загрузка
+
+        schema.save_assignments_bulk([{'id': f'a{i}', 'task_id': f't{i}', 'executor_id': executor_id,
+                                       'assigned_at': '2025-01-02T11:00:00', 'score': 1.0}
+                                      for i, executor_id in enumerate(['e2', 'e2', 'e3'])], path)
+        schema.increment_executor_counts_bulk({'e2': 2, 'e3': 1}, path)
+        service.refresh()
+        view = shared.current()
+        print(f"[RESULT] Изменились: {sorted(sync.changed_executors)}, метрики: {view.metrics['avg_utilization']:.1f}%")
+        assert sync.changed_executors == {'e2', 'e3'}
+        assert same_metrics(view.metrics, FairnessMetrics.from_executors(view.executors).summary())
+
+        # Лимит изменен без назначений - полный проход
+        with db.transaction(path) as conn:
+            conn.execute("UPDATE executors SET daily_limit = 4 WHERE id = 'e3'")
+        service.refresh()
+        view = shared.current()
+        assert sync.changed_executors is None
+        assert same_metrics(view.metrics, FairnessMetrics.from_executors(view.executors).summary())
+        assert view.metrics['max_utilization'] == 25.0
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Version Invalidation", test_version_invalidation),
+        ("Sessions Share One Copy", test_sessions_share_one_copy),
+        ("Fairness From Counter Changes", test_fairness_from_counter_changes),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
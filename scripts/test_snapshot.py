@@ -0,0 +1,180 @@
+"""
+Тесты снимка БД для читателей (snapshot.py)
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import archive_db
+import db
+import schema
+from delta_sync import DeltaSync
+from snapshot import SnapshotService
+
+
+def make_db():
+    path = os.path.join(tempfile.mkdtemp(), 'snapshot.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+    schema.save_executors_bulk([{'id': 'e1', 'name': 'Иван', 'email': 'i@x.ru', 'department': 'IT',
+                                 'created_at': '2025-01-01', 'params': {'location': 'Москва'}}], path)
+    return path
+
+
+def make_tasks(start, n):
+    return [{'id': f't{i}', 'name': f'Заявка {i}', 'category': 'IT', 'priority': 'Средний',
+             'created_at': f'2025-01-02T10:00:{i:02d}'} for i in range(start, start + n)]
+
+
+def test_point_in_time():
+    """Снимок не меняется до refresh и обновляется только при изменениях БД"""
+    print("=" * 60)
+    print("TEST 1: Point In Time")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 3), path)
+    service = SnapshotService(path, interval_s=0).start()
+    try:
+        first = service.generation.number
+        assert not service.refresh()
+
+        schema.save_tasks_bulk(make_tasks(3, 2), path)
+        assert len(service.load_tasks()) == 3
+        assert service.refresh()
+        assert service.generation.number == first + 1
+        assert len(service.load_tasks()) == 5
+
+        # Счетчики исполнителей и генерируемые колонки копируются вместе с БД
+        schema.increment_executor_counts_bulk({'e1': 2}, path)
+        service.refresh()
+        executors = service.load_executors()
+        print(f"[RESULT] Поколение {service.generation.number}, исполнитель: {executors[0]['assigned_today']}")
+        assert executors[0]['assigned_today'] == 2
+        assert service.count_by_param('executors', 'location') == [('Москва', 1)]
+
+        # Снимок только для чтения
+        try:
+            service.connection().execute("DELETE FROM tasks")
+            assert False, "запись в снимок должна быть запрещена"
+        except Exception:
+            pass
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_readers_do_not_block_writer():
+    """Открытое чтение снимка не мешает записи, дельта-синхронизация читает снимок"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Readers And Writer")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 50), path)
+    service = SnapshotService(path, interval_s=0).start()
+    sync = DeltaSync(path, snapshot=service)
+    try:
+        assert sync.sync() and sync.watermarks['tasks'] == (50, 50)
+        assert not sync.sync()
+
+        # Незавершенное чтение в другом потоке
+        cursor = service.connection().execute("SELECT id FROM tasks")
+        cursor.fetchone()
+        done = threading.Event()
+
+        def writer():
+            schema.save_tasks_bulk(make_tasks(50, 10), path)
+            db.close_connection(path)
+            done.set()
+
+        threading.Thread(target=writer).start()
+        assert done.wait(2.0)
+        assert len(cursor.fetchall()) == 49
+
+        service.refresh()
+        assert sync.sync()
+        print(f"[RESULT] Водяной знак: {sync.watermarks['tasks']}, полных перезагрузок: {sync.full_reloads}")
+        assert sync.watermarks['tasks'] == (60, 60) and len(sync.appended['tasks']) == 10
+        assert sync.full_reloads == 2  # только первая синхронизация tasks и assignments
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_archive_copied_on_change():
+    """Архив копируется только при изменении, поколения видят его через tasks_all"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Archive Copied On Change")
+    print("=" * 60)
+
+    path = make_db()
+    schema.save_tasks_bulk(make_tasks(0, 4), path)
+    schema.save_assignments_bulk([{'id': f'a{i}', 'task_id': f't{i}', 'executor_id': 'e1',
+                                   'assigned_at': '2025-01-02T11:00:00', 'score': 1.0} for i in range(4)], path)
+    archive_db.archive(path, cutoff='2025-01-03T00:00:00')
+    service = SnapshotService(path, interval_s=0).start()
+    try:
+        first = service.generation
+        assert first.schema.has_archive and first.archive_copied
+        assert len(service.load_tasks()) == 0
+        assert len(service.load_tasks(include_archive=True)) == 4
+
+        # Новые горячие строки - архив берется у прошлого поколения
+        schema.save_tasks_bulk(make_tasks(4, 2), path)
+        assert service.refresh()
+        second = service.generation
+        assert not second.archive_copied and second.archive is first.archive
+        assert len(service.load_tasks()) == 2
+        assert len(service.load_assignments(include_archive=True)) == 4
+        indexes = {r[0] for r in service.connection().execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        assert 'idx_assignments_task_id' in indexes
+
+        # Архивация меняет отпечаток - архив копируется заново
+        schema.save_assignments_bulk([{'id': 'a4', 'task_id': 't4', 'executor_id': 'e1',
+                                       'assigned_at': '2025-01-02T11:00:00', 'score': 1.0}], path)
+        archive_db.archive(path, cutoff='2025-01-03T00:00:00')
+        assert service.refresh()
+        third = service.generation
+        print(f"[RESULT] Копий архива: {sum(g.archive_copied for g in (first, second, third))} из 3 поколений")
+        assert third.archive_copied and third.archive is not first.archive
+        assert len(service.load_tasks()) == 1
+        assert len(service.load_tasks(include_archive=True)) == 6
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Point In Time", test_point_in_time),
+        ("Readers And Writer", test_readers_do_not_block_writer),
+        ("Archive Copied On Change", test_archive_copied_on_change),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,178 @@
+"""
+Тесты кольцевых буферов скорости заявок и назначений (time_series.py)
+"""
+
+import os
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+# Добавляем путь к scripts
+sys.path.insert(0, os.path.dirname(__file__))
+import db
+import schema
+from shared_data import SharedData
+from snapshot import SnapshotService
+from time_series import TimeSeriesStore
+
+
+def test_ring_buffers():
+    """Окна по разрешениям, вытеснение старых ячеек"""
+    print("=" * 60)
+    print("TEST 1: Ring Buffers")
+    print("=" * 60)
+
+    now = 1_699_999_200.0  # начало минуты и часа
+    store = TimeSeriesStore()
+    store.record('tasks', now - 0.5)          # прошлая минута
+    store.record('tasks', now + 10, n=3)      # текущая минута
+    store.record('tasks', now - 120)          # две минуты назад
+    store.record('tasks', now - 2 * 86400)    # двое суток назад
+    current = now + 30
+
+    assert store.count_since('tasks', 60, now=current) == 4
+    assert store.count_since('tasks', 300, now=current) == 5
+    assert store.count_since('tasks', 86400, now=current) == 5
+    assert store.count_since('tasks', 7 * 86400, now=current) == 6
+    assert store.count_since('assignments', 3600, now=current) == 0
+
+    points = store.window('tasks', '1m', 6, now=current)
+    assert [count for _, count in points] == [0, 0, 0, 1, 1, 3]
+    assert len(store.window('tasks', '1h', 168, now=current)) == 168
+
+    # Через сутки минутный буфер переиспользует слоты: старые значения не видны
+    later = current + 86400
+    store.record('tasks', later)
+    assert [count for _, count in store.window('tasks', '1m', 6, now=later)] == [0, 0, 0, 0, 0, 1]
+    store.record('tasks', now)  # старше буфера - не портит текущие ячейки
+    assert store.count_since('tasks', 60, now=later) == 1
+    print(f"[RESULT] Окно 1m: {[count for _, count in points]}")
+
+
+def test_shared_data_series():
+    """Восстановление из SQL при первой загрузке и дописывание новых строк"""
+    print("\n" + "=" * 60)
+    print("TEST 2: Shared Data Series")
+    print("=" * 60)
+
+    path = os.path.join(tempfile.mkdtemp(), 'series.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+
+    now = datetime.now()
+    offsets = [timedelta(seconds=5), timedelta(seconds=20), timedelta(minutes=10), timedelta(hours=5),
+               timedelta(days=3), timedelta(days=30)]
+    schema.save_tasks_bulk([{'id': f't{i}', 'name': 'Заявка', 'category': 'IT', 'priority': 'Средний',
+                             'created_at': (now - offset).isoformat()} for i, offset in enumerate(offsets)], path)
+
+    service = SnapshotService(path, interval_s=0).start()
+    shared = SharedData(path, snapshot=service)
+    try:
+        shared.current()
+        series = shared.series
+        assert series.rebuilds == 1
+        assert series.count_since('tasks', 60) == 2
+        assert series.count_since('tasks', 3600) == 3
+        assert series.count_since('tasks', 86400) == 4
+        assert series.count_since('tasks', 7 * 86400) == 5
+
+        schema.save_tasks_bulk([{'id': 'new', 'name': 'Заявка', 'category': 'IT', 'priority': 'Средний',
+                                 'created_at': datetime.now().isoformat()}], path)
+        schema.save_assignments_bulk([{'id': 'a1', 'task_id': 'new', 'executor_id': 'e1',
+                                       'assigned_at': datetime.now().isoformat(), 'score': 1.0}], path)
+        service.refresh()
+        shared.current()
+        print(f"[RESULT] За минуту: {series.count_since('tasks', 60)}, перестроений: {series.rebuilds}")
+        assert series.rebuilds == 1  # новые строки дописаны без запроса
+        assert series.count_since('tasks', 60) == 3
+        assert series.count_since('assignments', 60) == 1
+
+        shared.reload()
+        assert series.rebuilds == 2 and series.count_since('tasks', 60) == 3
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def test_deletes_between_generations():
+    """Удаления и вставки между поколениями снимка не теряют новые строки"""
+    print("\n" + "=" * 60)
+    print("TEST 3: Deletes Between Generations")
+    print("=" * 60)
+
+    path = os.path.join(tempfile.mkdtemp(), 'series_delete.db')
+    with db.transaction(path) as conn:
+        conn.execute("CREATE TABLE tasks (id TEXT PRIMARY KEY, name TEXT NOT NULL, category TEXT, "
+                     "priority TEXT, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE executors (id TEXT PRIMARY KEY, name TEXT NOT NULL, email TEXT NOT NULL, "
+                     "department TEXT, skills TEXT, active INTEGER DEFAULT 1, daily_limit INTEGER DEFAULT 10, "
+                     "assigned_today INTEGER DEFAULT 0, created_at TEXT, data TEXT, params TEXT)")
+        conn.execute("CREATE TABLE assignments (id TEXT PRIMARY KEY, task_id TEXT, executor_id TEXT, "
+                     "assigned_at TEXT, score REAL)")
+
+    def make_tasks(start, n, age=timedelta(0)):
+        return [{'id': f't{i}', 'name': 'Заявка', 'category': 'IT', 'priority': 'Средний',
+                 'created_at': (datetime.now() - age).isoformat()} for i in range(start, start + n)]
+
+    # 3 старые заявки (вне часового окна) и 7 новых
+    schema.save_tasks_bulk(make_tasks(0, 3, timedelta(days=30)) + make_tasks(3, 7), path)
+    service = SnapshotService(path, interval_s=0).start()
+    shared = SharedData(path, snapshot=service)
+    sync = shared._sync
+    try:
+        shared.current()
+        series = shared.series
+        assert sync.watermarks['tasks'] == (10, 10)
+        assert series.count_since('tasks', 3600) == 7
+
+        # Между поколениями: архивирование старых заявок и 5 новых
+        with db.transaction(path) as conn:
+            conn.execute("DELETE FROM tasks WHERE id IN ('t0', 't1', 't2')")
+        schema.save_tasks_bulk(make_tasks(10, 5), path)
+        service.refresh()
+        shared.current()
+        print(f"[RESULT] Водяной знак: {sync.watermarks['tasks']}, за час: {series.count_since('tasks', 3600)}")
+        # rowid снимка совпадают с БД: удаления видны, ряд перестраивается
+        assert sync.watermarks['tasks'] == (15, 12)
+        assert sync.appended['tasks'] is None and series.rebuilds == 2
+        assert series.count_since('tasks', 3600) == 12
+
+        schema.save_tasks_bulk(make_tasks(15, 4), path)
+        service.refresh()
+        shared.current()
+        assert len(sync.appended['tasks']) == 4 and series.rebuilds == 2
+        assert series.count_since('tasks', 3600) == 16
+    finally:
+        service.stop()
+        db.close_connection(path)
+
+
+def main():
+    """Запуск всех тестов"""
+    tests = [
+        ("Ring Buffers", test_ring_buffers),
+        ("Shared Data Series", test_shared_data_series),
+        ("Deletes Between Generations", test_deletes_between_generations),
+    ]
+
+    failed = 0
+    for name, test_func in tests:
+        try:
+            test_func()
+            print(f"[OK] {name}")
+        except Exception as e:
+            print(f"[FAIL] {name}: {e!r}")
+            failed += 1
+
+    print(f"\nTotal: {len(tests) - failed}/{len(tests)} tests passed")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    exit(main())
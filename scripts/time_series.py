@@ -0,0 +1,206 @@
+"""
+Time Series - Скорость поступления заявок и назначений в кольцевых буферах
+
+Графики «последние 5 минут» и метрика «новых за минуту» разбирали
+datetime.fromisoformat для каждой заявки и каждого назначения истории на
+каждом обновлении дашборда. TimeSeriesStore хранит счетчики событий в
+кольцевых буферах трех разрешений:
+- 1s - последний час по секундам
+- 1m - последние сутки по минутам
+- 1h - последняя неделя по часам
+
+Событие увеличивает по одной ячейке в каждом буфере (O(1)), окно из N
+точек читается за O(N) независимо от размера истории. Буферы
+заполняются новыми строками при синхронизации (shared_data.py), а при
+первой загрузке и после удалений восстанавливаются GROUP BY запросами
+по created_at / assigned_at (вместе с архивом для часового буфера).
+
+Время - локальное, как в ISO-строках created_at/assigned_at.
+"""
+
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+# Разрешение -> (секунд в ячейке, ячеек в буфере, длина префикса ISO-строки)
+RESOLUTIONS = {
+    '1s': (1, 3600, 19),
+    '1m': (60, 24 * 60, 16),
+    '1h': (3600, 7 * 24, 13),
+}
+
+# Окна графиков дашборда: подпись -> (разрешение, точек)
+WINDOWS = {
+    'Последняя минута': ('1s', 60),
+    'Последние 5 минут': ('1m', 6),
+    'Последний час': ('1m', 60),
+    'Последние сутки': ('1h', 24),
+    'Последняя неделя': ('1h', 7 * 24),
+}
+
+# Подпись точки графика по разрешению
+TIME_FORMATS = {'1s': '%H:%M:%S', '1m': '%H:%M', '1h': '%d.%m %H:00'}
+
+# Ряд -> (таблица, колонка времени, архивная таблица)
+SERIES = {
+    'tasks': ('tasks', 'created_at', 'tasks_archive'),
+    'assignments': ('assignments', 'assigned_at', 'assignments_archive'),
+}
+
+# Дополнение префикса ISO-строки до секунд
+_ISO_SUFFIX = {19: '', 16: ':00', 13: ':00:00'}
+
+
+class RingBuffer:
+    """Счетчики последних slots ячеек длиной resolution секунд"""
+
+    def __init__(self, resolution: int, slots: int):
+        self.resolution = resolution
+        self.slots = slots
+        self._counts = [0] * slots
+        # Номер ячейки (время // resolution), которой сейчас принадлежит слот
+        self._buckets = [-1] * slots
+
+    def add(self, timestamp: float, n: int = 1) -> None:
+        """Учесть n событий в момент timestamp"""
+        bucket = int(timestamp // self.resolution)
+        slot = bucket % self.slots
+        current = self._buckets[slot]
+        if current != bucket:
+            if bucket < current:
+                return  # старше буфера
+            self._buckets[slot] = bucket
+            self._counts[slot] = 0
+        self._counts[slot] += n
+
+    def window(self, buckets: int, now: float) -> List[Tuple[float, int]]:
+        """
+        Последние buckets ячеек, включая текущую (O(buckets))
+
+        Returns:
+            [(начало ячейки, количество)] от старых к новым
+        """
+        last = int(now // self.resolution)
+        result = []
+        for bucket in range(last - min(buckets, self.slots) + 1, last + 1):
+            slot = bucket % self.slots
+            count = self._counts[slot] if self._buckets[slot] == bucket else 0
+            result.append((bucket * self.resolution, count))
+        return result
+
+
+class TimeSeriesStore:
+    """Ряды событий (заявки, назначения) в буферах 1s/1m/1h"""
+
+    def __init__(self):
+        self._series: Dict[str, Dict[str, RingBuffer]] = {
+            name: self._make_rings() for name in SERIES
+        }
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+
+    @staticmethod
+    def _make_rings() -> Dict[str, RingBuffer]:
+        return {name: RingBuffer(seconds, slots) for name, (seconds, slots, _) in RESOLUTIONS.items()}
+
+    # === Запись ===
+
+    def record(self, name: str, timestamp: float, n: int = 1) -> None:
+        """Учесть n событий ряда name в момент timestamp (время эпохи)"""
+        with self._lock:
+            for ring in self._series[name].values():
+                ring.add(timestamp, n)
+
+    def record_iso(self, name: str, values: Iterable[str]) -> int:
+        """
+        Учесть события по ISO-строкам времени (новые строки синхронизации)
+
+        Returns:
+            Количество учтенных событий
+        """
+        recorded = 0
+        with self._lock:
+            rings = self._series[name].values()
+            for value in values:
+                try:
+                    timestamp = datetime.fromisoformat(value).timestamp()
+                except (TypeError, ValueError):
+                    continue
+                for ring in rings:
+                    ring.add(timestamp)
+                recorded += 1
+        return recorded
+
+    def rebuild(self, conn, schema, max_rowids: Dict[str, int] = None, now: float = None) -> None:
+        """
+        Заполнить буферы заново GROUP BY запросами к БД
+
+        Args:
+            conn: Соединение с БД или снимком
+            schema: Schema этого соединения (архив - если has_archive)
+            max_rowids: Ряд -> максимальный rowid горячей таблицы (строки новее
+                будут учтены при следующей синхронизации через record_iso)
+            now: Текущее время (по умолчанию time.time())
+        """
+        now = time.time() if now is None else now
+        max_rowids = max_rowids or {}
+        series = {name: self._make_rings() for name in SERIES}
+        for name, (table, column, archive_table) in SERIES.items():
+            rowid_filter = " AND rowid <= ?" if name in max_rowids else ""
+            for resolution, (seconds, slots, length) in RESOLUTIONS.items():
+                ring = series[name][resolution]
+                since = datetime.fromtimestamp(now - seconds * slots).isoformat()
+                sources = [(table, rowid_filter, (since, max_rowids[name]) if rowid_filter else (since,))]
+                if schema.has_archive and resolution == '1h':
+                    sources.append((archive_table, "", (since,)))
+                for source, extra, params in sources:
+                    rows = conn.execute(
+                        f"SELECT substr({column}, 1, {length}) AS bucket, COUNT(*) FROM {source} "
+                        f"WHERE {column} >= ?{extra} GROUP BY bucket",
+                        params,
+                    ).fetchall()
+                    for bucket, count in rows:
+                        try:
+                            timestamp = datetime.fromisoformat(bucket + _ISO_SUFFIX[length]).timestamp()
+                        except (TypeError, ValueError):
+                            continue
+                        ring.add(timestamp, count)
+        with self._lock:
+            self._series = series
+            self.rebuilds += 1
+
+    # === Чтение ===
+
+    def window(self, name: str, resolution: str = '1m', buckets: int = 5,
+               now: float = None) -> List[Tuple[datetime, int]]:
+        """
+        Последние buckets точек ряда с заданным разрешением (O(buckets))
+
+        Args:
+            name: Ряд ('tasks' или 'assignments')
+            resolution: '1s', '1m' или '1h'
+            buckets: Количество точек, включая текущую неполную
+            now: Текущее время (по умолчанию time.time())
+
+        Returns:
+            [(начало интервала, количество)] от старых к новым
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            points = self._series[name][resolution].window(buckets, now)
+        return [(datetime.fromtimestamp(start), count) for start, count in points]
+
+    def count_since(self, name: str, seconds: int, now: float = None) -> int:
+        """
+        Событий ряда за последние seconds секунд (по самому точному буферу,
+        покрывающему окно)
+        """
+        now = time.time() if now is None else now
+        for resolution, (size, slots, _) in RESOLUTIONS.items():
+            if seconds <= size * slots:
+                buckets = max(1, -(-seconds // size))
+                with self._lock:
+                    points = self._series[name][resolution].window(buckets, now)
+                return sum(count for _, count in points)
+        return self.count_since(name, size * slots, now)
@@ -2,23 +2,33 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from datetime import datetime, timedelta
+from datetime import datetime
 import json
 import uuid
 import os
-import sqlite3
-import random
 import time
 import threading
 import sys
+from collections import deque
 
 # Добавляем путь к scripts для импорта Rule Engine
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'scripts'))
-try:
-    from rule_engine import RuleEngine
-    RULE_ENGINE_AVAILABLE = True
-except ImportError:
-    RULE_ENGINE_AVAILABLE = False
+from archive_db import archive, archive_cutoff, count_archivable
+from dashboard_queries import CHART_EXECUTOR_LIMIT, DashboardQueries
+from db import DB_PATH, checkpoint, close_connection
+from db_writer import get_writer
+from dispatcher import RULE_ENGINE_AVAILABLE, Dispatcher, load_rule_engine
+from export_jobs import DONE as EXPORT_DONE, QUEUED as EXPORT_QUEUED, RUNNING as EXPORT_RUNNING
+from export_jobs import available_formats, get_export_runner
+from load_test_control import COMPLETED, ERROR, RUNNING, get_controller
+from repository import SQLiteRepository
+from schema import get_schema
+from sampling_benchmark import DEFAULT_D_VALUES, benchmark_sampling
+from shared_data import SharedData
+from snapshot import get_snapshot
+from task_generator import generate_task
+from time_series import TIME_FORMATS, WINDOWS
+if not RULE_ENGINE_AVAILABLE:
     print("[WARN] Rule Engine не найден, используется простой алгоритм")
 
 # Конфигурация страницы
@@ -68,387 +78,85 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Хранилище: SQLite
-DB_PATH = os.environ.get('SQLITE_PATH', os.path.join(os.path.dirname(__file__), 'ais.db'))
-
-def get_sqlite_conn():
-    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Хранилище: SQLite через Repository (см. scripts/repository.py)
+repo = SQLiteRepository(DB_PATH)
+# Нагрузочный тест: прогресс и остановка в памяти процесса, в БД - только итог
+load_test = get_controller(DB_PATH, repo)
 
 def init_sqlite():
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS tasks (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        category TEXT,
-        priority TEXT,
-        created_at TEXT,
-        data TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS executors (
-        id TEXT PRIMARY KEY,
-        name TEXT NOT NULL,
-        email TEXT NOT NULL,
-        department TEXT,
-        skills TEXT,
-        active INTEGER DEFAULT 1,
-        daily_limit INTEGER DEFAULT 10,
-        assigned_today INTEGER DEFAULT 0,
-        created_at TEXT,
-        data TEXT
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS assignments (
-        id TEXT PRIMARY KEY,
-        task_id TEXT,
-        executor_id TEXT,
-        assigned_at TEXT,
-        score REAL
-    )
-    """)
-    cur.execute("""
-    CREATE TABLE IF NOT EXISTS load_test_status (
-        id INTEGER PRIMARY KEY,
-        status TEXT,
-        progress REAL,
-        current INTEGER,
-        total INTEGER,
-        assigned INTEGER,
-        elapsed REAL,
-        performance REAL,
-        message TEXT,
-        updated_at TEXT
-    )
-    """)
-    conn.commit()
-    conn.close()
+    repo.init_storage()
 
 def get_load_test_status():
-    """Получить статус нагрузочного теста из БД"""
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM load_test_status WHERE id = 1")
-    row = cur.fetchone()
-    conn.close()
-    if row:
-        return {
-            'status': row['status'],
-            'progress': row['progress'] or 0,
-            'current': row['current'] or 0,
-            'total': row['total'] or 0,
-            'assigned': row['assigned'] or 0,
-            'elapsed': row['elapsed'] or 0,
-            'performance': row['performance'] or 0,
-            'message': row['message'] or ''
-        }
-    return None
-
-def set_load_test_status(status, progress=0, current=0, total=0, assigned=0, elapsed=0, performance=0, message=''):
-    """Установить статус нагрузочного теста в БД"""
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO load_test_status (id, status, progress, current, total, assigned, elapsed, performance, message, updated_at)
-        VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ON CONFLICT(id) DO UPDATE SET
-            status=excluded.status,
-            progress=excluded.progress,
-            current=excluded.current,
-            total=excluded.total,
-            assigned=excluded.assigned,
-            elapsed=excluded.elapsed,
-            performance=excluded.performance,
-            message=excluded.message,
-            updated_at=excluded.updated_at
-    """, (status, progress, current, total, assigned, elapsed, performance, message, datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
-
-def _json_dumps(obj):
-    try:
-        return json.dumps(obj, ensure_ascii=False)
-    except Exception:
-        return '{}'
-
-def _json_loads(s):
-    if not s:
-        return {}
-    try:
-        return json.loads(s)
-    except Exception:
-        return {}
-
-def load_tasks_from_db():
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    
-    # Проверяем наличие колонки params
-    cur.execute("PRAGMA table_info(tasks)")
-    columns = [col[1] for col in cur.fetchall()]
-    has_params = 'params' in columns
-    
-    if has_params:
-        cur.execute("SELECT id,name,category,priority,created_at,data,params FROM tasks ORDER BY datetime(created_at) DESC")
-    else:
-        cur.execute("SELECT id,name,category,priority,created_at,data FROM tasks ORDER BY datetime(created_at) DESC")
-    
-    rows = cur.fetchall()
-    conn.close()
-    tasks = []
-    for r in rows:
-        t = {
-            'id': r['id'],
-            'name': r['name'],
-            'category': r['category'],
-            'priority': r['priority'],
-            'created_at': r['created_at'] or datetime.now().isoformat()
-        }
-        
-        # Загружаем дополнительные данные из data (для обратной совместимости)
-        t.update(_json_loads(r['data']))
-        
-        # Загружаем params если колонка есть
-        if has_params and r['params']:
-            params = _json_loads(r['params'])
-            if params:
-                t['params'] = params
-        
-        tasks.append(t)
-    return tasks
+    """Текущий статус нагрузочного теста (из памяти процесса)"""
+    return load_test.snapshot()
 
 def load_executors_from_db():
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    
-    # Проверяем наличие колонки params
-    cur.execute("PRAGMA table_info(executors)")
-    columns = [col[1] for col in cur.fetchall()]
-    has_params = 'params' in columns
-    
-    if has_params:
-        cur.execute("SELECT id,name,email,department,skills,active,daily_limit,assigned_today,created_at,data,params FROM executors ORDER BY name")
-    else:
-        cur.execute("SELECT id,name,email,department,skills,active,daily_limit,assigned_today,created_at,data FROM executors ORDER BY name")
-    
-    rows = cur.fetchall()
-    conn.close()
-    executors = []
-    for r in rows:
-        e = {
-            'id': r['id'],
-            'name': r['name'],
-            'email': r['email'],
-            'department': r['department'],
-            'skills': r['skills'].split(',') if r['skills'] else [],
-            'active': bool(r['active']),
-            'daily_limit': r['daily_limit'],
-            'assigned_today': r['assigned_today'],
-            'created_at': r['created_at'] or datetime.now().isoformat()
-        }
-        
-        # Загружаем дополнительные данные из data (для обратной совместимости)
-        e.update(_json_loads(r['data']))
-        
-        # Загружаем params если колонка есть
-        if has_params and r['params']:
-            params = _json_loads(r['params'])
-            if params:
-                e['params'] = params
-        
-        executors.append(e)
-    return executors
-
-def load_assignments_from_db():
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT id,task_id,executor_id,assigned_at,score FROM assignments ORDER BY datetime(assigned_at) DESC")
-    rows = cur.fetchall()
-    conn.close()
-    return [{
-        'id': r['id'],
-        'task_id': r['task_id'],
-        'executor_id': r['executor_id'],
-        'assigned_at': r['assigned_at'] or datetime.now().isoformat(),
-        'score': r['score'] if r['score'] is not None else 0.0
-    } for r in rows]
-
-def save_task_to_db(task):
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    
-    # Проверяем наличие колонки params
-    cur.execute("PRAGMA table_info(tasks)")
-    columns = [col[1] for col in cur.fetchall()]
-    has_params = 'params' in columns
-    
-    base_keys = ['id','name','category','priority','created_at','params']
-    data = {k: v for k, v in task.items() if k not in base_keys}
-    
-    # Получаем params
-    params = task.get('params', {})
-    params_json = _json_dumps(params) if params else '{}'
-    
-    if has_params:
-        # Новая схема с колонкой params
-        cur.execute("""
-            INSERT INTO tasks(id,name,category,priority,created_at,data,params)
-            VALUES(?,?,?,?,?,?,?)
-            ON CONFLICT(id) DO UPDATE SET
-                name=excluded.name,
-                category=excluded.category,
-                priority=excluded.priority,
-                created_at=excluded.created_at,
-                data=excluded.data,
-                params=excluded.params
-        """, (
-            task['id'], task['name'], task.get('category',''), task.get('priority',''), 
-            task['created_at'], _json_dumps(data), params_json
-        ))
-    else:
-        # Старая схема без params
-        cur.execute("""
-            INSERT INTO tasks(id,name,category,priority,created_at,data)
-            VALUES(?,?,?,?,?,?)
-            ON CONFLICT(id) DO UPDATE SET
-                name=excluded.name,
-                category=excluded.category,
-                priority=excluded.priority,
-                created_at=excluded.created_at,
-                data=excluded.data
-        """, (
-            task['id'], task['name'], task.get('category',''), task.get('priority',''), 
-            task['created_at'], _json_dumps(data)
-        ))
-    
-    conn.commit()
-    conn.close()
-    return True
+    return repo.load_executors()
 
 def save_executor_to_db(executor):
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    
-    # Проверяем наличие колонки params
-    cur.execute("PRAGMA table_info(executors)")
-    columns = [col[1] for col in cur.fetchall()]
-    has_params = 'params' in columns
-    
-    base_keys = ['id','name','email','department','skills','active','daily_limit','assigned_today','created_at','params']
-    data = {k: v for k, v in executor.items() if k not in base_keys}
-    skills_str = ','.join(executor.get('skills', [])) if isinstance(executor.get('skills'), list) else executor.get('skills', '')
-    
-    # Получаем params
-    params = executor.get('params', {})
-    params_json = _json_dumps(params) if params else '{}'
-    
-    if has_params:
-        # Новая схема с колонкой params
-        cur.execute("""
-            INSERT INTO executors(id,name,email,department,skills,active,daily_limit,assigned_today,created_at,data,params)
-            VALUES(?,?,?,?,?,?,?,?,?,?,?)
-            ON CONFLICT(id) DO UPDATE SET
-                name=excluded.name,
-                email=excluded.email,
-                department=excluded.department,
-                skills=excluded.skills,
-                active=excluded.active,
-                daily_limit=excluded.daily_limit,
-                assigned_today=excluded.assigned_today,
-                created_at=excluded.created_at,
-                data=excluded.data,
-                params=excluded.params
-        """, (
-            executor['id'], executor['name'], executor['email'], executor.get('department',''), skills_str, 
-            1 if executor.get('active', True) else 0, executor.get('daily_limit', 10), 
-            executor.get('assigned_today', 0), executor['created_at'], _json_dumps(data), params_json
-        ))
-    else:
-        # Старая схема без params (для обратной совместимости)
-        cur.execute("""
-            INSERT INTO executors(id,name,email,department,skills,active,daily_limit,assigned_today,created_at,data)
-            VALUES(?,?,?,?,?,?,?,?,?,?)
-            ON CONFLICT(id) DO UPDATE SET
-                name=excluded.name,
-                email=excluded.email,
-                department=excluded.department,
-                skills=excluded.skills,
-                active=excluded.active,
-                daily_limit=excluded.daily_limit,
-                assigned_today=excluded.assigned_today,
-                created_at=excluded.created_at,
-                data=excluded.data
-        """, (
-            executor['id'], executor['name'], executor['email'], executor.get('department',''), skills_str, 
-            1 if executor.get('active', True) else 0, executor.get('daily_limit', 10), 
-            executor.get('assigned_today', 0), executor['created_at'], _json_dumps(data)
-        ))
-    
-    conn.commit()
-    conn.close()
-    return True
-
-def save_assignment_to_db(assignment):
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("""
-        INSERT INTO assignments(id,task_id,executor_id,assigned_at,score)
-        VALUES(?,?,?,?,?)
-        ON CONFLICT(id) DO UPDATE SET
-            task_id=excluded.task_id,
-            executor_id=excluded.executor_id,
-            assigned_at=excluded.assigned_at,
-            score=excluded.score
-    """, (
-        assignment['id'], assignment['task_id'], assignment['executor_id'], assignment['assigned_at'], assignment.get('score', 0.0)
-    ))
-    conn.commit()
-    conn.close()
+    repo.save_executor(executor)
     return True
 
 def delete_executor_from_db(executor_id):
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM assignments WHERE executor_id=?", (executor_id,))
-    cur.execute("DELETE FROM executors WHERE id=?", (executor_id,))
-    conn.commit()
-    conn.close()
+    repo.delete_executor(executor_id)
     return True
 
 def clear_all_data_in_db():
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("DELETE FROM assignments")
-    cur.execute("DELETE FROM tasks")
-    cur.execute("UPDATE executors SET assigned_today=0")
-    conn.commit()
-    conn.close()
+    repo.clear_tasks_and_assignments()
     return True
 
 def reset_daily_counts_in_db():
-    conn = get_sqlite_conn()
-    cur = conn.cursor()
-    cur.execute("UPDATE executors SET assigned_today=0")
-    conn.commit()
-    conn.close()
+    repo.reset_daily_counts()
     return True
 
+# Данные дашборда: одна копия на процесс, общая для всех сессий
+@st.cache_resource
+def get_shared_data():
+    """Общие данные сессий (scripts/shared_data.py), читаются из снимка БД"""
+    return SharedData(DB_PATH, snapshot=get_snapshot(DB_PATH))
+
+@st.cache_resource
+def get_dashboard_queries():
+    """Агрегаты дашборда в SQL по снимку БД (scripts/dashboard_queries.py)"""
+    return DashboardQueries(get_snapshot(DB_PATH))
+
+def current_data():
+    """Текущее представление общих данных (только чтение, без обращения к БД)"""
+    return get_shared_data().current()
+
 # Инициализация состояния сессии
 def init_session_state():
     if 'db_initialized' not in st.session_state:
         init_sqlite()
         st.session_state.db_initialized = True
-    if 'tasks' not in st.session_state:
-        st.session_state.tasks = load_tasks_from_db()
-    if 'executors' not in st.session_state:
-        st.session_state.executors = load_executors_from_db()
-    if 'assignments' not in st.session_state:
-        st.session_state.assignments = load_assignments_from_db()
+    if 'data_version' not in st.session_state:
+        refresh_session_data()
+        # Заявки, оставшиеся нераспределенными до старта сессии
+        st.session_state.auto_assign_pending = True
+
+def refresh_session_data(full=False):
+    """
+    Обновить общие данные и запомнить их версию в сессии
+
+    Снимок БД (snapshot.py) копирует фоновый поток; здесь он только получает
+    запрос на обновление (записи этой сессии появятся в следующем поколении),
+    а представление строится по уже опубликованному поколению - одно на все
+    сессии и только при смене версии. full=True - полная перезагрузка с
+    синхронным обновлением снимка (после правок строк).
+    В session_state хранится только номер версии, сами данные - current_data().
+
+    Returns:
+        False если данные не менялись с прошлого обновления этой сессии
+    """
+    shared = get_shared_data()
+    if full:
+        view = shared.reload()
+    else:
+        shared.snapshot.request_refresh()
+        view = shared.current()
+    changed = full or view.version != st.session_state.get('data_version')
+    st.session_state.data_version = view.version
+    return changed
 
 # Заголовок приложения
 def render_header():
@@ -488,330 +196,188 @@ def render_main_menu():
     return st.session_state.current_page
 
 # Дашборд распределения
-def _aggregate_per_minute(items, timestamp_key, window_minutes=5):
-    now = datetime.now()
-    start = now - timedelta(minutes=window_minutes)
-    buckets = {}
-    for i in range(window_minutes + 1):
-        t = (start + timedelta(minutes=i)).replace(second=0, microsecond=0)
-        buckets[t] = 0
-    for it in items:
-        try:
-            ts = datetime.fromisoformat(it.get(timestamp_key, now.isoformat()))
-            ts0 = ts.replace(second=0, microsecond=0)
-            if ts0 >= start:
-                buckets[ts0] = buckets.get(ts0, 0) + 1
-        except Exception:
-            pass
-    times = sorted(buckets.keys())
+def _rate_frame(name, resolution='1m', buckets=6):
+    """Точки ряда событий ('tasks' / 'assignments') из кольцевых буферов (scripts/time_series.py)"""
+    points = get_shared_data().series.window(name, resolution, buckets)
+    time_format = TIME_FORMATS[resolution]
     return pd.DataFrame({
-        'Минута': [t.strftime('%H:%M') for t in times],
-        'Количество': [buckets[t] for t in times],
+        'Время': [start.strftime(time_format) for start, _ in points],
+        'Количество': [count for _, count in points],
     })
 
-def export_dashboard_to_excel():
+def _rate_points(name):
+    """Точки ряда событий за последние 5 минут для листов экспорта"""
+    resolution, buckets = WINDOWS['Последние 5 минут']
+    points = get_shared_data().series.window(name, resolution, buckets)
+    return [(start.strftime(TIME_FORMATS[resolution]), count) for start, count in points]
+
+def submit_export(fmt, include_archive=False):
     """
-    Экспортирует все метрики дашборда в Excel файл с диаграммами
-    Возвращает байты файла для скачивания
+    Запустить фоновый экспорт (scripts/export_jobs.py) или получить готовый
+    для текущей версии данных
+
+    Returns:
+        ExportJob
     """
-    from io import BytesIO
-    from openpyxl.chart import BarChart, LineChart, PieChart, Reference
-    from openpyxl.chart.label import DataLabelList
-    from openpyxl.utils import get_column_letter
-    
-    tasks = st.session_state.tasks
-    executors = st.session_state.executors
-    assignments = st.session_state.assignments
-    active_executors = [e for e in executors if e.get('active', True)]
-    
-    # Создаем Excel writer
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        
-        # === Лист 1: Общие метрики ===
-        if active_executors:
-            total_assigned = sum(e['assigned_today'] for e in active_executors)
-            avg_load = total_assigned / len(active_executors)
-            
-            # Расчет MAE
-            utilizations = [e['assigned_today'] / e['daily_limit'] if e['daily_limit'] > 0 else 0 for e in active_executors]
-            avg_util = sum(utilizations) / len(utilizations)
-            mae = sum(abs(u - avg_util) for u in utilizations) / len(utilizations)
-            
-            # Статистика
-            utilizations_pct = [u * 100 for u in utilizations]
-            avg_utilization = sum(utilizations_pct) / len(utilizations_pct)
-            std_utilization = pd.Series(utilizations_pct).std() if len(utilizations_pct) > 1 else 0
-            min_utilization = min(utilizations_pct)
-            max_utilization = max(utilizations_pct)
-            range_utilization = max_utilization - min_utilization
-        else:
-            total_assigned = 0
-            avg_load = 0
-            mae = 0
-            avg_utilization = 0
-            std_utilization = 0
-            min_utilization = 0
-            max_utilization = 0
-            range_utilization = 0
-        
-        recent_tasks = len([t for t in tasks if (datetime.now() - datetime.fromisoformat(t['created_at'])).seconds < 60])
-        
-        df_metrics = pd.DataFrame({
-            'Метрика': [
-                'Всего заявок в системе',
-                'Новых заявок за последнюю минуту',
-                'Активных исполнителей',
-                'Обработано заявок',
-                'Справедливость (MAE)',
-                'Средняя нагрузка (заявок/исполнитель)',
-                '---',
-                'СТАТИСТИКА РАСПРЕДЕЛЕНИЯ:',
-                'Средняя утилизация (%)',
-                'Стандартное отклонение (σ, %)',
-                'Минимальная утилизация (%)',
-                'Максимальная утилизация (%)',
-                'Разброс утилизации (%)',
-            ],
-            'Значение': [
-                len(tasks),
-                recent_tasks,
-                len(active_executors),
-                total_assigned,
-                f'{mae:.3f}',
-                f'{avg_load:.1f}',
-                '',
-                '',
-                f'{avg_utilization:.1f}',
-                f'{std_utilization:.2f}',
-                f'{min_utilization:.1f}',
-                f'{max_utilization:.1f}',
-                f'{range_utilization:.1f}',
-            ]
-        })
-        df_metrics.to_excel(writer, sheet_name='Общие метрики', index=False)
-        
-        # === Лист 2: Детали по исполнителям ===
-        if active_executors:
-            exec_data = []
-            for e in active_executors:
-                utilization = e['assigned_today'] / e['daily_limit'] if e['daily_limit'] > 0 else 0
-                deviation = utilization * 100 - avg_utilization
-                exec_data.append({
-                    'ID': e['id'],
-                    'Исполнитель': e['name'],
-                    'Email': e['email'],
-                    'Отдел': e.get('department', 'N/A'),
-                    'Назначено заявок': e['assigned_today'],
-                    'Дневной лимит': e['daily_limit'],
-                    'Утилизация (%)': round(utilization * 100, 1),
-                    'Отклонение от среднего (%)': round(deviation, 1),
-                    'Навыки': ', '.join(e.get('skills', [])),
-                    'Активен': 'Да' if e.get('active', True) else 'Нет'
-                })
-            df_executors = pd.DataFrame(exec_data)
-            df_executors.to_excel(writer, sheet_name='Исполнители', index=False)
-        
-        # === Лист 3: Поступление заявок (последние 5 минут) ===
-        df_tasks_min = _aggregate_per_minute(tasks, 'created_at', window_minutes=5)
-        df_tasks_min.to_excel(writer, sheet_name='Поступление заявок', index=False)
-        
-        # === Лист 4: Назначения (последние 5 минут) ===
-        df_assign_min = _aggregate_per_minute(assignments, 'assigned_at', window_minutes=5)
-        df_assign_min.to_excel(writer, sheet_name='Назначения', index=False)
-        
-        # === Лист 5: Все назначения ===
-        if assignments:
-            assign_data = []
-            for a in assignments:
-                # Найдем исполнителя и заявку
-                executor = next((e for e in executors if e['id'] == a['executor_id']), None)
-                task = next((t for t in tasks if t['id'] == a['task_id']), None)
-                
-                assign_data.append({
-                    'ID назначения': a['id'],
-                    'ID заявки': a['task_id'],
-                    'Категория заявки': task.get('category', 'N/A') if task else 'N/A',
-                    'Приоритет': task.get('priority', 'N/A') if task else 'N/A',
-                    'ID исполнителя': a['executor_id'],
-                    'Имя исполнителя': executor['name'] if executor else 'N/A',
-                    'Отдел': executor.get('department', 'N/A') if executor else 'N/A',
-                    'Дата назначения': a['assigned_at'],
-                    'Оценка (score)': round(a.get('score', 0), 2)
-                })
-            df_assignments = pd.DataFrame(assign_data)
-            df_assignments.to_excel(writer, sheet_name='Все назначения', index=False)
-        
-        # === СОЗДАНИЕ ДИАГРАММ ===
-        workbook = writer.book
-        
-        # === Диаграмма 1: Утилизация исполнителей (на листе "Исполнители") ===
-        if active_executors and 'Исполнители' in workbook.sheetnames:
-            ws_exec = workbook['Исполнители']
-            
-            # Столбчатая диаграмма утилизации
-            chart1 = BarChart()
-            chart1.title = "Утилизация исполнителей (%)"
-            chart1.y_axis.title = "Утилизация (%)"
-            chart1.x_axis.title = "Исполнитель"
-            
-            # Данные из колонки G (Утилизация)
-            data = Reference(ws_exec, min_col=7, min_row=1, max_row=len(active_executors)+1)
-            categories = Reference(ws_exec, min_col=2, min_row=2, max_row=len(active_executors)+1)
-            
-            chart1.add_data(data, titles_from_data=True)
-            chart1.set_categories(categories)
-            chart1.height = 12
-            chart1.width = 20
-            
-            ws_exec.add_chart(chart1, "L2")
-            
-            # Диаграмма 2: Отклонение от среднего
-            chart2 = BarChart()
-            chart2.title = "Отклонение от среднего (%)"
-            chart2.y_axis.title = "Отклонение (%)"
-            chart2.x_axis.title = "Исполнитель"
-            
-            # Данные из колонки H (Отклонение от среднего)
-            data2 = Reference(ws_exec, min_col=8, min_row=1, max_row=len(active_executors)+1)
-            categories2 = Reference(ws_exec, min_col=2, min_row=2, max_row=len(active_executors)+1)
-            
-            chart2.add_data(data2, titles_from_data=True)
-            chart2.set_categories(categories2)
-            chart2.height = 12
-            chart2.width = 20
-            
-            ws_exec.add_chart(chart2, "L22")
-        
-        # === Диаграмма 3: Поступление заявок (линейный график) ===
-        if 'Поступление заявок' in workbook.sheetnames:
-            ws_tasks = workbook['Поступление заявок']
-            
-            chart3 = LineChart()
-            chart3.title = "Поступление заявок (последние 5 минут)"
-            chart3.y_axis.title = "Количество заявок"
-            chart3.x_axis.title = "Время"
-            
-            data3 = Reference(ws_tasks, min_col=2, min_row=1, max_row=ws_tasks.max_row)
-            categories3 = Reference(ws_tasks, min_col=1, min_row=2, max_row=ws_tasks.max_row)
-            
-            chart3.add_data(data3, titles_from_data=True)
-            chart3.set_categories(categories3)
-            chart3.height = 12
-            chart3.width = 20
-            chart3.style = 10
-            
-            ws_tasks.add_chart(chart3, "E2")
-        
-        # === Диаграмма 4: Назначения (линейный график) ===
-        if 'Назначения' in workbook.sheetnames:
-            ws_assign = workbook['Назначения']
-            
-            chart4 = LineChart()
-            chart4.title = "Назначения (последние 5 минут)"
-            chart4.y_axis.title = "Количество назначений"
-            chart4.x_axis.title = "Время"
-            
-            data4 = Reference(ws_assign, min_col=2, min_row=1, max_row=ws_assign.max_row)
-            categories4 = Reference(ws_assign, min_col=1, min_row=2, max_row=ws_assign.max_row)
-            
-            chart4.add_data(data4, titles_from_data=True)
-            chart4.set_categories(categories4)
-            chart4.height = 12
-            chart4.width = 20
-            chart4.style = 12
-            
-            ws_assign.add_chart(chart4, "E2")
-        
-        # === Диаграмма 5: Распределение по отделам (круговая) ===
-        if active_executors and 'Исполнители' in workbook.sheetnames:
-            ws_exec = workbook['Исполнители']
-            
-            # Создаем сводку по отделам
-            departments = {}
-            for e in active_executors:
-                dept = e.get('department', 'N/A')
-                departments[dept] = departments.get(dept, 0) + e['assigned_today']
-            
-            # Добавляем данные для круговой диаграммы справа от таблицы
-            start_row = len(active_executors) + 5
-            ws_exec.cell(start_row, 11, "Отдел")
-            ws_exec.cell(start_row, 12, "Заявок")
-            
-            row = start_row + 1
-            for dept, count in departments.items():
-                ws_exec.cell(row, 11, dept)
-                ws_exec.cell(row, 12, count)
-                row += 1
-            
-            # Создаем круговую диаграмму
-            chart5 = PieChart()
-            chart5.title = "Распределение заявок по отделам"
-            
-            labels = Reference(ws_exec, min_col=11, min_row=start_row+1, max_row=start_row+len(departments))
-            data5 = Reference(ws_exec, min_col=12, min_row=start_row, max_row=start_row+len(departments))
-            
-            chart5.add_data(data5, titles_from_data=True)
-            chart5.set_categories(labels)
-            chart5.height = 12
-            chart5.width = 15
-            
-            # Добавляем подписи данных
-            chart5.dataLabels = DataLabelList()
-            chart5.dataLabels.showPercent = True
-            
-            ws_exec.add_chart(chart5, "L42")
-    
-    output.seek(0)
-    return output.getvalue()
+    inputs = {}
+    if fmt == 'xlsx':
+        # Книга дашборда: метрики и графики активности на момент запуска
+        inputs = dict(
+            metrics=current_data().metrics,
+            rates={name: _rate_points(name) for name in ('tasks', 'assignments')},
+            recent_tasks=get_shared_data().series.count_since('tasks', 60),
+        )
+    return get_export_runner(get_snapshot(DB_PATH)).submit(fmt, include_archive, **inputs)
+
+@st.cache_data(max_entries=2, show_spinner=False)
+def _export_file_bytes(path):
+    """Содержимое готового файла экспорта (читается один раз, а не на каждом обновлении)"""
+    with open(path, 'rb') as f:
+        return f.read()
+
+def render_export_job():
+    """Прогресс или кнопка скачивания задания экспорта этой сессии"""
+    job_id = st.session_state.get('export_job_id')
+    job = get_export_runner(get_snapshot(DB_PATH)).get(job_id) if job_id else None
+    if job is None:
+        return
+    if job.status in (EXPORT_QUEUED, EXPORT_RUNNING):
+        st.progress(job.progress, text=f"⏳ Экспорт {job.format.upper()}: {job.rows}/{job.total} назначений")
+    elif job.status == EXPORT_DONE:
+        col1, col2 = st.columns([1, 5])
+        with col1:
+            st.download_button(
+                label="⬇️ Скачать файл",
+                data=_export_file_bytes(job.path),
+                file_name=job.file_name,
+                mime=job.mime,
+                use_container_width=True
+            )
+        with col2:
+            st.success(f"✅ {job.format.upper()} готов: {job.rows} назначений за {job.seconds:.1f} сек")
+    else:
+        st.error(f"❌ Ошибка при экспорте: {job.error}")
+
+# Исполнителей на графиках крайних значений и строк таблицы отдела
+OUTLIER_COUNT = 10
+DRILL_DOWN_LIMIT = 500
+
+def render_executor_rollups(queries, avg_utilization):
+    """Графики нагрузки большого пула: размер не зависит от числа исполнителей"""
+    st.caption(f"Исполнителей больше {CHART_EXECUTOR_LIMIT}: показаны гистограмма, "
+               f"крайние значения и отделы, отдельные исполнители - по запросу")
+
+    # Гистограмма: корзины по 10% считаются в SQL
+    fig_hist = px.bar(
+        queries.utilization_histogram(),
+        x='Утилизация',
+        y='Исполнителей',
+        title=f"Распределение утилизации (среднее: {avg_utilization:.1f}%)",
+        color_discrete_sequence=['#1f77b4']
+    )
+    fig_hist.update_layout(showlegend=False, height=350, bargap=0.1)
+    st.plotly_chart(fig_hist, use_container_width=True)
+
+    col_top, col_bottom = st.columns(2)
+    for col, highest, title, color in (
+        (col_top, True, f"Топ-{OUTLIER_COUNT}: самая высокая утилизация", 'red'),
+        (col_bottom, False, f"Топ-{OUTLIER_COUNT}: самая низкая утилизация", 'green'),
+    ):
+        with col:
+            fig = px.bar(
+                queries.executor_outliers(OUTLIER_COUNT, highest=highest),
+                x='Утилизация',
+                y='Исполнитель',
+                orientation='h',
+                hover_data=['Отдел', 'Назначено', 'Лимит'],
+                title=title,
+                labels={'Утилизация': 'Утилизация (%)'},
+                color_discrete_sequence=[color]
+            )
+            fig.add_vline(x=avg_utilization, line_dash="dot", line_color="blue")
+            fig.update_layout(showlegend=False, height=350, yaxis={'autorange': 'reversed'})
+            st.plotly_chart(fig, use_container_width=True)
+
+    # Сводка по отделам (отделов немного, но график все равно ограничен)
+    df_dept = queries.department_load()
+    fig_dept = px.bar(
+        df_dept.head(20),
+        x='Отдел',
+        y='Утилизация',
+        color='Утилизация',
+        color_continuous_scale=['green', 'yellow', 'orange', 'red'],
+        range_color=[0, 100],
+        hover_data=['Исполнителей', 'Назначено', 'Лимит'],
+        title="Средняя утилизация по отделам (%)"
+    )
+    fig_dept.add_hline(y=avg_utilization, line_dash="dot", line_color="blue",
+                       annotation_text=f"Среднее: {avg_utilization:.1f}%", annotation_position="left")
+    fig_dept.update_layout(showlegend=False, height=350)
+    st.plotly_chart(fig_dept, use_container_width=True)
+
+    # Детализация: исполнители одного отдела, только по выбору пользователя
+    st.markdown("### 📋 Детали распределения")
+    department = st.selectbox("Исполнители отдела", df_dept['Отдел'].tolist(), index=None,
+                              key='drill_down_department', placeholder="Выберите отдел")
+    if department is not None:
+        df_display = queries.executor_load(limit=DRILL_DOWN_LIMIT, department=department).copy()
+        df_display['Отклонение'] = df_display['Утилизация'].apply(lambda x: f"{x - avg_utilization:+.1f}%")
+        df_display['Утилизация'] = df_display['Утилизация'].apply(lambda x: f"{x:.1f}%")
+        df_display = df_display[['Исполнитель', 'Назначено', 'Лимит', 'Утилизация', 'Отклонение']]
+        st.dataframe(df_display, use_container_width=True, hide_index=True)
+        if len(df_display) == DRILL_DOWN_LIMIT:
+            st.caption(f"Показаны первые {DRILL_DOWN_LIMIT} исполнителей отдела по имени")
 
 def render_dashboard():
     st.markdown('<h2 class="section-header">⚖️ Распределение заявок</h2>', unsafe_allow_html=True)
     
-    # Кнопка экспорта в Excel
+    # Экспорт: фоновое задание, готовый файл кэшируется до изменения данных
     col_export1, col_export2, col_export3 = st.columns([1, 1, 4])
     with col_export1:
-        if st.button("📥 Экспорт в Excel", use_container_width=True, type="primary"):
+        if st.button("📥 Экспорт", use_container_width=True, type="primary"):
             try:
-                excel_data = export_dashboard_to_excel()
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                filename = f"распределение_заявок_{timestamp}.xlsx"
-                
-                st.download_button(
-                    label="⬇️ Скачать файл",
-                    data=excel_data,
-                    file_name=filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    use_container_width=True
-                )
-                st.success(f"✅ Excel файл готов к скачиванию!")
+                job = submit_export(st.session_state.get('export_format', 'xlsx'),
+                                    include_archive=st.session_state.get('export_include_archive', False))
+                st.session_state.export_job_id = job.id
             except Exception as e:
-                st.error(f"❌ Ошибка при создании Excel: {str(e)}")
+                st.error(f"❌ Ошибка при экспорте: {str(e)}")
     
     with col_export2:
         if st.button("🔄 Обновить данные", use_container_width=True):
-            st.session_state.tasks = load_tasks_from_db()
-            st.session_state.executors = load_executors_from_db()
-            st.session_state.assignments = load_assignments_from_db()
+            refresh_session_data(full=True)
             st.rerun()
     
+    with col_export3:
+        format_col, archive_col = st.columns([1, 2])
+        with format_col:
+            st.selectbox("Формат", available_formats(), key='export_format', format_func=str.upper,
+                         label_visibility="collapsed",
+                         help="XLSX - книга дашборда с диаграммами, CSV и Parquet - все назначения")
+        with archive_col:
+            st.checkbox("🗄️ История назначений с архивом", key='export_include_archive',
+                        help="Включить в экспорт заявки и назначения, перенесенные в архив")
+    
+    render_export_job()
+    
     st.markdown("---")
 
     # Показываем индикатор нагрузочного тестирования если оно запущено
     test_status_data = get_load_test_status()
-    if test_status_data and test_status_data['status'] == 'running':
+    if test_status_data['status'] == RUNNING:
         progress = test_status_data['progress']
         current = test_status_data['current']
         total = test_status_data['total']
         assigned = test_status_data['assigned']
+        performance = test_status_data['performance']
         
         with st.expander("🔄 Нагрузочное тестирование в процессе...", expanded=True):
             st.progress(progress)
-            st.write(f"**Обработано:** {current}/{total} заявок | **Назначено:** {assigned}")
+            st.write(f"**Обработано:** {current}/{total} заявок | **Назначено:** {assigned} | "
+                     f"**Скорость:** {performance:.1f} заявок/сек")
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("⏹️ Остановить"):
-                    set_load_test_status('stopped')
+                    load_test.request_stop()
                     st.rerun()
             with col2:
                 if st.button("🧪 Перейти к тестированию"):
@@ -821,17 +387,14 @@ def render_dashboard():
     # Автообновление
     auto_refresh_enabled = st.session_state.get('auto_refresh', True)
     if auto_refresh_enabled:
-        st.session_state.tasks = load_tasks_from_db()
-        st.session_state.executors = load_executors_from_db()
-        st.session_state.assignments = load_assignments_from_db()
-        
-        # Автоматическое распределение нераспределенных заявок
-        assigned_count = auto_assign_unassigned_tasks()
-        if assigned_count > 0:
-            # Обновляем данные после распределения
-            st.session_state.tasks = load_tasks_from_db()
-            st.session_state.executors = load_executors_from_db()
-            st.session_state.assignments = load_assignments_from_db()
+        # Автоматическое распределение - только если в БД что-то изменилось
+        # Флаг снимается всегда, даже если данные и так изменились
+        auto_assign_pending = st.session_state.pop('auto_assign_pending', False)
+        if refresh_session_data() or auto_assign_pending:
+            assigned_count = auto_assign_unassigned_tasks()
+            if assigned_count > 0:
+                # Обновляем данные после распределения
+                refresh_session_data()
         
         try:
             from streamlit_autorefresh import st_autorefresh
@@ -839,50 +402,46 @@ def render_dashboard():
         except Exception:
             st.markdown('<meta http-equiv="refresh" content="2">', unsafe_allow_html=True)
     
-    # Индикатор автоматического распределения
-    tasks = st.session_state.tasks
-    assignments = st.session_state.assignments
-    assigned_task_ids = set(a['task_id'] for a in assignments)
-    unassigned_count = len([t for t in tasks if t['id'] not in assigned_task_ids])
+    # Индикатор автоматического распределения: итоги считаются в SQL
+    queries = get_dashboard_queries()
+    kpis = queries.kpis()
+    unassigned_count = kpis['unassigned']
     
     if unassigned_count > 0:
         st.info(f"⚠️ Нераспределенных заявок: **{unassigned_count}** (автоматически распределяются)")
         st.markdown("---")
-    elif len(assignments) > 0:
-        st.success(f"✅ Все заявки распределены! Всего назначений: {len(assignments)}")
+    elif kpis['assignments'] > 0:
+        st.success(f"✅ Все заявки распределены! Всего назначений: {kpis['assignments']}")
         st.markdown("---")
     
     # Ключевые метрики
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        recent_tasks = len([t for t in st.session_state.tasks if (datetime.now() - datetime.fromisoformat(t['created_at'])).seconds < 60])
+        recent_tasks = get_shared_data().series.count_since('tasks', 60)
         st.metric(
             label="📊 Всего заявок в системе",
-            value=len(st.session_state.tasks),
+            value=kpis['tasks'],
             delta=f"+{recent_tasks} за последнюю минуту" if recent_tasks > 0 else "Нет новых"
         )
     
+    # Метрики справедливости считаются инкрементально (scripts/fairness.py)
+    metrics = current_data().metrics
+    
     with col2:
-        active_executors = [e for e in st.session_state.executors if e.get('active', True)]
-        total_assigned = sum(e['assigned_today'] for e in active_executors)
         st.metric(
             label="👥 Активных исполнителей",
-            value=len(active_executors),
-            delta=f"Обработано заявок: {total_assigned}",
+            value=metrics['active'],
+            delta=f"Обработано заявок: {metrics['total_assigned']}",
             delta_color="off"
         )
     
     with col3:
-        # Расчет MAE (Mean Absolute Error) для справедливости
-        mae = 0
-        if active_executors:
-            utilizations = [e['assigned_today'] / e['daily_limit'] if e['daily_limit'] > 0 else 0 for e in active_executors]
-            avg_util = sum(utilizations) / len(utilizations)
-            mae = sum(abs(u - avg_util) for u in utilizations) / len(utilizations)
+        # MAE (Mean Absolute Error) утилизации - справедливость распределения
+        if metrics['active']:
             st.metric(
                 label="⚖️ Справедливость (MAE)",
-                value=f"{mae:.3f}",
+                value=f"{metrics['mae']:.3f}",
                 delta="Чем ближе к 0, тем лучше",
                 delta_color="inverse"
             )
@@ -890,11 +449,10 @@ def render_dashboard():
             st.metric(label="⚖️ Справедливость (MAE)", value="N/A")
     
     with col4:
-        if active_executors:
-            avg_load = sum(e['assigned_today'] for e in active_executors) / len(active_executors)
+        if metrics['active']:
             st.metric(
                 label="📈 Средняя нагрузка",
-                value=f"{avg_load:.1f}",
+                value=f"{metrics['avg_load']:.1f}",
                 delta=f"заявок/исполнитель"
             )
         else:
@@ -903,26 +461,12 @@ def render_dashboard():
     # Графики распределения
     st.markdown("### 📊 Распределение нагрузки")
     
-    if active_executors:
-        # График утилизации исполнителей
-        exec_data = []
-        for e in active_executors:
-            utilization = e['assigned_today'] / e['daily_limit'] if e['daily_limit'] > 0 else 0
-            exec_data.append({
-                'Исполнитель': e['name'],
-                'Назначено': e['assigned_today'],
-                'Лимит': e['daily_limit'],
-                'Утилизация': utilization * 100
-            })
-        
-        df_exec = pd.DataFrame(exec_data)
-        
-        # Расчет статистики
-        avg_utilization = df_exec['Утилизация'].mean()
-        std_utilization = df_exec['Утилизация'].std() if len(df_exec) > 1 else 0
-        min_utilization = df_exec['Утилизация'].min()
-        max_utilization = df_exec['Утилизация'].max()
-        range_utilization = max_utilization - min_utilization
+    if metrics['active']:
+        avg_utilization = metrics['avg_utilization']
+        std_utilization = metrics['std_utilization']
+        min_utilization = metrics['min_utilization']
+        max_utilization = metrics['max_utilization']
+        range_utilization = metrics['range_utilization']
         
         # Статистические метрики распределения
         st.markdown("#### 📈 Статистика распределения")
@@ -948,106 +492,137 @@ def render_dashboard():
             st.metric(
                 label="📐 Разброс",
                 value=f"{range_utilization:.1f}%",
-                delta=f"Min: {min_utilization:.1f}%, Max: {max_utilization:.1f}%",
+                delta=f"Min: {min_utilization:.1f}%, Max: {max_utilization:.1f}%, P90: {metrics['p90_utilization']:.1f}%",
                 help="Разница между максимальной и минимальной утилизацией"
             )
         
         st.markdown("---")
         
-        # График 1: Утилизация с линией среднего
-        fig1 = px.bar(
-            df_exec,
-            x='Исполнитель',
-            y='Утилизация',
-            color='Утилизация',
-            color_continuous_scale=['green', 'yellow', 'orange', 'red'],
-            range_color=[0, 100],
-            title="Утилизация исполнителей (%)",
-            labels={'Утилизация': 'Утилизация (%)'}
-        )
-        fig1.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Лимит (100%)", annotation_position="right")
-        fig1.add_hline(y=avg_utilization, line_dash="dot", line_color="blue", 
-                      annotation_text=f"Среднее: {avg_utilization:.1f}%", 
-                      annotation_position="left")
-        fig1.update_layout(xaxis_tickangle=-45, showlegend=False, height=400)
-        st.plotly_chart(fig1, use_container_width=True)
-        
-        # График 2 и 3 в двух колонках
-        col_graph1, col_graph2 = st.columns(2)
-        
-        with col_graph1:
-            # График отклонений от среднего
-            df_exec['Отклонение'] = df_exec['Утилизация'] - avg_utilization
+        if metrics['active'] > CHART_EXECUTOR_LIMIT:
+            # Большой пул: агрегаты фиксированного размера, исполнители - по запросу
+            render_executor_rollups(queries, avg_utilization)
+        else:
+            # Нагрузка исполнителей: Исполнитель, Назначено, Лимит, Утилизация (%)
+            df_exec = queries.executor_load()
             
-            fig2 = px.bar(
+            # График 1: Утилизация с линией среднего
+            fig1 = px.bar(
                 df_exec,
                 x='Исполнитель',
-                y='Отклонение',
-                color='Отклонение',
-                color_continuous_scale=['red', 'yellow', 'green', 'yellow', 'red'],
-                color_continuous_midpoint=0,
-                title="Отклонение от среднего (%)",
-                labels={'Отклонение': 'Отклонение (%)'}
+                y='Утилизация',
+                color='Утилизация',
+                color_continuous_scale=['green', 'yellow', 'orange', 'red'],
+                range_color=[0, 100],
+                title="Утилизация исполнителей (%)",
+                labels={'Утилизация': 'Утилизация (%)'}
             )
-            fig2.add_hline(y=0, line_dash="solid", line_color="gray", line_width=1)
-            fig2.update_layout(xaxis_tickangle=-45, showlegend=False, height=350)
-            st.plotly_chart(fig2, use_container_width=True)
-        
-        with col_graph2:
-            # Гистограмма распределения утилизации
-            fig3 = px.histogram(
-                df_exec,
-                x='Утилизация',
-                nbins=min(10, len(df_exec)),
-                title="Гистограмма распределения утилизации",
-                labels={'Утилизация': 'Утилизация (%)', 'count': 'Количество исполнителей'},
-                color_discrete_sequence=['#1f77b4']
-            )
-            fig3.add_vline(x=avg_utilization, line_dash="dash", line_color="red",
-                          annotation_text=f"Среднее: {avg_utilization:.1f}%",
-                          annotation_position="top")
-            fig3.update_layout(showlegend=False, height=350, bargap=0.1)
-            st.plotly_chart(fig3, use_container_width=True)
-        
-        # Детальная таблица
-        st.markdown("### 📋 Детали распределения")
-        df_display = df_exec.copy()
-        df_display['Утилизация'] = df_display['Утилизация'].apply(lambda x: f"{x:.1f}%")
-        df_display['Отклонение'] = df_display['Отклонение'].apply(lambda x: f"{x:+.1f}%")
-        df_display = df_display[['Исполнитель', 'Назначено', 'Лимит', 'Утилизация', 'Отклонение']]
-        st.dataframe(df_display, use_container_width=True, hide_index=True)
+            fig1.add_hline(y=100, line_dash="dash", line_color="red", annotation_text="Лимит (100%)", annotation_position="right")
+            fig1.add_hline(y=avg_utilization, line_dash="dot", line_color="blue", 
+                          annotation_text=f"Среднее: {avg_utilization:.1f}%", 
+                          annotation_position="left")
+            fig1.update_layout(xaxis_tickangle=-45, showlegend=False, height=400)
+            st.plotly_chart(fig1, use_container_width=True)
+        
+            # График 2 и 3 в двух колонках
+            col_graph1, col_graph2 = st.columns(2)
+        
+            with col_graph1:
+                # График отклонений от среднего
+                df_exec['Отклонение'] = df_exec['Утилизация'] - avg_utilization
+            
+                fig2 = px.bar(
+                    df_exec,
+                    x='Исполнитель',
+                    y='Отклонение',
+                    color='Отклонение',
+                    color_continuous_scale=['red', 'yellow', 'green', 'yellow', 'red'],
+                    color_continuous_midpoint=0,
+                    title="Отклонение от среднего (%)",
+                    labels={'Отклонение': 'Отклонение (%)'}
+                )
+                fig2.add_hline(y=0, line_dash="solid", line_color="gray", line_width=1)
+                fig2.update_layout(xaxis_tickangle=-45, showlegend=False, height=350)
+                st.plotly_chart(fig2, use_container_width=True)
+        
+            with col_graph2:
+                # Гистограмма распределения утилизации
+                fig3 = px.histogram(
+                    df_exec,
+                    x='Утилизация',
+                    nbins=min(10, len(df_exec)),
+                    title="Гистограмма распределения утилизации",
+                    labels={'Утилизация': 'Утилизация (%)', 'count': 'Количество исполнителей'},
+                    color_discrete_sequence=['#1f77b4']
+                )
+                fig3.add_vline(x=avg_utilization, line_dash="dash", line_color="red",
+                              annotation_text=f"Среднее: {avg_utilization:.1f}%",
+                              annotation_position="top")
+                fig3.update_layout(showlegend=False, height=350, bargap=0.1)
+                st.plotly_chart(fig3, use_container_width=True)
+        
+            # Детальная таблица
+            st.markdown("### 📋 Детали распределения")
+            df_display = df_exec.copy()
+            df_display['Утилизация'] = df_display['Утилизация'].apply(lambda x: f"{x:.1f}%")
+            df_display['Отклонение'] = df_display['Отклонение'].apply(lambda x: f"{x:+.1f}%")
+            df_display = df_display[['Исполнитель', 'Назначено', 'Лимит', 'Утилизация', 'Отклонение']]
+            st.dataframe(df_display, use_container_width=True, hide_index=True)
     else:
         st.info("👥 Нет активных исполнителей. Добавьте исполнителей в разделе 'Исполнители'")
     
-    # Графики активности
+    # Графики активности: кольцевые буферы 1s/1m/1h, стоимость - число точек окна
+    window_label = st.selectbox("Окно графиков активности", list(WINDOWS), index=1, key='rate_window')
+    resolution, buckets = WINDOWS[window_label]
     col1, col2 = st.columns(2)
     
     with col1:
-        st.markdown("### ⏱ Поступление заявок (последние 5 минут)")
-        df_tasks_min = _aggregate_per_minute(st.session_state.tasks, 'created_at', window_minutes=5)
-        fig2 = px.line(df_tasks_min, x='Минута', y='Количество', markers=True, color_discrete_sequence=['#1f77b4'])
+        st.markdown(f"### ⏱ Поступление заявок ({window_label.lower()})")
+        df_tasks_min = _rate_frame('tasks', resolution, buckets)
+        fig2 = px.line(df_tasks_min, x='Время', y='Количество', markers=buckets <= 60, color_discrete_sequence=['#1f77b4'])
         st.plotly_chart(fig2, use_container_width=True)
     
     with col2:
-        st.markdown("### ⚡ Назначения (последние 5 минут)")
-        df_assign_min = _aggregate_per_minute(st.session_state.assignments, 'assigned_at', window_minutes=5)
-        fig3 = px.line(df_assign_min, x='Минута', y='Количество', markers=True, color_discrete_sequence=['#2ca02c'])
+        st.markdown(f"### ⚡ Назначения ({window_label.lower()})")
+        df_assign_min = _rate_frame('assignments', resolution, buckets)
+        fig3 = px.line(df_assign_min, x='Время', y='Количество', markers=buckets <= 60, color_discrete_sequence=['#2ca02c'])
         st.plotly_chart(fig3, use_container_width=True)
+    
+    # Разбивка по параметрам: группировка в SQL по генерируемым колонкам
+    param_columns = get_schema(DB_PATH).param_columns
+    param_options = [(table, key) for table in ('tasks', 'executors') for key in param_columns.get(table, {})]
+    if param_options:
+        with st.expander("🔎 Разбивка по параметрам"):
+            table_labels = {'tasks': 'Заявки', 'executors': 'Исполнители'}
+            table, key = st.selectbox(
+                "Параметр",
+                param_options,
+                format_func=lambda option: f"{table_labels[option[0]]}: {option[1]}"
+            )
+            breakdown = get_snapshot(DB_PATH).count_by_param(table, key)
+            if breakdown:
+                df_breakdown = pd.DataFrame(breakdown, columns=['Значение', 'Количество'])
+                df_breakdown['Значение'] = df_breakdown['Значение'].astype(str)
+                st.plotly_chart(px.bar(df_breakdown, x='Значение', y='Количество'), use_container_width=True)
+            else:
+                st.info("Нет данных по этому параметру")
 
 # Управление исполнителями
 def render_executors_management():
     st.markdown('<h2 class="section-header">👥 Управление исполнителями</h2>', unsafe_allow_html=True)
     
+    executors = current_data().executors
+    
     # Проверка на редактирование исполнителя
     editing_executor_id = None
-    for executor in st.session_state.executors:
+    for executor in executors:
         if st.session_state.get(f"editing_executor_{executor['id']}", False):
             editing_executor_id = executor['id']
             break
     
     if editing_executor_id:
         # Редактирование существующего исполнителя
-        executor_to_edit = next(e for e in st.session_state.executors if e['id'] == editing_executor_id)
+        # Копия: записи общих данных не изменяются на месте
+        executor_to_edit = dict(next(e for e in executors if e['id'] == editing_executor_id))
         st.markdown("### ✏️ Редактировать исполнителя")
         
         col1, col2 = st.columns(2)
@@ -1191,14 +766,12 @@ def render_executors_management():
                     if f"edit_params_{editing_executor_id}" in st.session_state:
                         del st.session_state[f"edit_params_{editing_executor_id}"]
                     st.session_state[f"editing_executor_{editing_executor_id}"] = False
-                    st.session_state.executors = load_executors_from_db()
                     
                     # Автоматически распределяем нераспределенные заявки
                     assigned_count = auto_assign_unassigned_tasks()
                     
                     # Обновляем данные в сессии
-                    st.session_state.assignments = load_assignments_from_db()
-                    st.session_state.executors = load_executors_from_db()
+                    refresh_session_data()
                     
                     if assigned_count > 0:
                         st.success(f"✅ Исполнитель обновлен! Автоматически назначено заявок: {assigned_count}")
@@ -1219,8 +792,7 @@ def render_executors_management():
         with col3:
             if st.button("🗑️ Удалить исполнителя", type="secondary"):
                 delete_executor_from_db(editing_executor_id)
-                st.session_state.executors = load_executors_from_db()
-                st.session_state.assignments = load_assignments_from_db()
+                refresh_session_data(full=True)
                 st.session_state[f"editing_executor_{editing_executor_id}"] = False
                 st.success("✅ Исполнитель удален!")
                 st.rerun()
@@ -1361,14 +933,12 @@ def render_executors_management():
             # Очищаем session_state параметров
             st.session_state.new_executor_params = {}
             
-            st.session_state.executors = load_executors_from_db()
             
             # Автоматически распределяем нераспределенные заявки
             assigned_count = auto_assign_unassigned_tasks()
             
             # Обновляем данные в сессии
-            st.session_state.assignments = load_assignments_from_db()
-            st.session_state.executors = load_executors_from_db()
+            refresh_session_data()
             
             if assigned_count > 0:
                 st.success(f"✅ Исполнитель успешно добавлен! Автоматически назначено заявок: {assigned_count}")
@@ -1381,8 +951,8 @@ def render_executors_management():
     # Список исполнителей
     st.markdown("### 👥 Список исполнителей")
     
-    if st.session_state.executors:
-        for executor in st.session_state.executors:
+    if executors:
+        for executor in executors:
             with st.container():
                 col1, col2, col3 = st.columns([3, 1, 1])
                 
@@ -1414,8 +984,7 @@ def render_executors_management():
                 with col3:
                     if st.button(f"🗑️ Удалить", key=f"delete_exec_{executor['id']}"):
                         delete_executor_from_db(executor['id'])
-                        st.session_state.executors = load_executors_from_db()
-                        st.session_state.assignments = load_assignments_from_db()
+                        refresh_session_data(full=True)
                         st.success("✅ Исполнитель удален!")
                         st.rerun()
                 
@@ -1423,281 +992,120 @@ def render_executors_management():
     else:
         st.info("👥 Исполнителей пока нет. Добавьте первого исполнителя выше.")
 
-# Нагрузочное тестирование
-def load_rule_engine():
-    """Загрузить Rule Engine из конфигурации"""
-    config_path = os.path.join(os.path.dirname(__file__), '..', 'config', 'matching_rules.json')
-    
-    if not os.path.exists(config_path):
-        print(f"[WARN] Конфигурация правил не найдена: {config_path}")
-        return None
-    
-    try:
-        with open(config_path, 'r', encoding='utf-8') as f:
-            config = json.load(f)
-        
-        engine = RuleEngine(config)
-        print(f"[OK] Rule Engine загружен, правил: {len(config.get('rules', []))}")
-        return engine
-    except Exception as e:
-        print(f"[ERROR] Ошибка загрузки Rule Engine: {e}")
-        return None
-
-
-def find_best_executor_simple(task, executors):
-    """
-    Алгоритм поиска лучшего исполнителя
-    Поддерживает:
-    - Простой алгоритм (если Rule Engine недоступен)
-    - Rule Engine (если доступен и настроен)
-    """
-    # Фильтруем только активных исполнителей с доступными слотами
-    active_executors = [e for e in executors if e.get('active', True) and e['assigned_today'] < e['daily_limit']]
-    if not active_executors:
-        return None
-    
-    # Пробуем использовать Rule Engine
-    if RULE_ENGINE_AVAILABLE:
-        try:
-            engine = load_rule_engine()
-            if engine:
-                # Подготовка данных для Rule Engine
-                # Обогащаем данные для использования в формулах
-                for executor in active_executors:
-                    executor['assigned_count'] = executor.get('assigned_today', 0)
-                    executor['max_assignments'] = executor.get('daily_limit', 10)
-                    # Добавляем params из data если есть
-                    if 'params' not in executor and 'data' in executor:
-                        executor['params'] = executor.get('data', {})
-                
-                # Добавляем params к заявке
-                if 'params' not in task and 'data' in task:
-                    task['params'] = task.get('data', {})
-                
-                # Добавляем is_active для правила active_executor
-                task['is_active'] = 1
-                
-                # Используем Rule Engine
-                result = engine.find_best_match(task, active_executors)
-                
-                if result:
-                    executor, score, matched_rules = result
-                    print(f"[Rule Engine] Score: {score:.2f}, Правил: {len(matched_rules)}")
-                    return executor, score
-        except Exception as e:
-            print(f"[WARN] Rule Engine error: {e}, fallback to simple algorithm")
-    
-    # Fallback: простой алгоритм
-    best_executor = None
-    best_score = -1.0
-    
-    for executor in active_executors:
-        # Расчет score на основе утилизации
-        utilization = executor['assigned_today'] / executor['daily_limit'] if executor['daily_limit'] > 0 else 0
-        
-        # Fairness score - ОСНОВНОЙ вес (умножаем на 10 для усиления)
-        fairness_score = (1.0 - utilization) * 10.0
-        
-        # Бонус за совпадение отдела (небольшой аддитивный бонус)
-        department_bonus = 1.0 if executor.get('department') == task.get('category') else 0.0
-        
-        # Бонус за приоритет (небольшой аддитивный бонус)
-        priority_bonus = {'Критический': 0.5, 'Высокий': 0.3, 'Средний': 0.1, 'Низкий': 0.0}.get(task.get('priority', 'Средний'), 0.1)
-        
-        # Итоговый score = fairness (главный) + бонусы (дополнительные)
-        final_score = fairness_score + department_bonus + priority_bonus
-        
-        if final_score > best_score:
-            best_score = final_score
-            best_executor = executor
-    
-    return best_executor, best_score if best_executor else None
-
 def auto_assign_unassigned_tasks():
     """Автоматически распределяет все нераспределенные заявки"""
-    tasks = load_tasks_from_db()
-    assignments = load_assignments_from_db()
     executors = load_executors_from_db()
-    
-    if not executors or not tasks:
+    if not executors:
         return 0
     
-    # Найти ID всех распределенных заявок
-    assigned_task_ids = set(a['task_id'] for a in assignments)
-    
-    # Найти нераспределенные заявки
-    unassigned_tasks = [t for t in tasks if t['id'] not in assigned_task_ids]
-    
+    # Нераспределенные заявки выбираются в SQL по индексу assignments.task_id
+    unassigned_tasks = repo.load_unassigned_tasks()
     if not unassigned_tasks:
         return 0
     
-    assigned_count = 0
-    
-    # Распределить каждую нераспределенную заявку
-    for task in unassigned_tasks:
-        result = find_best_executor_simple(task, executors)
-        if result:
-            executor, score = result
-            assignment = {
-                'id': str(uuid.uuid4()),
-                'task_id': task['id'],
-                'executor_id': executor['id'],
-                'assigned_at': datetime.now().isoformat(),
-                'score': score
-            }
-            save_assignment_to_db(assignment)
-            
-            # Обновляем счетчик исполнителя
-            executor['assigned_today'] += 1
-            save_executor_to_db(executor)
-            
-            assigned_count += 1
-            
-            # Перезагружаем исполнителей для актуальных данных
-            executors = load_executors_from_db()
-    
-    return assigned_count
+    # Распределить все нераспределенные заявки одной транзакцией
+    engine = load_rule_engine() if RULE_ENGINE_AVAILABLE else None
+    assignments = repo.assign_tasks(unassigned_tasks, executors, engine)
+    return sum(1 for a in assignments if a)
 
 def run_load_test_background(num_tasks, batch_size, delay_ms):
-    """Фоновая функция для нагрузочного тестирования"""
+    """Фоновая функция для нагрузочного тестирования (прогресс - в load_test)"""
     try:
-        categories = ["IT", "Строительство", "Страхование", "Консалтинг"]
-        priorities = ["Низкий", "Средний", "Высокий", "Критический"]
+        engine = load_rule_engine() if RULE_ENGINE_AVAILABLE else None
         
-        set_load_test_status('running', 0, 0, num_tasks, 0)
+        executors = load_executors_from_db()
+        if not executors:
+            load_test.finish(ERROR, "Нет исполнителей!")
+            return
         
+        # Распределение идет в памяти, запись - в потоке записи групповыми
+        # коммитами: следующая пачка распределяется, пока пишется предыдущая
+        writer = get_writer(DB_PATH)
+        schema = get_schema(DB_PATH)
+        dispatcher = Dispatcher(executors, engine)
+        pending = deque()
         total_generated = 0
-        total_assigned = 0
-        start_time = time.time()
+        
+        def collect_reservations():
+            # Учитываем уже зафиксированные резервирования, возвращаем число конфликтов
+            assigned = conflicts = 0
+            while pending and pending[0].done():
+                if pending.popleft().result():
+                    assigned += 1
+                else:
+                    conflicts += 1
+            load_test.advance(assigned=assigned)
+            return conflicts
         
         for i in range(0, num_tasks, batch_size):
-            # Проверяем статус (может быть остановлен пользователем)
-            status = get_load_test_status()
-            if status and status['status'] == 'stopped':
+            # Остановка проверяется на каждой заявке и прерывает паузу
+            if load_test.should_stop():
                 break
             
             current_batch_size = min(batch_size, num_tasks - i)
-            executors = load_executors_from_db()
-            
-            if not executors:
-                set_load_test_status('error', message="Нет исполнителей!")
-                return
             
+            # Генерируем заявки с параметрами в зависимости от категории
+            tasks = []
             for j in range(current_batch_size):
-                task_id = str(uuid.uuid4())
-                category = random.choice(categories)
-                priority = random.choice(priorities)
-                
-                # Генерируем параметры в зависимости от категории
-                params = {}
-                
-                if category == "IT":
-                    # IT параметры
-                    all_skills = ["Python", "JavaScript", "React", "FastAPI", "Docker", "PostgreSQL", "AWS"]
-                    params = {
-                        'required_skills': random.sample(all_skills, random.randint(1, 3)),
-                        'min_experience_years': random.choice([1, 2, 3, 5, 7]),
-                        'complexity': random.randint(1, 10),
-                        'remote_work': random.choice([True, False]),
-                        'max_hourly_rate': random.choice([3000, 4000, 5000, 6000])
-                    }
-                
-                elif category == "Строительство":
-                    # Строительство параметры
-                    params = {
-                        'location': random.choice(["Москва", "Санкт-Петербург", "Казань", "Екатеринбург"]),
-                        'equipment_needed': random.sample(["Кран", "Экскаватор", "Бетономешалка"], random.randint(1, 2)),
-                        'square_meters': random.choice([500, 1000, 1500, 2000, 3000]),
-                        'floor_count': random.randint(1, 10)
-                    }
-                
-                elif category == "Страхование":
-                    # Страхование параметры
-                    params = {
-                        'insurance_types': random.sample(["ОСАГО", "КАСКО", "Жизнь", "Имущество"], random.randint(1, 2)),
-                        'vehicle_year': random.choice([2018, 2019, 2020, 2021, 2022, 2023]),
-                        'driver_age': random.randint(25, 65),
-                        'accident_history': random.choice([True, False])
-                    }
-                
-                elif category == "Консалтинг":
-                    # Консалтинг параметры
-                    params = {
-                        'required_certifications': random.sample(["PMP", "Agile", "PRINCE2", "Scrum Master"], random.randint(1, 2)),
-                        'project_duration_months': random.choice([1, 3, 6, 12, 24]),
-                        'team_size': random.randint(5, 50),
-                        'industry': random.choice(["Финансы", "Производство", "Ритейл", "IT"])
-                    }
-                
-                task = {
-                    'id': task_id,
-                    'name': f"Заявка #{total_generated + j + 1}",
-                    'category': category,
-                    'priority': priority,
-                    'params': params,
-                    'created_at': datetime.now().isoformat()
-                }
-                
-                save_task_to_db(task)
-                
-                result = find_best_executor_simple(task, executors)
-                if result:
-                    executor, score = result
-                    assignment = {
-                        'id': str(uuid.uuid4()),
-                        'task_id': task_id,
-                        'executor_id': executor['id'],
-                        'assigned_at': datetime.now().isoformat(),
-                        'score': score
-                    }
-                    save_assignment_to_db(assignment)
-                    
-                    executor['assigned_today'] += 1
-                    save_executor_to_db(executor)
-                    
-                    total_assigned += 1
+                if load_test.should_stop():
+                    break
+                tasks.append(generate_task(total_generated + j + 1))
+            if not tasks:
+                break
             
-            total_generated += current_batch_size
+            writer.executemany(schema.upsert_task_sql, [schema.task_row(t) for t in tasks])
+            pending.extend(writer.reserve(a) for a in dispatcher.assign_batch(tasks) if a)
             
-            # Обновляем прогресс в БД
-            progress = total_generated / num_tasks
-            set_load_test_status('running', progress, total_generated, num_tasks, total_assigned)
+            if collect_reservations():
+                # Счетчики в памяти разошлись с БД (параллельное распределение) - перечитываем
+                writer.flush()
+                dispatcher.load(load_executors_from_db())
             
-            if delay_ms > 0 and i + batch_size < num_tasks:
-                time.sleep(delay_ms / 1000.0)
+            total_generated += len(tasks)
+            load_test.advance(generated=len(tasks))
+            
+            if i + batch_size < num_tasks and load_test.wait(delay_ms / 1000.0):
+                break
         
-        end_time = time.time()
-        elapsed_time = end_time - start_time
-        performance = total_generated / elapsed_time if elapsed_time > 0 else 0
+        # Дожидаемся фиксации всех резервирований
+        writer.flush()
+        collect_reservations()
         
-        # Завершение
-        set_load_test_status('completed', 1.0, total_generated, num_tasks, total_assigned, elapsed_time, performance)
+        # Завершение (итог сохраняется в БД)
+        load_test.finish(COMPLETED)
         
     except Exception as e:
-        set_load_test_status('error', message=f"Ошибка: {str(e)}")
+        load_test.finish(ERROR, f"Ошибка: {str(e)}")
+    finally:
+        # WAL после теста переносится в файл БД, соединение потока закрывается
+        get_writer(DB_PATH).flush()
+        checkpoint(DB_PATH, 'TRUNCATE')
+        close_connection(DB_PATH)
 
 def render_load_test():
     st.markdown('<h2 class="section-header">🧪 Нагрузочное тестирование</h2>', unsafe_allow_html=True)
     
-    # Получаем текущий статус теста из БД
+    # Текущий статус теста (из памяти процесса)
     test_status_data = get_load_test_status()
-    test_status = test_status_data['status'] if test_status_data else None
+    test_status = test_status_data['status']
     
-    if test_status == 'running':
+    if test_status == RUNNING:
         st.info("🔄 Тестирование выполняется в фоновом режиме. Вы можете переключаться между вкладками!")
         
         progress = test_status_data['progress']
         current = test_status_data['current']
         total = test_status_data['total']
         assigned = test_status_data['assigned']
+        performance = test_status_data['performance']
         
         st.progress(progress)
-        st.write(f"**Обработано:** {current}/{total} заявок | **Назначено:** {assigned}")
+        st.write(f"**Обработано:** {current}/{total} заявок | **Назначено:** {assigned} | "
+                 f"**Скорость:** {performance:.1f} заявок/сек")
         
         col1, col2 = st.columns(2)
         with col1:
             if st.button("⏹️ Остановить тестирование", type="secondary"):
-                set_load_test_status('stopped')
+                load_test.request_stop()
                 st.warning("Тестирование остановлено")
                 st.rerun()
         
@@ -1705,7 +1113,7 @@ def render_load_test():
             if st.button("🔄 Обновить", type="secondary"):
                 st.rerun()
     
-    elif test_status == 'completed':
+    elif test_status == COMPLETED:
         elapsed = test_status_data['elapsed']
         performance = test_status_data['performance']
         current = test_status_data['current']
@@ -1716,22 +1124,24 @@ def render_load_test():
 Создано заявок: {current} | Назначено: {assigned}  
 Время выполнения: {elapsed:.2f} сек | Производительность: {performance:.1f} заявок/сек
         """)
+        if test_status_data['message']:
+            st.caption(test_status_data['message'])
         
         if st.button("🔄 Запустить новое тестирование"):
-            set_load_test_status('idle')
+            load_test.reset()
             st.balloons()
             st.rerun()
     
-    elif test_status == 'error':
+    elif test_status == ERROR:
         error_msg = test_status_data['message']
         st.error(f"❌ Ошибка: {error_msg}")
         
         if st.button("🔄 Попробовать снова"):
-            set_load_test_status('idle')
+            load_test.reset()
             st.rerun()
     
     # Форма настроек (показываем только если тест не запущен)
-    if test_status not in ['running']:
+    if test_status != RUNNING:
         st.markdown("""
         ### 🎯 Массовая генерация заявок
         
@@ -1757,6 +1167,10 @@ def render_load_test():
             st.error("❌ Нет исполнителей! Сначала добавьте исполнителей в разделе 'Исполнители'")
             return
         
+        if not load_test.start(num_tasks):
+            st.warning("⚠️ Нагрузочное тестирование уже выполняется")
+            return
+        
         # Запускаем тестирование в отдельном потоке
         test_thread = threading.Thread(
             target=run_load_test_background,
@@ -1769,21 +1183,62 @@ def render_load_test():
         time.sleep(0.5)  # Даем потоку запуститься
         st.rerun()
     
+    render_sampling_benchmark()
+    
     # Статистика последнего теста
     st.markdown("### 📊 Текущая статистика")
     
+    kpis = get_dashboard_queries().kpis()
     col1, col2, col3 = st.columns(3)
     
     with col1:
-        st.metric("Всего заявок в системе", len(st.session_state.tasks))
+        st.metric("Всего заявок в системе", kpis['tasks'])
     
     with col2:
-        st.metric("Всего назначений", len(st.session_state.assignments))
+        st.metric("Всего назначений", kpis['assignments'])
     
     with col3:
-        active_executors = [e for e in st.session_state.executors if e.get('active', True)]
-        total_assigned_today = sum(e['assigned_today'] for e in active_executors)
-        st.metric("Всего назначено сегодня", total_assigned_today)
+        st.metric("Всего назначено сегодня", kpis['assigned_today'])
+
+def render_sampling_benchmark():
+    """Замер точного режима и power-of-d-choices на синтетическом пуле"""
+    st.markdown("### 🎲 Приближенное распределение (power-of-d-choices)")
+    
+    with st.expander("Сравнить MAE и производительность для разных d", expanded=False):
+        st.markdown("""
+        В режиме `sampled` (секция `sampling` в `config/matching_rules.json`) Rule Engine оценивает
+        только **d** случайных свободных кандидатов вместо всего пула. Замер выполняется в памяти
+        на синтетических данных и не затрагивает БД.
+        """)
+        
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_executors = st.number_input("Исполнителей в пуле", min_value=10, max_value=100000, value=300, step=100)
+            n_tasks = st.number_input("Заявок", min_value=10, max_value=100000, value=500, step=100)
+        with col2:
+            d_values = st.multiselect("Значения d", [1, 2, 4, 8, 16, 32, 64, 128], default=list(DEFAULT_D_VALUES))
+            pool = st.selectbox("Выборка кандидатов", ["category", "uniform"],
+                                help="category - из свободных исполнителей отдела заявки, uniform - из всех свободных")
+        with col3:
+            include_exact = st.checkbox("Замерить полный перебор", value=True,
+                                        help="На больших пулах полный перебор может занять минуты")
+        
+        if st.button("📏 Запустить замер"):
+            with st.spinner("Выполняется замер..."):
+                st.session_state.sampling_benchmark = benchmark_sampling(
+                    int(n_executors), int(n_tasks), sorted(d_values), pool, include_exact
+                )
+        
+        results = st.session_state.get('sampling_benchmark')
+        if results:
+            df_bench = pd.DataFrame(results)
+            st.dataframe(df_bench, use_container_width=True, hide_index=True)
+            fig = px.scatter(
+                df_bench, x='Заявок/сек', y='MAE', text='Режим', log_x=True,
+                title="Компромисс: производительность vs справедливость"
+            )
+            fig.update_traces(textposition='top center')
+            st.plotly_chart(fig, use_container_width=True)
 
 # Настройки
 def render_settings():
@@ -1808,9 +1263,25 @@ def render_settings():
         
         if st.button("🔄 Сбросить дневные счетчики", type="secondary"):
             reset_daily_counts_in_db()
-            st.session_state.executors = load_executors_from_db()
+            refresh_session_data()
             st.success("✅ Дневные счетчики сброшены!")
             st.rerun()
+        
+        # Архивация: в горячих таблицах остается рабочий набор текущего дня.
+        # Объем считается по кнопке (сканирует историю), а не на каждом обновлении
+        if st.button("🔍 Проверить, что можно архивировать", type="secondary"):
+            st.session_state.archive_pending = count_archivable(archive_cutoff(), DB_PATH)
+        pending_archive = st.session_state.get('archive_pending')
+        if pending_archive is not None:
+            # Заявки переносятся вместе с назначениями: 0 назначений - переносить нечего
+            pending_assignments = pending_archive['assignments']
+            if st.button(f"🗄️ Архивировать прошлые дни ({pending_assignments} назначений)", type="secondary",
+                         disabled=pending_assignments == 0):
+                stats = archive(DB_PATH)
+                st.session_state.pop('archive_pending', None)
+                refresh_session_data(full=True)
+                st.success(f"✅ В архив перенесено заявок: {stats['tasks']}, назначений: {stats['assignments']}")
+                st.rerun()
     
     st.markdown("---")
     
@@ -1823,22 +1294,14 @@ def render_settings():
     with col1:
         if st.button("🗑️ Очистить все заявки и назначения", type="secondary"):
             clear_all_data_in_db()
-            st.session_state.tasks = load_tasks_from_db()
-            st.session_state.executors = load_executors_from_db()
-            st.session_state.assignments = load_assignments_from_db()
+            refresh_session_data(full=True)
             st.success("✅ Все заявки и назначения удалены!")
             st.rerun()
     
     with col2:
         if st.button("🗑️ Удалить всех исполнителей", type="secondary"):
-            conn = get_sqlite_conn()
-            cur = conn.cursor()
-            cur.execute("DELETE FROM assignments")
-            cur.execute("DELETE FROM executors")
-            conn.commit()
-            conn.close()
-            st.session_state.executors = load_executors_from_db()
-            st.session_state.assignments = load_assignments_from_db()
+            repo.clear_executors()
+            refresh_session_data(full=True)
             st.success("✅ Все исполнители удалены!")
             st.rerun()
     